@@ -4,11 +4,12 @@ NovaEvo - Application Principale
 import os
 import json
 import logging
+import atexit
 import requests
 import threading
 import time
 from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -66,6 +67,11 @@ if os.getenv('SENTRY_DSN'):
 # Importer les modules
 from ocr.ocr_main import OCRProcessor
 from obd2.obd_main import OBDManager
+from obd2.obd_session import OBDSession
+from obd2.obd_stream import StreamerFull, TelemetryStreamer
+from obd2.obd_owner import OBDLinkOwner
+from obd2.obd_scheduler import PollingScheduler
+from obd2.obd_fleet import OBDFleet
 from nlp.nlp_main import AutoAssistantNLP
 from image_recognition.image_recognition_main import ImageRecognitionEngine, detect_labels
 from ecu_flash.ecu_flash_main import flash_ecu, ECUFlashManager
@@ -73,6 +79,9 @@ from parts_finder.parts_finder_main import PartsFinderManager, search_parts
 
 # Nouveaux modules
 from subscriptions.subscriptions_main import process_subscription, app as subscriptions_app, webhook_handler
+from utils.dtc_index import DTCIndex
+from utils.upload_buffer import UploadBuffer
+from utils.job_queue import JobQueue, JobQueueFull
 
 # Dictionnaire pour stocker les modules contextuels
 context_modules = {}
@@ -227,14 +236,57 @@ for server_url in app.config['CONTEXT_SERVERS']:
         api_key = os.getenv(f"API_KEY_{module_id.upper()}")
         context_manager.register_module(module_id, server_url, api_key)
 
+def dtc_context_codes():
+    """
+    Retourne les codes défaut du module contextuel 'dtc_database', s'il est enregistré
+    """
+    if 'dtc_database' not in context_manager.modules:
+        return None
+    return context_manager.get_context_data('dtc_database', 'codes')
+
+# Index des codes défaut partagé par les modules OBD-II et NLP
+dtc_index = DTCIndex(context_source=dtc_context_codes)
+
 # Initialiser les gestionnaires des modules
 ocr_processor = OCRProcessor()
+atexit.register(ocr_processor.tesseract.shutdown)  # Pool de processus Tesseract (démarré au premier usage)
+job_queue = JobQueue()  # Analyses d'image en arrière-plan (mode job de /ocr et /image_recognition)
+atexit.register(job_queue.shutdown)
 obd_manager = OBDManager()
-nlp_assistant = AutoAssistantNLP()
+obd_session = OBDSession(obd_manager)  # Liaison OBD-II persistante, ouverte au premier appel
+atexit.register(obd_session.stop)
+obd_fleet = OBDFleet(default_session=obd_session)  # Dongles supplémentaires (OBD_DEVICES), un thread chacun
+atexit.register(obd_fleet.stop)
+telemetry_streamer = TelemetryStreamer(obd_session)
+polling_scheduler = PollingScheduler(obd_session)  # Surveillance continue, démarrée via /obd2/monitor
+atexit.register(polling_scheduler.stop)
+obd_owner = OBDLinkOwner()  # Un seul worker détient la liaison OBD-II, les autres lui relaient /obd2 (gunicorn.conf.py)
+atexit.register(obd_owner.release)
+nlp_assistant = AutoAssistantNLP(dtc_index=dtc_index)
 image_recognition_engine = ImageRecognitionEngine()
 ecu_flash_manager = ECUFlashManager()
 parts_finder_manager = PartsFinderManager()
 
+def warm_up():
+    """
+    Prépare les moteurs d'analyse d'un processus avant sa première requête
+    
+    Appelée par gunicorn dans chaque worker (voir gunicorn.conf.py): inférence
+    de préchauffage du modèle de détection, et démarrage du pool Tesseract si
+    le moteur OCR l'utilise.
+    
+    Returns:
+        dict: État de chaque moteur préparé
+    """
+    status = {'image_recognition': image_recognition_engine.warm_up()}
+    if ocr_processor.backend in ('tesseract', 'hedged'):
+        try:
+            status['tesseract_workers'] = ocr_processor.tesseract.warm_up()
+        except Exception as e:
+            logger.warning(f"Préchauffage du pool Tesseract impossible: {str(e)}")
+    logger.info(f"Moteurs d'analyse préparés (pid {os.getpid()}): {status}")
+    return status
+
 # Démarrer la synchronisation en arrière-plan si des modules sont configurés
 if context_manager.modules:
     context_manager.start_background_sync()
@@ -248,7 +300,7 @@ def index():
         'status': 'success',
         'message': 'API NovaEvo opérationnelle',
         'modules': [
-            '/ocr', '/obd2', '/nlp', '/image_recognition', 
+            '/ocr', '/obd2', '/obd2/stream', '/obd2/history', '/obd2/metrics', '/obd2/alerts', '/obd2/monitor', '/obd2/fleet', '/obd2/<device_id>', '/nlp', '/image_recognition', '/jobs/<job_id>',
             '/ecu_flash', '/parts_finder', '/subscriptions', '/mapping_affiliations',
             '/feedback', '/context_modules'  # Nouvelle route pour les modules contextuels
         ]
@@ -321,6 +373,122 @@ def sync_module(module_id):
 
 # Routes pour chaque module
 
+def add_vehicle_context(vehicle_info):
+    """
+    Ajoute les données contextuelles du véhicule (module 'vehicles_data') si disponibles
+    
+    Args:
+        vehicle_info (dict): Informations extraites par OCRProcessor.extract_vehicle_info
+    """
+    try:
+        if 'immatriculation' in vehicle_info and 'vehicles_data' in context_manager.modules:
+            immat = vehicle_info['immatriculation']
+            extra_data = context_manager.get_context_data('vehicles_data', f'registrations.{immat}')
+            if extra_data:
+                vehicle_info['context_data'] = extra_data
+                logger.info(f"Données contextuelles ajoutées pour {immat}")
+    except Exception as context_err:
+        logger.warning(f"Impossible d'ajouter des données contextuelles: {str(context_err)}")
+
+def analyze_document(image_source):
+    """
+    Lit une carte grise et en extrait les informations du véhicule
+    
+    Args:
+        image_source (dict): Arguments de process_image (image_content ou image_path)
+        
+    Returns:
+        tuple: (réponse, code HTTP)
+    """
+    ocr_result = ocr_processor.process_image(**image_source)
+    if 'error' in ocr_result:
+        return {'status': 'error', 'message': ocr_result['error']}, 500
+    
+    vehicle_info = ocr_processor.extract_vehicle_info(ocr_result)
+    # Confiance basse: relecture agrandie des seules zones des champs manquants
+    vehicle_info = ocr_processor.refine_vehicle_info(vehicle_info, ocr_result, **image_source)
+    
+    # Enrichir avec des données contextuelles si disponibles
+    add_vehicle_context(vehicle_info)
+    return vehicle_info, 200
+
+def recognize_image(image_source, analysis_type='standard'):
+    """
+    Détecte les labels d'une image et les enrichit avec la base de pièces
+    
+    Args:
+        image_source (dict): Arguments de detect_labels (image_content ou image_path)
+        analysis_type (str): "standard" (labels Vision), "advanced" (OpenCV + Vision)
+            ou "detection" (modèle de détection local, passes regroupées par lots)
+        
+    Returns:
+        dict: Résultats de l'analyse
+    """
+    if analysis_type == 'detection':
+        # Modèle local: les requêtes simultanées partagent une passe du réseau
+        results = image_recognition_engine.analyze_image(**image_source)
+    elif analysis_type == 'advanced':
+        # Utiliser la classe pour une analyse complète (OpenCV + Vision API)
+        results = image_recognition_engine.detect_labels(**image_source)
+    else:
+        # Utiliser la fonction autonome pour la détection simple de labels
+        results = detect_labels(**image_source)
+    
+    # Enrichir avec des données contextuelles
+    if 'parts_database' in context_manager.modules and results.get('labels'):
+        try:
+            for i, label in enumerate(results['labels']):
+                label_key = label['description'].lower().replace(' ', '_')
+                part_data = context_manager.get_context_data('parts_database', f'parts.{label_key}')
+                if part_data:
+                    results['labels'][i]['context_data'] = part_data
+        except Exception as context_err:
+            logger.warning(f"Erreur lors de l'enrichissement des détections: {str(context_err)}")
+    return results
+
+def job_requested():
+    """
+    Indique si le client demande le mode job (paramètre async=1 ou champ webhook)
+    
+    Returns:
+        bool: True pour traiter la requête en arrière-plan
+    """
+    flag = request.args.get('async', request.form.get('async', ''))
+    return flag.lower() in ('1', 'true') or bool(request.form.get('webhook') or request.args.get('webhook'))
+
+def submit_image_job(kind, func, upload, *args):
+    """
+    Place l'analyse d'une image dans la file de jobs
+    
+    Le contenu est copié: l'image envoyée est libérée dès la fin de la requête.
+    
+    Args:
+        kind (str): Type de traitement ("ocr" ou "image_recognition")
+        func (Callable): Traitement recevant {"image_content": ...} puis *args
+        upload (UploadBuffer): Image reçue
+        *args: Arguments supplémentaires du traitement
+        
+    Returns:
+        Response: 202 avec l'identifiant du job, 400 ou 503 si le job est refusé
+    """
+    try:
+        job = job_queue.submit(kind, func, {'image_content': upload.read()}, *args,
+                               webhook=request.form.get('webhook') or request.args.get('webhook'))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except JobQueueFull:
+        response = jsonify({
+            'status': 'error',
+            'message': 'Trop d\'analyses en attente, réessayez dans quelques instants'
+        })
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    
+    status_url = f"/jobs/{job['id']}"
+    response = jsonify({'status': 'accepted', 'job_id': job['id'], 'status_url': status_url})
+    response.headers['Location'] = status_url
+    return response, 202
+
 @app.route('/ocr', methods=['POST'])
 def ocr_endpoint():
     """
@@ -343,35 +511,18 @@ def ocr_endpoint():
             'message': 'Aucun fichier sélectionné'
         }), 400
     
+    upload = None
     try:
-        # Sauvegarder temporairement l'image
-        image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_file.filename)
-        image_file.save(image_path)
+        # Lire l'image en mémoire (fichier temporaire unique seulement au-delà du seuil)
+        upload = UploadBuffer.from_request_file(image_file, spill_dir=app.config['UPLOAD_FOLDER'])
         
-        # Traiter l'image avec OCR
-        ocr_result = ocr_processor.process_image(image_path=image_path)
+        # Mode job: réponse immédiate, analyse en arrière-plan (résultat sur /jobs/<id>)
+        if job_requested():
+            return submit_image_job('ocr', lambda source: analyze_document(source)[0], upload)
         
-        # Extraire les informations du véhicule
-        if 'error' not in ocr_result:
-            vehicle_info = ocr_processor.extract_vehicle_info(ocr_result)
-            
-            # Enrichir avec des données contextuelles si disponibles
-            try:
-                if 'immatriculation' in vehicle_info and 'vehicles_data' in context_manager.modules:
-                    immat = vehicle_info['immatriculation']
-                    extra_data = context_manager.get_context_data('vehicles_data', f'registrations.{immat}')
-                    if extra_data:
-                        vehicle_info['context_data'] = extra_data
-                        logger.info(f"Données contextuelles ajoutées pour {immat}")
-            except Exception as context_err:
-                logger.warning(f"Impossible d'ajouter des données contextuelles: {str(context_err)}")
-                
-            return jsonify(vehicle_info)
-        else:
-            return jsonify({
-                'status': 'error',
-                'message': ocr_result['error']
-            }), 500
+        # Traiter l'image avec OCR et extraire les informations du véhicule
+        payload, status_code = analyze_document(upload.image_source())
+        return jsonify(payload), status_code
     
     except Exception as e:
         logger.error(f"Erreur lors du traitement OCR: {str(e)}")
@@ -380,12 +531,70 @@ def ocr_endpoint():
             'message': f'Erreur lors du traitement de l\'image: {str(e)}'
         }), 500
     finally:
-        # Nettoyer le fichier temporaire
-        try:
-            if os.path.exists(image_path):
-                os.remove(image_path)
-        except:
-            pass  # Ignorer les erreurs de nettoyage
+        # Libérer l'image (et supprimer le fichier temporaire éventuel)
+        if upload is not None:
+            upload.close()
+
+@app.route('/ocr/batch', methods=['POST'])
+def ocr_batch_endpoint():
+    """
+    Endpoint OCR par lot (onboarding de flotte)
+    
+    Accepte plusieurs images dans le champ "images". Elles sont envoyées à Google
+    Cloud Vision par groupes (batch_annotate_images) traités en parallèle par un
+    pool borné. La réponse est diffusée en NDJSON: une ligne par document dès que
+    son groupe est traité (champ "index": position dans l'envoi), puis une ligne
+    finale {"done": true, ...}.
+    """
+    image_files = [f for f in request.files.getlist('images') if f.filename]
+    if not image_files:
+        return jsonify({
+            'status': 'error',
+            'message': 'Aucune image fournie. Veuillez envoyer les images dans le champ "images".'
+        }), 400
+    
+    max_images = int(os.getenv('OCR_BATCH_MAX_IMAGES', '100'))
+    if len(image_files) > max_images:
+        return jsonify({
+            'status': 'error',
+            'message': f'Trop d\'images: {len(image_files)} (maximum {max_images} par lot)'
+        }), 413
+    
+    filenames = [f.filename for f in image_files]
+    images = []
+    for image_file in image_files:
+        with UploadBuffer.from_request_file(image_file, spill_dir=app.config['UPLOAD_FOLDER']) as upload:
+            images.append(upload.read())
+    
+    def generate():
+        errors = 0
+        for index, ocr_result in ocr_processor.iter_batch(images):
+            if 'error' in ocr_result:
+                errors += 1
+                line = {'status': 'error', 'message': ocr_result['error']}
+            else:
+                line = ocr_processor.extract_vehicle_info(ocr_result)
+                add_vehicle_context(line)
+            line.update({'index': index, 'filename': filenames[index]})
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        yield json.dumps({'done': True, 'count': len(images), 'errors': errors}) + "\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.before_request
+def route_obd_to_link_owner():
+    """
+    Relaie les requêtes /obd2 au worker propriétaire de la liaison OBD-II
+    
+    Sans attribution (un seul processus), ou dans le worker propriétaire, la
+    requête est traitée normalement.
+    """
+    if (request.path == '/obd2' or request.path.startswith('/obd2/')) and not obd_owner.is_owner():
+        return obd_owner.forward(request)
 
 @app.route('/obd2', methods=['GET'])
 def obd2_endpoint():
@@ -401,15 +610,213 @@ def obd2_endpoint():
             'message': f'Erreur lors de la récupération des données OBD-II: {str(e)}'
         }), 500
 
-def get_vehicle_data():
+@app.route('/obd2/stream', methods=['GET'])
+def obd2_stream_endpoint():
+    """
+    Endpoint de diffusion continue (Server-Sent Events) de la télémétrie OBD-II
+    
+    Paramètre "pids": liste de commandes séparées par des virgules (défaut: RPM,SPEED).
+    Tous les clients partagent la même session dongle. Chaque client occupe un
+    thread du worker (gunicorn.conf.py): au-delà de OBD_STREAM_MAX_CLIENTS, 503.
+    """
+    pids = TelemetryStreamer.validate_pids(request.args.get('pids', 'RPM,SPEED').split(','))
+    if not pids:
+        return jsonify({
+            'status': 'error',
+            'message': 'Aucun PID valide fourni. Exemple: ?pids=RPM,SPEED,COOLANT_TEMP'
+        }), 400
+    
+    if not obd_session.wait_until_connected(timeout=obd_manager.timeout):
+        return jsonify({
+            'status': 'error',
+            'message': 'Connexion OBD-II échouée. Vérifiez que le dongle est bien connecté et que le moteur est allumé.'
+        }), 503
+    
+    try:
+        subscription = telemetry_streamer.subscribe(pids)
+    except StreamerFull:
+        response = jsonify({
+            'status': 'error',
+            'message': 'Trop de tableaux de bord connectés, réessayez dans quelques instants'
+        })
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    keepalive = float(os.getenv('OBD_STREAM_KEEPALIVE', '15'))
+    
+    def generate():
+        try:
+            yield f"retry: 2000\nevent: subscribed\ndata: {json.dumps({'pids': sorted(subscription.pids)})}\n\n"
+            while True:
+                sample = subscription.get(timeout=keepalive)
+                if sample is None:
+                    # Commentaire SSE: garde la connexion ouverte et détecte les clients partis
+                    yield ": keepalive\n\n"
+                else:
+                    yield f"event: sample\ndata: {json.dumps(sample)}\n\n"
+        finally:
+            telemetry_streamer.unsubscribe(subscription)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/obd2/history', methods=['GET'])
+def obd2_history_endpoint():
+    """
+    Endpoint de l'historique récent d'un PID (ex: 30 dernières minutes de RPM)
+    
+    Paramètres: "pid" (défaut: RPM), "duration" en secondes (défaut: 1800),
+    "max_points" (défaut: 600) qui détermine la résolution retournée.
+    """
+    pid = request.args.get('pid', 'RPM').strip().upper()
+    try:
+        duration = float(request.args.get('duration', 1800))
+        max_points = int(request.args.get('max_points', 600))
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'Paramètres "duration" et "max_points" numériques attendus'
+        }), 400
+    
+    series = obd_manager.telemetry.series(pid, duration, max_points)
+    if 'error' in series:
+        return jsonify({'status': 'error', 'message': series['error']}), 404
+    
+    return jsonify(series)
+
+@app.route('/obd2/metrics', methods=['GET'])
+def obd2_metrics_endpoint():
+    """
+    Endpoint des indicateurs d'un trajet calculés sur l'historique de télémétrie
+    
+    Paramètres: "duration" en secondes (défaut: 7200), "device" (défaut: dongle principal).
+    Retourne consommation, distance, temps par plage de régime, histogramme de charge
+    et part du temps au ralenti.
+    """
+    try:
+        duration = float(request.args.get('duration', 7200))
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'Paramètre "duration" numérique attendu'
+        }), 400
+    
+    device_id = request.args.get('device', 'default')
+    session = obd_fleet.get(device_id)
+    if session is None:
+        return jsonify({'status': 'error', 'message': f'Appareil OBD-II inconnu: {device_id}'}), 404
+    
+    metrics = session.manager.derived_metrics.summary(duration)
+    if 'error' in metrics:
+        return jsonify({'status': 'error', 'message': metrics['error']}), 404
+    
+    return jsonify(metrics)
+
+@app.route('/obd2/alerts', methods=['GET'])
+def obd2_alerts_endpoint():
+    """
+    Endpoint des alertes récentes détectées sur la télémétrie OBD-II
+    
+    Paramètres: "device" (défaut: tous les dongles), "limit" (défaut: 50),
+    "since" (horodatage minimal, pour ne récupérer que les nouvelles alertes).
+    """
+    try:
+        limit = int(request.args.get('limit', 50))
+        since = float(request.args['since']) if 'since' in request.args else None
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'Paramètres "limit" et "since" numériques attendus'
+        }), 400
+    
+    device_id = request.args.get('device')
+    if device_id is None:
+        return jsonify({'alerts': obd_fleet.alerts(limit, since)})
+    
+    session = obd_fleet.get(device_id)
+    if session is None:
+        return jsonify({'status': 'error', 'message': f'Appareil OBD-II inconnu: {device_id}'}), 404
+    
+    detector = session.manager.anomaly_detector
+    return jsonify({'alerts': detector.alerts(limit, since), 'detector': detector.status()})
+
+@app.route('/obd2/monitor', methods=['GET', 'POST', 'DELETE'])
+def obd2_monitor_endpoint():
+    """
+    Endpoint de la surveillance continue du véhicule (lectures planifiées)
+    
+    GET: fréquences cible, effective et observée par PID
+    POST: démarre la surveillance; corps optionnel {"targets": {"RPM": 10, ...}} en Hz
+    DELETE: arrête la surveillance
+    """
+    if request.method == 'DELETE':
+        polling_scheduler.stop()
+    elif request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if 'targets' in data:
+            try:
+                targets = {name.strip().upper(): float(rate) for name, rate in data['targets'].items()}
+            except (AttributeError, TypeError, ValueError):
+                targets = {}
+            valid = TelemetryStreamer.validate_pids(targets)
+            if not valid:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'Format attendu: {"targets": {"RPM": 10, "COOLANT_TEMP": 0.5}}'
+                }), 400
+            polling_scheduler.set_targets({name: targets[name] for name in valid})
+        polling_scheduler.start()
+    
+    return jsonify(polling_scheduler.status())
+
+@app.route('/obd2/fleet', methods=['GET'])
+def obd2_fleet_endpoint():
+    """
+    Endpoint de l'état agrégé des dongles OBD-II (un par poste d'atelier)
+    """
+    return jsonify(obd_fleet.status())
+
+@app.route('/obd2/<device_id>', methods=['GET'])
+def obd2_device_endpoint(device_id):
+    """
+    Endpoint des données du véhicule branché sur un dongle de la flotte
+    
+    Chaque dongle a sa propre session: une lecture lente sur un poste ne bloque pas les autres.
+    """
+    session = obd_fleet.get(device_id)
+    if session is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'Appareil OBD-II inconnu: {device_id}',
+            'devices': obd_fleet.devices()
+        }), 404
+    
+    try:
+        data = get_vehicle_data(session)
+        return jsonify({'device_id': device_id, **data})
+    except Exception as e:
+        logger.error(f"Erreur OBD-II ({device_id}): {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Erreur lors de la récupération des données OBD-II: {str(e)}'
+        }), 500
+
+def get_vehicle_data(session=None):
     """
     Fonction pour récupérer les données du véhicule via OBD-II
     
+    Args:
+        session (OBDSession, optional): Session du dongle à interroger (défaut: dongle principal)
+    
     Returns:
         dict: Données du véhicule (RPM, vitesse, codes d'erreur)
     """
-    # Tenter de se connecter au dongle OBD-II
-    connected = obd_manager.connect()
+    session = session or obd_session
+    
+    # Réutiliser la liaison OBD-II persistante (la première requête attend la connexion)
+    connected = session.wait_until_connected(timeout=session.manager.timeout)
     
     # Préparer la structure de retour
     data = {}
@@ -420,57 +827,45 @@ def get_vehicle_data():
             "error": "Connexion OBD-II échouée. Vérifiez que le dongle est bien connecté et que le moteur est allumé."
         }
     
-    try:
-        # Récupérer le régime moteur (RPM)
-        rpm_data = obd_manager.get_rpm()
-        if "error" not in rpm_data:
-            data["RPM"] = rpm_data.get("value", "Non disponible")
-        else:
-            data["RPM"] = "Non disponible"
-        
-        # Récupérer la vitesse
-        speed_data = obd_manager.get_speed()
-        if "error" not in speed_data:
-            data["Speed"] = speed_data.get("value", "Non disponible")
-        else:
-            data["Speed"] = "Non disponible"
-        
-        # Récupérer les codes d'erreur (DTC)
-        dtc_data = obd_manager.get_dtc_codes()
-        if "error" not in dtc_data:
-            if dtc_data.get("codes", []):
-                data["DTC"] = dtc_data.get("codes", [])
-            else:
-                data["DTC"] = "Aucun code détecté"
+    # Récupérer le régime moteur (RPM) et la vitesse en une seule requête groupée
+    live_data = session.call('query_batch', ('RPM', 'SPEED'))
+    values = live_data.get("values", {})
+    
+    rpm_data = values.get("RPM", live_data)
+    if "error" not in rpm_data:
+        data["RPM"] = rpm_data.get("value", "Non disponible")
+    else:
+        data["RPM"] = "Non disponible"
+    
+    speed_data = values.get("SPEED", live_data)
+    if "error" not in speed_data:
+        data["Speed"] = speed_data.get("value", "Non disponible")
+    else:
+        data["Speed"] = "Non disponible"
+    
+    # Récupérer les codes d'erreur (DTC)
+    dtc_data = session.call('get_dtc_codes')
+    if "error" not in dtc_data:
+        if dtc_data.get("codes", []):
+            data["DTC"] = dtc_data.get("codes", [])
         else:
-            data["DTC"] = "Non disponible"
-        
-        # Ajouter des données contextuelles pour les codes d'erreur
-        if "DTC" in data and isinstance(data["DTC"], list) and len(data["DTC"]) > 0:
-            try:
-                dtc_context = []
-                for code in data["DTC"]:
-                    if 'dtc_database' in context_manager.modules:
-                        code_data = context_manager.get_context_data('dtc_database', f'codes.{code}')
-                        if code_data:
-                            dtc_context.append({
-                                'code': code,
-                                'description': code_data.get('description', ''),
-                                'severity': code_data.get('severity', 'unknown'),
-                                'possible_causes': code_data.get('causes', []),
-                                'recommended_actions': code_data.get('actions', [])
-                            })
-                
-                if dtc_context:
-                    data["DTC_details"] = dtc_context
-            except Exception as context_err:
-                logger.warning(f"Erreur lors de l'ajout des contextes DTC: {str(context_err)}")
-        
-        return data
+            data["DTC"] = "Aucun code détecté"
+    else:
+        data["DTC"] = "Non disponible"
     
-    finally:
-        # S'assurer de fermer la connexion
-        obd_manager.disconnect()
+    # Ajouter des données contextuelles pour les codes d'erreur
+    if "DTC" in data and isinstance(data["DTC"], list) and len(data["DTC"]) > 0:
+        try:
+            # Une seule passe sur l'index pour l'ensemble des codes
+            dtc_context = [details for details in dtc_index.lookup_many(data["DTC"])
+                           if details['match'] or details['description']]
+            
+            if dtc_context:
+                data["DTC_details"] = dtc_context
+        except Exception as context_err:
+            logger.warning(f"Erreur lors de l'ajout des contextes DTC: {str(context_err)}")
+    
+    return data
 
 @app.route('/nlp', methods=['POST'])
 def nlp_endpoint():
@@ -633,34 +1028,20 @@ def image_recognition_endpoint():
             'message': 'Aucun fichier sélectionné'
         }), 400
     
+    upload = None
     try:
-        # Sauvegarder temporairement l'image
-        image_path = os.path.join(app.config['UPLOAD_FOLDER'], image_file.filename)
-        image_file.save(image_path)
+        # Lire l'image en mémoire (fichier temporaire unique seulement au-delà du seuil)
+        upload = UploadBuffer.from_request_file(image_file, spill_dir=app.config['UPLOAD_FOLDER'])
         
         # Déterminer le type d'analyse à effectuer (standard ou avancée)
         analysis_type = request.args.get('type', 'standard')
         
-        if analysis_type == 'advanced':
-            # Utiliser la classe pour une analyse complète (OpenCV + Vision API)
-            results = image_recognition_engine.detect_labels(image_path)
-        else:
-            # Utiliser la fonction autonome pour la détection simple de labels
-            results = detect_labels(image_path)
-        
-        # Enrichir avec des données contextuelles
-        if 'parts_database' in context_manager.modules and results.get('labels'):
-            try:
-                for i, label in enumerate(results['labels']):
-                    label_key = label['description'].lower().replace(' ', '_')
-                    part_data = context_manager.get_context_data('parts_database', f'parts.{label_key}')
-                    if part_data:
-                        results['labels'][i]['context_data'] = part_data
-            except Exception as context_err:
-                logger.warning(f"Erreur lors de l'enrichissement des détections: {str(context_err)}")
+        # Mode job: réponse immédiate, analyse en arrière-plan (résultat sur /jobs/<id>)
+        if job_requested():
+            return submit_image_job('image_recognition', recognize_image, upload, analysis_type)
         
         # Retourner les résultats
-        return jsonify(results)
+        return jsonify(recognize_image(upload.image_source(), analysis_type))
         
     except Exception as e:
         logger.error(f"Erreur reconnaissance d'image: {str(e)}")
@@ -669,12 +1050,76 @@ def image_recognition_endpoint():
             'message': f'Erreur lors de l\'analyse de l\'image: {str(e)}'
         }), 500
     finally:
-        # Nettoyer le fichier temporaire
-        try:
-            if os.path.exists(image_path):
-                os.remove(image_path)
-        except:
-            pass  # Ignorer les erreurs de nettoyage
+        # Libérer l'image (et supprimer le fichier temporaire éventuel)
+        if upload is not None:
+            upload.close()
+
+@app.route('/image_recognition/batch', methods=['POST'])
+def image_recognition_batch_endpoint():
+    """
+    Endpoint de détection par lot (expertise de dommages)
+    
+    Accepte plusieurs images dans le champ "images" et les analyse avec le
+    modèle de détection local, en une passe du réseau par groupe de
+    DNN_BATCH_SIZE images. Retourne un résultat par image (champ "index":
+    position dans l'envoi).
+    """
+    image_files = [f for f in request.files.getlist('images') if f.filename]
+    if not image_files:
+        return jsonify({
+            'status': 'error',
+            'message': 'Aucune image fournie. Veuillez envoyer les images dans le champ "images".'
+        }), 400
+    
+    max_images = int(os.getenv('IMAGE_BATCH_MAX_IMAGES', '32'))
+    if len(image_files) > max_images:
+        return jsonify({
+            'status': 'error',
+            'message': f'Trop d\'images: {len(image_files)} (maximum {max_images} par lot)'
+        }), 413
+    
+    try:
+        images = []
+        for image_file in image_files:
+            with UploadBuffer.from_request_file(image_file, spill_dir=app.config['UPLOAD_FOLDER']) as upload:
+                images.append(upload.read())
+        
+        results = []
+        for index, result in enumerate(image_recognition_engine.analyze_images(images)):
+            if 'error' in result:
+                result = {'status': 'error', 'message': result['error']}
+            result.update({'index': index, 'filename': image_files[index].filename})
+            results.append(result)
+        
+        return jsonify({
+            'status': 'success',
+            'count': len(results),
+            'errors': sum(1 for result in results if result.get('status') == 'error'),
+            'results': results
+        })
+    
+    except Exception as e:
+        logger.error(f"Erreur reconnaissance d'image par lot: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Erreur lors de l\'analyse des images: {str(e)}'
+        }), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status_endpoint(job_id):
+    """
+    État d'une analyse lancée en mode job (/ocr?async=1, /image_recognition?async=1)
+    
+    Retourne le job (status: queued, running, done ou error) et, une fois
+    terminé, son résultat ("result"). Les jobs expirent après JOB_RESULT_TTL.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Job inconnu ou expiré'
+        }), 404
+    return jsonify(job)
 
 @app.route('/ecu_flash', methods=['POST'])
 def ecu_flash_endpoint():
@@ -1487,5 +1932,7 @@ def send_feedback_notification(feedback_data):
 
 # Fonction principale
 if __name__ == '__main__':
+    if os.getenv('MODEL_WARMUP', 'True').lower() in ('true', '1', 't'):
+        warm_up()
     port = int(os.getenv('PORT', 5000))
     app.run(host='0.0.0.0', port=port)
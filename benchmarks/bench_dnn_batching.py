@@ -0,0 +1,135 @@
+"""
+NovaEvo - Benchmark du regroupement des inférences du modèle de détection
+
+Mesure la latence, le débit et la taille réelle des lots de
+ImageRecognitionEngine.analyze_image selon la concurrence d'un worker
+gunicorn: un seul client à la fois (worker synchrone, sans fenêtre de
+regroupement ou avec l'ancienne fenêtre DNN_BATCH_DELAY_MS), puis
+GUNICORN_THREADS clients simultanés (worker gthread), avec et sans
+regroupement. Le réseau est simulé: une passe coûte un temps fixe plus un
+temps par image, et libère le GIL comme cv2.dnn.
+
+Usage:
+    python benchmarks/bench_dnn_batching.py --requests 40
+    python benchmarks/bench_dnn_batching.py --threads 16 --forward-ms 25 --json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import statistics
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from image_recognition.image_recognition_main import ImageRecognitionEngine
+
+
+class SimulatedNet:
+    """Réseau simulé: coût fixe par passe plus un coût par image du lot"""
+
+    def __init__(self, forward_ms, per_image_ms):
+        self.forward_ms = forward_ms
+        self.per_image_ms = per_image_ms
+        self.batch = 1
+
+    def setInput(self, blob):
+        self.batch = blob.shape[0]
+
+    def forward(self):
+        time.sleep((self.forward_ms + self.per_image_ms * self.batch) / 1000)
+        rows = [[index, 1, 0.9, 0.1, 0.1, 0.5, 0.5] for index in range(self.batch)]
+        return np.array(rows, dtype=np.float32).reshape(1, 1, -1, 7)
+
+
+class BatchSizes:
+    """Métriques simulées: tailles des lots traitées"""
+
+    def __init__(self):
+        self.sizes = []
+        self._lock = threading.Lock()
+
+    def record_value(self, name, value, tags=None):
+        if name.endswith('_batch_size'):
+            with self._lock:
+                self.sizes.append(value)
+
+
+def bench(name, engine, threads, requests, delay_ms):
+    """Requêtes en boucle fermée depuis plusieurs threads (un thread = un client)"""
+    metrics = BatchSizes()
+    engine.batcher.shutdown()
+    engine.batcher.metrics = metrics
+    engine.batcher.max_delay = delay_ms / 1000
+    image = np.random.default_rng(0).integers(0, 256, (300, 300, 3), dtype=np.uint8)
+    durations = []
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(requests):
+            start = time.perf_counter()
+            engine.analyze_image(image_array=image)
+            with lock:
+                durations.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "scenario": name,
+        "calls": len(durations),
+        "p50_ms": round(statistics.median(durations) * 1000, 1),
+        "max_ms": round(max(durations) * 1000, 1),
+        "requests_per_s": round(len(durations) / elapsed, 1),
+        # Sans fenêtre, les appels sont directs (un lot d'une image chacun)
+        "mean_batch_size": round(float(statistics.mean(metrics.sizes)), 2) if metrics.sizes else 1.0
+    }
+
+
+def main():
+    """Point d'entrée du benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark du regroupement des inférences du modèle")
+    parser.add_argument('--requests', type=int, default=40, help="Requêtes par client")
+    parser.add_argument('--threads', type=int, default=16, help="Clients simultanés d'un worker gthread")
+    parser.add_argument('--batch-size', type=int, default=8, help="DNN_BATCH_SIZE")
+    parser.add_argument('--delay-ms', type=float, default=5, help="DNN_BATCH_DELAY_MS")
+    parser.add_argument('--forward-ms', type=float, default=20, help="Coût fixe d'une passe simulée")
+    parser.add_argument('--per-image-ms', type=float, default=3, help="Coût par image d'une passe simulée")
+    parser.add_argument('--json', action='store_true', help="Sortie au format JSON")
+    args = parser.parse_args()
+
+    engine = ImageRecognitionEngine()
+    engine.net = SimulatedNet(args.forward_ms, args.per_image_ms)
+    engine.batch_size = engine.batcher.max_batch_size = args.batch_size
+    # Même image à chaque requête: pas de résultat repris d'une photo quasi identique
+    engine.analysis_index.enabled = False
+
+    results = [
+        bench("sync_worker_inline", engine, 1, args.requests, 0),
+        bench("sync_worker_window", engine, 1, args.requests, args.delay_ms),
+        bench(f"gthread_{args.threads}_inline", engine, args.threads, args.requests, 0),
+        bench(f"gthread_{args.threads}_batched", engine, args.threads, args.requests, args.delay_ms)
+    ]
+    engine.batcher.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'Scénario':<24}{'Appels':>8}{'p50 (ms)':>11}{'max (ms)':>11}{'Req/s':>9}{'Lot moyen':>11}")
+    for row in results:
+        print(f"{row['scenario']:<24}{row['calls']:>8}{row['p50_ms']:>11}{row['max_ms']:>11}"
+              f"{row['requests_per_s']:>9}{row['mean_batch_size']:>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+NovaEvo - Benchmark de l'analyse de base de la reconnaissance d'image
+
+Compare _basic_image_analysis (copie de travail réduite, histogramme unique
+des couleurs) à l'ancienne version (pleine résolution, un inRange et un
+countNonZero par couleur) sur des photos synthétiques de 12 mégapixels:
+aplats de couleurs, dégradé et bruit de capteur. Les écarts des proportions
+de couleurs entre les deux versions sont aussi rapportés.
+
+Usage:
+    python benchmarks/bench_image_recognition.py --images 5
+    python benchmarks/bench_image_recognition.py --width 4000 --height 3000 --json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from image_recognition.image_recognition_main import ImageRecognitionEngine
+
+
+def legacy_basic_analysis(image):
+    """Ancienne analyse de base: pleine résolution, un masque par couleur"""
+    height, width, _ = image.shape
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    edges = cv2.Canny(gray, 50, 150)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    significant_contours = [c for c in contours if cv2.contourArea(c) > 500]
+
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    color_ranges = {
+        "rouge": ([0, 100, 100], [10, 255, 255]),
+        "jaune": ([20, 100, 100], [35, 255, 255]),
+        "vert": ([35, 50, 50], [85, 255, 255]),
+        "bleu": ([85, 50, 50], [130, 255, 255])
+    }
+    color_detection = {}
+    for color_name, (lower, upper) in color_ranges.items():
+        mask = cv2.inRange(hsv, np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8))
+        color_detection[color_name] = cv2.countNonZero(mask) / (height * width) * 100
+    return {
+        "contours": {"total": len(contours), "significant": len(significant_contours)},
+        "colors": {"distribution": color_detection}
+    }
+
+
+def synthetic_photo(rng, width, height):
+    """Photo synthétique: aplats de couleurs, dégradé de luminosité et bruit"""
+    blocks = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    image = cv2.resize(blocks, (width, height), interpolation=cv2.INTER_NEAREST)
+    gradient = np.linspace(0.7, 1.0, width, dtype=np.float32)[np.newaxis, :, np.newaxis]
+    image = (image * gradient).astype(np.uint8)
+    noise = rng.normal(0, 6, (height, width, 3)).astype(np.int16)
+    return np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def summarize(name, durations):
+    """Résume une série de mesures (durées en secondes)"""
+    return {
+        "scenario": name,
+        "calls": len(durations),
+        "p50_ms": round(statistics.median(durations) * 1000, 1),
+        "max_ms": round(max(durations) * 1000, 1),
+        "images_per_s": round(len(durations) / sum(durations), 2)
+    }
+
+
+def bench(name, analyze, photos, rounds):
+    """Durée de l'analyse de base par image"""
+    durations = []
+    for _ in range(rounds):
+        for photo in photos:
+            start = time.perf_counter()
+            analyze(photo)
+            durations.append(time.perf_counter() - start)
+    return summarize(name, durations)
+
+
+def main():
+    """Point d'entrée du benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark de l'analyse de base de la reconnaissance d'image")
+    parser.add_argument('--images', type=int, default=3, help="Nombre de photos synthétiques")
+    parser.add_argument('--rounds', type=int, default=3, help="Nombre de passages sur les photos")
+    parser.add_argument('--width', type=int, default=4000, help="Largeur des photos (pixels)")
+    parser.add_argument('--height', type=int, default=3000, help="Hauteur des photos (pixels)")
+    parser.add_argument('--seed', type=int, default=42, help="Graine des photos synthétiques")
+    parser.add_argument('--json', action='store_true', help="Sortie au format JSON")
+    args = parser.parse_args()
+
+    engine = ImageRecognitionEngine()
+    rng = np.random.default_rng(args.seed)
+    photos = [synthetic_photo(rng, args.width, args.height) for _ in range(args.images)]
+
+    results = [
+        bench("legacy_full_resolution", legacy_basic_analysis, photos, args.rounds),
+        bench("working_copy_histogram", engine._basic_image_analysis, photos, args.rounds)
+    ]
+
+    # Écart maximal des proportions de couleurs (points de pourcentage)
+    drift = max(
+        abs(legacy_basic_analysis(photo)["colors"]["distribution"][color] - share)
+        for photo in photos
+        for color, share in engine._basic_image_analysis(photo)["colors"]["distribution"].items()
+    )
+
+    if args.json:
+        print(json.dumps({"results": results, "max_color_drift_pct": round(drift, 3)}, indent=2))
+        return
+
+    print(f"{'Scénario':<26}{'Appels':>8}{'p50 (ms)':>11}{'max (ms)':>11}{'Images/s':>11}")
+    for row in results:
+        print(f"{row['scenario']:<26}{row['calls']:>8}{row['p50_ms']:>11}{row['max_ms']:>11}{row['images_per_s']:>11}")
+    print(f"Écart maximal des proportions de couleurs: {drift:.3f} points")
+
+
+if __name__ == '__main__':
+    main()
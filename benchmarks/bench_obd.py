@@ -0,0 +1,185 @@
+"""
+NovaEvo - Benchmark du module OBD-II
+
+Mesure, sur l'émulateur ELM327, la latence de bout en bout et le débit des
+lectures simples, groupées (multi-PID), séquentielles et en continu (obd.Async),
+ainsi que le temps de connexion avec et sans profil mémorisé et le calcul des
+indicateurs d'un trajet de deux heures (sans et avec cache) et le débit du
+détecteur d'anomalies.
+
+Usage:
+    python benchmarks/bench_obd.py --latency 0.03 --iterations 50
+    python benchmarks/bench_obd.py --session data/session.jsonl --json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from obd2.obd_main import OBDManager, DASHBOARD_COMMANDS
+from obd2.obd_cache import OBDProfileCache
+from obd2.obd_metrics import DerivedMetrics
+from obd2.obd_anomaly import AnomalyDetector
+from obd2.obd_telemetry import TelemetryStore
+from obd2.elm327_emulator import ELM327Emulator, load_session
+
+
+def percentile(values, ratio):
+    """Retourne le percentile d'une liste de durées"""
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * ratio), len(ordered) - 1)]
+
+
+def summarize(name, durations, values_per_call):
+    """Résume une série de mesures (durées en secondes)"""
+    total = sum(durations)
+    return {
+        "scenario": name,
+        "calls": len(durations),
+        "p50_ms": round(statistics.median(durations) * 1000, 2),
+        "p95_ms": round(percentile(durations, 0.95) * 1000, 2),
+        "values_per_s": round(len(durations) * values_per_call / total, 1) if total else 0.0
+    }
+
+
+def timed_calls(method, iterations):
+    """Exécute une méthode plusieurs fois et retourne les durées"""
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = method()
+        durations.append(time.perf_counter() - start)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+    return durations
+
+
+def bench_connect(emulator, cache_path):
+    """Connexion à froid (détection automatique) puis avec profil mémorisé"""
+    results = []
+    for name in ("connect_cold", "connect_warm"):
+        manager = OBDManager()
+        manager.profile_cache = OBDProfileCache(cache_path)
+        start = time.perf_counter()
+        if not manager.connect(port=emulator.port):
+            raise RuntimeError("Connexion à l'émulateur impossible")
+        results.append(summarize(name, [time.perf_counter() - start], 0))
+        manager.disconnect()
+    return results
+
+
+def bench_reads(manager, iterations):
+    """Lectures simples, groupées et séquentielles"""
+    results = [summarize("single_rpm", timed_calls(manager.get_rpm, iterations), 1)]
+
+    manager.multi_pid_supported = None
+    results.append(summarize("batched_dashboard",
+                             timed_calls(manager.get_dashboard_data, iterations),
+                             len(DASHBOARD_COMMANDS)))
+
+    # Même tableau de bord, un PID par requête
+    manager.multi_pid_supported = False
+    results.append(summarize("sequential_dashboard",
+                             timed_calls(manager.get_dashboard_data, iterations),
+                             len(DASHBOARD_COMMANDS)))
+    manager.multi_pid_supported = None
+    return results
+
+
+def bench_streaming(manager, duration, pids=("RPM", "SPEED", "COOLANT_TEMP")):
+    """Lecture continue via les watchers obd.Async"""
+    samples = []
+    result = manager.watch(pids, lambda response: samples.append(time.perf_counter()))
+    if "error" in result:
+        raise RuntimeError(result["error"])
+
+    time.sleep(duration)
+    manager.unwatch(pids)
+
+    intervals = [b - a for a, b in zip(samples, samples[1:])] or [duration]
+    summary = summarize("streaming_async", intervals, 1)
+    summary["calls"] = len(samples)
+    return summary
+
+
+def bench_metrics(iterations, duration=7200.0):
+    """Indicateurs d'un trajet synthétique (RPM 10 Hz, vitesse et MAF 5 Hz)"""
+    store = TelemetryStore()
+    for i in range(int(duration * 10)):
+        timestamp = 1000.0 + i / 10
+        driving = (i // 3000) % 2 == 1
+        store.record("RPM", timestamp, 2400 if driving else 800)
+        if i % 2 == 0:
+            store.record("SPEED", timestamp, 70 if driving else 0)
+            store.record("MAF", timestamp, 18.0 if driving else 3.0)
+
+    cold = []
+    for _ in range(iterations):
+        engine = DerivedMetrics(store)
+        start = time.perf_counter()
+        engine.summary(duration)
+        cold.append(time.perf_counter() - start)
+
+    cached = timed_calls(lambda: engine.summary(duration), iterations)
+    return [summarize("trip_metrics_2h", cold, 1), summarize("trip_metrics_cached", cached, 1)]
+
+
+def bench_anomaly(samples=100000, pids=("RPM", "SPEED", "COOLANT_TEMP", "ENGINE_LOAD")):
+    """Coût par échantillon du détecteur d'anomalies (bandes EWMA, seuils, règles)"""
+    detector = AnomalyDetector(event_sink=lambda *args, **kwargs: None)
+    start = time.perf_counter()
+    for i in range(samples):
+        detector.observe(pids[i % len(pids)], i * 0.05, 60.0 + (i % 7))
+    elapsed = time.perf_counter() - start
+    return summarize("anomaly_observe", [elapsed / samples] * samples, 1)
+
+
+def main():
+    """Point d'entrée du benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark du module OBD-II sur l'émulateur ELM327")
+    parser.add_argument('--latency', type=float, default=0.03,
+                        help="Latence simulée du véhicule par requête OBD (s)")
+    parser.add_argument('--iterations', type=int, default=30, help="Nombre d'appels par scénario")
+    parser.add_argument('--stream-duration', type=float, default=3.0, help="Durée de la lecture continue (s)")
+    parser.add_argument('--session', help="Session enregistrée à rejouer (JSONL)")
+    parser.add_argument('--json', action='store_true', help="Sortie au format JSON")
+    args = parser.parse_args()
+
+    session = load_session(args.session) if args.session else None
+    latency = {"AT": 0.0, "default": args.latency}
+    results = []
+
+    results += bench_metrics(args.iterations)
+    results.append(bench_anomaly())
+
+    with ELM327Emulator(latency=latency, session=session) as emulator, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        results += bench_connect(emulator, os.path.join(tmp_dir, 'profiles.json'))
+
+        manager = OBDManager()
+        manager.profile_cache = None
+        manager.connect(port=emulator.port)
+        try:
+            results += bench_reads(manager, args.iterations)
+            manager.enable_async()
+            results.append(bench_streaming(manager, args.stream_duration))
+        finally:
+            manager.disconnect()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'Scénario':<22}{'Appels':>8}{'p50 (ms)':>12}{'p95 (ms)':>12}{'Valeurs/s':>12}")
+    for row in results:
+        print(f"{row['scenario']:<22}{row['calls']:>8}{row['p50_ms']:>12}{row['p95_ms']:>12}{row['values_per_s']:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+NovaEvo - Benchmark de l'extraction des informations d'une carte grise
+
+Mesure extract_vehicle_info sur un corpus de résultats OCR: cartes grises
+synthétiques (rubriques A, B, C.1, D.1, D.3, E, P.2, P.6 avec leurs blocs de
+texte positionnés, lignes parasites, marques variées) ou résultats réels
+enregistrés (un résultat de process_image par ligne JSON). Le même corpus est
+mesuré avec et sans blocs de texte, pour isoler le coût de la confiance par champ.
+
+Usage:
+    python benchmarks/bench_ocr.py --documents 2000
+    python benchmarks/bench_ocr.py --corpus data/ocr_results.jsonl --json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ocr.ocr_main import OCRProcessor
+
+# Hauteur d'une ligne et largeur d'un caractère des blocs synthétiques (pixels)
+LINE_HEIGHT = 32
+CHAR_WIDTH = 18
+
+NOISE_LINES = [
+    "REPUBLIQUE FRANCAISE",
+    "CERTIFICAT D'IMMATRICULATION",
+    "Ministère de l'Intérieur",
+    "F.1 1850 F.2 1850 F.3 2450",
+    "G 1320 G.1 1250",
+    "J VP J.1 VP J.2 AC J.3 CI",
+    "K e2*2007/46*0527*07",
+    "S.1 5 S.2 -",
+    "U.1 76 U.2 3000",
+    "V.7 128 V.9 70/220*2001/100EC",
+    "Z.1 Ne pas jeter sur la voie publique"
+]
+
+OWNERS = ["MARTIN SOPHIE MARIE", "DUPONT JEAN", "BERNARD LUC", "PETIT CAMILLE ANNE", "ROUX PAUL"]
+
+
+def percentile(values, ratio):
+    """Retourne le percentile d'une liste de durées"""
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * ratio), len(ordered) - 1)]
+
+
+def summarize(name, durations):
+    """Résume une série de mesures (durées en secondes)"""
+    total = sum(durations)
+    return {
+        "scenario": name,
+        "calls": len(durations),
+        "p50_ms": round(statistics.median(durations) * 1000, 3),
+        "p95_ms": round(percentile(durations, 0.95) * 1000, 3),
+        "documents_per_s": round(len(durations) / total, 1) if total else 0.0
+    }
+
+
+def synthetic_document(rng, brands):
+    """Résultat OCR d'une carte grise synthétique, blocs de texte compris"""
+    letters = "ABCDEFGHJKLMNPRSTVWXYZ"
+    registration = f"{rng.choice(letters)}{rng.choice(letters)}-{rng.randint(100, 999)}-" \
+                   f"{rng.choice(letters)}{rng.choice(letters)}"
+    vin = "VF" + "".join(rng.choice("ABCDEFGHJKLMNPRSTUVWXYZ0123456789") for _ in range(15))
+    fields = [
+        f"A {registration}",
+        f"B {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1995, 2023)}",
+        f"C.1 {rng.choice(OWNERS)}",
+        f"D.1 {rng.choice(brands)}",
+        f"D.3 {rng.choice(['CLIO', '308 GTI', 'GOLF', 'YARIS', 'SERIE 3'])}",
+        f"E {vin}",
+        f"P.2 {rng.randint(50, 250)} KW P.6 {rng.randint(4, 15)} CV"
+    ]
+    lines = NOISE_LINES[:rng.randint(2, len(NOISE_LINES))] + fields
+    rng.shuffle(lines)
+
+    text_blocks = []
+    for row, line in enumerate(lines):
+        column = 0
+        for word in line.split():
+            text_blocks.append({
+                "text": word,
+                "bounding_poly": [
+                    [40 + column * CHAR_WIDTH, 60 + row * LINE_HEIGHT],
+                    [40 + (column + len(word)) * CHAR_WIDTH, 60 + row * LINE_HEIGHT],
+                    [40 + (column + len(word)) * CHAR_WIDTH, 60 + row * LINE_HEIGHT + 24],
+                    [40 + column * CHAR_WIDTH, 60 + row * LINE_HEIGHT + 24]
+                ]
+            })
+            column += len(word) + 1
+
+    return {"success": True, "full_text": "\n".join(lines) + "\n", "text_blocks": text_blocks}
+
+
+def load_corpus(path):
+    """Charge des résultats OCR enregistrés (un objet JSON par ligne)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def bench_extract(processor, name, corpus, rounds):
+    """Durée de extract_vehicle_info par document"""
+    durations = []
+    for _ in range(rounds):
+        for document in corpus:
+            start = time.perf_counter()
+            processor.extract_vehicle_info(document)
+            durations.append(time.perf_counter() - start)
+    return summarize(name, durations)
+
+
+def main():
+    """Point d'entrée du benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark de l'extraction des informations d'une carte grise")
+    parser.add_argument('--documents', type=int, default=1000, help="Nombre de cartes grises synthétiques")
+    parser.add_argument('--rounds', type=int, default=3, help="Nombre de passages sur le corpus")
+    parser.add_argument('--corpus', help="Résultats OCR enregistrés (JSONL)")
+    parser.add_argument('--seed', type=int, default=42, help="Graine du corpus synthétique")
+    parser.add_argument('--json', action='store_true', help="Sortie au format JSON")
+    args = parser.parse_args()
+
+    # Les messages de l'extraction fausseraient la mesure
+    logging.getLogger('ocr').setLevel(logging.WARNING)
+
+    processor = OCRProcessor()
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        rng = random.Random(args.seed)
+        corpus = [synthetic_document(rng, list(processor.car_brands)) for _ in range(args.documents)]
+    text_only = [{key: value for key, value in document.items() if key != "text_blocks"} for document in corpus]
+
+    results = [
+        bench_extract(processor, "extract_text_blocks", corpus, args.rounds),
+        bench_extract(processor, "extract_text_only", text_only, args.rounds)
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'Scénario':<22}{'Appels':>8}{'p50 (ms)':>12}{'p95 (ms)':>12}{'Documents/s':>14}")
+    for row in results:
+        print(f"{row['scenario']:<22}{row['calls']:>8}{row['p50_ms']:>12}{row['p95_ms']:>12}"
+              f"{row['documents_per_s']:>14}")
+
+
+if __name__ == '__main__':
+    main()
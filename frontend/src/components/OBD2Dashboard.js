@@ -1,15 +1,19 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Container, Card, Button, Row, Col, Alert, Spinner, Table } from 'react-bootstrap';
 import axios from 'axios';
 
+// Relecture des codes d'erreur pendant la connexion (les capteurs arrivent par le flux)
+const DTC_REFRESH_MS = 30000;
+
 const OBD2Dashboard = () => {
   const [vehicleData, setVehicleData] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [connected, setConnected] = useState(false);
-  const [refreshInterval, setRefreshInterval] = useState(null);
+  const eventSourceRef = useRef(null);
+  const dtcIntervalRef = useRef(null);
 
-  // Fonction pour récupérer les données OBD2
+  // Fonction pour récupérer les données OBD2 (retourne true si le véhicule est connecté)
   const fetchOBD2Data = async () => {
     try {
       setLoading(true);
@@ -21,33 +25,88 @@ const OBD2Dashboard = () => {
       // Si la connexion est établie
       if (!response.data.error) {
         setConnected(true);
-      } else {
-        setConnected(false);
-        setError(response.data.error);
+        return true;
       }
+      setConnected(false);
+      setError(response.data.error);
+      return false;
     } catch (err) {
       console.error("Erreur lors de la récupération des données OBD-II:", err);
       setError("Impossible de récupérer les données du véhicule. Vérifiez que le dongle OBD-II est correctement connecté.");
       setConnected(false);
+      return false;
     } finally {
       setLoading(false);
     }
   };
 
+  // Relire les codes d'erreur sans écraser les valeurs reçues par le flux
+  const refreshDTC = async () => {
+    try {
+      const response = await axios.get('/obd2');
+      if (!response.data.error) {
+        setVehicleData((previous) => ({ ...(previous || {}), DTC: response.data.DTC }));
+      }
+    } catch (err) {
+      console.error("Erreur lors de la relecture des codes d'erreur:", err);
+    }
+  };
+
+  // Correspondance entre les PIDs diffusés et les champs affichés
+  const STREAM_FIELDS = {
+    RPM: 'RPM',
+    SPEED: 'Speed',
+    COOLANT_TEMP: 'EngineTemp',
+    ENGINE_LOAD: 'EngineLoad'
+  };
+
+  // Fermer le flux et arrêter la relecture des codes d'erreur
+  const closeTelemetry = () => {
+    if (eventSourceRef.current) {
+      eventSourceRef.current.close();
+      eventSourceRef.current = null;
+    }
+    if (dtcIntervalRef.current) {
+      clearInterval(dtcIntervalRef.current);
+      dtcIntervalRef.current = null;
+    }
+  };
+
+  // Ouvrir le flux de télémétrie en temps réel (Server-Sent Events)
+  const openTelemetryStream = () => {
+    // Un seul flux à la fois: l'ancien se reconnecterait indéfiniment
+    closeTelemetry();
+    const source = new EventSource(`/obd2/stream?pids=${Object.keys(STREAM_FIELDS).join(',')}`);
+
+    source.addEventListener('sample', (event) => {
+      const sample = JSON.parse(event.data);
+      const field = STREAM_FIELDS[sample.pid];
+      if (field) {
+        setVehicleData((previous) => ({ ...(previous || {}), [field]: sample.value }));
+      }
+    });
+
+    source.onerror = () => {
+      // EventSource se reconnecte automatiquement; on signale seulement la coupure
+      setError("Flux de télémétrie interrompu, reconnexion en cours...");
+    };
+
+    source.onopen = () => setError(null);
+
+    eventSourceRef.current = source;
+    dtcIntervalRef.current = setInterval(refreshDTC, DTC_REFRESH_MS);
+  };
+
   // Gérer la connexion/déconnexion
-  const toggleConnection = () => {
+  const toggleConnection = async () => {
     if (!connected) {
-      // Se connecter
-      fetchOBD2Data();
-      // Mettre en place un rafraîchissement périodique (toutes les 3 secondes)
-      const interval = setInterval(fetchOBD2Data, 3000);
-      setRefreshInterval(interval);
-    } else {
-      // Se déconnecter: arrêter le rafraîchissement
-      if (refreshInterval) {
-        clearInterval(refreshInterval);
-        setRefreshInterval(null);
+      // Se connecter: lecture initiale (codes d'erreur) puis flux continu si le véhicule répond
+      if (await fetchOBD2Data()) {
+        openTelemetryStream();
       }
+    } else {
+      // Se déconnecter: fermer le flux
+      closeTelemetry();
       setConnected(false);
       setVehicleData(null);
     }
@@ -55,12 +114,8 @@ const OBD2Dashboard = () => {
 
   // Nettoyage lors du démontage du composant
   useEffect(() => {
-    return () => {
-      if (refreshInterval) {
-        clearInterval(refreshInterval);
-      }
-    };
-  }, [refreshInterval]);
+    return () => closeTelemetry();
+  }, []);
 
   // Rendre les données du véhicule
   const renderVehicleData = () => {
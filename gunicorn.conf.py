@@ -0,0 +1,80 @@
+"""
+NovaEvo - Configuration gunicorn
+
+Avec GUNICORN_PRELOAD=True, l'application est importée une seule fois par le
+processus maître et le modèle de détection y est chargé avant le fork: les
+workers partagent les pages des poids (copie à l'écriture) au lieu d'en
+charger chacun une copie. Chaque worker exécute ensuite une inférence de
+préchauffage avant sa première requête (MODEL_WARMUP).
+
+Les workers sont multithreadés (gthread): une diffusion /obd2/stream ouverte
+occupe un thread, pas un worker entier, et les requêtes simultanées d'un
+même worker peuvent être regroupées par le micro-batching du modèle. Un
+worker gthread signale sa vie à l'arbitre depuis sa boucle principale: une
+diffusion longue ne déclenche pas le délai `timeout`, qui ne tue qu'un
+worker bloqué. Capacité d'un worker: GUNICORN_THREADS requêtes simultanées,
+dont au plus OBD_STREAM_MAX_CLIENTS diffusions.
+
+Avec plusieurs workers, un seul détient la liaison OBD-II (verrou
+OBD_LOCK_FILE) et les autres lui relaient les requêtes /obd2 (voir
+obd2/obd_owner.py): le port série n'est ouvert que par un processus.
+
+Usage:
+    gunicorn --config gunicorn.conf.py app:app
+"""
+
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', '4'))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'False').lower() in ('true', '1', 't')
+
+
+def when_ready(server):
+    """
+    Processus maître prêt, workers pas encore créés: chargement du modèle (preload_app)
+
+    Aucune inférence n'est lancée ici: le pool de threads d'OpenCV ne doit pas
+    exister dans le processus maître au moment du fork.
+    """
+    if not server.cfg.preload_app:
+        return
+    from app import image_recognition_engine
+    image_recognition_engine.load_model()
+
+
+def concurrent_requests(cfg):
+    """
+    Indique si un worker traite plusieurs requêtes à la fois (regroupement des inférences possible)
+
+    Un worker sync avec plus d'un thread est exécuté par gunicorn en gthread.
+    """
+    return cfg.worker_class_str != 'sync' or cfg.threads > 1
+
+
+def post_worker_init(worker):
+    """
+    Worker initialisé (application importée ou héritée du maître): préchauffage
+    """
+    import app
+
+    if worker.cfg.workers > 1:
+        # Liaison OBD-II détenue par un seul worker, requêtes /obd2 relayées par les autres
+        app.obd_owner.enable(app.app)
+        if app.job_queue.store.directory is None:
+            worker.log.warning("JOB_STORE_DIR vide: un job n'est visible que du worker qui l'a reçu, "
+                               "GET /jobs/<id> répondra souvent 404 avec plusieurs workers")
+
+    if not concurrent_requests(worker.cfg):
+        # Une requête à la fois: rien à regrouper, la fenêtre n'ajouterait que de l'attente
+        app.image_recognition_engine.batcher.max_delay = 0
+
+    if worker.cfg.preload_app and app.context_manager.modules:
+        # Le thread de synchronisation du processus maître n'existe pas dans le worker
+        app.context_manager.start_background_sync()
+
+    if os.getenv('MODEL_WARMUP', 'True').lower() in ('true', '1', 't'):
+        app.warm_up()
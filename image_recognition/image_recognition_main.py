@@ -9,12 +9,157 @@ import cv2
 import numpy as np
 import json
 import io
+import time
+import threading
+from bisect import bisect_right
 from dotenv import load_dotenv
 from google.cloud import vision
 
+from utils.image_preprocessing import image_preprocessor, record_vision_latency
+from utils.micro_batcher import MicroBatcher
+from utils.multi_pattern import MultiPatternMatcher
+from utils.perceptual_hash import NearDuplicateIndex, dhash, dhash_content
+from utils.result_cache import ResultCache, content_key
+from utils.vision_client import get_vision_client
+
 # Charger les variables d'environnement
 load_dotenv()
 
+# Version du format des résultats de labels mis en cache (à incrémenter s'il change)
+LABELS_CACHE_VERSION = 1
+
+# Taille d'entrée du modèle de détection (pixels)
+DNN_INPUT_SIZE = (300, 300)
+
+# Attente maximale du résultat d'une image regroupée avec d'autres (secondes)
+DNN_BATCH_TIMEOUT = 30
+
+# Couleurs de l'analyse de base: teinte minimale et maximale (OpenCV: 0-179, bornes
+# incluses) et seuil commun de saturation et de valeur
+COLOR_RANGES = {
+    "rouge": (0, 10, 100),
+    "jaune": (20, 35, 100),
+    "vert": (35, 85, 50),
+    "bleu": (85, 130, 50)
+}
+# Niveaux de saturation/valeur: un pixel est au niveau i s'il atteint les i premiers seuils
+SATURATION_THRESHOLDS = sorted({minimum for _, _, minimum in COLOR_RANGES.values()})
+SATURATION_LEVELS_LUT = np.searchsorted(SATURATION_THRESHOLDS, np.arange(256), side='right').astype(np.uint8)
+
+# Surface minimale d'un contour significatif, à la résolution d'origine (pixels)
+SIGNIFICANT_CONTOUR_AREA = 500
+
+# Mots-clés problématiques à rechercher dans les labels (l'ordre donne celui des anomalies)
+ANOMALY_KEYWORDS = (
+    "damage", "damaged", "broken", "crack", "cracked", "dent", "dented",
+    "scratch", "scratched", "rust", "rusty", "corrosion", "leak", "leaking",
+    "worn", "wear", "tear", "bent", "burnt", "burned", "melted", "flat",
+    "accident", "collision", "problem", "issue", "fault", "error", "warning",
+    # Mots français
+    "dommage", "endommagé", "cassé", "fissure", "fissuré", "bosselé", "bosse",
+    "rayure", "rayé", "rouille", "rouillé", "fuite", "usé",
+    "usure", "déchirure", "plié", "brûlé", "fondu", "dégonflé", "à plat",
+    "problème", "panne", "défaut", "erreur", "alerte"
+)
+
+# Mots-clés indiquant une image liée à une voiture ou à ses composants
+CAR_KEYWORDS = (
+    "car", "automobile", "vehicle", "motor", "engine", "wheel", "tire",
+    "brake", "suspension", "transmission", "exhaust", "battery", "headlight",
+    "taillight", "windshield", "hood", "trunk", "bumper", "door", "dashboard",
+    "steering", "airbag", "seat", "seatbelt", "mirror", "wiper", "radiator",
+    # Mots français
+    "voiture", "véhicule", "moteur", "roue", "pneu", "frein",
+    "échappement", "batterie", "phare", "feu",
+    "pare-brise", "capot", "coffre", "pare-choc", "portière", "tableau de bord",
+    "volant", "siège", "ceinture", "rétroviseur", "essuie-glace", "radiateur"
+)
+
+# Automate unique des deux listes, construit à l'import: un parcours des labels suffit
+LABEL_KEYWORDS = MultiPatternMatcher(ANOMALY_KEYWORDS + CAR_KEYWORDS)
+ANOMALY_KEYWORD_RANKS = {keyword: rank for rank, keyword in enumerate(ANOMALY_KEYWORDS)}
+CAR_KEYWORD_SET = frozenset(CAR_KEYWORDS)
+
+# Résultats de labels déjà calculés, par contenu d'image (partagés par la classe et la fonction)
+label_cache = ResultCache('labels')
+
+# Résultats de labels des images quasi identiques (autre photo de la même pièce), par hash perceptuel
+label_index = NearDuplicateIndex('labels')
+
+def read_image_content(image_path=None, image_content=None):
+    """
+    Retourne le contenu binaire d'une image, lu sur disque seulement si nécessaire
+    
+    Args:
+        image_path (str, optional): Chemin vers l'image
+        image_content (bytes | memoryview, optional): Contenu de l'image déjà en mémoire
+        
+    Returns:
+        bytes | memoryview: Contenu de l'image (sans copie s'il est déjà en mémoire),
+        ou None si aucune image n'est fournie
+    """
+    if image_content is not None:
+        return image_content
+    if image_path:
+        with io.open(image_path, 'rb') as image_file:
+            return image_file.read()
+    return None
+
+def scan_labels(labels):
+    """
+    Recherche les anomalies et les mots-clés automobiles des labels en un seul parcours
+    
+    Les labels sont réunis en un texte (un label par ligne) parcouru une fois
+    par l'automate LABEL_KEYWORDS. Chaque mot-clé d'anomalie présent dans un
+    label donne une anomalie; un seul mot-clé automobile suffit à marquer
+    l'image comme liée à une voiture.
+    
+    Args:
+        labels (dict): Dictionnaire des labels détectés et leur score
+        
+    Returns:
+        tuple: (anomalies triées par score décroissant, True si l'image est liée à une voiture)
+    """
+    names = list(labels)
+    starts = []
+    position = 0
+    for name in names:
+        starts.append(position)
+        position += len(name) + 1
+    text = '\n'.join(name.lower() for name in names)
+    
+    hits = set()
+    car_related = False
+    for start, keyword in LABEL_KEYWORDS.finditer(text):
+        rank = ANOMALY_KEYWORD_RANKS.get(keyword)
+        if rank is not None:
+            hits.add((rank, bisect_right(starts, start) - 1))
+        if keyword in CAR_KEYWORD_SET:
+            car_related = True
+    
+    # Ordre des mots-clés puis des labels, puis tri par score décroissant
+    anomalies = [
+        {"type": ANOMALY_KEYWORDS[rank], "label": names[index], "score": labels[names[index]]}
+        for rank, index in sorted(hits)
+    ]
+    return sorted(anomalies, key=lambda x: x["score"], reverse=True), car_related
+
+def decode_image(image_content):
+    """
+    Décode une image en mémoire (JPEG, PNG, ...) sans fichier intermédiaire
+    
+    Args:
+        image_content (bytes | memoryview): Contenu de l'image
+        
+    Returns:
+        numpy.ndarray: Image BGR, ou None si le contenu n'est pas une image valide
+    """
+    # np.frombuffer partage la mémoire du contenu reçu: aucune copie avant le décodage
+    buffer = np.frombuffer(image_content, dtype=np.uint8)
+    if not buffer.size:
+        return None
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
 class ImageRecognitionEngine:
     """Moteur de reconnaissance d'images pour le diagnostic automobile"""
     
@@ -24,37 +169,150 @@ class ImageRecognitionEngine:
         self.labels_path = os.getenv('LABELS_PATH', 'models/labels.pbtxt')
         self.confidence_threshold = float(os.getenv('CONFIDENCE_THRESHOLD', 0.5))
         
-        # Tenter de charger le modèle si disponible
-        self.net = None
+        # Le modèle est chargé au premier usage (voir load_model), pas à l'import de l'application
+        self._net = None
+        self._model_loaded = False
+        self._model_lock = threading.Lock()
         self.labels = {}
-        
-        # Vérifier si les fichiers du modèle existent
-        if os.path.exists(self.model_path) and os.path.exists(self.labels_path):
-            try:
-                self.net = cv2.dnn.readNetFromTensorflow(self.model_path)
-                self._load_labels()
-                print(f"Modèle chargé avec succès: {self.model_path}")
-                print(f"Étiquettes chargées: {len(self.labels)} classes")
-            except Exception as e:
-                print(f"Erreur lors du chargement du modèle: {str(e)}")
-        else:
-            print(f"AVERTISSEMENT: Fichiers de modèle non trouvés.")
-            print(f"Créez un dossier 'models' avec les fichiers de modèle appropriés.")
             
         # Initialiser OpenCV pour les fonctionnalités de base
         self.initialized = True
+        # Plus grand côté de la copie de travail de l'analyse de base (pixels)
+        self.basic_max_edge = int(os.getenv('BASIC_ANALYSIS_MAX_EDGE', '1024'))
+        
+        # Inférence par lots: images par passe du modèle, et regroupement des
+        # requêtes d'une image arrivées dans la même fenêtre de quelques ms
+        self.batch_size = max(1, int(os.getenv('DNN_BATCH_SIZE', '8')))
+        self.batcher = MicroBatcher(
+            self._model_based_analysis_batch,
+            max_batch_size=self.batch_size,
+            max_delay=float(os.getenv('DNN_BATCH_DELAY_MS', '5')) / 1000,
+            name='dnn'
+        )
+        # Un cv2.dnn.Net ne doit pas être utilisé par deux threads à la fois
+        self._net_lock = threading.Lock()
+        
+        # Réduction et recompression des images avant envoi à Google Cloud Vision
+        self.preprocessor = image_preprocessor
+        self.cache = label_cache
+        # Photos quasi identiques: labels et détections déjà calculés, retrouvés par hash perceptuel
+        self.label_index = label_index
+        self.analysis_index = NearDuplicateIndex('analysis')
+        
+        # Le client Google Cloud Vision est partagé par tout le processus et créé
+        # au premier appel (voir utils/vision_client.py)
+        self._vision_client = None
+        self._vision_api_available = None
+    
+    @property
+    def net(self):
+        """Réseau de détection (chargé au premier accès), ou None si le modèle est absent"""
+        if not self._model_loaded:
+            self.load_model()
+        return self._net
+    
+    @net.setter
+    def net(self, net):
+        self._net = net
+        self._model_loaded = True
+    
+    def load_model(self):
+        """
+        Charge le modèle de détection et ses étiquettes (une seule fois)
         
-        # Initialiser le client Google Cloud Vision si une clé d'API est configurée
-        try:
-            # La bibliothèque Google Cloud cherche automatiquement la variable d'environnement
-            # GOOGLE_APPLICATION_CREDENTIALS qui doit pointer vers un fichier de credentials JSON
-            self.vision_client = vision.ImageAnnotatorClient()
-            self.vision_api_available = True
-            print("Client Google Cloud Vision initialisé avec succès")
-        except Exception as e:
-            self.vision_api_available = False
-            print(f"AVERTISSEMENT: Impossible d'initialiser le client Google Cloud Vision: {str(e)}")
-            print("Assurez-vous que la variable d'environnement GOOGLE_APPLICATION_CREDENTIALS est correctement configurée")
+        Appelée au premier usage du modèle, ou avant le fork des workers gunicorn
+        (preload_app, voir gunicorn.conf.py) pour que les poids chargés par le
+        processus maître soient partagés par les workers (copie à l'écriture).
+        
+        Returns:
+            bool: True si le modèle est disponible
+        """
+        with self._model_lock:
+            if self._model_loaded:
+                return self._net is not None
+            
+            # Vérifier si les fichiers du modèle existent
+            if os.path.exists(self.model_path) and os.path.exists(self.labels_path):
+                try:
+                    started = time.perf_counter()
+                    self._net = cv2.dnn.readNetFromTensorflow(self.model_path)
+                    self._load_labels()
+                    print(f"Modèle chargé avec succès: {self.model_path} "
+                          f"({(time.perf_counter() - started) * 1000:.0f} ms, pid {os.getpid()})")
+                    print(f"Étiquettes chargées: {len(self.labels)} classes")
+                except Exception as e:
+                    self._net = None
+                    print(f"Erreur lors du chargement du modèle: {str(e)}")
+            else:
+                print(f"AVERTISSEMENT: Fichiers de modèle non trouvés.")
+                print(f"Créez un dossier 'models' avec les fichiers de modèle appropriés.")
+            
+            self._model_loaded = True
+            return self._net is not None
+    
+    def warm_up(self):
+        """
+        Prépare le moteur avant la première requête
+        
+        Charge le modèle s'il ne l'est pas encore et exécute une inférence sur
+        des images vides, d'une image puis d'un lot complet: la première passe
+        d'OpenCV prépare le réseau (fusion des couches, allocation des tampons),
+        coût que la première vraie requête n'a alors plus à payer. Le client
+        Google Cloud Vision du processus est aussi créé si des identifiants sont
+        configurés.
+        
+        Returns:
+            dict: Modèle disponible, tailles de lot préparées et durée (ms)
+        """
+        started = time.perf_counter()
+        batch_sizes = []
+        if self.load_model():
+            blank = np.zeros((DNN_INPUT_SIZE[1], DNN_INPUT_SIZE[0], 3), dtype=np.uint8)
+            for size in sorted({1, self.batch_size}):
+                try:
+                    self._model_based_analysis_batch([blank] * size)
+                    batch_sizes.append(size)
+                except Exception as e:
+                    print(f"Erreur lors de l'inférence de préchauffage (lot de {size}): {str(e)}")
+        
+        if os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
+            self.vision_api_available
+        
+        return {
+            "model_loaded": self._net is not None,
+            "batch_sizes": batch_sizes,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+    
+    @property
+    def vision_client(self):
+        """Client Google Cloud Vision (client partagé du processus, sauf s'il a été remplacé)"""
+        if self._vision_client is not None:
+            return self._vision_client
+        return get_vision_client()
+    
+    @vision_client.setter
+    def vision_client(self, client):
+        self._vision_client = client
+    
+    @property
+    def vision_api_available(self):
+        """True si le client Google Cloud Vision a pu être créé (vérifié au premier appel)"""
+        if self._vision_api_available is None:
+            try:
+                # La bibliothèque Google Cloud cherche automatiquement la variable d'environnement
+                # GOOGLE_APPLICATION_CREDENTIALS qui doit pointer vers un fichier de credentials JSON
+                self.vision_client
+                self._vision_api_available = True
+            except Exception as e:
+                self._vision_api_available = False
+                print(f"AVERTISSEMENT: Impossible d'initialiser le client Google Cloud Vision: {str(e)}")
+                print("Assurez-vous que la variable d'environnement GOOGLE_APPLICATION_CREDENTIALS est correctement configurée")
+        return self._vision_api_available
+    
+    @vision_api_available.setter
+    def vision_api_available(self, available):
+        self._vision_api_available = available
     
     def _load_labels(self):
         """Charge les étiquettes à partir du fichier pbtxt"""
@@ -74,13 +332,14 @@ class ImageRecognitionEngine:
                     self.labels[current_id] = current_name
                     current_id = None
     
-    def analyze_image(self, image_path=None, image_array=None):
+    def analyze_image(self, image_path=None, image_array=None, image_content=None):
         """
         Analyse une image pour détecter et identifier des objets automobiles
         
         Args:
             image_path (str, optional): Chemin vers l'image à analyser
             image_array (numpy.ndarray, optional): Image déjà chargée en mémoire
+            image_content (bytes | memoryview, optional): Image encodée (JPEG, PNG, ...) en mémoire
             
         Returns:
             dict: Résultats de l'analyse avec les objets détectés
@@ -96,24 +355,78 @@ class ImageRecognitionEngine:
                     return {"error": f"Impossible de charger l'image: {image_path}"}
             elif image_array is not None:
                 image = image_array
+            elif image_content is not None:
+                image = decode_image(image_content)
+                if image is None:
+                    return {"error": "Impossible de décoder l'image fournie"}
             else:
                 return {"error": "Aucune image fournie"}
             
             # Si le modèle n'est pas chargé, utiliser seulement les fonctionnalités de base OpenCV
             if self.net is None:
                 return self._basic_image_analysis(image)
-            else:
-                return self._model_based_analysis(image)
+            
+            # Photo quasi identique déjà analysée: pas de nouvelle passe du modèle
+            image_hash = dhash(image)
+            namespace = f"{self.model_path}:{self.confidence_threshold}"
+            similar = self.analysis_index.get(namespace, image_hash)
+            if similar is not None:
+                result, distance = similar
+                result = self._scale_boxes(result, image)
+                result.update({"cached": True, "near_duplicate": {"distance": distance}})
+                return result
+            
+            # Passe du modèle partagée avec les requêtes simultanées
+            result = self.batcher.process(image, timeout=DNN_BATCH_TIMEOUT)
+            if "error" not in result:
+                self.analysis_index.set(namespace, image_hash, self._normalize_boxes(result))
+            return result
                 
         except Exception as e:
             return {"error": f"Erreur lors de l'analyse de l'image: {str(e)}"}
     
-    def detect_labels(self, image_path):
+    def analyze_images(self, images):
+        """
+        Analyse plusieurs images, avec une passe du modèle par groupe de DNN_BATCH_SIZE images
+        
+        Args:
+            images (list): Images encodées (bytes | memoryview) ou déjà décodées (numpy.ndarray)
+            
+        Returns:
+            list: Résultat de chaque image, dans l'ordre reçu (voir analyze_image)
+        """
+        if not self.initialized:
+            return [{"error": "Moteur d'analyse d'image non initialisé correctement"}] * len(images)
+        
+        results = [None] * len(images)
+        decoded = []
+        for index, image in enumerate(images):
+            if not isinstance(image, np.ndarray):
+                image = decode_image(image) if image is not None else None
+            if image is None:
+                results[index] = {"error": "Impossible de décoder l'image fournie"}
+            elif self.net is None:
+                results[index] = self._basic_image_analysis(image)
+            else:
+                decoded.append((index, image))
+        
+        for start in range(0, len(decoded), self.batch_size):
+            group = decoded[start:start + self.batch_size]
+            try:
+                analyses = self._model_based_analysis_batch([image for _, image in group])
+            except Exception as e:
+                analyses = [{"error": f"Erreur lors de l'analyse de l'image: {str(e)}"}] * len(group)
+            for (index, _), analysis in zip(group, analyses):
+                results[index] = analysis
+        return results
+    
+    def detect_labels(self, image_path=None, image_content=None):
         """
         Analyse une image via Google Cloud Vision et retourne un dictionnaire de labels avec leur score.
         
         Args:
-            image_path (str): Chemin vers l'image à analyser
+            image_path (str, optional): Chemin vers l'image à analyser
+            image_content (bytes | memoryview, optional): Contenu de l'image déjà en mémoire
             
         Returns:
             dict: Résultats de l'analyse avec les labels détectés et une analyse d'anomalies
@@ -125,21 +438,41 @@ class ImageRecognitionEngine:
             }
             
         try:
-            # Charger l'image et l'envoyer à l'API
-            with io.open(image_path, 'rb') as image_file:
-                content = image_file.read()
+            # Charger l'image (sauf si déjà en mémoire) et l'envoyer à l'API
+            content = read_image_content(image_path, image_content)
+            if content is None:
+                return {"error": "Aucune image fournie"}
+            
+            # Même image déjà analysée: pas de nouvel appel à l'API
+            namespace = f"engine:{LABELS_CACHE_VERSION}:{self.preprocessor.signature('labels')}"
+            cache_key = content_key(content, namespace)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                cached["cached"] = True
+                return cached
+            
+            # Photo quasi identique déjà analysée (bruit JPEG, léger recadrage)
+            image_hash = dhash_content(content)
+            similar = self.label_index.get(namespace, image_hash)
+            if similar is not None:
+                result, distance = similar
+                result.update({"cached": True, "near_duplicate": {"distance": distance}})
+                return result
             
+            content, preprocessing = self.preprocessor.prepare(content, 'labels')
             image = vision.Image(content=content)
             
             # Effectuer la détection de labels
+            started = time.perf_counter()
             response = self.vision_client.label_detection(image=image)
+            record_vision_latency('label_detection', started)
             labels = response.label_annotations
             
             # Créer un dictionnaire des labels détectés avec leur score
             label_results = {label.description.lower(): float(label.score) for label in labels}
             
-            # Analyser les anomalies potentielles dans les labels détectés
-            anomalies = self._detect_anomalies(label_results)
+            # Analyser les anomalies potentielles et le lien avec l'automobile (un seul parcours)
+            anomalies, car_related = scan_labels(label_results)
             
             # Liste des labels triés par score
             sorted_labels = sorted(
@@ -155,12 +488,16 @@ class ImageRecognitionEngine:
                 "anomalies_detected": len(anomalies) > 0,
                 "anomalies": anomalies,
                 "sorted_labels": sorted_labels,
-                "car_related": self._is_car_related(label_results)
+                "car_related": car_related,
+                "preprocessing": preprocessing
             }
             
-            # Vérifier si l'API a retourné une erreur
+            # Vérifier si l'API a retourné une erreur (résultat partiel: pas de mise en cache)
             if response.error.message:
                 result["warning"] = f"API Error: {response.error.message}"
+            else:
+                self.cache.set(cache_key, result)
+                self.label_index.set(namespace, image_hash, result)
                 
             return result
             
@@ -177,32 +514,7 @@ class ImageRecognitionEngine:
         Returns:
             list: Liste des anomalies détectées avec leur score
         """
-        # Liste de mots-clés problématiques à rechercher dans les labels
-        anomaly_keywords = [
-            "damage", "damaged", "broken", "crack", "cracked", "dent", "dented", 
-            "scratch", "scratched", "rust", "rusty", "corrosion", "leak", "leaking",
-            "worn", "wear", "tear", "bent", "burnt", "burned", "melted", "flat",
-            "accident", "collision", "problem", "issue", "fault", "error", "warning",
-            # Mots français
-            "dommage", "endommagé", "cassé", "fissure", "fissuré", "bosselé", "bosse", 
-            "rayure", "rayé", "rouille", "rouillé", "corrosion", "fuite", "usé", 
-            "usure", "déchirure", "plié", "brûlé", "fondu", "dégonflé", "à plat",
-            "accident", "collision", "problème", "panne", "défaut", "erreur", "alerte"
-        ]
-        
-        # Rechercher les anomalies dans les labels
-        anomalies = []
-        for keyword in anomaly_keywords:
-            for label, score in labels.items():
-                if keyword in label.lower():
-                    anomalies.append({
-                        "type": keyword,
-                        "label": label,
-                        "score": score
-                    })
-        
-        # Trier les anomalies par score en ordre décroissant
-        return sorted(anomalies, key=lambda x: x["score"], reverse=True)
+        return scan_labels(labels)[0]
     
     def _is_car_related(self, labels):
         """
@@ -214,30 +526,16 @@ class ImageRecognitionEngine:
         Returns:
             bool: True si l'image est liée à une voiture, False sinon
         """
-        car_keywords = [
-            "car", "automobile", "vehicle", "motor", "engine", "wheel", "tire",
-            "brake", "suspension", "transmission", "exhaust", "battery", "headlight",
-            "taillight", "windshield", "hood", "trunk", "bumper", "door", "dashboard",
-            "steering", "airbag", "seat", "seatbelt", "mirror", "wiper", "radiator",
-            # Mots français
-            "voiture", "automobile", "véhicule", "moteur", "roue", "pneu", "frein",
-            "suspension", "transmission", "échappement", "batterie", "phare", "feu",
-            "pare-brise", "capot", "coffre", "pare-choc", "portière", "tableau de bord",
-            "volant", "airbag", "siège", "ceinture", "rétroviseur", "essuie-glace", "radiateur"
-        ]
-        
-        # Chercher les mots-clés liés aux voitures dans les labels
-        for keyword in car_keywords:
-            for label in labels.keys():
-                if keyword in label.lower():
-                    return True
-                    
-        return False
+        return scan_labels(labels)[1]
     
     def _basic_image_analysis(self, image):
         """
         Analyse de base d'une image avec OpenCV sans modèle de ML
         
+        L'analyse porte sur une copie réduite à au plus BASIC_ANALYSIS_MAX_EDGE
+        pixels (plus grand côté): les proportions de couleurs en dépendent peu,
+        et le seuil de surface des contours est ramené à cette échelle.
+        
         Args:
             image (numpy.ndarray): Image à analyser
             
@@ -246,6 +544,15 @@ class ImageRecognitionEngine:
         """
         height, width, _ = image.shape
         
+        # Copie de travail de résolution bornée, réduite d'un facteur entier (moyenne
+        # de blocs factor x factor: chemin rapide d'INTER_AREA, bords incomplets ignorés)
+        factor = max(1, -(-max(height, width) // self.basic_max_edge))
+        scale = 1.0 / factor
+        if factor > 1:
+            work_width, work_height = max(1, width // factor), max(1, height // factor)
+            image = cv2.resize(image[:work_height * factor, :work_width * factor], (work_width, work_height),
+                               interpolation=cv2.INTER_AREA)
+        
         # Convertir en niveaux de gris pour l'analyse
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
@@ -254,24 +561,23 @@ class ImageRecognitionEngine:
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
         # Nombre d'objets approximatif basé sur les contours
-        significant_contours = [c for c in contours if cv2.contourArea(c) > 500]
+        min_area = SIGNIFICANT_CONTOUR_AREA * scale * scale
+        significant_contours = [c for c in contours if cv2.contourArea(c) > min_area]
         
-        # Analyse de couleur
+        # Analyse de couleur: un seul histogramme teinte x niveau de saturation/valeur
+        # (niveau: seuils de COLOR_RANGES atteints à la fois par la saturation et la valeur)
         hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        color_ranges = {
-            "rouge": ([0, 100, 100], [10, 255, 255]),
-            "jaune": ([20, 100, 100], [35, 255, 255]),
-            "vert": ([35, 50, 50], [85, 255, 255]),
-            "bleu": ([85, 50, 50], [130, 255, 255])
-        }
+        hue, saturation, value = cv2.split(hsv)
+        levels = cv2.LUT(cv2.min(saturation, value), SATURATION_LEVELS_LUT)
+        level_count = len(SATURATION_THRESHOLDS) + 1
+        histogram = cv2.calcHist([hue, levels], [0, 1], None, [180, level_count], [0, 180, 0, level_count])
         
+        pixels = hue.size
         color_detection = {}
-        for color_name, (lower, upper) in color_ranges.items():
-            lower = np.array(lower, dtype=np.uint8)
-            upper = np.array(upper, dtype=np.uint8)
-            mask = cv2.inRange(hsv, lower, upper)
-            ratio = cv2.countNonZero(mask) / (height * width)
-            color_detection[color_name] = ratio * 100  # en pourcentage
+        for color_name, (hue_min, hue_max, minimum) in COLOR_RANGES.items():
+            level = SATURATION_THRESHOLDS.index(minimum) + 1
+            count = float(histogram[hue_min:hue_max + 1, level:].sum())
+            color_detection[color_name] = count / pixels * 100  # en pourcentage
         
         dominant_color = max(color_detection.items(), key=lambda x: x[1])
         
@@ -306,38 +612,68 @@ class ImageRecognitionEngine:
         Returns:
             dict: Résultats de l'analyse avancée
         """
-        height, width, _ = image.shape
+        return self._model_based_analysis_batch([image])[0]
+    
+    def _model_based_analysis_batch(self, images):
+        """
+        Analyse un lot d'images en une seule passe du modèle
+        
+        Les images sont réunies dans un tenseur (blobFromImages), puis les
+        détections sont réparties par image selon leur première colonne (indice
+        de l'image dans le lot).
         
-        # Préparer l'image pour le modèle
-        blob = cv2.dnn.blobFromImage(image, size=(300, 300), swapRB=True, crop=False)
-        self.net.setInput(blob)
+        Args:
+            images (list): Images à analyser (numpy.ndarray)
+            
+        Returns:
+            list: Résultats de l'analyse avancée de chaque image
+        """
+        # Préparer les images pour le modèle (redimensionnées chacune à la taille d'entrée)
+        blob = cv2.dnn.blobFromImages(images, size=DNN_INPUT_SIZE, swapRB=True, crop=False)
         
         # Faire la prédiction
-        detections = self.net.forward()
+        with self._net_lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()
+        
+        # Détections au-dessus du seuil: [indice de l'image, classe, confiance, x_min, y_min, x_max, y_max]
+        rows = detections.reshape(-1, detections.shape[-1])
+        rows = rows[rows[:, 2] > self.confidence_threshold]
+        return [self._model_result(image, rows[rows[:, 0] == index]) for index, image in enumerate(images)]
+    
+    def _model_result(self, image, rows):
+        """
+        Construit le résultat de l'analyse avancée d'une image
+        
+        Args:
+            image (numpy.ndarray): Image analysée
+            rows (numpy.ndarray): Détections de cette image au-dessus du seuil
+            
+        Returns:
+            dict: Résultats de l'analyse avancée
+        """
+        height, width, _ = image.shape
         
         # Traiter les résultats
         results = []
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
+        for row in rows:
+            class_id = int(row[1])
+            class_name = self.labels.get(class_id, f"Classe {class_id}")
             
-            if confidence > self.confidence_threshold:
-                class_id = int(detections[0, 0, i, 1])
-                class_name = self.labels.get(class_id, f"Classe {class_id}")
-                
-                # Coordonnées de la boîte englobante
-                box = detections[0, 0, i, 3:7] * np.array([width, height, width, height])
-                x_min, y_min, x_max, y_max = box.astype('int')
-                
-                results.append({
-                    "class": class_name,
-                    "confidence": float(confidence),
-                    "bounding_box": {
-                        "x_min": int(x_min),
-                        "y_min": int(y_min),
-                        "x_max": int(x_max),
-                        "y_max": int(y_max)
-                    }
-                })
+            # Coordonnées de la boîte englobante
+            box = row[3:7] * np.array([width, height, width, height])
+            x_min, y_min, x_max, y_max = box.astype('int')
+            
+            results.append({
+                "class": class_name,
+                "confidence": float(row[2]),
+                "bounding_box": {
+                    "x_min": int(x_min),
+                    "y_min": int(y_min),
+                    "x_max": int(x_max),
+                    "y_max": int(y_max)
+                }
+            })
         
         # Générer des diagnostics possibles basés sur les objets détectés
         possible_diagnoses = self._generate_diagnoses(results)
@@ -354,6 +690,60 @@ class ImageRecognitionEngine:
             "possible_diagnoses": possible_diagnoses
         }
     
+    @staticmethod
+    def _normalize_boxes(result):
+        """
+        Copie d'un résultat avec les boîtes en fractions (0 à 1) des dimensions de l'image
+        
+        Forme gardée dans l'index des photos quasi identiques: une autre photo de
+        la même pièce n'a pas forcément la même résolution.
+        
+        Args:
+            result (dict): Résultat de l'analyse avancée (coordonnées en pixels)
+            
+        Returns:
+            dict: Résultat aux boîtes normalisées
+        """
+        width = max(result["dimensions"]["width"], 1)
+        height = max(result["dimensions"]["height"], 1)
+        detections = []
+        for detection in result["detections"]:
+            box = detection["bounding_box"]
+            detections.append(dict(detection, bounding_box={
+                "x_min": box["x_min"] / width,
+                "y_min": box["y_min"] / height,
+                "x_max": box["x_max"] / width,
+                "y_max": box["y_max"] / height
+            }))
+        return dict(result, detections=detections)
+    
+    @staticmethod
+    def _scale_boxes(result, image):
+        """
+        Ramène un résultat de l'index (boîtes normalisées) aux dimensions d'une image
+        
+        Les classes et les diagnostics sont repris tels quels; les boîtes, en
+        proportion de la photo analysée, sont approximatives pour une photo recadrée.
+        
+        Args:
+            result (dict): Résultat aux boîtes normalisées (voir _normalize_boxes)
+            image (numpy.ndarray): Image à laquelle le résultat est rendu
+            
+        Returns:
+            dict: Résultat aux dimensions et coordonnées de l'image, en pixels
+        """
+        height, width = image.shape[:2]
+        for detection in result["detections"]:
+            box = detection["bounding_box"]
+            detection["bounding_box"] = {
+                "x_min": int(round(box["x_min"] * width)),
+                "y_min": int(round(box["y_min"] * height)),
+                "x_max": int(round(box["x_max"] * width)),
+                "y_max": int(round(box["y_max"] * height))
+            }
+        result["dimensions"] = {"width": width, "height": height}
+        return result
+    
     def _generate_diagnoses(self, detections):
         """
         Génère des diagnostics possibles basés sur les objets détectés
@@ -404,78 +794,72 @@ class ImageRecognitionEngine:
         return diagnoses
 
 # Fonction autonome pour la détection de labels via Google Cloud Vision
-def detect_labels(image_path: str) -> dict:
+def detect_labels(image_path: str = None, image_content=None) -> dict:
     """
     Analyse une image via Google Cloud Vision et retourne un dictionnaire de labels avec leur score.
     
     Args:
-        image_path (str): Chemin vers l'image à analyser
+        image_path (str, optional): Chemin vers l'image à analyser
+        image_content (bytes | memoryview, optional): Contenu de l'image déjà en mémoire
         
     Returns:
         dict: Dictionnaire contenant les labels détectés et leur score
     """
     try:
-        # Initialiser le client Vision
-        client = vision.ImageAnnotatorClient()
+        # Charger l'image (sauf si déjà en mémoire)
+        content = read_image_content(image_path, image_content)
+        if content is None:
+            return {"error": "Aucune image fournie"}
+        
+        # Même image déjà analysée: pas de nouvel appel à l'API
+        namespace = f"function:{LABELS_CACHE_VERSION}:{image_preprocessor.signature('labels')}"
+        cache_key = content_key(content, namespace)
+        cached = label_cache.get(cache_key)
+        if cached is not None:
+            cached["cached"] = True
+            return cached
+        
+        # Photo quasi identique déjà analysée (bruit JPEG, léger recadrage)
+        image_hash = dhash_content(content)
+        similar = label_index.get(namespace, image_hash)
+        if similar is not None:
+            result, distance = similar
+            result.update({"cached": True, "near_duplicate": {"distance": distance}})
+            return result
         
-        # Charger l'image
-        with io.open(image_path, 'rb') as image_file:
-            content = image_file.read()
+        # Client Vision partagé (créé au premier appel du processus)
+        client = get_vision_client()
         
+        content, preprocessing = image_preprocessor.prepare(content, 'labels')
         image = vision.Image(content=content)
         
         # Détecter les labels
+        started = time.perf_counter()
         response = client.label_detection(image=image)
+        record_vision_latency('label_detection', started)
         labels = response.label_annotations
         
         # Créer un dictionnaire des labels détectés avec leur score
         results = {label.description.lower(): float(label.score) for label in labels}
         
-        # Rechercher des anomalies potentielles
-        anomaly_keywords = [
-            "damage", "broken", "crack", "dent", "scratch", "rust", "leak", 
-            "worn", "bent", "burnt", "accident", "problem", "issue", "fault",
-            # En français
-            "dommage", "cassé", "fissure", "bosse", "rayure", "rouille", "fuite", 
-            "usé", "plié", "brûlé", "accident", "problème", "panne", "défaut"
-        ]
-        
-        anomalies = []
-        for keyword in anomaly_keywords:
-            for label, score in results.items():
-                if keyword in label.lower():
-                    anomalies.append({
-                        "type": keyword,
-                        "label": label,
-                        "score": score
-                    })
-        
-        # Vérifier si c'est lié à l'automobile
-        car_keywords = [
-            "car", "vehicle", "motor", "engine", "wheel", "tire", "brake", 
-            "transmission", "exhaust", "battery", "headlight", "bumper",
-            # En français  
-            "voiture", "véhicule", "moteur", "roue", "pneu", "frein", 
-            "transmission", "échappement", "batterie", "phare", "pare-choc"
-        ]
-        
-        car_related = False
-        for keyword in car_keywords:
-            for label in results.keys():
-                if keyword in label.lower():
-                    car_related = True
-                    break
-            if car_related:
-                break
+        # Rechercher des anomalies potentielles et vérifier si c'est lié à l'automobile
+        anomalies, car_related = scan_labels(results)
         
-        return {
+        result = {
             "success": True,
             "labels": results,
             "anomalies_detected": len(anomalies) > 0,
             "anomalies": anomalies,
-            "car_related": car_related
+            "car_related": car_related,
+            "preprocessing": preprocessing
         }
         
+        # Une réponse en erreur ne doit pas être resservie depuis le cache
+        if not response.error.message:
+            label_cache.set(cache_key, result)
+            label_index.set(namespace, image_hash, result)
+        return result
+        
     except Exception as e:
         return {"error": f"Erreur lors de l'analyse avec Google Cloud Vision: {str(e)}"}
 
@@ -8,14 +8,21 @@ import re
 from dotenv import load_dotenv
 import openai
 
+from utils.dtc_index import DTCIndex
+
 # Charger les variables d'environnement
 load_dotenv()
 
 class AutoAssistantNLP:
     """Assistant NLP pour l'interprétation des commandes auto"""
     
-    def __init__(self):
-        """Initialise l'assistant NLP"""
+    def __init__(self, dtc_index=None):
+        """
+        Initialise l'assistant NLP
+        
+        Args:
+            dtc_index (DTCIndex, optional): Index des codes défaut partagé avec le module OBD-II
+        """
         api_key = os.getenv('OPENAI_API_KEY')
         if api_key:
             openai.api_key = api_key
@@ -25,24 +32,11 @@ class AutoAssistantNLP:
             print("AVERTISSEMENT: Clé API OpenAI non configurée!")
             self.initialized = False
             
+        # Index des codes défaut (codes complets, préfixes et familles P/C/B/U)
+        self.dtc_index = dtc_index or DTCIndex()
+            
         # Charger la base de connaissances automobile
         self.auto_knowledge = {
-            "codes_erreur": {
-                "P0": "Problème de système de carburant/air",
-                "P1": "Problème spécifique au constructeur",
-                "P2": "Problème de gestion du carburant/air",
-                "P3": "Problème d'allumage",
-                "P00": "Système de contrôle d'émission",
-                "P01": "Mesure de débit de carburant/d'air",
-                "P02": "Circuit d'injection",
-                "P03": "Système d'allumage",
-                "P04": "Système de contrôle auxiliaire d'émission",
-                "P05": "Contrôle de vitesse/régime de ralenti",
-                # Exemples spécifiques
-                "P0120": "Capteur de position du papillon/pédale - problème de circuit",
-                "P0300": "Détection de ratés d'allumage aléatoires",
-                "P0420": "Efficacité du système catalytique inférieure au seuil"
-            },
             "entretien": {
                 "vidange": "À réaliser tous les 10 000 à 15 000 km ou une fois par an",
                 "freins": "Vérifier les plaquettes tous les 10 000 km, disques tous les 50 000 km",
@@ -71,10 +65,9 @@ class AutoAssistantNLP:
         
         try:
             # Vérifier d'abord si c'est une demande de code erreur avec regex
-            code_match = re.search(r'[Pp][0-9]{4}', user_query)
-            if code_match:
-                code = code_match.group(0).upper()
-                return self._handle_error_code(code)
+            codes = re.findall(r'\b[PCBU][0-3][0-9A-F]{3}\b', user_query, re.IGNORECASE)
+            if codes:
+                return self._handle_error_code(*dict.fromkeys(code.upper() for code in codes))
             
             # Rechercher des mots-clés pour le traitement local
             if any(keyword in user_query.lower() for keyword in ["vidange", "entretien", "quand changer"]):
@@ -119,46 +112,34 @@ class AutoAssistantNLP:
                 "query": user_query
             }
     
-    def _handle_error_code(self, code):
+    def _handle_error_code(self, code, *other_codes):
         """
-        Traite un code d'erreur OBD spécifique
+        Traite un ou plusieurs codes d'erreur OBD
         
         Args:
-            code (str): Code d'erreur au format Pxxxx
+            code (str): Code d'erreur au format Pxxxx (ou Cxxxx, Bxxxx, Uxxxx)
+            *other_codes (str): Autres codes cités dans la même requête
             
         Returns:
             dict: Informations sur le code d'erreur
         """
-        # Vérifier dans notre base de connaissances
-        code_prefix_2 = code[:2]  # P0, P1, etc.
-        code_prefix_3 = code[:3]  # P00, P01, etc.
-        
-        description = None
-        
-        # Vérifier d'abord le code complet
-        if code in self.auto_knowledge["codes_erreur"]:
-            description = self.auto_knowledge["codes_erreur"][code]
-        # Puis vérifier le préfixe à 3 chiffres
-        elif code_prefix_3 in self.auto_knowledge["codes_erreur"]:
-            description = self.auto_knowledge["codes_erreur"][code_prefix_3]
-        # Enfin vérifier le préfixe à 2 chiffres
-        elif code_prefix_2 in self.auto_knowledge["codes_erreur"]:
-            description = self.auto_knowledge["codes_erreur"][code_prefix_2]
+        # Une seule passe sur l'index pour tous les codes de la requête
+        details = self.dtc_index.lookup_many((code,) + other_codes)
         
-        if description:
-            return {
+        if details[0]["match"]:
+            result = {
                 "success": True,
                 "category": "diagnostic",
                 "intent": "recherche_code_erreur",
                 "entities": {
                     "code": code
                 },
-                "description": description,
+                "description": details[0]["description"],
                 "suggested_action": f"Vérifier le composant lié au code {code}",
                 "module": "obd2"
             }
         else:
-            return {
+            result = {
                 "success": True,
                 "category": "diagnostic",
                 "intent": "recherche_code_erreur",
@@ -169,6 +150,11 @@ class AutoAssistantNLP:
                 "suggested_action": "Consulter un manuel technique ou utiliser le module OBD pour plus d'informations",
                 "module": "obd2"
             }
+        
+        if other_codes:
+            result["entities"]["codes"] = [item["code"] for item in details]
+            result["details"] = details
+        return result
     
     def _handle_maintenance_query(self, query):
         """
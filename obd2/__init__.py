@@ -1,4 +1,11 @@
 # Module OBD-II - Package Initialization
 from .obd_main import OBDManager
+from .obd_session import OBDSession
+from .obd_stream import TelemetryStreamer, TelemetrySubscription
+from .obd_telemetry import TelemetryStore
+from .obd_scheduler import PollingScheduler
+from .obd_fleet import OBDFleet
+from .obd_owner import OBDLinkOwner
 
-__all__ = ['OBDManager']
+__all__ = ['OBDManager', 'OBDSession', 'TelemetryStreamer', 'TelemetrySubscription', 'TelemetryStore',
+           'PollingScheduler', 'OBDFleet', 'OBDLinkOwner']
@@ -0,0 +1,474 @@
+"""
+NovaEvo - Émulateur ELM327
+
+Ce module simule un dongle ELM327 branché sur un véhicule CAN (ISO 15765-4,
+11 bits, 500 kbauds) sur un pseudo-terminal. OBDManager.connect(port=...) peut
+l'ouvrir comme un vrai port série, ce qui permet de tester et de mesurer les
+performances du module OBD-II sans matériel.
+
+L'émulateur répond aux commandes AT utilisées par python-OBD et aux Modes 01
+(valeurs courantes, y compris les requêtes multi-PID), 03 (codes défaut) et
+09 (VIN), avec une latence configurable par commande. Il peut rejouer une
+session de conduite enregistrée au format des échantillons de /obd2/stream.
+"""
+
+import os
+import pty
+import tty
+import json
+import time
+import select
+import bisect
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import obd
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.elm327_emulator')
+
+# En-tête de réponse de l'ECU moteur (CAN 11 bits)
+ENGINE_HEADER = "7E8"
+
+# Valeurs renvoyées en l'absence de session rejouée
+DEFAULT_VALUES = {
+    "RPM": 850,
+    "SPEED": 0,
+    "FUEL_STATUS": b"\x02\x00",
+    "ENGINE_LOAD": 22,
+    "COOLANT_TEMP": 88,
+    "INTAKE_TEMP": 30,
+    "MAF": 3.2,
+    "THROTTLE_POS": 15,
+    "FUEL_LEVEL": 64,
+    "BAROMETRIC_PRESSURE": 101,
+    "CONTROL_MODULE_VOLTAGE": 14.1,
+    "OIL_TEMP": 92
+}
+
+# Encodage des valeurs physiques en octets bruts (formules SAE J1979)
+ENCODERS = {
+    "RPM": lambda v: int(v * 4).to_bytes(2, 'big'),
+    "SPEED": lambda v: bytes([int(v)]),
+    "ENGINE_LOAD": lambda v: bytes([round(v * 255 / 100)]),
+    "COOLANT_TEMP": lambda v: bytes([int(v) + 40]),
+    "INTAKE_TEMP": lambda v: bytes([int(v) + 40]),
+    "OIL_TEMP": lambda v: bytes([int(v) + 40]),
+    "MAF": lambda v: int(v * 100).to_bytes(2, 'big'),
+    "THROTTLE_POS": lambda v: bytes([round(v * 255 / 100)]),
+    "FUEL_LEVEL": lambda v: bytes([round(v * 255 / 100)]),
+    "BAROMETRIC_PRESSURE": lambda v: bytes([int(v)]),
+    "INTAKE_PRESSURE": lambda v: bytes([int(v)]),
+    "CONTROL_MODULE_VOLTAGE": lambda v: int(v * 1000).to_bytes(2, 'big'),
+    "RUN_TIME": lambda v: int(v).to_bytes(2, 'big')
+}
+
+
+class ELM327Emulator:
+    """
+    Dongle ELM327 simulé sur un pseudo-terminal
+
+    Cette classe s'occupe de:
+    - Ouvrir un pseudo-terminal et exposer son chemin (attribut port)
+    - Répondre aux commandes AT et aux Modes 01, 03 et 09
+    - Appliquer une latence par commande, par mode ou par défaut
+    - Rejouer une session de conduite enregistrée (en boucle)
+    """
+
+    def __init__(self, values: Optional[Dict[str, Any]] = None,
+                 latency: Union[float, Dict[str, float], None] = None,
+                 dtcs: Iterable[str] = (),
+                 vin: str = "VF1RFB00556789345",
+                 session: Optional[List[Dict[str, Any]]] = None,
+                 multi_pid: bool = True):
+        """
+        Initialise l'émulateur
+
+        Args:
+            values (Dict[str, Any], optional): Valeurs par nom de commande (physiques ou octets bruts)
+            latency (float | Dict[str, float], optional): Latence en secondes, globale ou par
+                commande ("010C"), par mode ("01", "AT") et "default"
+            dtcs (Iterable[str]): Codes défaut renvoyés en Mode 03 (ex: "P0133")
+            vin (str): VIN renvoyé en Mode 09
+            session (List[Dict[str, Any]], optional): Échantillons {"pid", "time", "value"} à rejouer
+            multi_pid (bool): Accepter les requêtes Mode 01 de plusieurs PIDs
+        """
+        self.values = dict(DEFAULT_VALUES if values is None else values)
+        self.latency = latency if isinstance(latency, dict) else {"default": latency or 0.0}
+        self.dtcs = list(dtcs)
+        self.vin = vin
+        self.multi_pid = multi_pid
+        self.port = None
+
+        self.echo = True
+        self.headers = False
+        self.protocol = "0"
+        self.commands_received = 0
+        self._last_command = None
+
+        self._session = {}
+        self._session_duration = 0.0
+        self._session_start = None
+        if session:
+            self.load_session(session)
+
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self) -> str:
+        """
+        Ouvre le pseudo-terminal et démarre la boucle de réponse
+
+        Returns:
+            str: Chemin du port à passer à OBDManager.connect()
+        """
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+
+        self._stop_event.clear()
+        self._session_start = time.time()
+        self._thread = threading.Thread(target=self._run, name='elm327-emulator', daemon=True)
+        self._thread.start()
+
+        logger.info(f"Émulateur ELM327 démarré sur {self.port}")
+        return self.port
+
+    def stop(self) -> None:
+        """
+        Arrête la boucle de réponse et ferme le pseudo-terminal
+        """
+        if self._thread is None:
+            return
+
+        self._stop_event.set()
+        self._thread.join(2)
+        self._thread = None
+
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        logger.info("Émulateur ELM327 arrêté")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def load_session(self, samples: Iterable[Dict[str, Any]]) -> None:
+        """
+        Charge une session de conduite à rejouer
+
+        Args:
+            samples (Iterable[Dict[str, Any]]): Échantillons {"pid", "time", "value"}
+        """
+        series = {}
+        for sample in samples:
+            series.setdefault(sample["pid"], []).append((float(sample["time"]), sample["value"]))
+
+        if not series:
+            return
+
+        origin = min(t for points in series.values() for t, _ in points)
+        self._session = {}
+        for pid, points in series.items():
+            points.sort(key=lambda point: point[0])
+            self._session[pid] = ([t - origin for t, _ in points], [v for _, v in points])
+        self._session_duration = max(times[-1] for times, _ in self._session.values()) or 1.0
+        self._session_start = time.time()
+
+    def current_value(self, name: str) -> Any:
+        """
+        Retourne la valeur courante d'une commande (session rejouée ou valeur fixe)
+
+        Args:
+            name (str): Nom de la commande (ex: "RPM")
+
+        Returns:
+            Any: Valeur physique ou octets bruts, None si la commande est inconnue
+        """
+        if name in self._session:
+            times, values = self._session[name]
+            elapsed = (time.time() - self._session_start) % self._session_duration
+            index = max(bisect.bisect_right(times, elapsed) - 1, 0)
+            return values[index]
+        return self.values.get(name)
+
+    def respond(self, command: str) -> str:
+        """
+        Calcule la réponse à une commande (sans latence ni invite)
+
+        Args:
+            command (str): Commande reçue, sans retour chariot
+
+        Returns:
+            str: Lignes de réponse séparées par des retours chariot
+        """
+        command = command.strip().upper().replace(" ", "")
+        self.commands_received += 1
+
+        if command.startswith("AT"):
+            return self._respond_at(command[2:])
+
+        if not command or len(command) < 2 or any(c not in "0123456789ABCDEF" for c in command):
+            return "?"
+
+        # python-OBD ajoute le nombre de trames attendues ("010C1") en mode rapide
+        if len(command) % 2:
+            command = command[:-1]
+
+        mode = command[:2]
+        if mode == "01":
+            payload = self._mode_01([int(command[i:i + 2], 16) for i in range(2, len(command), 2)])
+        elif mode == "03":
+            payload = self._mode_03()
+        elif mode == "09":
+            payload = self._mode_09(int(command[2:4], 16) if len(command) >= 4 else None)
+        else:
+            payload = None
+
+        if payload is None:
+            return "NO DATA"
+        return "\r".join(self._frames(payload))
+
+    def _respond_at(self, command: str) -> str:
+        """
+        Répond à une commande AT
+
+        Args:
+            command (str): Commande sans le préfixe "AT"
+
+        Returns:
+            str: Réponse de l'adaptateur
+        """
+        if command in ("Z", "WS"):
+            self.echo = True
+            self.headers = False
+            return "\rELM327 v1.5"
+        if command == "I":
+            return "ELM327 v1.5"
+        if command in ("E0", "E1"):
+            self.echo = command == "E1"
+            return "OK"
+        if command in ("H0", "H1"):
+            self.headers = command == "H1"
+            return "OK"
+        if command == "RV":
+            return "12.6V"
+        if command == "DPN":
+            return "A6" if self.protocol == "0" else self.protocol
+        if command.startswith("SP") or command.startswith("TP"):
+            self.protocol = command[2:] or "0"
+            return "OK"
+        if command.startswith(("L", "S", "SH", "AT", "ST", "CAF", "D")):
+            return "OK"
+        return "?"
+
+    def _mode_01(self, pids: List[int]) -> Optional[bytes]:
+        """
+        Construit la réponse Mode 01 (un ou plusieurs PIDs)
+
+        Args:
+            pids (List[int]): PIDs demandés
+
+        Returns:
+            Optional[bytes]: Octets de données, None si aucun PID n'est disponible
+        """
+        if not pids or (len(pids) > 1 and not self.multi_pid):
+            return None
+
+        data = b""
+        for pid in pids:
+            value = self._pid_bytes(pid)
+            if value is not None:
+                data += bytes([pid]) + value
+        return b"\x41" + data if data else None
+
+    def _pid_bytes(self, pid: int) -> Optional[bytes]:
+        """
+        Encode la valeur courante d'un PID Mode 01
+
+        Args:
+            pid (int): Numéro du PID
+
+        Returns:
+            Optional[bytes]: Octets bruts, None si le PID n'est pas simulé
+        """
+        if pid % 0x20 == 0:
+            return self._support_bitmap(pid)
+
+        if not obd.commands.has_pid(1, pid):
+            return None
+        name = obd.commands[1][pid].name
+        value = self.current_value(name)
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray)):
+            return bytes(value)
+        if name in ENCODERS:
+            return ENCODERS[name](value)
+        return None
+
+    def _support_bitmap(self, base: int) -> Optional[bytes]:
+        """
+        Construit le bitmap des PIDs supportés de [base+1, base+32]
+
+        Args:
+            base (int): PID de listing (0x00, 0x20, 0x40...)
+
+        Returns:
+            Optional[bytes]: Bitmap sur 4 octets, None au-delà des PIDs simulés
+        """
+        names = set(self.values) | set(self._session)
+        pids = [cmd.pid for cmd in obd.commands[1] if cmd is not None and cmd.name in names]
+        if base and not any(pid > base for pid in pids):
+            return None
+
+        bitmap = 0
+        for pid in pids:
+            if base < pid <= base + 32:
+                bitmap |= 1 << (32 - (pid - base))
+        if any(pid > base + 32 for pid in pids):
+            bitmap |= 1  # le PID de listing suivant est supporté
+        return bitmap.to_bytes(4, 'big')
+
+    def _mode_03(self) -> bytes:
+        """
+        Construit la réponse Mode 03 (codes défaut mémorisés)
+
+        Returns:
+            bytes: Octets de données
+        """
+        data = b""
+        for code in self.dtcs:
+            first = ("PCBU".index(code[0]) << 6) | (int(code[1]) << 4) | int(code[2], 16)
+            data += bytes([first, int(code[3:5], 16)])
+        return b"\x43" + bytes([len(self.dtcs)]) + data
+
+    def _mode_09(self, pid: Optional[int]) -> Optional[bytes]:
+        """
+        Construit la réponse Mode 09 (informations véhicule)
+
+        Args:
+            pid (int): PID demandé (0x00 = listing, 0x02 = VIN)
+
+        Returns:
+            Optional[bytes]: Octets de données, None si non supporté
+        """
+        if pid == 0x00:
+            return b"\x49\x00\x40\x00\x00\x00"  # seul le VIN (PID 02) est supporté
+        if pid == 0x02:
+            return b"\x49\x02\x01" + self.vin.encode()
+        return None
+
+    def _frames(self, payload: bytes) -> List[str]:
+        """
+        Découpe une réponse en trames CAN ISO-TP, avec ou sans en-têtes
+
+        Args:
+            payload (bytes): Octets de données de la réponse
+
+        Returns:
+            List[str]: Lignes au format ELM327
+        """
+        if len(payload) <= 7:
+            frames = [bytes([len(payload)]) + payload]
+        else:
+            frames = [bytes([0x10 | (len(payload) >> 8), len(payload) & 0xFF]) + payload[:6]]
+            rest = payload[6:]
+            sequence = 1
+            while rest:
+                frames.append(bytes([0x20 | (sequence % 16)]) + rest[:7].ljust(7, b"\x00"))
+                rest = rest[7:]
+                sequence += 1
+
+        lines = []
+        for frame in frames:
+            text = " ".join(f"{b:02X}" for b in frame)
+            lines.append(f"{ENGINE_HEADER} {text}" if self.headers else text)
+        return lines
+
+    def _latency_for(self, command: str) -> float:
+        """
+        Retourne la latence à appliquer à une commande
+
+        Args:
+            command (str): Commande reçue
+
+        Returns:
+            float: Latence en secondes
+        """
+        command = command.strip().upper().replace(" ", "")
+        for key in (command, command[:4], command[:2]):
+            if key in self.latency:
+                return self.latency[key]
+        return self.latency.get("default", 0.0)
+
+    def _run(self) -> None:
+        """
+        Boucle de lecture des commandes sur le pseudo-terminal
+        """
+        buffer = b""
+        while not self._stop_event.is_set():
+            try:
+                ready, _, _ = select.select([self._master], [], [], 0.1)
+                if not ready:
+                    continue
+                buffer += os.read(self._master, 1024)
+            except OSError:
+                return
+
+            while b"\r" in buffer:
+                line, buffer = buffer.split(b"\r", 1)
+                command = line.decode(errors="ignore").strip("\n\x7f ")
+                if not command:
+                    # Un retour chariot seul répète la commande précédente (python-OBD l'utilise)
+                    if not self._last_command:
+                        continue
+                    command = self._last_command
+                self._last_command = command
+
+                reply = self.respond(command)
+                delay = self._latency_for(command)
+                if delay:
+                    time.sleep(delay)
+
+                echo = command + "\r" if self.echo else ""
+                try:
+                    os.write(self._master, f"{echo}{reply}\r\r>".encode())
+                except OSError:
+                    return
+
+
+def load_session(path: str) -> List[Dict[str, Any]]:
+    """
+    Charge une session enregistrée (un échantillon JSON par ligne)
+
+    Args:
+        path (str): Chemin du fichier JSONL
+
+    Returns:
+        List[Dict[str, Any]]: Échantillons {"pid", "time", "value"}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_session(samples: Iterable[Dict[str, Any]], path: str) -> None:
+    """
+    Enregistre une session (un échantillon JSON par ligne)
+
+    Args:
+        samples (Iterable[Dict[str, Any]]): Échantillons {"pid", "time", "value"}
+        path (str): Chemin du fichier JSONL
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for sample in samples:
+            f.write(json.dumps({"pid": sample["pid"], "time": sample["time"], "value": sample["value"]}) + "\n")
@@ -0,0 +1,306 @@
+"""
+NovaEvo - Détection d'anomalies sur la télémétrie OBD-II
+
+Ce module surveille en continu les valeurs lues sur le véhicule:
+- bandes EWMA par PID (moyenne et variance mobiles exponentielles, score z)
+- seuils absolus par PID (ex: liquide de refroidissement au-delà de 110 °C)
+- règles croisant plusieurs signaux (ex: moteur chaud sous forte charge)
+
+Chaque échantillon est traité en O(1). Une alerte est émise au franchissement
+de la condition (puis réarmée quand elle disparaît), journalisée via
+metrics_manager.log_event et conservée dans un historique récent.
+"""
+
+import os
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.metrics_manager import metrics_manager
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.obd_anomaly')
+
+# Seuils absolus par PID: (minimum, maximum, sévérité)
+LIMITS = {
+    "COOLANT_TEMP": (None, 110.0, "critical"),
+    "OIL_TEMP": (None, 130.0, "critical"),
+    "INTAKE_TEMP": (None, 70.0, "warning"),
+    "RPM": (None, 6500.0, "warning"),
+    "CONTROL_MODULE_VOLTAGE": (11.5, 15.5, "warning")
+}
+
+# Règles croisant plusieurs signaux (dernières valeurs connues de chaque PID)
+CROSS_RULES = [
+    {
+        "name": "surchauffe_en_charge",
+        "pids": ("COOLANT_TEMP", "ENGINE_LOAD"),
+        "condition": lambda v: v["COOLANT_TEMP"] > 105 and v["ENGINE_LOAD"] > 70,
+        "severity": "critical",
+        "description": "Liquide de refroidissement au-delà de 105 °C sous forte charge"
+    },
+    {
+        "name": "regime_eleve_moteur_froid",
+        "pids": ("RPM", "COOLANT_TEMP"),
+        "condition": lambda v: v["RPM"] > 4000 and v["COOLANT_TEMP"] < 50,
+        "severity": "warning",
+        "description": "Régime élevé alors que le moteur est froid"
+    },
+    {
+        "name": "emballement_a_l_arret",
+        "pids": ("RPM", "SPEED"),
+        "condition": lambda v: v["RPM"] > 3500 and v["SPEED"] < 1,
+        "severity": "warning",
+        "description": "Régime élevé véhicule à l'arrêt"
+    }
+]
+
+
+class _SignalState:
+    """État de détection d'un PID"""
+
+    __slots__ = ('mean', 'variance', 'count', 'value', 'time')
+
+    def __init__(self):
+        self.mean = 0.0
+        self.variance = 0.0
+        self.count = 0
+        self.value = None
+        self.time = None
+
+
+class AnomalyDetector:
+    """
+    Détecteur d'anomalies en ligne sur la télémétrie d'un véhicule
+
+    Cette classe s'occupe de:
+    - Maintenir une moyenne et une variance EWMA par PID
+    - Évaluer seuils absolus et règles multi-signaux à chaque échantillon
+    - Émettre une alerte par franchissement, avec délai de réémission
+    - Conserver les alertes récentes
+    """
+
+    def __init__(self, device: str = 'default', alpha: Optional[float] = None,
+                 z_threshold: Optional[float] = None, warmup: int = 30,
+                 cooldown: Optional[float] = None, max_age: float = 5.0,
+                 history_size: int = 200,
+                 event_sink: Optional[Callable[..., None]] = None):
+        """
+        Initialise le détecteur
+
+        Args:
+            device (str): Identifiant du dongle (ajouté aux alertes)
+            alpha (float, optional): Poids des nouveaux échantillons dans les moyennes EWMA
+            z_threshold (float, optional): Écart à la moyenne (en écarts-types) déclenchant une alerte
+            warmup (int): Nombre d'échantillons avant d'évaluer le score z d'un PID
+            cooldown (float, optional): Délai minimal entre deux alertes identiques (s)
+            max_age (float): Âge maximal d'une valeur utilisée par une règle croisée (s)
+            history_size (int): Nombre d'alertes récentes conservées
+            event_sink (Callable, optional): Fonction de journalisation (défaut: metrics_manager.log_event)
+        """
+        self.device = device
+        self.alpha = alpha or float(os.getenv('OBD_ANOMALY_ALPHA', '0.05'))
+        self.z_threshold = z_threshold or float(os.getenv('OBD_ANOMALY_Z_THRESHOLD', '4'))
+        self.warmup = warmup
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv('OBD_ANOMALY_COOLDOWN', '60'))
+        self.max_age = max_age
+        self.event_sink = event_sink or metrics_manager.log_event
+
+        self._signals = {}
+        self._active = set()  # alertes dont la condition est toujours vraie
+        self._last_emitted = {}
+        self._alerts = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+
+        # Règles croisées indexées par PID: seules celles du PID reçu sont évaluées
+        self._rules_by_pid = {}
+        for rule in CROSS_RULES:
+            for pid in rule["pids"]:
+                self._rules_by_pid.setdefault(pid, []).append(rule)
+
+        self.stats = {
+            'samples': 0,
+            'alerts': 0
+        }
+
+    def observe(self, pid: str, timestamp: float, value: float) -> List[Dict[str, Any]]:
+        """
+        Traite un échantillon
+
+        Args:
+            pid (str): Nom de la commande (ex: "RPM")
+            timestamp (float): Horodatage de la mesure
+            value (float): Valeur mesurée
+
+        Returns:
+            List[Dict[str, Any]]: Alertes émises pour cet échantillon
+        """
+        triggered = []
+        with self._lock:
+            self.stats['samples'] += 1
+            state = self._signals.get(pid)
+            if state is None:
+                state = self._signals[pid] = _SignalState()
+
+            # Bande EWMA: score z par rapport à l'état avant cet échantillon
+            deviation = value - state.mean
+            if state.count >= self.warmup and state.variance > 0:
+                z_score = deviation / state.variance ** 0.5
+                self._check(triggered, f"ecart:{pid}", abs(z_score) > self.z_threshold, timestamp, lambda: {
+                    "type": "ecart_statistique",
+                    "pid": pid,
+                    "severity": "warning",
+                    "value": value,
+                    "expected": round(state.mean, 3),
+                    "z_score": round(z_score, 2),
+                    "description": f"{pid} hors de sa bande habituelle (z={z_score:.1f})"
+                })
+
+            if state.count == 0:
+                state.mean = value
+            else:
+                increment = self.alpha * deviation
+                state.mean += increment
+                state.variance = (1 - self.alpha) * (state.variance + deviation * increment)
+            state.count += 1
+            state.value = value
+            state.time = timestamp
+
+            # Seuils absolus
+            limits = LIMITS.get(pid)
+            if limits is not None:
+                low, high, severity = limits
+                exceeded = (low is not None and value < low) or (high is not None and value > high)
+                self._check(triggered, f"seuil:{pid}", exceeded, timestamp, lambda: {
+                    "type": "seuil",
+                    "pid": pid,
+                    "severity": severity,
+                    "value": value,
+                    "limits": [low, high],
+                    "description": f"{pid} hors limites ({value})"
+                })
+
+            # Règles croisées impliquant ce PID
+            for rule in self._rules_by_pid.get(pid, ()):
+                latest = self._latest(rule["pids"], timestamp)
+                if latest is None:
+                    continue
+                self._check(triggered, f"regle:{rule['name']}", rule["condition"](latest), timestamp, lambda: {
+                    "type": "regle",
+                    "rule": rule["name"],
+                    "severity": rule["severity"],
+                    "values": latest,
+                    "description": rule["description"]
+                })
+
+        # Journalisation hors verrou (écriture disque)
+        for alert in triggered:
+            self._emit(alert)
+        return triggered
+
+    def alerts(self, limit: int = 50, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Retourne les alertes récentes, de la plus récente à la plus ancienne
+
+        Args:
+            limit (int): Nombre maximal d'alertes
+            since (float, optional): Horodatage minimal des alertes
+
+        Returns:
+            List[Dict[str, Any]]: Alertes
+        """
+        with self._lock:
+            alerts = [a for a in reversed(self._alerts) if since is None or a["time"] > since]
+        return alerts[:limit]
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Retourne l'état du détecteur
+
+        Returns:
+            Dict[str, Any]: Bandes EWMA par PID, alertes actives et statistiques
+        """
+        with self._lock:
+            return {
+                "device": self.device,
+                "bands": {
+                    pid: {
+                        "mean": round(state.mean, 3),
+                        "std": round(state.variance ** 0.5, 3),
+                        "samples": state.count
+                    }
+                    for pid, state in self._signals.items()
+                },
+                "active": sorted(self._active),
+                **self.stats
+            }
+
+    def _latest(self, pids, now: float) -> Optional[Dict[str, float]]:
+        """
+        Dernières valeurs récentes d'un ensemble de PIDs (à appeler sous verrou)
+
+        Args:
+            pids (tuple): Noms des commandes
+            now (float): Horodatage courant
+
+        Returns:
+            Optional[Dict[str, float]]: Valeurs, ou None si l'une manque ou est trop ancienne
+        """
+        latest = {}
+        for pid in pids:
+            state = self._signals.get(pid)
+            if state is None or state.value is None or now - state.time > self.max_age:
+                return None
+            latest[pid] = state.value
+        return latest
+
+    def _check(self, triggered: list, key: str, condition: bool, timestamp: float,
+               build: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Émet une alerte au franchissement d'une condition (à appeler sous verrou)
+
+        Args:
+            triggered (list): Alertes émises pour l'échantillon courant
+            key (str): Identifiant de la condition
+            condition (bool): État courant de la condition
+            timestamp (float): Horodatage de l'échantillon
+            build (Callable[[], Dict[str, Any]]): Construit le contenu de l'alerte
+                (appelé uniquement si elle est émise)
+        """
+        if not condition:
+            self._active.discard(key)
+            return
+        if key in self._active:
+            return
+
+        self._active.add(key)
+        last = self._last_emitted.get(key)
+        if last is not None and timestamp - last < self.cooldown:
+            return
+
+        self._last_emitted[key] = timestamp
+        alert = build()
+        alert.update({"device": self.device, "time": timestamp})
+        self._alerts.append(alert)
+        self.stats['alerts'] += 1
+        triggered.append(alert)
+
+    def _emit(self, alert: Dict[str, Any]) -> None:
+        """
+        Journalise une alerte
+
+        Args:
+            alert (Dict[str, Any]): Alerte émise
+        """
+        logger.warning(f"Anomalie OBD ({self.device}): {alert['description']}")
+        try:
+            self.event_sink(
+                'obd_anomaly',
+                alert['description'],
+                data=alert,
+                severity=alert['severity'],
+                tags={'device': self.device, 'type': alert['type']}
+            )
+        except Exception as e:
+            logger.error(f"Erreur lors de la journalisation d'une anomalie OBD: {str(e)}")
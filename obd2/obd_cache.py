@@ -0,0 +1,279 @@
+"""
+NovaEvo - Cache des profils de connexion OBD-II
+
+Ce module mémorise sur disque, pour chaque port (et le VIN du véhicule qui y
+était branché), le protocole détecté, le débit en bauds et les bitmaps des PIDs
+supportés. Les connexions suivantes réutilisent ces valeurs et évitent la
+détection automatique du protocole et la découverte des PIDs.
+"""
+
+import os
+import json
+import time
+import fcntl
+import logging
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+import obd
+from obd import OBDStatus
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.obd_cache')
+
+
+class OBDProfileCache:
+    """
+    Cache persistant des profils de connexion par port
+
+    Un profil contient:
+    - protocol: identifiant ELM327 du protocole (ex: "6")
+    - baudrate: débit en bauds du dongle
+    - pid_bitmaps: réponses des commandes de listing des PIDs ("PIDS_A": "1011...")
+    - vin: VIN du véhicule, renseigné dès sa première lecture
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialise le cache et charge le fichier existant
+
+        Args:
+            path (str, optional): Chemin du fichier JSON du cache
+        """
+        self.path = path or os.getenv('OBD_CACHE_FILE', 'data/obd_profiles.json')
+        self._lock = threading.Lock()
+        self._profiles = self._load()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0
+        }
+
+    def get(self, port: str) -> Optional[Dict[str, Any]]:
+        """
+        Retourne le profil mémorisé pour un port
+
+        Args:
+            port (str): Port série du dongle
+
+        Returns:
+            Optional[Dict[str, Any]]: Profil, ou None s'il est inconnu
+        """
+        with self._lock:
+            profile = self._profiles.get(port)
+            self.stats['hits' if profile else 'misses'] += 1
+            return dict(profile) if profile else None
+
+    def save(self, port: str, profile: Dict[str, Any]) -> None:
+        """
+        Enregistre (ou complète) le profil d'un port
+
+        Args:
+            port (str): Port série du dongle
+            profile (Dict[str, Any]): Champs du profil à enregistrer
+        """
+        with self._lock:
+            self._write(port, dict(profile, updated=time.time()))
+
+    def invalidate(self, port: str, reason: str = "") -> None:
+        """
+        Supprime le profil d'un port
+
+        Args:
+            port (str): Port série du dongle
+            reason (str): Motif de l'invalidation (journalisé)
+        """
+        with self._lock:
+            known = self._profiles.pop(port, None) is not None
+            if not self._write(port) and not known:
+                return
+            self.stats['invalidations'] += 1
+
+        logger.info(f"Profil OBD invalidé pour {port}: {reason}")
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Charge le fichier du cache
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Profils par port
+        """
+        if not os.path.exists(self.path):
+            return {}
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Cache des profils OBD illisible, il sera recréé: {str(e)}")
+            return {}
+
+    def _write(self, port: str, profile: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Enregistre ou supprime le profil d'un port dans le fichier (à appeler sous verrou)
+
+        Le fichier est partagé par les workers: sous le verrou exclusif (fcntl)
+        de "<fichier>.lock", il est relu et seul le profil du port est modifié,
+        sans écraser ceux enregistrés entre-temps par les autres workers. Il est
+        ensuite remplacé de manière atomique depuis un fichier temporaire unique,
+        et la mémoire de ce worker reprend son contenu.
+
+        Args:
+            port (str): Port série du dongle
+            profile (Dict[str, Any], optional): Champs à enregistrer (None: profil supprimé)
+
+        Returns:
+            bool: True si le fichier contenait un profil pour ce port
+        """
+        directory = os.path.dirname(self.path)
+        try:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            with open(f"{self.path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                profiles = self._load()
+                known = port in profiles
+                if profile is None:
+                    profiles.pop(port, None)
+                else:
+                    profiles.setdefault(port, {}).update(profile)
+
+                fd, tmp_path = tempfile.mkstemp(dir=directory or '.', suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        json.dump(profiles, f, indent=2)
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+        except Exception as e:
+            logger.error(f"Erreur lors de l'écriture du cache des profils OBD: {str(e)}")
+            # Fichier inchangé: le profil est au moins gardé en mémoire
+            if profile is None:
+                self._profiles.pop(port, None)
+            else:
+                self._profiles.setdefault(port, {}).update(profile)
+            return False
+
+        self._profiles = profiles
+        return known
+
+
+class _CachedCommandsMixin:
+    """
+    Remplace la découverte des PIDs de python-OBD par des bitmaps mémorisés
+
+    OBD.__init__ appelle self.__load_commands(), soit _OBD__load_commands après
+    résolution des noms privés: la redéfinir ici permet de réutiliser un profil.
+    Une seule requête 0100 vérifie que le véhicule correspond au profil; en cas
+    de différence, la découverte complète de python-OBD est relancée.
+    """
+
+    def __init__(self, *args, pid_bitmaps: Optional[Dict[str, str]] = None, **kwargs):
+        self.pid_bitmaps = dict(pid_bitmaps or {})
+        self.used_cache = False
+        self.probe_mismatch = False
+        super().__init__(*args, **kwargs)
+
+    def _OBD__load_commands(self) -> None:
+        """
+        Charge les commandes supportées depuis le profil, après vérification
+        """
+        if self.status() != OBDStatus.CAR_CONNECTED:
+            logger.warning("Impossible de charger les commandes: véhicule non connecté")
+            return
+
+        # Toujours utiliser la requête bloquante (Async redéfinit query)
+        getter = obd.commands.PIDS_A
+        response = obd.OBD.query(self, getter)
+        if not response.is_null() and \
+                _known_bits(getter, response.value) == self.pid_bitmaps.get(getter.name):
+            for name, bits in self.pid_bitmaps.items():
+                _add_supported(self.supported_commands, obd.commands[name], bits)
+            self.used_cache = True
+            logger.info(f"{len(self.supported_commands)} commandes OBD chargées depuis le profil")
+            return
+
+        logger.info("Le véhicule ne correspond pas au profil OBD mémorisé")
+        self.probe_mismatch = True
+        obd.OBD._OBD__load_commands(self)
+
+
+class CachedOBD(_CachedCommandsMixin, obd.OBD):
+    """Connexion obd.OBD réutilisant un profil mémorisé"""
+
+
+class CachedAsync(_CachedCommandsMixin, obd.Async):
+    """Connexion obd.Async réutilisant un profil mémorisé"""
+
+
+def build_profile(connection) -> Dict[str, Any]:
+    """
+    Construit le profil d'une connexion établie
+
+    Args:
+        connection (obd.OBD): Connexion au véhicule
+
+    Returns:
+        Dict[str, Any]: Protocole, débit et bitmaps des PIDs supportés
+    """
+    bitmaps = {}
+    for getter in obd.commands.pid_getters():
+        if getter in connection.supported_commands:
+            bitmaps[getter.name] = ''.join(
+                '1' if obd.commands.has_pid(getter.mode, getter.pid + i + 1)
+                and obd.commands[getter.mode][getter.pid + i + 1] in connection.supported_commands
+                else '0'
+                for i in range(32)
+            )
+
+    # python-OBD n'expose pas le débit retenu par la détection automatique
+    serial_port = getattr(connection.interface, '_ELM327__port', None)
+
+    return {
+        'protocol': connection.protocol_id(),
+        'baudrate': getattr(serial_port, 'baudrate', None),
+        'pid_bitmaps': bitmaps
+    }
+
+
+def _known_bits(getter, value) -> str:
+    """
+    Convertit la réponse d'une commande de listing en bitmap limité aux PIDs connus
+
+    Args:
+        getter (OBDCommand): Commande de listing des PIDs
+        value (list): Tableau de booléens décodé par python-OBD
+
+    Returns:
+        str: Bitmap sous forme de chaîne de "0" et "1"
+    """
+    return ''.join(
+        '1' if bit and obd.commands.has_pid(getter.mode, getter.pid + i + 1) else '0'
+        for i, bit in enumerate(value)
+    )
+
+
+def _add_supported(supported_commands: set, getter, bits: str) -> None:
+    """
+    Marque comme supportées les commandes annoncées par un bitmap
+
+    Args:
+        supported_commands (set): Commandes supportées de la connexion
+        getter (OBDCommand): Commande de listing des PIDs
+        bits (str): Bitmap sous forme de chaîne de "0" et "1"
+    """
+    for i, bit in enumerate(bits):
+        if bit != '1':
+            continue
+
+        pid = getter.pid + i + 1
+        if obd.commands.has_pid(getter.mode, pid):
+            supported_commands.add(obd.commands[getter.mode][pid])
+
+        # Les PIDs Mode 01 supportés le sont aussi en Mode 02 (freeze frame)
+        if getter.mode == 1 and obd.commands.has_pid(2, pid):
+            supported_commands.add(obd.commands[2][pid])
@@ -0,0 +1,225 @@
+"""
+NovaEvo - Flotte de dongles OBD-II
+
+Ce module pilote plusieurs dongles OBD-II à la fois (un par poste d'atelier).
+Chaque dongle est identifié par un identifiant d'appareil et possède sa propre
+session: un OBDManager, un thread propriétaire et une file de requêtes. Une
+lecture lente ou une reconnexion sur un poste ne bloque jamais les autres.
+"""
+
+import os
+import re
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from .obd_main import OBDManager
+from .obd_cache import OBDProfileCache
+from .obd_session import OBDSession
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.obd_fleet')
+
+# Identifiants d'appareil utilisables dans les URLs (/obd2/<device_id>)
+DEVICE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Identifiants réservés par les autres endpoints /obd2/...
+RESERVED_DEVICE_IDS = {'stream', 'history', 'metrics', 'alerts', 'monitor', 'fleet'}
+
+
+def parse_devices(value: str) -> Dict[str, str]:
+    """
+    Analyse la liste des dongles configurés
+
+    Format: "poste1=/dev/ttyUSB0,poste2=/dev/ttyUSB1". Sans identifiant, le nom
+    du port sert d'identifiant (ex: "/dev/ttyUSB2" -> "ttyUSB2").
+
+    Args:
+        value (str): Valeur de la variable OBD_DEVICES
+
+    Returns:
+        Dict[str, str]: Port série par identifiant d'appareil
+    """
+    devices = {}
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if '=' in item:
+            device_id, port = (part.strip() for part in item.split('=', 1))
+        else:
+            port = item
+            device_id = os.path.basename(port.rstrip('/\\')) or port
+        devices[device_id] = port
+    return devices
+
+
+class OBDFleet:
+    """
+    Gestionnaire d'une flotte de dongles OBD-II
+
+    Cette classe s'occupe de:
+    - Créer une session OBD-II indépendante par port série
+    - Router les requêtes vers la session d'un appareil
+    - Partager le cache des profils de connexion entre les appareils
+    - Agréger l'état de l'ensemble des appareils
+    """
+
+    def __init__(self, devices: Optional[Dict[str, str]] = None,
+                 default_session: Optional[OBDSession] = None):
+        """
+        Initialise la flotte (les sessions ne se connectent qu'au premier usage)
+
+        Args:
+            devices (Dict[str, str], optional): Port série par identifiant d'appareil
+                (défaut: variable d'environnement OBD_DEVICES)
+            default_session (OBDSession, optional): Session existante, enregistrée
+                sous l'identifiant "default" avant les autres appareils
+        """
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+        # Un seul cache pour tous les appareils: chaque OBDManager réécrit le fichier entier
+        use_cache = os.getenv('OBD_PROFILE_CACHE', 'True').lower() in ('true', '1', 't')
+        self.profile_cache = OBDProfileCache() if use_cache else None
+
+        if default_session is not None:
+            if default_session.manager.profile_cache is not None:
+                default_session.manager.profile_cache = self.profile_cache
+            self.add_device('default', session=default_session)
+
+        if devices is None:
+            devices = parse_devices(os.getenv('OBD_DEVICES', ''))
+        for device_id, port in devices.items():
+            result = self.add_device(device_id, port)
+            if 'error' in result:
+                logger.error(result['error'])
+
+    def add_device(self, device_id: str, port: Optional[str] = None,
+                   session: Optional[OBDSession] = None) -> Dict[str, Any]:
+        """
+        Ajoute un appareil à la flotte
+
+        Args:
+            device_id (str): Identifiant de l'appareil
+            port (str, optional): Port série du dongle (ignoré si session est fournie)
+            session (OBDSession, optional): Session existante à enregistrer
+
+        Returns:
+            Dict[str, Any]: Identifiant et port de l'appareil, ou dictionnaire d'erreur
+        """
+        if not DEVICE_ID_PATTERN.match(device_id or '') or device_id in RESERVED_DEVICE_IDS:
+            return {"error": f"Identifiant d'appareil invalide: {device_id}"}
+
+        if session is None:
+            if not port:
+                return {"error": f"Port série manquant pour l'appareil {device_id}"}
+            manager = OBDManager()
+            manager.port = port
+            manager.profile_cache = self.profile_cache
+            manager.anomaly_detector.device = device_id
+            session = OBDSession(manager, name=f'obd-session-{device_id}')
+
+        port = session.manager.port
+        with self._lock:
+            if device_id in self._sessions:
+                return {"error": f"Appareil déjà enregistré: {device_id}"}
+            for other_id, other in self._sessions.items():
+                # Deux sessions sur le même port se disputeraient le dongle
+                if other.manager.port == port:
+                    return {"error": f"Le port {port} est déjà utilisé par l'appareil {other_id}"}
+            self._sessions[device_id] = session
+
+        logger.info(f"Appareil OBD-II ajouté à la flotte: {device_id} -> {port}")
+        return {"device_id": device_id, "port": port}
+
+    def remove_device(self, device_id: str) -> bool:
+        """
+        Retire un appareil de la flotte et ferme sa liaison
+
+        Args:
+            device_id (str): Identifiant de l'appareil
+
+        Returns:
+            bool: True si l'appareil était enregistré
+        """
+        with self._lock:
+            session = self._sessions.pop(device_id, None)
+
+        if session is None:
+            return False
+
+        session.stop()
+        logger.info(f"Appareil OBD-II retiré de la flotte: {device_id}")
+        return True
+
+    def get(self, device_id: str) -> Optional[OBDSession]:
+        """
+        Retourne la session d'un appareil
+
+        Args:
+            device_id (str): Identifiant de l'appareil
+
+        Returns:
+            Optional[OBDSession]: Session, ou None si l'appareil est inconnu
+        """
+        with self._lock:
+            return self._sessions.get(device_id)
+
+    def devices(self) -> List[str]:
+        """
+        Retourne les identifiants des appareils de la flotte
+
+        Returns:
+            List[str]: Identifiants triés
+        """
+        with self._lock:
+            return sorted(self._sessions)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Retourne l'état agrégé de la flotte
+
+        Returns:
+            Dict[str, Any]: État de chaque appareil et totaux
+        """
+        with self._lock:
+            sessions = dict(self._sessions)
+
+        devices = {device_id: session.status() for device_id, session in sessions.items()}
+        return {
+            "devices": devices,
+            "count": len(devices),
+            "connected": sum(1 for status in devices.values() if status['connected']),
+            "queued_requests": sum(status['queued_requests'] for status in devices.values()),
+            "requests": sum(status['requests'] for status in devices.values())
+        }
+
+    def alerts(self, limit: int = 50, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Retourne les alertes récentes de tous les appareils
+
+        Args:
+            limit (int): Nombre maximal d'alertes
+            since (float, optional): Horodatage minimal des alertes
+
+        Returns:
+            List[Dict[str, Any]]: Alertes, de la plus récente à la plus ancienne
+        """
+        with self._lock:
+            sessions = list(self._sessions.values())
+
+        alerts = [alert for session in sessions
+                  for alert in session.manager.anomaly_detector.alerts(limit, since)]
+        alerts.sort(key=lambda alert: alert["time"], reverse=True)
+        return alerts[:limit]
+
+    def stop(self) -> None:
+        """
+        Arrête les sessions de tous les appareils
+        """
+        with self._lock:
+            sessions = list(self._sessions.values())
+
+        for session in sessions:
+            session.stop()
@@ -9,11 +9,39 @@ from dotenv import load_dotenv
 import obd
 from obd import OBDCommand, Unit
 from obd.protocols import ECU
+from obd.protocols.protocol import Message
 from obd.utils import bytes_to_int
 
+from .obd_cache import OBDProfileCache, CachedOBD, CachedAsync, build_profile
+from .obd_telemetry import TelemetryStore
+from .obd_metrics import DerivedMetrics
+from .obd_anomaly import AnomalyDetector
+
 # Charger les variables d'environnement
 load_dotenv()
 
+# Nombre maximal de PIDs Mode 01 par requête (limite de la norme ISO 15765-4)
+MAX_PIDS_PER_REQUEST = 6
+
+# Protocoles CAN (identifiants ELM327) acceptant les requêtes multi-PID
+MULTI_PID_PROTOCOLS = ("6", "7", "8", "9")
+
+# Réponses de l'ELM327 signifiant que l'ECU refuse la requête multi-PID
+MULTI_PID_REFUSALS = ("NO DATA", "?")
+
+# Commandes lues pour un rafraîchissement complet du tableau de bord
+DASHBOARD_COMMANDS = (
+    "RPM",
+    "SPEED",
+    "FUEL_STATUS",
+    "ENGINE_LOAD",
+    "COOLANT_TEMP",
+    "INTAKE_TEMP",
+    "FUEL_LEVEL",
+    "OIL_TEMP",
+    "BAROMETRIC_PRESSURE"
+)
+
 class OBDManager:
     """Gestionnaire de connexion OBD-II"""
     
@@ -22,8 +50,36 @@ class OBDManager:
         self.connection = None
         self.connected = False
         self.port = os.getenv('OBD_PORT', '/dev/ttyUSB0')
-        self.baudrate = int(os.getenv('OBD_BAUDRATE', 9600))
+        # "auto" = détection du débit par python-OBD (mémorisé ensuite dans le profil)
+        baudrate = os.getenv('OBD_BAUDRATE', '9600')
+        self.baudrate = None if baudrate.lower() == 'auto' else int(baudrate)
+        protocol = os.getenv('OBD_PROTOCOL', 'auto')
+        self.protocol = None if protocol.lower() == 'auto' else protocol
         self.timeout = int(os.getenv('OBD_TIMEOUT', 30))
+        # Profils mémorisés (protocole, débit, PIDs supportés) par port
+        self.use_profile_cache = os.getenv('OBD_PROFILE_CACHE', 'True').lower() in ('true', '1', 't')
+        self.profile_cache = OBDProfileCache() if self.use_profile_cache else None
+        self.profile = None
+        self.profile_port = None
+        # None = inconnu, déterminé à la première requête groupée
+        self.multi_pid_supported = None
+        # Échecs consécutifs tolérés avant de renoncer aux requêtes groupées, et
+        # délai (s) avant de les retenter sur la même connexion
+        self.multi_pid_max_failures = int(os.getenv('OBD_MULTI_PID_MAX_FAILURES', 3))
+        self.multi_pid_retry_delay = float(os.getenv('OBD_MULTI_PID_RETRY', 300))
+        self.multi_pid_failures = 0
+        self.multi_pid_disabled_at = None
+        self.vin = None
+        # Mode asynchrone (obd.Async) utilisé pour la diffusion en continu
+        self.async_mode = os.getenv('OBD_ASYNC', 'False').lower() in ('true', '1', 't')
+        self.async_delay = float(os.getenv('OBD_ASYNC_DELAY', 0.1))
+        # Historique en mémoire des valeurs lues (tampons circulaires par PID)
+        self.telemetry = TelemetryStore()
+        # Indicateurs de trajet calculés sur cet historique (cache par fenêtre)
+        self.derived_metrics = DerivedMetrics(self.telemetry)
+        # Détection d'anomalies sur chaque valeur enregistrée
+        self.anomaly_detector = AnomalyDetector()
+        self.telemetry.add_listener(self.anomaly_detector.observe)
     
     def connect(self, port=None, baudrate=None, timeout=None):
         """
@@ -39,15 +95,62 @@ class OBDManager:
         """
         # Utiliser les paramètres spécifiés ou les valeurs par défaut
         port = port or self.port
-        baudrate = baudrate or self.baudrate
         timeout = timeout or self.timeout
         
+        profile = self.profile_cache.get(port) if self.profile_cache else None
+        if profile:
+            # Profil connu: protocole et débit imposés, découverte des PIDs évitée
+            if self._open(port, baudrate or self.baudrate or profile.get('baudrate'), timeout,
+                          self.protocol or profile.get('protocol'), profile.get('pid_bitmaps')):
+                self._update_profile(port, profile)
+                self.port = port
+                return True
+            if self.connection is None or self.connection.status() == obd.OBDStatus.NOT_CONNECTED:
+                # Dongle absent: rien ne remet le profil en cause
+                return False
+            # L'adaptateur répond, mais pas avec le protocole mémorisé: nouvelle détection
+            self.disconnect()
+        
+        if self._open(port, baudrate or self.baudrate, timeout, self.protocol):
+            self._update_profile(port, profile)
+            # Les reconnexions (mode asynchrone, session) réutilisent ce port
+            self.port = port
+            return True
+        return False
+    
+    def _open(self, port, baudrate, timeout, protocol, pid_bitmaps=None):
+        """
+        Ouvre la connexion avec les paramètres donnés
+        
+        Args:
+            port (str): Port série du dongle OBD
+            baudrate (int): Débit en bauds (None = détection automatique)
+            timeout (int): Timeout en secondes
+            protocol (str): Identifiant ELM327 du protocole (None = détection automatique)
+            pid_bitmaps (dict, optional): Bitmaps mémorisés des PIDs supportés
+            
+        Returns:
+            bool: True si connexion réussie, False sinon
+        """
         try:
-            print(f"Tentative de connexion OBD sur {port} (baudrate: {baudrate})...")
-            self.connection = obd.OBD(portstr=port, baudrate=baudrate, timeout=timeout)
+            print(f"Tentative de connexion OBD sur {port} (baudrate: {baudrate or 'auto'})...")
+            if pid_bitmaps:
+                connection_class = CachedAsync if self.async_mode else CachedOBD
+                kwargs = {"pid_bitmaps": pid_bitmaps}
+            else:
+                connection_class = obd.Async if self.async_mode else obd.OBD
+                kwargs = {}
+            if self.async_mode:
+                # Connexion asynchrone: les commandes surveillées sont lues en continu
+                kwargs["delay_cmds"] = self.async_delay
+            
+            self.connection = connection_class(portstr=port, baudrate=baudrate, protocol=protocol,
+                                               timeout=timeout, **kwargs)
             
             if self.connection.status() == obd.OBDStatus.CAR_CONNECTED:
                 self.connected = True
+                self._reset_multi_pid()
+                self.vin = None
                 print("Véhicule connecté avec succès!")
                 return True
             else:
@@ -66,6 +169,45 @@ class OBDManager:
             self.connected = False
             return False
     
+    def _update_profile(self, port, profile=None):
+        """
+        Mémorise le profil de la connexion qui vient d'être établie
+        
+        Args:
+            port (str): Port série du dongle OBD
+            profile (dict, optional): Profil utilisé pour la connexion
+        """
+        if not self.profile_cache:
+            return
+        
+        self.profile_port = port
+        if profile and getattr(self.connection, 'used_cache', False):
+            self.profile = profile
+            return
+        
+        if profile:
+            # Protocole ou PIDs supportés différents: autre véhicule sur ce dongle
+            self.profile_cache.invalidate(port, "profil ne correspondant plus au véhicule")
+        
+        self.profile = build_profile(self.connection)
+        self.profile_cache.save(port, self.profile)
+    
+    def _check_profile_vin(self):
+        """
+        Compare le VIN lu au VIN du profil mémorisé et complète ou invalide le profil
+        """
+        if not self.profile_cache or self.profile is None or self.vin is None:
+            return
+        
+        cached_vin = self.profile.get("vin")
+        if cached_vin is None:
+            self.profile["vin"] = self.vin
+            self.profile_cache.save(self.profile_port, {"vin": self.vin})
+        elif cached_vin != self.vin:
+            # Autre véhicule: le profil sera redécouvert à la prochaine connexion
+            self.profile_cache.invalidate(self.profile_port, f"VIN différent ({self.vin})")
+            self.profile = None
+    
     def disconnect(self):
         """Ferme la connexion OBD"""
         if self.connection:
@@ -78,6 +220,110 @@ class OBDManager:
                 self.connected = False
                 self.connection = None
     
+    def enable_async(self):
+        """
+        Bascule la connexion en mode asynchrone (obd.Async)
+        
+        Si une connexion synchrone est ouverte, elle est rétablie en mode asynchrone.
+        
+        Returns:
+            bool: True si une connexion asynchrone est active
+        """
+        if isinstance(self.connection, obd.Async):
+            return True
+        
+        self.async_mode = True
+        if not self.connected:
+            return False
+        
+        self.disconnect()
+        return self.connect()
+    
+    def watch(self, names, callback):
+        """
+        Surveille des commandes en continu via les watchers de python-OBD
+        
+        Args:
+            names (iterable): Noms des commandes à surveiller (ex: "RPM")
+            callback (callable): Fonction appelée avec chaque nouvelle réponse
+            
+        Returns:
+            dict: Commandes effectivement surveillées et statut
+        """
+        if not self.connected or not self.connection:
+            return {"error": "Non connecté au véhicule"}
+        
+        if not self.enable_async():
+            return {"error": "Impossible d'activer le mode asynchrone"}
+        
+        try:
+            watched = []
+            with self.connection.paused():
+                for name in names:
+                    cmd = obd.commands[name]
+                    if self.connection.supports(cmd):
+                        self.connection.watch(cmd, callback=callback)
+                        watched.append(cmd.name)
+            self.connection.start()
+            
+            return {
+                "success": True,
+                "watched": watched
+            }
+        except Exception as e:
+            return {"error": f"Erreur lors de la surveillance des commandes: {str(e)}"}
+    
+    def unwatch(self, names, callback=None):
+        """
+        Arrête la surveillance continue de commandes
+        
+        Args:
+            names (iterable): Noms des commandes à ne plus surveiller
+            callback (callable, optional): Seul ce callback est retiré
+            
+        Returns:
+            dict: Statut de l'opération
+        """
+        if not self.connected or not isinstance(self.connection, obd.Async):
+            return {"success": True, "unwatched": []}
+        
+        try:
+            with self.connection.paused():
+                for name in names:
+                    self.connection.unwatch(obd.commands[name], callback=callback)
+            
+            return {
+                "success": True,
+                "unwatched": list(names)
+            }
+        except Exception as e:
+            return {"error": f"Erreur lors de l'arrêt de la surveillance: {str(e)}"}
+    
+    def _query(self, cmd, force=False):
+        """
+        Envoie une commande au véhicule
+        
+        En mode asynchrone, une commande surveillée retourne sa dernière valeur
+        sans aller-retour série; les autres sont envoyées en suspendant la boucle
+        de surveillance le temps de la requête.
+        
+        Args:
+            cmd (OBDCommand): Commande à envoyer
+            force (bool): Envoyer même si la commande n'est pas déclarée supportée
+            
+        Returns:
+            OBDResponse: Réponse du véhicule
+        """
+        if not isinstance(self.connection, obd.Async):
+            return self.connection.query(cmd, force=force)
+        
+        response = self.connection.query(cmd, force=force)
+        if not response.is_null():
+            return response
+        
+        with self.connection.paused():
+            return obd.OBD.query(self.connection, cmd, force=force)
+    
     def get_rpm(self):
         """
         Obtient le régime moteur (RPM)
@@ -90,11 +336,12 @@ class OBDManager:
         
         try:
             cmd = obd.commands.RPM
-            response = self.connection.query(cmd)
+            response = self._query(cmd)
             
             if response.is_null():
                 return {"error": "Impossible de lire le RPM"}
-                
+            
+            self._record(cmd, response)
             return {
                 "success": True,
                 "value": response.value.magnitude,  # Valeur numérique de RPM
@@ -117,11 +364,12 @@ class OBDManager:
         
         try:
             cmd = obd.commands.SPEED
-            response = self.connection.query(cmd)
+            response = self._query(cmd)
             
             if response.is_null():
                 return {"error": "Impossible de lire la vitesse"}
-                
+            
+            self._record(cmd, response)
             return {
                 "success": True,
                 "value": response.value.magnitude,  # Valeur numérique (km/h)
@@ -144,7 +392,7 @@ class OBDManager:
         
         try:
             cmd = obd.commands.GET_DTC
-            response = self.connection.query(cmd)
+            response = self._query(cmd)
             
             if response.is_null():
                 return {
@@ -182,31 +430,27 @@ class OBDManager:
         try:
             info = {}
             
-            # Récupérer les informations disponibles
-            commands = [
-                ("VIN", obd.commands.VIN),
-                ("FUEL_STATUS", obd.commands.FUEL_STATUS),
-                ("ENGINE_LOAD", obd.commands.ENGINE_LOAD),
-                ("COOLANT_TEMP", obd.commands.COOLANT_TEMP),
-                ("INTAKE_TEMP", obd.commands.INTAKE_TEMP),
-                ("FUEL_LEVEL", obd.commands.FUEL_LEVEL),
-                ("OIL_TEMP", obd.commands.OIL_TEMP),
-                ("BAROMETRIC_PRESSURE", obd.commands.BAROMETRIC_PRESSURE)
-            ]
-            
-            for name, cmd in commands:
-                if cmd in self.connection.supported_commands:
-                    response = self.connection.query(cmd)
-                    if not response.is_null():
-                        if hasattr(response.value, 'magnitude'):
-                            info[name] = {
-                                "value": response.value.magnitude,
-                                "unit": str(response.value.units)
-                            }
-                        else:
-                            info[name] = {
-                                "value": str(response.value)
-                            }
+            # Le VIN (Mode 09) ne change pas pendant une session: il n'est lu qu'une fois
+            if self.vin is None and obd.commands.VIN in self.connection.supported_commands:
+                response = self._query(obd.commands.VIN)
+                if not response.is_null():
+                    # python-OBD retourne le VIN sous forme d'octets
+                    value = response.value
+                    self.vin = value.decode(errors="ignore") if isinstance(value, (bytes, bytearray)) else str(value)
+                    self._check_profile_vin()
+            if self.vin is not None:
+                info["VIN"] = {"value": self.vin}
+            
+            # Les capteurs Mode 01 sont lus en une seule requête groupée
+            names = [name for name in DASHBOARD_COMMANDS if name not in ("RPM", "SPEED")]
+            batch = self.query_batch(names)
+            if "error" in batch:
+                return batch
+            
+            for name in names:
+                result = batch["values"].get(name, {})
+                if "error" not in result:
+                    info[name] = {key: result[key] for key in ("value", "unit") if key in result}
             
             return {
                 "success": True,
@@ -215,6 +459,205 @@ class OBDManager:
             }
         except Exception as e:
             return {"error": f"Erreur lors de la récupération des informations: {str(e)}"}
+    
+    def get_dashboard_data(self):
+        """
+        Obtient toutes les valeurs du tableau de bord (régime, vitesse, capteurs)
+        
+        Returns:
+            dict: Valeurs par nom de commande et statut
+        """
+        return self.query_batch(DASHBOARD_COMMANDS)
+    
+    def query_batch(self, commands):
+        """
+        Lit plusieurs commandes en regroupant les PIDs Mode 01 par requête
+        
+        Sur les protocoles CAN, jusqu'à six PIDs Mode 01 sont envoyés dans une
+        seule requête. Les commandes non groupables, les PIDs absents de la
+        réponse et les véhicules qui refusent les requêtes multi-PID sont lus
+        séquentiellement.
+        
+        Args:
+            commands (iterable): Noms de commandes (ex: "RPM") ou objets OBDCommand
+            
+        Returns:
+            dict: Résultat par nom de commande (même format que get_rpm) et statut
+        """
+        if not self.connected or not self.connection:
+            return {"error": "Non connecté au véhicule"}
+        
+        try:
+            commands = [obd.commands[cmd] if isinstance(cmd, str) else cmd for cmd in commands]
+            
+            results = {}
+            sequential = []
+            batchable = []
+            for cmd in commands:
+                if cmd not in self.connection.supported_commands:
+                    results[cmd.name] = {"error": f"{cmd.name} non supporté par le véhicule"}
+                elif cmd.mode == 1 and cmd.bytes > 2:
+                    batchable.append(cmd)
+                else:
+                    sequential.append(cmd)
+            
+            if batchable and self._multi_pid_available():
+                for start in range(0, len(batchable), MAX_PIDS_PER_REQUEST):
+                    chunk = batchable[start:start + MAX_PIDS_PER_REQUEST]
+                    responses = self._query_multi_pid(chunk) if len(chunk) > 1 else {}
+                    for cmd in chunk:
+                        if cmd in responses:
+                            results[cmd.name] = self._format_response(cmd, responses[cmd])
+                        else:
+                            sequential.append(cmd)
+            else:
+                sequential.extend(batchable)
+            
+            for cmd in sequential:
+                results[cmd.name] = self._format_response(cmd, self._query(cmd))
+            
+            return {
+                "success": True,
+                "values": results,
+                "time": time.time()
+            }
+        except Exception as e:
+            return {"error": f"Erreur lors de la lecture groupée: {str(e)}"}
+    
+    def _multi_pid_available(self):
+        """
+        Indique si les requêtes multi-PID peuvent être tentées sur ce véhicule
+        
+        Returns:
+            bool: True si le protocole est CAN et que l'ECU ne les a pas refusées
+            (ou que le délai OBD_MULTI_PID_RETRY est écoulé depuis le refus)
+        """
+        if self.multi_pid_supported is False:
+            if self.multi_pid_disabled_at is None or \
+                    time.monotonic() - self.multi_pid_disabled_at < self.multi_pid_retry_delay:
+                return False
+            # Délai écoulé: l'ECU peut de nouveau les accepter (ex: contact remis)
+            self._reset_multi_pid()
+        return self.connection.protocol_id() in MULTI_PID_PROTOCOLS
+    
+    def _reset_multi_pid(self):
+        """
+        Oublie le support des requêtes multi-PID (nouvelle connexion ou délai écoulé)
+        """
+        self.multi_pid_supported = None
+        self.multi_pid_failures = 0
+        self.multi_pid_disabled_at = None
+    
+    def _multi_pid_failed(self, response):
+        """
+        Prend en compte une requête multi-PID sans réponse exploitable
+        
+        Un refus explicite de l'ECU (NO DATA, ?) désactive aussitôt les requêtes
+        groupées; une réponse vide ou illisible (bruit sur la ligne, délai) ne les
+        désactive qu'après OBD_MULTI_PID_MAX_FAILURES échecs consécutifs. Elles
+        sont retentées après OBD_MULTI_PID_RETRY secondes.
+        
+        Args:
+            response (OBDResponse): Réponse de la requête groupée
+        """
+        refused = any(not message.data and message.raw().strip().upper() in MULTI_PID_REFUSALS
+                      for message in response.messages)
+        self.multi_pid_failures += 1
+        if refused or self.multi_pid_failures >= self.multi_pid_max_failures:
+            self.multi_pid_supported = False
+            self.multi_pid_disabled_at = time.monotonic()
+    
+    def _query_multi_pid(self, chunk):
+        """
+        Envoie une requête Mode 01 contenant plusieurs PIDs et décode la réponse
+        
+        Args:
+            chunk (list): Commandes Mode 01 (au plus MAX_PIDS_PER_REQUEST)
+            
+        Returns:
+            dict: Réponse OBD par commande, pour les PIDs présents dans la réponse
+        """
+        by_pid = {cmd.pid: cmd for cmd in chunk}
+        command = b"01" + b"".join(cmd.command[2:] for cmd in chunk)
+        # Tous les messages sont gardés: les réponses texte de l'ELM327 (NO DATA, ?)
+        # sont attribuées à un ECU inconnu
+        batch_cmd = OBDCommand("MULTI_PID", "Requête Mode 01 multi-PID", command, 0,
+                               lambda messages: messages, ecu=ECU.ALL, fast=False)
+        
+        response = self._query(batch_cmd, force=True)
+        
+        responses = {}
+        for message in response.value if not response.is_null() else ():
+            data = message.data
+            if not message.ecu & ECU.ENGINE or not data or data[0] != 0x41:
+                continue
+            
+            # Réponse: 41 [PID A (B C D)] [PID A (B C D)] ...
+            index = 1
+            while index < len(data):
+                cmd = by_pid.get(data[index])
+                if cmd is None:
+                    break
+                size = cmd.bytes - 2
+                payload = data[index + 1:index + 1 + size]
+                if len(payload) < size:
+                    break
+                
+                sub_message = Message(message.frames)
+                sub_message.ecu = message.ecu
+                sub_message.data = bytearray([0x41, cmd.pid]) + payload
+                responses[cmd] = cmd([sub_message])
+                index += 1 + size
+        
+        if not responses:
+            self._multi_pid_failed(response)
+            return {}
+        self.multi_pid_supported = True
+        self.multi_pid_failures = 0
+        return responses
+    
+    def _record(self, cmd, response):
+        """
+        Ajoute une valeur numérique lue à l'historique de télémétrie
+        
+        Args:
+            cmd (OBDCommand): Commande lue
+            response (OBDResponse): Réponse de python-OBD
+        """
+        try:
+            self.telemetry.record(cmd.name, response.time, response.value.magnitude)
+        except (TypeError, ValueError):
+            pass  # valeur non scalaire (ex: statut du circuit de carburant)
+    
+    def _format_response(self, cmd, response):
+        """
+        Convertit une réponse OBD au format de retour du gestionnaire
+        
+        Args:
+            cmd (OBDCommand): Commande lue
+            response (OBDResponse): Réponse de python-OBD
+            
+        Returns:
+            dict: Valeur et unité, ou erreur
+        """
+        if response.is_null():
+            return {"error": f"Impossible de lire {cmd.name}"}
+        
+        if hasattr(response.value, 'magnitude'):
+            self._record(cmd, response)
+            return {
+                "success": True,
+                "value": response.value.magnitude,
+                "unit": str(response.value.units),
+                "command": cmd.name,
+                "time": time.time()
+            }
+        return {
+            "success": True,
+            "value": str(response.value),
+            "command": cmd.name,
+            "time": time.time()
+        }
 
 # Exemple d'utilisation
 def main():
@@ -0,0 +1,296 @@
+"""
+NovaEvo - Indicateurs dérivés de la télémétrie OBD-II
+
+Ce module calcule, sur une fenêtre de l'historique de télémétrie, les
+indicateurs d'un trajet: consommation instantanée et moyenne, distance,
+répartition du temps par plage de régime, histogramme de charge moteur et
+part du temps au ralenti. Les calculs sont vectorisés avec NumPy (pondération
+par la durée de chaque échantillon) et leurs résultats sont mis en cache par
+fenêtre: le résumé d'un trajet de deux heures est obtenu en quelques
+millisecondes.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .obd_telemetry import TelemetryStore
+
+# PIDs utilisés par les indicateurs
+METRIC_PIDS = ("RPM", "SPEED", "ENGINE_LOAD", "MAF", "FUEL_RATE")
+
+# Bornes des plages de régime (tr/min)
+RPM_BANDS = (0, 1000, 2000, 3000, 4000, 5000)
+
+# Bornes de l'histogramme de charge moteur (%)
+LOAD_EDGES = tuple(range(0, 101, 10))
+
+# Conversion débit d'air -> débit de carburant (essence, mélange stoechiométrique)
+AIR_FUEL_RATIO = 14.7
+FUEL_DENSITY = 745.0  # g/L
+
+# Vitesse en dessous de laquelle le véhicule est considéré à l'arrêt (km/h)
+STOPPED_SPEED = 2.0
+
+# Vitesse minimale pour une consommation instantanée en L/100 km (km/h)
+MIN_CONSUMPTION_SPEED = 5.0
+
+
+def sample_durations(times: np.ndarray, end: float, max_gap: float) -> np.ndarray:
+    """
+    Durée représentée par chaque échantillon (jusqu'au suivant)
+
+    Les trous de l'historique (liaison coupée, moteur arrêté) sont bornés à max_gap.
+
+    Args:
+        times (np.ndarray): Horodatages croissants
+        end (float): Fin de la fenêtre
+        max_gap (float): Durée maximale attribuée à un échantillon (s)
+
+    Returns:
+        np.ndarray: Durées en secondes
+    """
+    if not len(times):
+        return np.zeros(0)
+    return np.clip(np.diff(times, append=max(end, times[-1])), 0.0, max_gap)
+
+
+def hold(times: np.ndarray, values: np.ndarray, at: np.ndarray, max_age: float) -> np.ndarray:
+    """
+    Valeur d'un signal aux instants demandés (dernière valeur connue)
+
+    Args:
+        times (np.ndarray): Horodatages du signal
+        values (np.ndarray): Valeurs du signal
+        at (np.ndarray): Instants d'évaluation
+        max_age (float): Âge maximal de la dernière valeur connue (s), NaN au-delà
+
+    Returns:
+        np.ndarray: Valeurs, NaN si inconnues
+    """
+    if not len(times):
+        return np.full(len(at), np.nan)
+
+    index = np.searchsorted(times, at, side='right') - 1
+    valid = index >= 0
+    index = np.clip(index, 0, None)
+    result = values[index]
+    stale = ~valid | (at - times[index] > max_age)
+    return np.where(stale, np.nan, result)
+
+
+def compute_metrics(signals: Dict[str, Tuple[np.ndarray, np.ndarray]], start: float, end: float,
+                    resolutions: Optional[Dict[str, float]] = None,
+                    max_gap: float = 5.0, idle_rpm: float = 1100.0,
+                    rpm_bands: Sequence[float] = RPM_BANDS,
+                    load_edges: Sequence[float] = LOAD_EDGES) -> Dict[str, Any]:
+    """
+    Calcule les indicateurs d'une fenêtre de télémétrie
+
+    Args:
+        signals (Dict[str, Tuple[np.ndarray, np.ndarray]]): (horodatages, valeurs) par PID
+        start (float): Début de la fenêtre
+        end (float): Fin de la fenêtre
+        resolutions (Dict[str, float], optional): Résolution des signaux agrégés par PID (s)
+        max_gap (float): Durée maximale attribuée à un échantillon brut (s)
+        idle_rpm (float): Régime maximal du ralenti (tr/min)
+        rpm_bands (Sequence[float]): Bornes inférieures des plages de régime
+        load_edges (Sequence[float]): Bornes de l'histogramme de charge moteur
+
+    Returns:
+        Dict[str, Any]: Indicateurs du trajet
+    """
+    resolutions = resolutions or {}
+
+    def gap(pid):
+        # Un intervalle agrégé représente toute sa durée
+        return max(max_gap, resolutions.get(pid, 0))
+
+    empty = (np.zeros(0), np.zeros(0))
+    rpm_t, rpm = signals.get("RPM", empty)
+    speed_t, speed = signals.get("SPEED", empty)
+    load_t, load = signals.get("ENGINE_LOAD", empty)
+
+    # Régime: temps moteur tournant, plages de régime et ralenti
+    rpm_dt = sample_durations(rpm_t, end, gap("RPM"))
+    running = rpm > 0
+    engine_on = float(rpm_dt[running].sum())
+
+    edges = np.append(np.asarray(rpm_bands, dtype=np.float64), np.inf)
+    band_seconds, _ = np.histogram(rpm[running], bins=edges, weights=rpm_dt[running])
+    bands = [
+        {
+            "min": float(low),
+            "max": None if np.isinf(high) else float(high),
+            "seconds": round(float(seconds), 1),
+            "ratio": round(float(seconds) / engine_on, 4) if engine_on else 0.0
+        }
+        for low, high, seconds in zip(edges[:-1], edges[1:], band_seconds)
+    ]
+
+    speed_at_rpm = hold(speed_t, speed, rpm_t, gap("SPEED"))
+    idle = running & (rpm <= idle_rpm) & (speed_at_rpm < STOPPED_SPEED)
+    idle_seconds = float(rpm_dt[idle].sum())
+
+    # Vitesse: distance et vitesse moyenne en roulant
+    speed_dt = sample_durations(speed_t, end, gap("SPEED"))
+    distance_km = float(np.dot(speed, speed_dt)) / 3600.0
+    moving = speed >= STOPPED_SPEED
+    moving_seconds = float(speed_dt[moving].sum())
+
+    # Charge moteur: histogramme pondéré par la durée
+    load_dt = sample_durations(load_t, end, gap("ENGINE_LOAD"))
+    load_seconds, _ = np.histogram(load, bins=np.asarray(load_edges, dtype=np.float64), weights=load_dt)
+
+    return {
+        "start": start,
+        "end": end,
+        "duration_s": round(end - start, 1),
+        "engine_on_s": round(engine_on, 1),
+        "distance_km": round(distance_km, 3),
+        "idle": {
+            "seconds": round(idle_seconds, 1),
+            "ratio": round(idle_seconds / engine_on, 4) if engine_on else 0.0
+        },
+        "rpm_bands": bands,
+        "load_histogram": {
+            "edges": [float(edge) for edge in load_edges],
+            "seconds": [round(float(seconds), 1) for seconds in load_seconds],
+            "mean": round(float(np.average(load, weights=load_dt)), 1) if load_dt.sum() else None
+        },
+        "speed": {
+            "mean_moving": round(float(np.dot(speed[moving], speed_dt[moving])) / moving_seconds, 1)
+            if moving_seconds else None,
+            "max": round(float(speed.max()), 1) if len(speed) else None
+        },
+        "fuel": _fuel_metrics(signals, speed_t, speed, end, gap, distance_km)
+    }
+
+
+def _fuel_metrics(signals: Dict[str, Tuple[np.ndarray, np.ndarray]], speed_t: np.ndarray,
+                  speed: np.ndarray, end: float, gap: Callable[[str], float],
+                  distance_km: float) -> Dict[str, Any]:
+    """
+    Calcule la consommation de carburant
+
+    Le débit de carburant (PID 5E) est utilisé s'il est disponible, sinon il
+    est estimé depuis le débit d'air (MAF) pour un moteur essence.
+
+    Args:
+        signals (Dict[str, Tuple[np.ndarray, np.ndarray]]): (horodatages, valeurs) par PID
+        speed_t (np.ndarray): Horodatages de la vitesse
+        speed (np.ndarray): Vitesse (km/h)
+        end (float): Fin de la fenêtre
+        gap (Callable[[str], float]): Durée maximale attribuée à un échantillon, par PID
+        distance_km (float): Distance parcourue
+
+    Returns:
+        Dict[str, Any]: Carburant consommé, consommation moyenne et instantanée
+    """
+    if len(signals.get("FUEL_RATE", ((), ()))[0]):
+        source = "FUEL_RATE"
+        fuel_t, rate = signals["FUEL_RATE"]  # L/h
+    elif len(signals.get("MAF", ((), ()))[0]):
+        source = "MAF"
+        fuel_t, maf = signals["MAF"]  # g/s
+        rate = maf * 3600.0 / (AIR_FUEL_RATIO * FUEL_DENSITY)
+    else:
+        return {"source": None}
+
+    litres = float(np.dot(rate, sample_durations(fuel_t, end, gap(source)))) / 3600.0
+
+    # Consommation instantanée en L/100 km, uniquement en roulant
+    speed_at_fuel = hold(speed_t, speed, fuel_t, gap("SPEED"))
+    moving = speed_at_fuel >= MIN_CONSUMPTION_SPEED
+    instant = rate[moving] / speed_at_fuel[moving] * 100.0
+
+    return {
+        "source": source,
+        "litres": round(litres, 3),
+        "l_per_100km": round(litres / distance_km * 100.0, 2) if distance_km >= 0.1 else None,
+        "rate_l_h": {
+            "mean": round(float(rate.mean()), 2),
+            "max": round(float(rate.max()), 2)
+        },
+        "instant_l_per_100km": {
+            "p50": round(float(np.percentile(instant, 50)), 2),
+            "p95": round(float(np.percentile(instant, 95)), 2)
+        } if len(instant) else None
+    }
+
+
+class DerivedMetrics:
+    """
+    Indicateurs dérivés de l'historique de télémétrie, avec cache par fenêtre
+
+    Cette classe s'occupe de:
+    - Extraire une fenêtre cohérente des PIDs utiles depuis le TelemetryStore
+    - Calculer les indicateurs du trajet de manière vectorisée
+    - Réutiliser le résultat tant que la fenêtre n'a pas changé
+    """
+
+    def __init__(self, store: TelemetryStore, cache_size: Optional[int] = None):
+        """
+        Initialise le moteur d'indicateurs
+
+        Args:
+            store (TelemetryStore): Historique de télémétrie
+            cache_size (int, optional): Nombre de fenêtres conservées en cache
+        """
+        self.store = store
+        self.cache_size = cache_size or int(os.getenv('OBD_METRICS_CACHE_SIZE', '32'))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0
+        }
+
+    def summary(self, duration: float, end: Optional[float] = None, **options) -> Dict[str, Any]:
+        """
+        Retourne les indicateurs d'une fenêtre de l'historique
+
+        Args:
+            duration (float): Durée de la fenêtre en secondes
+            end (float, optional): Fin de la fenêtre (défaut: dernier échantillon)
+            **options: Paramètres de compute_metrics (max_gap, idle_rpm, ...)
+
+        Returns:
+            Dict[str, Any]: Indicateurs, ou dictionnaire d'erreur si aucune donnée
+        """
+        snapshot = self.store.snapshot(METRIC_PIDS, duration, end)
+        signals = snapshot["signals"]
+        if not any(len(times) for times, _, _ in signals.values()):
+            return {"error": "Aucune donnée de télémétrie sur la période demandée"}
+
+        # Une fenêtre est identifiée par ses bornes et par le dernier échantillon de chaque PID
+        key = (
+            round(snapshot["start"], 3), round(snapshot["end"], 3),
+            tuple(sorted(options.items())),
+            tuple((pid, len(times), float(times[-1]) if len(times) else None)
+                  for pid, (times, _, _) in sorted(signals.items()))
+        )
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats['hits'] += 1
+                return cached
+            self.stats['misses'] += 1
+
+        resolutions = {pid: resolution for pid, (_, _, resolution) in signals.items()}
+        result = compute_metrics({pid: (times, values) for pid, (times, values, _) in signals.items()},
+                                 snapshot["start"], snapshot["end"], resolutions, **options)
+        result["resolutions"] = resolutions
+
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return result
@@ -0,0 +1,253 @@
+"""
+NovaEvo - Propriétaire unique de la liaison OBD-II entre les workers
+
+Avec plusieurs workers gunicorn, chaque processus aurait sa propre
+OBDSession sur le même port série: les commandes ELM327 de plusieurs
+workers s'entremêleraient (les ouvertures pyserial ne sont pas exclusives)
+et la télémétrie, la surveillance, les alertes et la flotte seraient
+réparties entre processus. Un seul worker détient donc la liaison: celui
+qui obtient le verrou exclusif (flock) du fichier OBD_LOCK_FILE. Il sert
+l'application sur une adresse locale, inscrite dans le fichier de verrou,
+et les autres workers lui relaient les requêtes /obd2 (flux SSE compris).
+Si le propriétaire disparaît, le système libère le verrou et le prochain
+worker sollicité reprend la liaison.
+"""
+
+import os
+import fcntl
+import logging
+import threading
+from typing import Any, Optional
+
+import requests
+from flask import Response, jsonify
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.obd_owner')
+
+# En-tête des requêtes relayées au propriétaire (jamais relayées une seconde fois)
+FORWARDED_HEADER = 'X-NovaEvo-OBD-Forwarded'
+
+# En-têtes de requête et de réponse qui ne sont pas relayés (propres à chaque connexion)
+HOP_BY_HOP_HEADERS = {'connection', 'keep-alive', 'transfer-encoding', 'content-length', 'host',
+                      'content-encoding', 'upgrade', 'te', 'trailer', 'proxy-authorization'}
+
+# Délai de connexion au propriétaire (s)
+CONNECT_TIMEOUT = 2.0
+
+
+class OBDLinkOwner:
+    """
+    Attribution de la liaison OBD-II à un seul worker
+
+    Cette classe s'occupe de:
+    - Obtenir, sans attendre, le verrou exclusif de la liaison
+    - Servir l'application sur une adresse locale une fois propriétaire
+    - Relayer au propriétaire les requêtes reçues par les autres workers
+    - Répondre 503 quand le propriétaire est injoignable
+    """
+
+    def __init__(self, lock_path: Optional[str] = None, address: Optional[str] = None,
+                 enabled: Optional[bool] = None, request_timeout: Optional[float] = None):
+        """
+        Initialise l'attribution (le verrou est demandé à la première requête OBD)
+
+        Args:
+            lock_path (str, optional): Fichier de verrou partagé par les workers
+                (défaut: OBD_LOCK_FILE)
+            address (str, optional): Adresse hôte:port du serveur local du propriétaire,
+                port 0 = choisi par le système (défaut: OBD_OWNER_ADDRESS)
+            enabled (bool, optional): Active l'attribution (défaut: OBD_SINGLE_OWNER;
+                activée par gunicorn.conf.py dès qu'il y a plusieurs workers)
+            request_timeout (float, optional): Attente d'une réponse relayée, hors flux (s)
+                (défaut: OBD_TIMEOUT + 10)
+        """
+        self.lock_path = lock_path or os.getenv('OBD_LOCK_FILE', 'data/obd_link.lock')
+        self.address = address or os.getenv('OBD_OWNER_ADDRESS', '127.0.0.1:0')
+        self.enabled = enabled if enabled is not None else \
+            os.getenv('OBD_SINGLE_OWNER', 'False').lower() in ('true', '1', 't')
+        self.request_timeout = request_timeout or float(os.getenv('OBD_TIMEOUT', '30')) + 10
+
+        self.app = None
+        # Relais en boucle locale: jamais par un proxy HTTP de l'environnement
+        self._http = requests.Session()
+        self._http.trust_env = False
+        self._fd = None
+        self._pid = None
+        self._server = None
+        self._lock = threading.Lock()
+
+    def enable(self, app: Any) -> None:
+        """
+        Active l'attribution pour une application
+
+        Args:
+            app (Flask): Application servie par le propriétaire
+        """
+        self.app = app
+        self.enabled = True
+
+    def is_owner(self) -> bool:
+        """
+        Indique si ce processus détient la liaison, en la prenant si elle est libre
+
+        Returns:
+            bool: True si ce processus doit traiter les requêtes OBD lui-même
+        """
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self._pid != os.getpid():
+                # Processus issu d'un fork: le verrou éventuel appartient au parent
+                self._fd = None
+                self._server = None
+                self._pid = os.getpid()
+            if self._fd is not None:
+                return True
+            return self._acquire()
+
+    def owner_address(self) -> Optional[str]:
+        """
+        Adresse du serveur local du propriétaire, lue dans le fichier de verrou
+
+        Returns:
+            Optional[str]: Adresse hôte:port, ou None si aucun propriétaire ne l'a publiée
+        """
+        try:
+            with open(self.lock_path, 'r', encoding='utf-8') as f:
+                fields = f.read().split()
+        except OSError:
+            return None
+        return fields[1] if len(fields) == 2 else None
+
+    def forward(self, request) -> Response:
+        """
+        Relaie une requête au worker propriétaire de la liaison
+
+        Args:
+            request (flask.Request): Requête reçue
+
+        Returns:
+            Response: Réponse du propriétaire (diffusée au fil de l'eau), ou 503
+        """
+        address = self.owner_address()
+        if request.headers.get(FORWARDED_HEADER) or not address:
+            return self._unavailable("Liaison OBD-II en cours d'attribution")
+
+        headers = {name: value for name, value in request.headers.items()
+                   if name.lower() not in HOP_BY_HOP_HEADERS}
+        headers[FORWARDED_HEADER] = str(os.getpid())
+        streaming = request.path.endswith('/stream')
+        try:
+            upstream = self._http.request(
+                request.method, f"http://{address}{request.full_path.rstrip('?')}",
+                headers=headers, data=request.get_data(), stream=True, allow_redirects=False,
+                timeout=(CONNECT_TIMEOUT, None if streaming else self.request_timeout)
+            )
+        except requests.RequestException as e:
+            logger.warning(f"Propriétaire de la liaison OBD-II injoignable ({address}): {str(e)}")
+            return self._unavailable("Liaison OBD-II momentanément indisponible")
+
+        def relay():
+            try:
+                for chunk in upstream.iter_content(chunk_size=None):
+                    yield chunk
+            finally:
+                upstream.close()
+
+        response_headers = [(name, value) for name, value in upstream.headers.items()
+                            if name.lower() not in HOP_BY_HOP_HEADERS]
+        return Response(relay(), status=upstream.status_code, headers=response_headers)
+
+    def status(self) -> dict:
+        """
+        Retourne l'état de l'attribution
+
+        Returns:
+            dict: Activation, propriété de ce processus et adresse du propriétaire
+        """
+        with self._lock:
+            owner = self._fd is not None and self._pid == os.getpid()
+        return {
+            "enabled": self.enabled,
+            "owner": owner or not self.enabled,
+            "owner_address": self.owner_address() if self.enabled else None
+        }
+
+    def release(self) -> None:
+        """
+        Arrête le serveur local et libère la liaison
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            server, self._server = self._server, None
+            fd, self._fd = self._fd, None
+        if server is not None:
+            server.shutdown()
+        if fd is not None:
+            os.close(fd)
+
+    def _acquire(self) -> bool:
+        """
+        Tente de prendre le verrou et démarre le serveur local (à appeler sous verrou)
+
+        Returns:
+            bool: True si ce processus est devenu propriétaire
+        """
+        try:
+            directory = os.path.dirname(self.lock_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            logger.error(f"Fichier de verrou OBD-II inaccessible ({self.lock_path}): {str(e)}")
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        self._fd = fd
+        address = self._serve()
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, f"{os.getpid()} {address or ''}".strip().encode('ascii'), 0)
+        logger.info(f"Liaison OBD-II attribuée au worker {os.getpid()} (requêtes relayées sur {address})")
+        return True
+
+    def _serve(self) -> Optional[str]:
+        """
+        Démarre le serveur local qui reçoit les requêtes relayées (à appeler sous verrou)
+
+        Returns:
+            Optional[str]: Adresse effective hôte:port, ou None sans serveur
+        """
+        if self.app is None:
+            return None
+        from werkzeug.serving import make_server
+
+        host, _, port = self.address.rpartition(':')
+        try:
+            self._server = make_server(host or '127.0.0.1', int(port or 0), self.app, threaded=True)
+        except (OSError, ValueError) as e:
+            logger.error(f"Serveur local du propriétaire OBD-II impossible sur {self.address}: {str(e)}")
+            return None
+        threading.Thread(target=self._server.serve_forever, name='obd-owner', daemon=True).start()
+        return f"{self._server.host}:{self._server.port}"
+
+    @staticmethod
+    def _unavailable(message: str) -> Response:
+        """
+        Réponse 503 des requêtes OBD non relayées
+
+        Args:
+            message (str): Motif
+
+        Returns:
+            Response: Erreur JSON avec Retry-After
+        """
+        response = jsonify({'status': 'error', 'message': message})
+        response.status_code = 503
+        response.headers['Retry-After'] = '2'
+        return response
@@ -0,0 +1,373 @@
+"""
+NovaEvo - Planification adaptative des lectures OBD-II
+
+Ce module interroge en continu un ensemble de PIDs en répartissant la bande
+passante limitée de la liaison série: chaque PID a une fréquence cible,
+ajustée selon la variabilité observée de ses valeurs, puis l'ensemble est
+ramené à la capacité mesurée de la liaison. Les signaux rapides (régime,
+vitesse) obtiennent ainsi l'essentiel du bus, les valeurs lentes (température,
+pression atmosphérique) sont lues rarement.
+"""
+
+import os
+import math
+import time
+import heapq
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+from .obd_main import MAX_PIDS_PER_REQUEST
+from .obd_session import OBDSession
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.obd_scheduler')
+
+# Fréquences cibles par défaut (Hz)
+DEFAULT_TARGETS = {
+    "RPM": 10.0,
+    "SPEED": 5.0,
+    "ENGINE_LOAD": 5.0,
+    "COOLANT_TEMP": 0.5,
+    "INTAKE_TEMP": 0.5,
+    "OIL_TEMP": 0.2,
+    "FUEL_LEVEL": 0.1,
+    "FUEL_STATUS": 0.1,
+    "BAROMETRIC_PRESSURE": 0.05
+}
+
+# Variation d'une lecture à l'autre jugée significative, dans l'unité du PID
+DEADBANDS = {
+    "RPM": 50.0,
+    "SPEED": 1.0,
+    "ENGINE_LOAD": 2.0,
+    "THROTTLE_POS": 1.0,
+    "COOLANT_TEMP": 1.0,
+    "INTAKE_TEMP": 1.0,
+    "OIL_TEMP": 1.0,
+    "FUEL_LEVEL": 1.0,
+    "BAROMETRIC_PRESSURE": 1.0
+}
+
+# Bornes de l'adaptation autour de la fréquence cible
+MIN_RATE_FACTOR = 0.25
+MAX_RATE_FACTOR = 2.0
+
+
+class _PIDState:
+    """État de planification d'un PID"""
+
+    def __init__(self, name: str, target: float):
+        self.name = name
+        self.target = target
+        self.desired = target
+        self.effective = target
+        self.deadband = DEADBANDS.get(name)
+        self.last_value = None
+        self.delta_variance = None
+        self.samples = deque(maxlen=1024)  # instants des dernières lectures
+        # Échéance de référence (time.monotonic): les entrées du tas qui ne la portent
+        # pas sont périmées; None pendant une lecture en cours
+        self.due = None
+
+
+class PollingScheduler:
+    """
+    Planificateur adaptatif des lectures OBD-II
+
+    Cette classe s'occupe de:
+    - Lire chaque PID à sa fréquence effective, par requêtes groupées
+    - Adapter la fréquence à la variance des variations observées
+    - Mesurer la capacité de la liaison et y ajuster l'ensemble des fréquences
+    - Exposer les fréquences cibles, effectives et observées par PID
+    """
+
+    def __init__(self, session: OBDSession, targets: Optional[Dict[str, float]] = None,
+                 utilization: Optional[float] = None, smoothing: float = 0.2):
+        """
+        Initialise le planificateur (le thread n'est démarré que par start())
+
+        Args:
+            session (OBDSession): Session OBD-II propriétaire du dongle
+            targets (Dict[str, float], optional): Fréquences cibles par PID (Hz)
+            utilization (float, optional): Part de la capacité de la liaison réservée au planificateur
+            smoothing (float): Coefficient des moyennes mobiles exponentielles
+        """
+        self.session = session
+        self.utilization = utilization or float(os.getenv('OBD_SCHEDULER_UTILIZATION', '0.8'))
+        self.smoothing = smoothing
+        self.window = 10.0  # fenêtre de mesure des fréquences observées (s)
+
+        self._states = {}
+        self._heap = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+        # Durée moyenne d'une lecture de PID sur la liaison (s), None tant qu'inconnue
+        self.read_cost = None
+        self.stats = {
+            'requests': 0,
+            'failed_requests': 0,
+            'pid_reads': 0
+        }
+
+        self.set_targets(targets or DEFAULT_TARGETS)
+
+    @property
+    def running(self) -> bool:
+        """bool: True si le thread de lecture tourne"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def set_targets(self, targets: Dict[str, float]) -> None:
+        """
+        Remplace les PIDs suivis et leurs fréquences cibles
+
+        Args:
+            targets (Dict[str, float]): Fréquences cibles par nom de commande (Hz)
+        """
+        now = time.monotonic()
+        with self._lock:
+            states = {}
+            for name, rate in targets.items():
+                if rate <= 0:
+                    continue
+                state = self._states.get(name) or _PIDState(name, float(rate))
+                state.target = float(rate)
+                states[name] = state
+            self._states = states
+
+            # Une lecture en cours ne replanifiera pas ces PIDs: leur échéance a changé
+            for state in states.values():
+                state.due = now
+            self._heap = [(now, name) for name in self._states]
+            heapq.heapify(self._heap)
+            self._rebalance()
+
+    def start(self) -> None:
+        """
+        Démarre le thread de lecture s'il ne tourne pas déjà
+        """
+        if self.running:
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='obd-scheduler', daemon=True)
+        self._thread.start()
+        logger.info(f"Planificateur OBD démarré ({len(self._states)} PIDs)")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Arrête le thread de lecture
+
+        Args:
+            timeout (float): Délai maximal d'attente de l'arrêt du thread
+        """
+        if self._thread is None:
+            return
+
+        self._stop_event.set()
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info("Planificateur OBD arrêté")
+
+    def rates(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Retourne les fréquences de lecture par PID
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Fréquences cible, souhaitée (après adaptation),
+            effective (après partage de la liaison) et observée, en Hz
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    "target": state.target,
+                    "desired": round(state.desired, 3),
+                    "effective": round(state.effective, 3),
+                    "observed": round(self._observed_rate(state, now), 3)
+                }
+                for name, state in self._states.items()
+            }
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Retourne l'état du planificateur
+
+        Returns:
+            Dict[str, Any]: Capacité mesurée, fréquences et statistiques
+        """
+        capacity = 1.0 / self.read_cost if self.read_cost else None
+        return {
+            "running": self.running,
+            "link_capacity": round(capacity, 2) if capacity else None,
+            "utilization": self.utilization,
+            "rates": self.rates(),
+            **self.stats
+        }
+
+    def run_once(self) -> bool:
+        """
+        Attend les PIDs arrivés à échéance et les lit en une requête groupée
+
+        Returns:
+            bool: False si l'arrêt a été demandé pendant l'attente
+        """
+        with self._lock:
+            due = self._heap[0][0] if self._heap else None
+
+        if due is None:
+            return not self._stop_event.wait(0.5)
+
+        delay = due - time.monotonic()
+        if delay > 0:
+            # Attente bornée: de nouveaux PIDs peuvent être planifiés entre-temps
+            return not self._stop_event.wait(min(delay, 0.5))
+
+        now = time.monotonic()
+        batch = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(batch) < MAX_PIDS_PER_REQUEST:
+                due, name = heapq.heappop(self._heap)
+                state = self._states.get(name)
+                # Entrée périmée (PID retiré ou replanifié par set_targets): ignorée
+                if state is not None and state.due == due:
+                    state.due = None
+                    batch.append(name)
+
+        if not batch:
+            return True
+
+        start = time.monotonic()
+        result = self.session.call('query_batch', tuple(batch))
+        elapsed = time.monotonic() - start
+        self.stats['requests'] += 1
+
+        with self._lock:
+            if "error" in result:
+                # Liaison indisponible: nouvel essai dans une seconde
+                self.stats['failed_requests'] += 1
+                for name in batch:
+                    self._schedule(name, now + 1.0)
+                return True
+
+            self._observe_cost(elapsed / len(batch))
+            for name in batch:
+                state = self._states.get(name)
+                if state is None:
+                    continue
+                value = result["values"].get(name, {}).get("value")
+                if isinstance(value, (int, float)):
+                    self._observe(state, value, now)
+                else:
+                    state.samples.append(now)
+                self.stats['pid_reads'] += 1
+                self._schedule(name, now + 1.0 / state.effective)
+
+            self._rebalance()
+
+        return True
+
+    def _schedule(self, name: str, due: float) -> None:
+        """
+        Replanifie un PID après sa lecture (à appeler sous verrou)
+
+        Un PID replanifié pendant la lecture (set_targets) garde sa nouvelle
+        échéance: il n'a qu'une entrée valide dans le tas.
+
+        Args:
+            name (str): Nom de la commande
+            due (float): Prochaine échéance (time.monotonic)
+        """
+        state = self._states.get(name)
+        if state is None or state.due is not None:
+            return
+        state.due = due
+        heapq.heappush(self._heap, (due, name))
+
+    def _run(self) -> None:
+        """
+        Boucle du thread de lecture
+        """
+        while not self._stop_event.is_set():
+            try:
+                if not self.run_once():
+                    return
+            except Exception as e:
+                logger.error(f"Erreur dans le planificateur OBD: {str(e)}")
+                self._stop_event.wait(1.0)
+
+    def _observe(self, state: _PIDState, value: float, now: float) -> None:
+        """
+        Met à jour la variance des variations d'un PID et sa fréquence souhaitée
+        (à appeler sous verrou)
+
+        Args:
+            state (_PIDState): État du PID
+            value (float): Valeur lue
+            now (float): Instant de la lecture (time.monotonic)
+        """
+        state.samples.append(now)
+
+        if state.last_value is not None:
+            delta = value - state.last_value
+            if state.delta_variance is None:
+                state.delta_variance = delta * delta
+            else:
+                state.delta_variance += self.smoothing * (delta * delta - state.delta_variance)
+
+            # Seuil de variation significative: propre au PID, sinon 2 % de la valeur
+            deadband = state.deadband or max(abs(value) * 0.02, 1e-3)
+            ratio = math.sqrt(state.delta_variance) / deadband
+            state.desired = state.target * min(max(ratio, MIN_RATE_FACTOR), MAX_RATE_FACTOR)
+
+        state.last_value = value
+
+    def _observe_cost(self, cost: float) -> None:
+        """
+        Met à jour la durée moyenne d'une lecture de PID (à appeler sous verrou)
+
+        Args:
+            cost (float): Durée de la dernière requête divisée par son nombre de PIDs
+        """
+        if self.read_cost is None:
+            self.read_cost = cost
+        else:
+            self.read_cost += self.smoothing * (cost - self.read_cost)
+
+    def _rebalance(self) -> None:
+        """
+        Ramène la somme des fréquences souhaitées à la capacité de la liaison
+        (à appeler sous verrou)
+
+        La réduction est proportionnelle: les PIDs rapides gardent la plus
+        grande part du bus.
+        """
+        demand = sum(state.desired for state in self._states.values())
+        scale = 1.0
+        if self.read_cost and demand > 0:
+            budget = self.utilization / self.read_cost
+            scale = min(1.0, budget / demand)
+
+        for state in self._states.values():
+            state.effective = state.desired * scale
+
+    def _observed_rate(self, state: _PIDState, now: float) -> float:
+        """
+        Calcule la fréquence de lecture réellement obtenue (à appeler sous verrou)
+
+        Args:
+            state (_PIDState): État du PID
+            now (float): Instant courant (time.monotonic)
+
+        Returns:
+            float: Lectures par seconde sur la fenêtre de mesure
+        """
+        while state.samples and state.samples[0] < now - self.window:
+            state.samples.popleft()
+        if len(state.samples) < 2:
+            return 0.0
+        span = max(now - state.samples[0], state.samples[-1] - state.samples[0])
+        return (len(state.samples) - 1) / span if span > 0 else 0.0
@@ -0,0 +1,326 @@
+"""
+NovaEvo - Session OBD-II persistante
+
+Ce module maintient une liaison OBD-II ouverte en permanence autour d'un
+OBDManager. Toutes les requêtes passent par un unique thread propriétaire
+qui sérialise l'accès au port série et rétablit la connexion avec un
+backoff exponentiel lorsqu'elle est perdue.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+import obd
+
+from .obd_main import OBDManager
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.obd_session')
+
+
+class OBDSession:
+    """
+    Session OBD-II longue durée partagée entre les requêtes
+
+    Cette classe s'occupe de:
+    - Garder la connexion au dongle ouverte entre deux requêtes HTTP
+    - Sérialiser toutes les lectures dans un seul thread propriétaire
+    - Mutualiser les lectures identiques demandées simultanément
+    - Se reconnecter automatiquement avec un backoff exponentiel
+    """
+
+    def __init__(self, manager: Optional[OBDManager] = None,
+                 reconnect_min_delay: Optional[float] = None,
+                 reconnect_max_delay: Optional[float] = None,
+                 request_timeout: Optional[float] = None,
+                 name: str = 'obd-session'):
+        """
+        Initialise la session (le thread n'est démarré qu'au premier usage)
+
+        Args:
+            manager (OBDManager, optional): Gestionnaire OBD à piloter
+            reconnect_min_delay (float, optional): Délai initial avant reconnexion (s)
+            reconnect_max_delay (float, optional): Délai maximal entre deux tentatives (s)
+            request_timeout (float, optional): Délai maximal d'attente d'une lecture (s)
+            name (str): Nom du thread propriétaire
+        """
+        self.manager = manager or OBDManager()
+        self.name = name
+        self.reconnect_min_delay = reconnect_min_delay or float(os.getenv('OBD_RECONNECT_MIN_DELAY', '1'))
+        self.reconnect_max_delay = reconnect_max_delay or float(os.getenv('OBD_RECONNECT_MAX_DELAY', '60'))
+        self.request_timeout = request_timeout or float(os.getenv('OBD_REQUEST_TIMEOUT', '10'))
+        self.health_check_interval = float(os.getenv('OBD_HEALTH_CHECK_INTERVAL', '5'))
+
+        # File des lectures à exécuter par le thread propriétaire
+        self._queue = queue.Queue()
+
+        # Lectures en attente, indexées par (méthode, arguments) pour les mutualiser
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._connected = threading.Event()
+        self._first_attempt_done = threading.Event()
+        self._backoff = self.reconnect_min_delay
+        self._connect_listeners = []
+
+        # Statistiques de la session
+        self.stats = {
+            'connections': 0,
+            'failed_attempts': 0,
+            'link_losses': 0,
+            'requests': 0,
+            'shared_requests': 0,
+            'last_connected': None,
+            'last_error': None
+        }
+
+    @property
+    def connected(self) -> bool:
+        """bool: True si la liaison avec le véhicule est ouverte"""
+        return self._connected.is_set()
+
+    def start(self) -> None:
+        """
+        Démarre le thread propriétaire de la liaison s'il ne tourne pas déjà
+        """
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            logger.info("Session OBD-II démarrée")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Arrête le thread propriétaire et ferme la liaison OBD
+
+        Args:
+            timeout (float): Délai maximal d'attente de l'arrêt du thread
+        """
+        if self._thread is None:
+            return
+
+        self._stop_event.set()
+        self._queue.put(None)  # réveiller le thread s'il attend une requête
+        self._thread.join(timeout)
+        self._thread = None
+
+        logger.info("Session OBD-II arrêtée")
+
+    def add_connect_listener(self, listener: Callable[[], None]) -> None:
+        """
+        Enregistre une fonction appelée après chaque (re)connexion réussie
+
+        La fonction est exécutée dans le thread propriétaire et peut donc
+        utiliser directement l'OBDManager.
+
+        Args:
+            listener (Callable[[], None]): Fonction sans argument
+        """
+        self._connect_listeners.append(listener)
+
+    def wait_until_connected(self, timeout: Optional[float] = None) -> bool:
+        """
+        Attend la fin de la première tentative de connexion
+
+        Une fois la session établie, l'appel est immédiat. Pendant une coupure,
+        il échoue aussitôt : la reconnexion se poursuit en arrière-plan.
+
+        Args:
+            timeout (float, optional): Délai maximal d'attente en secondes
+
+        Returns:
+            bool: True si la liaison est ouverte
+        """
+        self.start()
+        if not self._connected.is_set():
+            self._first_attempt_done.wait(timeout)
+        return self._connected.is_set()
+
+    def submit(self, method_name: str, *args, **kwargs) -> Future:
+        """
+        Planifie l'appel d'une méthode de l'OBDManager dans le thread propriétaire
+
+        Si une lecture identique est déjà en attente, son résultat est partagé.
+
+        Args:
+            method_name (str): Nom de la méthode publique de l'OBDManager
+            *args: Arguments positionnels de la méthode
+            **kwargs: Arguments nommés de la méthode
+
+        Returns:
+            Future: Résultat futur de la méthode
+        """
+        if method_name.startswith('_') or not callable(getattr(self.manager, method_name, None)):
+            raise ValueError(f"Méthode OBD inconnue: {method_name}")
+
+        key = (method_name, args, tuple(sorted(kwargs.items())))
+
+        with self._pending_lock:
+            self.stats['requests'] += 1
+            future = self._pending.get(key)
+            if future is not None:
+                self.stats['shared_requests'] += 1
+                return future
+
+            future = Future()
+            self._pending[key] = future
+            self._queue.put((key, method_name, args, kwargs, future))
+
+        self.start()
+        return future
+
+    def call(self, method_name: str, *args, timeout: Optional[float] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Exécute une méthode de l'OBDManager via la session et attend son résultat
+
+        Args:
+            method_name (str): Nom de la méthode publique de l'OBDManager
+            timeout (float, optional): Délai maximal d'attente en secondes
+
+        Returns:
+            dict: Résultat de la méthode, ou dictionnaire d'erreur
+        """
+        future = self.submit(method_name, *args, **kwargs)
+        try:
+            return future.result(timeout or self.request_timeout)
+        except FutureTimeoutError:
+            return {"error": f"Délai dépassé pour la lecture OBD ({method_name})"}
+        except Exception as e:
+            return {"error": f"Erreur lors de la lecture OBD ({method_name}): {str(e)}"}
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Retourne l'état courant de la session
+
+        Returns:
+            dict: État de la liaison et statistiques
+        """
+        return {
+            'connected': self.connected,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'port': self.manager.port,
+            'queued_requests': self._queue.qsize(),
+            'reconnect_delay': self._backoff,
+            **self.stats
+        }
+
+    def _run(self) -> None:
+        """
+        Boucle du thread propriétaire: connexion, exécution des lectures, surveillance
+        """
+        while not self._stop_event.is_set():
+            if not self.manager.connected:
+                if self._try_connect():
+                    continue
+
+                # Répondre aux lectures en attente plutôt que de les laisser expirer
+                self._drain_queue()
+                self._stop_event.wait(self._backoff)
+                self._backoff = min(self._backoff * 2, self.reconnect_max_delay)
+                continue
+
+            try:
+                job = self._queue.get(timeout=self.health_check_interval)
+            except queue.Empty:
+                self._check_link()
+                continue
+
+            if job is None:
+                continue
+
+            self._execute(job)
+            self._check_link()
+
+        self.manager.disconnect()
+        self._connected.clear()
+
+    def _try_connect(self) -> bool:
+        """
+        Tente d'ouvrir la liaison OBD
+
+        Returns:
+            bool: True si la connexion est établie
+        """
+        try:
+            connected = self.manager.connect()
+        except Exception as e:
+            logger.error(f"Erreur lors de la connexion OBD: {str(e)}")
+            connected = False
+
+        if connected:
+            self._backoff = self.reconnect_min_delay
+            self.stats['connections'] += 1
+            self.stats['last_connected'] = time.time()
+            self._connected.set()
+            logger.info(f"Liaison OBD-II ouverte sur {self.manager.port}")
+
+            for listener in self._connect_listeners:
+                try:
+                    listener()
+                except Exception as e:
+                    logger.error(f"Erreur dans un listener de connexion OBD: {str(e)}")
+        else:
+            # Fermer une éventuelle connexion partielle (ELM sans véhicule)
+            self.manager.disconnect()
+            self.stats['failed_attempts'] += 1
+            self.stats['last_error'] = "Connexion OBD-II échouée"
+            logger.warning(f"Connexion OBD-II échouée, nouvelle tentative dans {self._backoff:.1f}s")
+
+        self._first_attempt_done.set()
+        return connected
+
+    def _check_link(self) -> None:
+        """
+        Vérifie que la liaison est toujours active et la ferme sinon
+        """
+        connection = self.manager.connection
+        if connection is not None and connection.status() == obd.OBDStatus.CAR_CONNECTED:
+            return
+
+        logger.warning("Liaison OBD-II perdue, reconnexion en cours")
+        self.stats['link_losses'] += 1
+        self.stats['last_error'] = "Liaison OBD-II perdue"
+        self._connected.clear()
+        self.manager.disconnect()
+
+    def _drain_queue(self) -> None:
+        """
+        Exécute immédiatement les lectures en attente (elles échouent proprement hors connexion)
+        """
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if job is not None:
+                self._execute(job)
+
+    def _execute(self, job) -> None:
+        """
+        Exécute une lecture et publie son résultat
+
+        Args:
+            job (tuple): (clé, méthode, args, kwargs, future)
+        """
+        key, method_name, args, kwargs, future = job
+
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(getattr(self.manager, method_name)(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+        with self._pending_lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
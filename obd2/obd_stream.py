@@ -0,0 +1,245 @@
+"""
+NovaEvo - Diffusion en continu de la télémétrie OBD-II
+
+Ce module diffuse les valeurs OBD-II en temps réel à plusieurs clients à partir
+d'une seule session dongle. Les PIDs demandés par l'ensemble des abonnés sont
+surveillés par les watchers obd.Async, et chaque nouvelle réponse est
+redistribuée aux abonnés concernés. Chaque client garde un thread du worker
+occupé pendant toute la diffusion: le nombre d'abonnés est donc borné.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+import obd
+
+from .obd_session import OBDSession
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.obd_stream')
+
+
+class StreamerFull(Exception):
+    """Trop de clients abonnés: le client doit réessayer plus tard"""
+
+
+class TelemetrySubscription:
+    """
+    Abonnement d'un client au flux de télémétrie
+
+    Chaque abonnement possède sa propre file bornée: un client lent perd ses
+    échantillons les plus anciens au lieu de bloquer la lecture du dongle.
+    """
+
+    def __init__(self, pids: Iterable[str], max_queue: int = 256):
+        """
+        Initialise l'abonnement
+
+        Args:
+            pids (Iterable[str]): Noms des commandes suivies (ex: "RPM")
+            max_queue (int): Nombre maximal d'échantillons en attente
+        """
+        self.pids = frozenset(pids)
+        self.created = time.time()
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+
+    def publish(self, sample: Dict[str, Any]) -> None:
+        """
+        Ajoute un échantillon à la file, en écartant le plus ancien si elle est pleine
+
+        Args:
+            sample (Dict[str, Any]): Échantillon de télémétrie
+        """
+        while True:
+            try:
+                self._queue.put_nowait(sample)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Attend le prochain échantillon
+
+        Args:
+            timeout (float, optional): Délai maximal d'attente en secondes
+
+        Returns:
+            Optional[Dict[str, Any]]: Échantillon, ou None si le délai est écoulé
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class TelemetryStreamer:
+    """
+    Diffuseur de télémétrie OBD-II partagé entre les clients
+
+    Cette classe s'occupe de:
+    - Surveiller via obd.Async l'union des PIDs demandés par les abonnés
+    - Redistribuer chaque réponse aux abonnés intéressés
+    - Retirer les watchers devenus inutiles au départ d'un abonné
+    - Réenregistrer les watchers après une reconnexion de la session
+    - Refuser les abonnés au-delà d'un nombre maximal (un thread du worker chacun)
+    """
+
+    def __init__(self, session: OBDSession, max_queue: int = 256, max_subscribers: Optional[int] = None):
+        """
+        Initialise le diffuseur
+
+        Args:
+            session (OBDSession): Session OBD-II propriétaire du dongle
+            max_queue (int): Taille de la file de chaque abonné
+            max_subscribers (int, optional): Abonnés simultanés, 0 = illimité
+                (défaut: OBD_STREAM_MAX_CLIENTS)
+        """
+        self.session = session
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers if max_subscribers is not None else \
+            int(os.getenv('OBD_STREAM_MAX_CLIENTS', '8'))
+        self._subscriptions = []
+        self._lock = threading.Lock()
+        self.samples_published = 0
+
+        self.session.add_connect_listener(self._rewatch)
+
+    @staticmethod
+    def validate_pids(pids: Iterable[str]) -> List[str]:
+        """
+        Normalise et filtre une liste de noms de commandes
+
+        Args:
+            pids (Iterable[str]): Noms de commandes proposés par le client
+
+        Returns:
+            List[str]: Noms de commandes OBD valides, en majuscules
+        """
+        names = []
+        for pid in pids:
+            name = pid.strip().upper()
+            if name and obd.commands.has_name(name) and name not in names:
+                names.append(name)
+        return names
+
+    def subscribe(self, pids: Iterable[str]) -> TelemetrySubscription:
+        """
+        Abonne un client à un ensemble de PIDs
+
+        Args:
+            pids (Iterable[str]): Noms des commandes à suivre
+
+        Returns:
+            TelemetrySubscription: Abonnement à lire par le client
+
+        Raises:
+            StreamerFull: Si le nombre maximal d'abonnés est atteint
+        """
+        subscription = TelemetrySubscription(self.validate_pids(pids), self.max_queue)
+
+        with self._lock:
+            if self.max_subscribers and len(self._subscriptions) >= self.max_subscribers:
+                raise StreamerFull(f"{len(self._subscriptions)} abonnés déjà connectés")
+            new_pids = subscription.pids - self._watched_pids()
+            self._subscriptions.append(subscription)
+
+        if new_pids:
+            result = self.session.call('watch', tuple(sorted(new_pids)), self._dispatch)
+            if "error" in result:
+                logger.warning(f"Surveillance impossible pour {sorted(new_pids)}: {result['error']}")
+
+        logger.info(f"Nouvel abonné télémétrie ({len(self._subscriptions)} actifs): {sorted(subscription.pids)}")
+        return subscription
+
+    def unsubscribe(self, subscription: TelemetrySubscription) -> None:
+        """
+        Désabonne un client et retire les watchers qui ne servent plus
+
+        Args:
+            subscription (TelemetrySubscription): Abonnement à retirer
+        """
+        with self._lock:
+            if subscription not in self._subscriptions:
+                return
+            self._subscriptions.remove(subscription)
+            unused_pids = subscription.pids - self._watched_pids()
+
+        if unused_pids:
+            self.session.call('unwatch', tuple(sorted(unused_pids)), self._dispatch)
+
+        logger.info(f"Abonné télémétrie parti ({len(self._subscriptions)} actifs)")
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Retourne l'état du diffuseur
+
+        Returns:
+            Dict[str, Any]: Abonnés, PIDs surveillés et volume diffusé
+        """
+        with self._lock:
+            return {
+                'subscribers': len(self._subscriptions),
+                'max_subscribers': self.max_subscribers,
+                'watched_pids': sorted(self._watched_pids()),
+                'samples_published': self.samples_published,
+                'dropped_samples': sum(s.dropped for s in self._subscriptions)
+            }
+
+    def _watched_pids(self) -> frozenset:
+        """
+        Union des PIDs demandés par les abonnés (à appeler sous verrou)
+
+        Returns:
+            frozenset: Noms des commandes à surveiller
+        """
+        pids = set()
+        for subscription in self._subscriptions:
+            pids |= subscription.pids
+        return frozenset(pids)
+
+    def _dispatch(self, response) -> None:
+        """
+        Callback obd.Async: redistribue une réponse aux abonnés concernés
+
+        Args:
+            response (OBDResponse): Nouvelle réponse de python-OBD
+        """
+        if response.is_null() or response.command is None:
+            return
+
+        name = response.command.name
+        sample = {'pid': name, 'time': response.time}
+        if hasattr(response.value, 'magnitude'):
+            sample['value'] = response.value.magnitude
+            sample['unit'] = str(response.value.units)
+            self.session.manager.telemetry.record(name, response.time, response.value.magnitude)
+        else:
+            sample['value'] = str(response.value)
+
+        with self._lock:
+            subscribers = [s for s in self._subscriptions if name in s.pids]
+            self.samples_published += 1
+
+        for subscription in subscribers:
+            subscription.publish(sample)
+
+    def _rewatch(self) -> None:
+        """
+        Réenregistre les watchers après une reconnexion (exécuté dans le thread de la session)
+        """
+        with self._lock:
+            pids = self._watched_pids()
+
+        if pids:
+            self.session.manager.watch(tuple(sorted(pids)), self._dispatch)
+            logger.info(f"Watchers télémétrie rétablis après reconnexion: {sorted(pids)}")
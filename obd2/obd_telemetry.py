@@ -0,0 +1,368 @@
+"""
+NovaEvo - Stockage en mémoire de la télémétrie OBD-II
+
+Ce module conserve l'historique récent des valeurs OBD-II dans des tampons
+circulaires NumPy de taille fixe (horodatage + valeur float32), un par PID,
+ainsi que des agrégats min/max/moyenne à 1 s, 10 s et 60 s. Les tableaux de
+bord peuvent ainsi afficher les 30 dernières minutes d'un capteur sans
+conserver des millions de dictionnaires Python.
+"""
+
+import os
+import math
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Type des échantillons bruts
+SAMPLE_DTYPE = np.dtype([('time', 'f8'), ('value', 'f4')])
+
+# Type des agrégats d'un niveau de sous-échantillonnage
+BUCKET_DTYPE = np.dtype([('time', 'f8'), ('min', 'f4'), ('max', 'f4'), ('mean', 'f4'), ('count', 'u4')])
+
+# Résolutions des niveaux de sous-échantillonnage (secondes)
+DEFAULT_TIERS = (1, 10, 60)
+
+
+class RingBuffer:
+    """
+    Tampon circulaire de taille fixe sur un tableau NumPy structuré
+
+    Chaque élément est écrit deux fois (positions i et i + capacité): les
+    derniers éléments sont donc toujours contigus en mémoire et view()
+    retourne une vue sans copie, même après un retour au début du tampon.
+    """
+
+    def __init__(self, capacity: int, dtype: np.dtype):
+        """
+        Initialise le tampon
+
+        Args:
+            capacity (int): Nombre maximal d'éléments conservés
+            dtype (np.dtype): Type structuré des éléments
+        """
+        self.capacity = capacity
+        self.count = 0
+        self._data = np.zeros(2 * capacity, dtype=dtype)
+        self._next = 0
+
+    def append(self, row: Tuple) -> None:
+        """
+        Ajoute un élément en O(1), en écrasant le plus ancien si le tampon est plein
+
+        Args:
+            row (Tuple): Valeurs des champs de l'élément
+        """
+        self._data[self._next] = row
+        self._data[self._next + self.capacity] = row
+        self._next = (self._next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def replace_last(self, row: Tuple) -> None:
+        """
+        Remplace le dernier élément ajouté
+
+        Args:
+            row (Tuple): Nouvelles valeurs des champs
+        """
+        index = (self._next - 1) % self.capacity
+        self._data[index] = row
+        self._data[index + self.capacity] = row
+
+    def last(self) -> Optional[np.void]:
+        """
+        Retourne le dernier élément ajouté
+
+        Returns:
+            Optional[np.void]: Élément, ou None si le tampon est vide
+        """
+        if not self.count:
+            return None
+        return self._data[self._next + self.capacity - 1]
+
+    def view(self) -> np.ndarray:
+        """
+        Retourne les éléments du plus ancien au plus récent, sans copie
+
+        La vue reflète les écritures suivantes: la copier pour la conserver.
+
+        Returns:
+            np.ndarray: Vue sur les éléments conservés
+        """
+        end = self._next + self.capacity
+        return self._data[end - self.count:end]
+
+
+class DownsampleTier:
+    """
+    Niveau de sous-échantillonnage: min/max/moyenne par intervalle fixe
+
+    Le dernier élément du tampon est l'intervalle en cours, mis à jour en place.
+    """
+
+    def __init__(self, resolution: float, capacity: int):
+        """
+        Initialise le niveau
+
+        Args:
+            resolution (float): Durée d'un intervalle en secondes
+            capacity (int): Nombre d'intervalles conservés
+        """
+        self.resolution = resolution
+        self.buffer = RingBuffer(capacity, BUCKET_DTYPE)
+
+    def add(self, timestamp: float, value: float) -> None:
+        """
+        Intègre un échantillon dans l'intervalle qui le contient
+
+        Args:
+            timestamp (float): Horodatage de l'échantillon
+            value (float): Valeur de l'échantillon
+        """
+        start = math.floor(timestamp / self.resolution) * self.resolution
+        last = self.buffer.last()
+
+        if last is None or last['time'] != start:
+            self.buffer.append((start, value, value, value, 1))
+            return
+
+        count = int(last['count']) + 1
+        mean = float(last['mean']) + (value - float(last['mean'])) / count
+        self.buffer.replace_last((start, min(last['min'], value), max(last['max'], value), mean, count))
+
+
+class TelemetryStore:
+    """
+    Historique en mémoire de la télémétrie OBD-II
+
+    Cette classe s'occupe de:
+    - Conserver un tampon circulaire d'échantillons bruts par PID
+    - Maintenir les agrégats min/max/moyenne à 1 s, 10 s et 60 s
+    - Restituer une fenêtre temporelle à la résolution adaptée
+    """
+
+    def __init__(self, capacity: Optional[int] = None,
+                 tiers: Iterable[float] = DEFAULT_TIERS,
+                 tier_capacity: Optional[int] = None):
+        """
+        Initialise le stockage
+
+        Args:
+            capacity (int, optional): Nombre d'échantillons bruts conservés par PID
+            tiers (Iterable[float]): Résolutions des niveaux de sous-échantillonnage (s)
+            tier_capacity (int, optional): Nombre d'intervalles conservés par niveau
+        """
+        self.capacity = capacity or int(os.getenv('OBD_TELEMETRY_CAPACITY', '18000'))
+        self.tier_capacity = tier_capacity or int(os.getenv('OBD_TELEMETRY_TIER_CAPACITY', '3600'))
+        self.resolutions = tuple(sorted(tiers))
+
+        self._raw = {}
+        self._tiers = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[str, float, float], Any]) -> None:
+        """
+        Enregistre une fonction appelée pour chaque nouvel échantillon enregistré
+
+        La fonction est appelée hors verrou, dans le thread qui enregistre.
+
+        Args:
+            listener (Callable[[str, float, float], Any]): Fonction (pid, horodatage, valeur)
+        """
+        self._listeners.append(listener)
+
+    def record(self, pid: str, timestamp: float, value: float) -> bool:
+        """
+        Enregistre un échantillon
+
+        Les échantillons antérieurs ou égaux au dernier horodatage du PID sont
+        ignorés (même réponse relue, ou horloge revenue en arrière).
+
+        Args:
+            pid (str): Nom de la commande (ex: "RPM")
+            timestamp (float): Horodatage de la mesure
+            value (float): Valeur mesurée
+
+        Returns:
+            bool: True si l'échantillon a été enregistré
+        """
+        timestamp = float(timestamp)
+        value = float(value)
+
+        with self._lock:
+            raw = self._raw.get(pid)
+            if raw is None:
+                raw = self._raw[pid] = RingBuffer(self.capacity, SAMPLE_DTYPE)
+                self._tiers[pid] = [DownsampleTier(r, self.tier_capacity) for r in self.resolutions]
+
+            last = raw.last()
+            if last is not None and timestamp <= last['time']:
+                return False
+
+            raw.append((timestamp, value))
+            for tier in self._tiers[pid]:
+                tier.add(timestamp, value)
+
+        for listener in self._listeners:
+            listener(pid, timestamp, value)
+        return True
+
+    def pids(self) -> List[str]:
+        """
+        Retourne les PIDs disposant d'un historique
+
+        Returns:
+            List[str]: Noms des commandes enregistrées
+        """
+        with self._lock:
+            return sorted(self._raw)
+
+    def window(self, pid: str, duration: float, end: Optional[float] = None,
+               resolution: Optional[float] = None) -> np.ndarray:
+        """
+        Retourne une fenêtre temporelle sous forme de vue NumPy, sans copie
+
+        Args:
+            pid (str): Nom de la commande
+            duration (float): Durée de la fenêtre en secondes
+            end (float, optional): Fin de la fenêtre (défaut: dernier échantillon)
+            resolution (float, optional): Niveau de sous-échantillonnage (None = brut)
+
+        Returns:
+            np.ndarray: Échantillons bruts (time, value) ou agrégats (time, min, max, mean, count)
+        """
+        with self._lock:
+            return self._window(pid, duration, end, resolution)
+
+    def series(self, pid: str, duration: float, max_points: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Retourne une fenêtre à la résolution la plus fine tenant dans max_points
+
+        Args:
+            pid (str): Nom de la commande
+            duration (float): Durée de la fenêtre en secondes
+            max_points (int, optional): Nombre maximal de points retournés
+
+        Returns:
+            Dict[str, Any]: Résolution retenue et colonnes de la fenêtre (listes)
+        """
+        with self._lock:
+            if pid not in self._raw:
+                return {"error": f"Aucune donnée enregistrée pour {pid}"}
+
+            resolution = None
+            window = self._window(pid, duration, None, None)
+            if max_points is not None and len(window) > max_points:
+                for candidate in self.resolutions:
+                    resolution = candidate
+                    window = self._window(pid, duration, None, resolution)
+                    if len(window) <= max_points:
+                        break
+
+            # Copie des colonnes sous verrou: la vue changerait à la prochaine écriture
+            return {
+                "pid": pid,
+                "resolution": resolution or 0,
+                "points": len(window),
+                **{field: window[field].tolist() for field in window.dtype.names}
+            }
+
+    def snapshot(self, pids: Iterable[str], duration: float,
+                 end: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Copie une même fenêtre temporelle pour plusieurs PIDs
+
+        Pour chaque PID, les échantillons bruts sont utilisés s'ils couvrent toute
+        la fenêtre; sinon le niveau de sous-échantillonnage le plus fin qui la
+        couvre fournit ses moyennes par intervalle.
+
+        Args:
+            pids (Iterable[str]): Noms des commandes
+            duration (float): Durée de la fenêtre en secondes
+            end (float, optional): Fin de la fenêtre (défaut: dernier échantillon des PIDs)
+
+        Returns:
+            Dict[str, Any]: Bornes de la fenêtre ("start", "end") et "signals": par PID
+            présent, un tuple (horodatages float64, valeurs float64, résolution)
+        """
+        with self._lock:
+            pids = [pid for pid in pids if pid in self._raw]
+            if end is None:
+                end = max((float(self._raw[pid].last()['time']) for pid in pids), default=0.0)
+            start = end - duration
+
+            signals = {}
+            for pid in pids:
+                raw = self._raw[pid]
+                data = self._window(pid, duration, end, None)
+                covered = raw.count < raw.capacity or raw.view()['time'][0] <= start
+                if covered:
+                    signals[pid] = (data['time'].copy(), data['value'].astype(np.float64), 0)
+                    continue
+
+                for tier in self._tiers[pid]:
+                    buckets = tier.buffer
+                    if buckets.count < buckets.capacity or buckets.view()['time'][0] <= start \
+                            or tier is self._tiers[pid][-1]:
+                        data = self._window(pid, duration, end, tier.resolution)
+                        signals[pid] = (data['time'].copy(), data['mean'].astype(np.float64),
+                                        tier.resolution)
+                        break
+
+            return {"start": start, "end": end, "signals": signals}
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Retourne l'état du stockage
+
+        Returns:
+            Dict[str, Any]: Nombre d'échantillons par PID et mémoire occupée
+        """
+        with self._lock:
+            nbytes = sum(raw._data.nbytes for raw in self._raw.values())
+            nbytes += sum(tier.buffer._data.nbytes for tiers in self._tiers.values() for tier in tiers)
+            return {
+                "pids": {pid: raw.count for pid, raw in self._raw.items()},
+                "capacity": self.capacity,
+                "resolutions": list(self.resolutions),
+                "memory_bytes": nbytes
+            }
+
+    def _window(self, pid: str, duration: float, end: Optional[float],
+                resolution: Optional[float]) -> np.ndarray:
+        """
+        Extrait une fenêtre (à appeler sous verrou)
+
+        Args:
+            pid (str): Nom de la commande
+            duration (float): Durée de la fenêtre en secondes
+            end (float, optional): Fin de la fenêtre
+            resolution (float, optional): Niveau de sous-échantillonnage
+
+        Returns:
+            np.ndarray: Vue sur les éléments de la fenêtre
+        """
+        raw = self._raw.get(pid)
+        if raw is None:
+            return np.zeros(0, dtype=SAMPLE_DTYPE if resolution is None else BUCKET_DTYPE)
+
+        if resolution is None:
+            data = raw.view()
+        else:
+            if resolution not in self.resolutions:
+                raise ValueError(f"Résolution non disponible: {resolution}")
+            data = self._tiers[pid][self.resolutions.index(resolution)].buffer.view()
+
+        times = data['time']
+        if end is None:
+            end = float(raw.last()['time'])
+        start = end - duration
+        if resolution is not None:
+            # Inclure l'intervalle qui contient le début de la fenêtre
+            start = math.floor(start / resolution) * resolution
+
+        first = np.searchsorted(times, start, side='left')
+        last = np.searchsorted(times, end, side='right')
+        return data[first:last]
@@ -6,12 +6,75 @@ import os
 import io
 import re
 import json
+import time
 import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError, as_completed, wait
 from datetime import datetime
 from dotenv import load_dotenv
 from google.cloud import vision
 from google.cloud.vision_v1 import types
 
+from utils.image_preprocessing import image_preprocessor, record_vision_latency
+from utils.metrics_manager import metrics_manager
+from utils.multi_pattern import MultiPatternMatcher
+from utils.result_cache import ResultCache, content_key
+from utils.tesseract_engine import tesseract_engine
+from utils.vision_client import get_vision_client
+
+# Version du format des résultats OCR mis en cache (à incrémenter s'il change)
+OCR_CACHE_VERSION = 1
+
+# Nombre maximal d'images par requête batch_annotate_images (limite de l'API)
+VISION_MAX_BATCH_SIZE = 16
+
+# Moteurs OCR: Vision seul, Tesseract local seul, ou Vision couvert par Tesseract
+OCR_BACKENDS = ('vision', 'tesseract', 'hedged')
+
+# Expressions régulières de l'extraction des informations du véhicule (compilées une fois)
+REGISTRATION_PATTERN = re.compile(r'[A-Z]{2}-\d{3}-[A-Z]{2}')  # format SIV: AA-123-BB
+VIN_PATTERN = re.compile(r'[A-HJ-NPR-Z0-9]{17}')  # 17 caractères, sans I, O ni Q
+DATE_PATTERNS = (
+    re.compile(r'(\d{2})[/](\d{2})[/](\d{4})'),  # JJ/MM/AAAA
+    re.compile(r'(\d{2})[.](\d{2})[.](\d{4})'),  # JJ.MM.AAAA
+    re.compile(r'(\d{2})[-](\d{2})[-](\d{4})')   # JJ-MM-AAAA
+)
+POWER_PATTERN = re.compile(r'(\d+)\s*(?:CV|CH|KW)', re.IGNORECASE)
+LETTER_PATTERN = re.compile(r'[A-Za-z]')
+# Lignes en majuscules qui ne sont pas un nom de propriétaire
+OWNER_EXCLUDED_PATTERN = re.compile(r'CARTE|CERTIFICAT|IMMATRICULATION|TYPE|MARQUE|MODELE')
+
+# Codes des rubriques de la carte grise précédant chaque champ
+FIELD_LABELS = {
+    "registration": ("A",),
+    "first_registration_date": ("B",),
+    "owner": ("C.1",),
+    "make": ("D.1",),
+    "type_variant_version": ("D.2",),
+    "model": ("D.3",),
+    "vin": ("E",),
+    "power": ("P.2", "P.6")
+}
+LABEL_CODES = frozenset(code for codes in FIELD_LABELS.values() for code in codes)
+
+# Confiance d'un champ: valeur lue dans le texte, retrouvée dans les blocs de
+# texte positionnés, sur une seule ligne, et précédée du code de sa rubrique
+FIELD_SCORE_PARSED = 0.5
+FIELD_SCORE_LOCATED = 0.2
+FIELD_SCORE_ALIGNED = 0.1
+FIELD_SCORE_LABELED = 0.2
+
+# Distance horizontale maximale entre un code de rubrique et sa valeur (en hauteurs de ligne)
+LABEL_MAX_GAP = 12
+
+# Relecture des zones des champs manquants: largeur d'une zone après le code de sa
+# rubrique et marge autour de la ligne (en hauteurs de ligne), hauteur de ligne visée
+# après agrandissement (pixels) et agrandissement maximal
+ROI_ZONE_WIDTH = 20
+ROI_ZONE_MARGIN = 0.5
+ROI_LINE_HEIGHT = 64
+ROI_MAX_SCALE = 4.0
+
 # Configuration du logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,18 +89,37 @@ class OCRProcessor:
     """Classe pour traiter les images avec OCR"""
     
     def __init__(self):
-        """Initialisation du client Google Cloud Vision"""
-        # Vérifier si les identifiants sont configurés
-        if os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
-            try:
-                self.client = vision.ImageAnnotatorClient()
-                logger.info("Client Google Cloud Vision initialisé avec succès")
-            except Exception as e:
-                logger.error(f"Erreur lors de l'initialisation du client Vision: {str(e)}")
-                self.client = None
-        else:
+        """Initialisation du processeur OCR"""
+        # Vérifier si les identifiants sont configurés. Le client lui-même est partagé
+        # par tout le processus et créé au premier appel (voir utils/vision_client.py)
+        self.vision_configured = bool(os.getenv('GOOGLE_APPLICATION_CREDENTIALS'))
+        self._client = None
+        if not self.vision_configured:
             logger.warning("AVERTISSEMENT: Identifiants Google Cloud Vision non configurés!")
-            self.client = None
+        
+        # Réduction et recompression des images avant envoi à l'API
+        self.preprocessor = image_preprocessor
+        
+        # Résultats déjà calculés, par contenu d'image
+        self.cache = ResultCache('ocr')
+        
+        # Traitement par lot: images par requête Vision et pool de threads borné
+        self.batch_size = int(os.getenv('OCR_BATCH_SIZE', str(VISION_MAX_BATCH_SIZE)))
+        self.batch_workers = int(os.getenv('OCR_BATCH_WORKERS', '4'))
+        self._batch_executor = None
+        self._batch_lock = threading.Lock()
+        
+        # Moteur local (pool de processus Tesseract), utilisé hors ligne ou en couverture de Vision
+        self.tesseract = tesseract_engine
+        self.backend = os.getenv('OCR_BACKEND', 'vision').lower()
+        if self.backend not in OCR_BACKENDS:
+            logger.warning(f"Moteur OCR inconnu: {self.backend}, Vision utilisé")
+            self.backend = 'vision'
+        self.hedge_delay = float(os.getenv('OCR_HEDGE_DELAY_MS', '1500')) / 1000
+        self.hedge_min_confidence = float(os.getenv('OCR_HEDGE_MIN_CONFIDENCE', '60'))
+        
+        # Relecture agrandie des zones des champs manquants quand la confiance est basse
+        self.roi_enabled = os.getenv('OCR_ROI_ENABLED', 'True').lower() in ('true', '1', 't')
             
         # Dictionnaire de correspondance pour les marques de véhicule (pour une meilleure détection)
         self.car_brands = {
@@ -78,20 +160,41 @@ class OCRProcessor:
             "TESLA": "Tesla",
             "DS": "DS Automobiles"
         }
+        # Automate de recherche des marques: une seule passe par ligne pour toutes les marques
+        self.brand_matcher = MultiPatternMatcher(self.car_brands)
             
+    @property
+    def client(self):
+        """Client Google Cloud Vision partagé, ou None s'il n'est pas configuré"""
+        if self._client is not None:
+            return self._client
+        if not self.vision_configured:
+            return None
+        try:
+            return get_vision_client()
+        except Exception as e:
+            logger.error(f"Erreur lors de l'initialisation du client Vision: {str(e)}")
+            return None
+    
+    @client.setter
+    def client(self, client):
+        self._client = client
+    
     def process_image(self, image_path=None, image_content=None):
         """
         Traite une image pour en extraire le texte
+        
+        Selon OCR_BACKEND, le texte est lu par Google Cloud Vision ("vision"), par
+        le moteur Tesseract local ("tesseract"), ou par Vision couvert par
+        Tesseract s'il tarde à répondre ("hedged"). Sans Vision configuré, le
+        moteur local est utilisé s'il est installé.
+        
         Args:
             image_path (str, optional): Chemin vers le fichier image local
-            image_content (bytes, optional): Contenu de l'image en bytes
+            image_content (bytes | memoryview, optional): Contenu de l'image en mémoire
         Returns:
             dict: Résultat de l'OCR avec le texte extrait
         """
-        if not self.client:
-            logger.error("Client Google Cloud Vision non configuré")
-            return {"error": "Client Google Cloud Vision non configuré. Vérifiez votre configuration API."}
-        
         try:
             # Préparer l'image
             if image_path:
@@ -100,42 +203,35 @@ class OCRProcessor:
                     content = image_file.read()
             elif image_content:
                 logger.info("Traitement d'image à partir du contenu binaire")
+                # Pas de copie ici: la clé de cache est calculée sur le tampon reçu et
+                # la préparation produit les bytes attendus par l'API
                 content = image_content
             else:
                 logger.error("Aucune image fournie pour le traitement OCR")
                 return {"error": "Aucune image fournie"}
             
-            image = types.Image(content=content)
-            
-            # Effectuer la détection de texte
-            response = self.client.text_detection(image=image)
-            texts = response.text_annotations
+            if self.backend == 'tesseract':
+                return self.tesseract.recognize(content)
             
-            # Vérifier si l'API a détecté des textes
-            if not texts:
-                logger.warning("Aucun texte détecté dans l'image")
-                return {
-                    "success": True,
-                    "message": "Aucun texte détecté dans l'image"
-                }
+            # Même image déjà analysée: pas de nouvel appel à l'API
+            cache_key = self._cache_key(content)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("Résultat OCR retrouvé dans le cache")
+                cached["cached"] = True
+                return cached
             
-            # Extraire le texte complet (premier élément) et tous les blocs de texte
-            full_text = texts[0].description
-            logger.info(f"Texte extrait avec succès: {len(full_text)} caractères")
+            client = self.client
+            if not client:
+                if self.tesseract.available:
+                    logger.info("Google Cloud Vision non configuré, OCR avec Tesseract")
+                    return self.tesseract.recognize(content)
+                logger.error("Client Google Cloud Vision non configuré")
+                return {"error": "Client Google Cloud Vision non configuré. Vérifiez votre configuration API."}
             
-            text_blocks = [
-                {
-                    "text": text.description,
-                    "bounding_poly": [[vertex.x, vertex.y] for vertex in text.bounding_poly.vertices]
-                }
-                for text in texts[1:]  # Ignorer le premier qui contient tout le texte
-            ]
-            
-            return {
-                "success": True,
-                "full_text": full_text,
-                "text_blocks": text_blocks
-            }
+            if self.backend == 'hedged' and self.tesseract.available:
+                return self._process_hedged(client, content, cache_key)
+            return self._detect_text(client, content, cache_key)
                 
         except Exception as e:
             logger.error(f"Erreur lors de l'analyse OCR: {str(e)}")
@@ -143,11 +239,473 @@ class OCRProcessor:
                 "error": f"Erreur lors de l'analyse OCR: {str(e)}"
             }
     
+    def _detect_text(self, client, content, cache_key):
+        """
+        Lit le texte d'une image avec Google Cloud Vision et met le résultat en cache
+        
+        Args:
+            client (vision.ImageAnnotatorClient): Client Vision
+            content (bytes | memoryview): Contenu de l'image
+            cache_key (str): Clé du résultat dans le cache
+            
+        Returns:
+            dict: Résultat de l'OCR
+        """
+        # Réduire, redresser et recompresser l'image avant l'envoi
+        content, preprocessing = self.preprocessor.prepare(content, 'ocr')
+        image = types.Image(content=content)
+        
+        # Effectuer la détection de texte
+        started = time.perf_counter()
+        response = client.text_detection(image=image)
+        record_vision_latency('text_detection', started)
+        
+        result = self._build_result(response, preprocessing)
+        
+        # Une réponse en erreur ne doit pas être resservie depuis le cache
+        if not response.error.message:
+            self.cache.set(cache_key, result)
+        return result
+    
+    def _process_hedged(self, client, content, cache_key):
+        """
+        Lit le texte avec Vision et lance Tesseract en parallèle si Vision tarde
+        
+        Vision est appelé dans un thread dédié (voir _start_vision_call). Sans
+        réponse exploitable après OCR_HEDGE_DELAY_MS, la même image est soumise au
+        pool Tesseract, et le premier résultat suffisant l'emporte (voir
+        _good_enough). Une réponse de Vision arrivée après coup est tout de même
+        mise en cache.
+        
+        Args:
+            client (vision.ImageAnnotatorClient): Client Vision
+            content (bytes | memoryview): Contenu de l'image
+            cache_key (str): Clé du résultat Vision dans le cache
+            
+        Returns:
+            dict: Résultat de l'OCR ("engine": "tesseract" si le moteur local l'emporte)
+        """
+        # Le tampon reçu peut être libéré par l'appelant avant la fin de l'appel Vision
+        content = content if isinstance(content, bytes) else bytes(content)
+        futures = {self._start_vision_call(self._detect_text, client, content, cache_key): 'vision'}
+        
+        done, _ = wait(futures, timeout=self.hedge_delay)
+        if not done or not self._good_enough(self._future_result(next(iter(done)))):
+            logger.info(f"Vision sans réponse après {self.hedge_delay * 1000:.0f} ms, OCR local lancé")
+            futures[self.tesseract.submit(content)] = 'tesseract'
+            self._count_hedge('started')
+        
+        fallback = None
+        try:
+            for future in as_completed(futures, timeout=self.tesseract.timeout):
+                result = self._future_result(future)
+                if futures[future] == 'tesseract':
+                    self.tesseract.record(result)
+                if self._good_enough(result):
+                    if len(futures) > 1:
+                        self._count_hedge(f"won_{futures[future]}")
+                    for other in futures:
+                        other.cancel()
+                    return result
+                if fallback is None or "error" in fallback:
+                    fallback = result
+        except TimeoutError:
+            logger.error(f"Aucun moteur OCR n'a répondu en {self.tesseract.timeout} s")
+        
+        return fallback or {"error": "Aucun moteur OCR n'a répondu à temps"}
+    
+    @staticmethod
+    def _start_vision_call(func, *args):
+        """
+        Lance un appel à Vision des modes "hedged" dans un thread dédié
+        
+        Le pool des lots (OCR_BATCH_WORKERS threads) peut être occupé par les
+        groupes de /ocr/batch: un appel mis en file y attendrait, et le délai
+        OCR_HEDGE_DELAY_MS mesurerait cette attente au lieu de la latence de
+        Vision. Le Future est marqué en cours dès sa création: l'appel ne peut
+        pas être interrompu, et l'annulation des moteurs restants l'ignore.
+        
+        Args:
+            func (callable): Appel à Vision (_detect_text ou _annotate_batch)
+            *args: Arguments de l'appel
+            
+        Returns:
+            Future: Résultat de l'appel
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+        
+        def run():
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+        threading.Thread(target=run, name='ocr-hedge-vision', daemon=True).start()
+        return future
+    
+    def _good_enough(self, result):
+        """
+        Indique si un résultat peut être retourné sans attendre l'autre moteur
+        
+        Args:
+            result (dict): Résultat de Vision ou de Tesseract
+            
+        Returns:
+            bool: True pour une réponse de Vision sans erreur, ou un texte lu par
+            Tesseract avec une confiance moyenne d'au moins OCR_HEDGE_MIN_CONFIDENCE
+        """
+        if "error" in result:
+            return False
+        if result.get("engine") != 'tesseract':
+            return True
+        return bool(result.get("full_text")) and \
+            result["tesseract"]["mean_confidence"] >= self.hedge_min_confidence
+    
+    @staticmethod
+    def _future_result(future):
+        """
+        Résultat d'un moteur, les exceptions étant converties en erreur
+        
+        Args:
+            future (Future): Appel à Vision ou à Tesseract
+            
+        Returns:
+            dict: Résultat de l'OCR ou {"error": ...}
+        """
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error(f"Erreur lors de l'analyse OCR: {str(e)}")
+            return {"error": f"Erreur lors de l'analyse OCR: {str(e)}"}
+    
+    @staticmethod
+    def _count_hedge(outcome):
+        """
+        Compte une requête de couverture dans les métriques
+        
+        Args:
+            outcome (str): "started", "won_vision" ou "won_tesseract"
+        """
+        try:
+            metrics_manager.increment_counter(f'ocr_hedge_{outcome}')
+        except Exception as e:
+            logger.warning(f"Erreur lors de l'enregistrement des métriques OCR: {str(e)}")
+    
+    def process_batch(self, images):
+        """
+        Traite un groupe d'images avec une seule requête batch_annotate_images
+        
+        Les images déjà présentes dans le cache ne sont pas renvoyées à l'API. Le
+        moteur suit les règles de process_image: Tesseract seul avec OCR_BACKEND
+        "tesseract" ou sans Vision configuré, Vision couvert par Tesseract en mode
+        "hedged".
+        
+        Args:
+            images (list): Contenus des images (bytes | memoryview), au plus VISION_MAX_BATCH_SIZE
+            
+        Returns:
+            list: Un résultat par image, dans l'ordre reçu (voir process_image)
+        """
+        if len(images) > VISION_MAX_BATCH_SIZE:
+            raise ValueError(f"Au plus {VISION_MAX_BATCH_SIZE} images par requête Vision")
+        
+        if self.backend == 'tesseract':
+            return self._recognize_local(images)
+        
+        results = [None] * len(images)
+        pending = []
+        for index, content in enumerate(images):
+            if not content:
+                results[index] = {"error": "Aucune image fournie"}
+                continue
+            cache_key = self._cache_key(content)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                cached["cached"] = True
+                results[index] = cached
+            else:
+                pending.append((index, cache_key, content))
+        
+        if not pending:
+            return results
+        client = self.client
+        if not client:
+            if self.tesseract.available:
+                logger.info("Google Cloud Vision non configuré, OCR avec Tesseract")
+                pending_results = self._recognize_local([content for _, _, content in pending])
+            else:
+                logger.error("Client Google Cloud Vision non configuré")
+                pending_results = [{"error": "Client Google Cloud Vision non configuré. Vérifiez votre configuration API."}
+                                   for _ in pending]
+        elif self.backend == 'hedged' and self.tesseract.available:
+            pending_results = self._process_batch_hedged(client, pending)
+        else:
+            pending_results = self._annotate_batch(client, pending)
+        
+        for (index, _, _), result in zip(pending, pending_results):
+            results[index] = result
+        return results
+    
+    def _annotate_batch(self, client, pending):
+        """
+        Lit le texte d'un groupe d'images avec Google Cloud Vision et met les résultats en cache
+        
+        Args:
+            client (vision.ImageAnnotatorClient): Client Vision
+            pending (list): (index, clé de cache, contenu) des images à lire
+            
+        Returns:
+            list: Un résultat par image de pending, dans le même ordre
+        """
+        results = []
+        try:
+            requests, preprocessing = [], []
+            for _, _, content in pending:
+                content, details = self.preprocessor.prepare(content, 'ocr')
+                preprocessing.append(details)
+                requests.append(vision.AnnotateImageRequest(
+                    image=types.Image(content=content),
+                    features=[vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)]
+                ))
+            
+            started = time.perf_counter()
+            batch = client.batch_annotate_images(requests=requests)
+            record_vision_latency('batch_text_detection', started)
+            
+            for (_, cache_key, _), response, details in zip(pending, batch.responses, preprocessing):
+                if response.error.message:
+                    results.append({"error": f"Erreur lors de l'analyse OCR: {response.error.message}"})
+                    continue
+                result = self._build_result(response, details)
+                self.cache.set(cache_key, result)
+                results.append(result)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'analyse OCR par lot: {str(e)}")
+            return results + [{"error": f"Erreur lors de l'analyse OCR: {str(e)}"}
+                              for _ in range(len(pending) - len(results))]
+        
+        # Réponse incomplète de l'API
+        return results + [{"error": "Aucune réponse de l'API pour cette image"}
+                          for _ in range(len(pending) - len(results))]
+    
+    def _process_batch_hedged(self, client, pending):
+        """
+        Lit un groupe d'images avec Vision et lance Tesseract en parallèle si Vision tarde
+        
+        Mêmes règles que _process_hedged, image par image: sans réponse exploitable
+        de Vision après OCR_HEDGE_DELAY_MS, les images concernées sont soumises au
+        pool Tesseract et le premier résultat suffisant l'emporte pour chacune.
+        La requête Vision part dans un thread dédié (voir _start_vision_call).
+        
+        Args:
+            client (vision.ImageAnnotatorClient): Client Vision
+            pending (list): (index, clé de cache, contenu) des images à lire
+            
+        Returns:
+            list: Un résultat par image de pending ("engine": "tesseract" si le moteur local l'emporte)
+        """
+        # Le tampon reçu peut être libéré par l'appelant avant la fin de l'appel Vision
+        pending = [(index, cache_key, content if isinstance(content, bytes) else bytes(content))
+                   for index, cache_key, content in pending]
+        vision_future = self._start_vision_call(self._annotate_batch, client, pending)
+        
+        done, _ = wait([vision_future], timeout=self.hedge_delay)
+        vision_results = self._future_result(vision_future) if done else None
+        futures = {vision_future: None}
+        for position, (_, _, content) in enumerate(pending):
+            if isinstance(vision_results, list) and self._good_enough(vision_results[position]):
+                continue
+            futures[self.tesseract.submit(content)] = position
+            self._count_hedge('started')
+        if len(futures) > 1:
+            logger.info(f"Vision sans réponse exploitable après {self.hedge_delay * 1000:.0f} ms, "
+                        f"OCR local lancé pour {len(futures) - 1} image(s)")
+        
+        results = [None] * len(pending)
+        fallbacks = [None] * len(pending)
+        
+        def offer(position, result, engine):
+            if results[position] is not None:
+                return
+            if self._good_enough(result):
+                results[position] = result
+                if position in futures.values():
+                    self._count_hedge(f"won_{engine}")
+            elif fallbacks[position] is None or "error" in fallbacks[position]:
+                fallbacks[position] = result
+        
+        try:
+            for future in as_completed(futures, timeout=self.tesseract.timeout):
+                position = futures[future]
+                result = self._future_result(future)
+                if position is None:
+                    # Une seule réponse de Vision pour tout le groupe
+                    if not isinstance(result, list):
+                        result = [result] * len(pending)
+                    for vision_position, vision_result in enumerate(result):
+                        offer(vision_position, vision_result, 'vision')
+                else:
+                    self.tesseract.record(result)
+                    offer(position, result, 'tesseract')
+                if all(item is not None for item in results):
+                    break
+        except TimeoutError:
+            logger.error(f"Aucun moteur OCR n'a répondu en {self.tesseract.timeout} s")
+        
+        for future in futures:
+            future.cancel()
+        return [result or fallback or {"error": "Aucun moteur OCR n'a répondu à temps"}
+                for result, fallback in zip(results, fallbacks)]
+    
+    def _recognize_local(self, images):
+        """
+        Lit le texte d'un groupe d'images avec le pool Tesseract, en parallèle
+        
+        Args:
+            images (list): Contenus des images (bytes | memoryview, vide pour une image absente)
+            
+        Returns:
+            list: Un résultat par image, dans l'ordre reçu, ou {"error": ...}
+        """
+        if not self.tesseract.available:
+            return [{"error": "Tesseract OCR non disponible"} for _ in images]
+        futures = [self.tesseract.submit(content) if content else None for content in images]
+        wait([future for future in futures if future], timeout=self.tesseract.timeout)
+        
+        results = []
+        for future in futures:
+            if future is None:
+                results.append({"error": "Aucune image fournie"})
+            elif not future.done():
+                future.cancel()
+                logger.error(f"Tesseract OCR n'a pas répondu en {self.tesseract.timeout} s")
+                results.append({"error": f"Tesseract OCR n'a pas répondu en {self.tesseract.timeout} s"})
+            else:
+                results.append(self._future_result(future))
+                self.tesseract.record(results[-1])
+        return results
+    
+    def iter_batch(self, images, batch_size=None):
+        """
+        Traite un lot d'images par groupes, en parallèle sur un pool borné
+        
+        Les groupes (au plus batch_size images, une requête Vision chacun) sont
+        exécutés par le pool partagé de OCR_BATCH_WORKERS threads. Les résultats
+        sont produits au fur et à mesure que les groupes se terminent.
+        
+        Args:
+            images (list): Contenus des images (bytes | memoryview)
+            batch_size (int, optional): Images par requête Vision (défaut: OCR_BATCH_SIZE)
+            
+        Yields:
+            tuple: (index de l'image dans le lot, résultat de l'OCR)
+        """
+        batch_size = max(1, min(batch_size or self.batch_size, VISION_MAX_BATCH_SIZE))
+        executor = self._get_batch_executor()
+        futures = {}
+        for start in range(0, len(images), batch_size):
+            indexes = list(range(start, min(start + batch_size, len(images))))
+            futures[executor.submit(self.process_batch, [images[i] for i in indexes])] = indexes
+        
+        try:
+            for future in as_completed(futures):
+                indexes = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    logger.error(f"Erreur lors de l'analyse OCR par lot: {str(e)}")
+                    results = [{"error": f"Erreur lors de l'analyse OCR: {str(e)}"}] * len(indexes)
+                for index, result in zip(indexes, results):
+                    yield index, result
+        finally:
+            # Client déconnecté: les groupes pas encore démarrés sont abandonnés
+            for future in futures:
+                future.cancel()
+    
+    def _get_batch_executor(self):
+        """
+        Retourne le pool de threads des traitements par lot (créé au premier usage)
+        
+        Returns:
+            ThreadPoolExecutor: Pool borné à OCR_BATCH_WORKERS threads
+        """
+        with self._batch_lock:
+            if self._batch_executor is None:
+                self._batch_executor = ThreadPoolExecutor(
+                    max_workers=self.batch_workers, thread_name_prefix='ocr-batch'
+                )
+            return self._batch_executor
+    
+    def _cache_key(self, content):
+        """
+        Clé de cache d'une image (contenu reçu et paramètres de préparation)
+        
+        Args:
+            content (bytes | memoryview): Contenu de l'image
+            
+        Returns:
+            str: Clé du cache
+        """
+        return content_key(content, f"ocr:{OCR_CACHE_VERSION}:{self.preprocessor.signature('ocr')}")
+    
+    def _build_result(self, response, preprocessing):
+        """
+        Construit le résultat de l'OCR à partir d'une réponse de l'API
+        
+        Args:
+            response (AnnotateImageResponse): Réponse de Vision pour une image
+            preprocessing (dict): Détails de la préparation de l'image
+            
+        Returns:
+            dict: Texte complet et blocs de texte
+        """
+        texts = response.text_annotations
+        
+        # Vérifier si l'API a détecté des textes
+        if not texts:
+            logger.warning("Aucun texte détecté dans l'image")
+            return {
+                "success": True,
+                "message": "Aucun texte détecté dans l'image",
+                "preprocessing": preprocessing
+            }
+        
+        # Extraire le texte complet (premier élément) et tous les blocs de texte
+        full_text = texts[0].description
+        logger.info(f"Texte extrait avec succès: {len(full_text)} caractères")
+        
+        # Coordonnées ramenées à la résolution d'origine (image redressée) si l'image a été réduite
+        scale_x, scale_y = 1.0, 1.0
+        if preprocessing.get("resized"):
+            scale_x = preprocessing["original_size"][0] / preprocessing["size"][0]
+            scale_y = preprocessing["original_size"][1] / preprocessing["size"][1]
+        
+        text_blocks = [
+            {
+                "text": text.description,
+                "bounding_poly": [[round(vertex.x * scale_x), round(vertex.y * scale_y)]
+                                  for vertex in text.bounding_poly.vertices]
+            }
+            for text in texts[1:]  # Ignorer le premier qui contient tout le texte
+        ]
+        
+        return {
+            "success": True,
+            "full_text": full_text,
+            "text_blocks": text_blocks,
+            "preprocessing": preprocessing
+        }
+    
     def extract_vehicle_info(self, ocr_result):
         """
         Extraire les informations du véhicule à partir du résultat OCR
         Spécifiquement adapté pour les cartes grises françaises
         
+        Les lignes du texte sont parcourues une seule fois: chaque ligne est
+        soumise aux champs pas encore trouvés (la première occurrence l'emporte).
+        La confiance de chaque champ est calculée à partir des positions des
+        blocs de texte (voir _field_confidence).
+        
         Args:
             ocr_result (dict): Résultat OCR de process_image()
             
@@ -172,123 +730,454 @@ class OCRProcessor:
             "type_variant_version": None,
             "power": None
         }
+        # Texte d'origine de chaque champ, recherché ensuite dans les blocs de texte
+        sources = {}
         
-        # Extraire les blocs de texte en lignes
-        lines = full_text.split('\n')
-        cleaned_lines = [line.strip() for line in lines if line.strip()]
-        
-        # Expression régulière pour l'immatriculation (format français: AA-123-BB ou AB-123-CD)
-        reg_pattern = r'[A-Z]{2}-\d{3}-[A-Z]{2}'
-        for line in cleaned_lines:
-            reg_match = re.search(reg_pattern, line)
-            if reg_match:
-                vehicle_info["registration"] = reg_match.group(0)
-                logger.info(f"Immatriculation détectée: {vehicle_info['registration']}")
-                break
+        current_year = datetime.now().year
+        owner_length = 0
         
-        # Détecter le VIN (numéro de châssis) - 17 caractères alphanumériques
-        vin_pattern = r'[A-HJ-NPR-Z0-9]{17}'
-        for line in cleaned_lines:
-            vin_match = re.search(vin_pattern, line)
-            if vin_match:
-                candidate = vin_match.group(0)
-                # Vérifier que c'est bien un VIN (pas de I, O, Q)
-                if not any(c in "IOQ" for c in candidate):
-                    vehicle_info["vin"] = candidate
+        for line in full_text.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            
+            # Immatriculation (format français: AA-123-BB)
+            if vehicle_info["registration"] is None:
+                reg_match = REGISTRATION_PATTERN.search(line)
+                if reg_match:
+                    vehicle_info["registration"] = sources["registration"] = reg_match.group(0)
+                    logger.info(f"Immatriculation détectée: {vehicle_info['registration']}")
+            
+            # VIN (numéro de châssis): la classe de caractères exclut déjà I, O et Q
+            if vehicle_info["vin"] is None:
+                vin_match = VIN_PATTERN.search(line)
+                if vin_match:
+                    vehicle_info["vin"] = sources["vin"] = vin_match.group(0)
                     logger.info(f"VIN détecté: {vehicle_info['vin']}")
-                    break
-        
-        # Recherche de marque et modèle
-        for line in cleaned_lines:
-            upper_line = line.upper()
-            # Chercher des correspondances avec les marques connues
-            for brand_key in self.car_brands:
-                if brand_key in upper_line:
-                    vehicle_info["make"] = self.car_brands[brand_key]
+            
+            # Marque (la première marque connue de la liste présente sur la ligne) et modèle
+            if vehicle_info["make"] is None:
+                upper_line = line.upper()
+                brand_match = self.brand_matcher.first(upper_line)
+                if brand_match:
+                    brand_index, brand_key = brand_match
+                    vehicle_info["make"] = self.brand_matcher.values[brand_key]
+                    sources["make"] = brand_key
                     logger.info(f"Marque détectée: {vehicle_info['make']}")
                     
                     # Essayer d'extraire le modèle (ce qui suit la marque)
-                    brand_index = upper_line.find(brand_key)
-                    if brand_index >= 0 and len(upper_line) > brand_index + len(brand_key) + 1:
+                    if len(upper_line) > brand_index + len(brand_key) + 1:
                         remainder = upper_line[brand_index + len(brand_key):].strip()
                         # Si le reste contient des lettres, c'est probablement le modèle
-                        if re.search(r'[A-Za-z]', remainder):
-                            vehicle_info["model"] = remainder.strip('.,;: ')
+                        if LETTER_PATTERN.search(remainder):
+                            vehicle_info["model"] = sources["model"] = remainder.strip('.,;: ')
                             logger.info(f"Modèle détecté: {vehicle_info['model']}")
-                    break
             
-            # Si on a trouvé la marque, on sort de la boucle
-            if vehicle_info["make"]:
-                break
-        
-        # Recherche de date de 1ère immatriculation (formats: JJ/MM/AAAA ou JJ.MM.AAAA)
-        date_patterns = [
-            r'(\d{2})[/](\d{2})[/](\d{4})',  # JJ/MM/AAAA
-            r'(\d{2})[.](\d{2})[.](\d{4})',  # JJ.MM.AAAA
-            r'(\d{2})[-](\d{2})[-](\d{4})'   # JJ-MM-AAAA
-        ]
-        
-        for line in cleaned_lines:
-            for pattern in date_patterns:
-                date_match = re.search(pattern, line)
-                if date_match:
-                    day, month, year = date_match.groups()
-                    try:
-                        # Vérifier que la date est valide
-                        date_obj = datetime(int(year), int(month), int(day))
-                        if 1900 <= date_obj.year <= datetime.now().year:
-                            vehicle_info["first_registration_date"] = f"{day}/{month}/{year}"
-                            logger.info(f"Date de 1ère immatriculation: {vehicle_info['first_registration_date']}")
-                            break
-                    except ValueError:
-                        # Date invalide, continuer la recherche
-                        pass
+            # Date de 1ère immatriculation (formats: JJ/MM/AAAA, JJ.MM.AAAA ou JJ-MM-AAAA)
+            if vehicle_info["first_registration_date"] is None:
+                date = self._parse_date(line, current_year)
+                if date:
+                    vehicle_info["first_registration_date"], sources["first_registration_date"] = date
+                    logger.info(f"Date de 1ère immatriculation: {vehicle_info['first_registration_date']}")
             
-            # Si on a trouvé la date, on sort de la boucle
-            if vehicle_info["first_registration_date"]:
-                break
-        
-        # Recherche de puissance (ex: 5CV, 110CH, etc.)
-        power_pattern = r'(\d+)\s*(?:CV|CH|KW)'
-        for line in cleaned_lines:
-            power_match = re.search(power_pattern, line, re.IGNORECASE)
-            if power_match:
-                power_value = power_match.group(1)
-                power_unit = power_match.group(0)[len(power_value):].strip()
-                vehicle_info["power"] = f"{power_value} {power_unit}"
-                logger.info(f"Puissance détectée: {vehicle_info['power']}")
-                break
+            # Puissance (ex: 5CV, 110CH, etc.)
+            if vehicle_info["power"] is None:
+                power = self._parse_power(line)
+                if power:
+                    vehicle_info["power"], sources["power"] = power
+                    logger.info(f"Puissance détectée: {vehicle_info['power']}")
+            
+            # Propriétaire: la plus longue ligne en majuscules contenant un espace,
+            # hors lignes contenant probablement des informations techniques
+            if len(line) > max(owner_length, 5) and ' ' in line and line.isupper() \
+                    and not OWNER_EXCLUDED_PATTERN.search(line):
+                vehicle_info["owner"] = sources["owner"] = line
+                owner_length = len(line)
         
-        # Recherche de propriétaire (généralement un nom en majuscules)
-        # Cette logique est simplifiée et pourrait nécessiter des ajustements
-        owner_candidates = []
-        for line in cleaned_lines:
-            # Si la ligne est principalement en majuscules et contient au moins un espace
-            if line.isupper() and ' ' in line and len(line) > 5:
-                # Éviter les lignes qui contiennent probablement des informations techniques
-                if not any(keyword in line for keyword in ['CARTE', 'CERTIFICAT', 'IMMATRICULATION', 'TYPE', 'MARQUE', 'MODELE']):
-                    owner_candidates.append(line)
-        
-        if owner_candidates:
-            # Prendre le candidat le plus long comme nom du propriétaire
-            vehicle_info["owner"] = max(owner_candidates, key=len)
+        if vehicle_info["owner"]:
             logger.info(f"Propriétaire potentiel détecté: {vehicle_info['owner']}")
         
-        # Vérifier la qualité des informations extraites
-        info_quality = sum(1 for value in vehicle_info.values() if value is not None)
-        info_percentage = (info_quality / len(vehicle_info)) * 100
-        logger.info(f"Qualité de l'extraction: {info_percentage:.2f}% ({info_quality}/{len(vehicle_info)} champs)")
-        
-        # Préparer la réponse avec une indication de confiance
-        confidence_level = "haute" if info_percentage > 70 else "moyenne" if info_percentage > 40 else "basse"
+        # Confiance par champ, et confiance globale (moyenne sur tous les champs)
+        field_confidence = self._field_confidence(vehicle_info, sources, ocr_result.get("text_blocks") or [])
+        summary = self._summarize_confidence(vehicle_info, field_confidence)
+        logger.info(f"Qualité de l'extraction: {summary['extraction_quality']}")
         
-        return {
+        result = {
             "success": True,
             "vehicle_info": vehicle_info,
             "raw_text": full_text,
-            "confidence": confidence_level,
+            "confidence": summary["confidence"],
+            "confidence_score": summary["confidence_score"],
+            "field_confidence": field_confidence,
+            "extraction_quality": summary["extraction_quality"]
+        }
+        # Moteur ayant lu le texte (Tesseract en repli ou en couverture de Vision)
+        for key in ("engine", "note"):
+            if key in ocr_result:
+                result[key] = ocr_result[key]
+        return result
+    
+    @staticmethod
+    def _parse_date(line, current_year):
+        """
+        Cherche une date valide dans une ligne (JJ/MM/AAAA, JJ.MM.AAAA ou JJ-MM-AAAA)
+        
+        Args:
+            line (str): Ligne de texte
+            current_year (int): Année en cours (dates postérieures ignorées)
+            
+        Returns:
+            tuple: (date au format JJ/MM/AAAA, texte lu), ou None
+        """
+        for pattern in DATE_PATTERNS:
+            date_match = pattern.search(line)
+            if date_match:
+                day, month, year = date_match.groups()
+                try:
+                    # Vérifier que la date est valide
+                    date_obj = datetime(int(year), int(month), int(day))
+                except ValueError:
+                    # Date invalide, continuer la recherche
+                    continue
+                if 1900 <= date_obj.year <= current_year:
+                    return f"{day}/{month}/{year}", date_match.group(0)
+        return None
+    
+    @staticmethod
+    def _parse_power(line):
+        """
+        Cherche une puissance dans une ligne (ex: 5CV, 110CH, 81 KW)
+        
+        Args:
+            line (str): Ligne de texte
+            
+        Returns:
+            tuple: (puissance "valeur unité", texte lu), ou None
+        """
+        power_match = POWER_PATTERN.search(line)
+        if not power_match:
+            return None
+        power_value = power_match.group(1)
+        power_unit = power_match.group(0)[len(power_value):].strip()
+        return f"{power_value} {power_unit}", power_match.group(0)
+    
+    @staticmethod
+    def _summarize_confidence(vehicle_info, field_confidence):
+        """
+        Calcule la confiance globale et la qualité d'une extraction
+        
+        Args:
+            vehicle_info (dict): Champs extraits
+            field_confidence (dict): Confiance de chaque champ
+            
+        Returns:
+            dict: confidence (haute, moyenne, basse), confidence_score (moyenne des
+            champs) et extraction_quality (pourcentage de champs trouvés)
+        """
+        info_quality = sum(1 for value in vehicle_info.values() if value is not None)
+        info_percentage = (info_quality / len(vehicle_info)) * 100
+        confidence_score = sum(field_confidence.values()) / len(field_confidence)
+        return {
+            "confidence": "haute" if confidence_score > 0.7 else "moyenne" if confidence_score > 0.4 else "basse",
+            "confidence_score": round(confidence_score, 2),
             "extraction_quality": f"{info_percentage:.2f}%"
         }
+    
+    def refine_vehicle_info(self, extraction, ocr_result, image_path=None, image_content=None):
+        """
+        Relit les zones des champs manquants d'une extraction de confiance basse
+        
+        Les codes de rubrique (A, D.1, D.2, E, P.6...) retrouvés dans les blocs de
+        texte situent la zone de chaque champ manquant. Seules ces zones sont
+        découpées dans l'image, agrandies (lignes d'environ ROI_LINE_HEIGHT pixels)
+        et relues ensemble: une seule requête Vision pour toutes les zones, ou une
+        tâche par zone sur le pool Tesseract si le texte a été lu par Tesseract.
+        Les valeurs relues complètent l'extraction et la confiance est recalculée.
+        
+        Args:
+            extraction (dict): Résultat de extract_vehicle_info()
+            ocr_result (dict): Résultat OCR de l'image entière
+            image_path (str, optional): Chemin vers le fichier image local
+            image_content (bytes | memoryview, optional): Contenu de l'image en mémoire
+            
+        Returns:
+            dict: Extraction complétée ("refined_fields": champs relus), ou inchangée
+        """
+        if not self.roi_enabled or "error" in extraction or extraction.get("confidence") != "basse":
+            return extraction
+        
+        vehicle_info = extraction["vehicle_info"]
+        missing = [field for field, value in vehicle_info.items() if value is None]
+        zones = self._locate_zones(missing, ocr_result.get("text_blocks") or [])
+        if not zones:
+            return extraction
+        logger.info(f"Confiance basse: relecture de {len(zones)} zone(s) ({', '.join(zone[0] for zone in zones)})")
+        
+        try:
+            if image_path:
+                with io.open(image_path, 'rb') as image_file:
+                    image_content = image_file.read()
+            if not image_content:
+                return extraction
+            crops = self.preprocessor.crop(image_content, [zone[1] for zone in zones], [zone[2] for zone in zones])
+            texts = self._read_zones(crops, ocr_result.get("engine"))
+        except Exception as e:
+            logger.error(f"Erreur lors de la relecture des zones: {str(e)}")
+            return extraction
+        
+        refined = []
+        field_confidence = extraction["field_confidence"]
+        for (field, _, _), text in zip(zones, texts):
+            value = self._read_zone_field(field, text) if text else None
+            if value:
+                vehicle_info[field] = value
+                # Valeur lue dans la zone de sa rubrique
+                field_confidence[field] = round(FIELD_SCORE_PARSED + FIELD_SCORE_LABELED, 2)
+                refined.append(field)
+                logger.info(f"Champ relu dans sa zone: {field} = {value}")
+        self._count_roi(len(zones), len(refined))
+        
+        if refined:
+            extraction.update(self._summarize_confidence(vehicle_info, field_confidence))
+            extraction["refined_fields"] = refined
+        return extraction
+    
+    def _locate_zones(self, fields, text_blocks):
+        """
+        Situe la zone de chaque champ à partir du code de sa rubrique
+        
+        La zone couvre la ligne du code (première occurrence) et s'étend à sa
+        droite sur ROI_ZONE_WIDTH hauteurs de ligne, là où se trouve la valeur.
+        
+        Args:
+            fields (list): Champs recherchés
+            text_blocks (list): Blocs de texte du résultat OCR
+            
+        Returns:
+            list: (champ, zone (gauche, haut, droite, bas), agrandissement) par champ situé
+        """
+        if not text_blocks:
+            return []
+        _, _, labels = self._index_text_blocks(text_blocks)
+        
+        zones = []
+        for field in fields:
+            for label in FIELD_LABELS.get(field, ()):
+                if label not in labels:
+                    continue
+                left, top, right, bottom = self._block_bounds(text_blocks[labels[label][0]])
+                height = max(bottom - top, 1)
+                margin = ROI_ZONE_MARGIN * height
+                box = (left - margin, top - margin, right + ROI_ZONE_WIDTH * height, bottom + margin)
+                zones.append((field, box, min(max(ROI_LINE_HEIGHT / height, 1.0), ROI_MAX_SCALE)))
+                break
+        return zones
+    
+    def _read_zones(self, crops, engine=None):
+        """
+        Lit le texte des zones découpées, en parallèle
+        
+        Args:
+            crops (list): Zones en PNG (None pour une zone vide)
+            engine (str, optional): Moteur ayant lu l'image entière
+            
+        Returns:
+            list: Texte de chaque zone (None si elle n'a pas pu être lue)
+        """
+        if engine == 'tesseract' or self.backend == 'tesseract' or not self.client:
+            results = self._recognize_local(crops)
+        else:
+            # Un seul appel batch_annotate_images pour toutes les zones
+            results = self.process_batch(crops)
+        return [result.get("full_text") if "error" not in result else None for result in results]
+    
+    def _read_zone_field(self, field, text):
+        """
+        Extrait la valeur d'un champ du texte lu dans sa zone
+        
+        Le code de la rubrique en tête de zone est ignoré, et la valeur s'arrête
+        au code de rubrique suivant (ex: "P.2 81 KW P.6 5 CV").
+        
+        Args:
+            field (str): Champ recherché
+            text (str): Texte de la zone
+            
+        Returns:
+            str: Valeur du champ, ou None
+        """
+        lines = [line.split() for line in text.split('\n') if line.strip()]
+        # Ligne du code de rubrique (la zone peut déborder sur les lignes voisines)
+        tokens = next((line for line in lines if line[0].upper().strip('().:') in LABEL_CODES),
+                      [token for line in lines for token in line])
+        while tokens and tokens[0].upper().strip('().:') in LABEL_CODES:
+            tokens = tokens[1:]
+        for index, token in enumerate(tokens):
+            if token.upper().strip('().:') in LABEL_CODES:
+                tokens = tokens[:index]
+                break
+        value = ' '.join(tokens)
+        if not value:
+            return None
+        
+        if field == "registration":
+            match = REGISTRATION_PATTERN.search(value.upper())
+            return match.group(0) if match else None
+        if field == "vin":
+            match = VIN_PATTERN.search(value.upper().replace(' ', ''))
+            return match.group(0) if match else None
+        if field == "make":
+            brand_match = self.brand_matcher.first(value.upper())
+            return self.brand_matcher.values[brand_match[1]] if brand_match else None
+        if field == "first_registration_date":
+            date = self._parse_date(value, datetime.now().year)
+            return date[0] if date else None
+        if field == "power":
+            power = self._parse_power(value)
+            return power[0] if power else None
+        # Modèle, type-variante-version, propriétaire: texte de la zone
+        return value.strip('.,;: ') or None
+    
+    @staticmethod
+    def _count_roi(zones, filled):
+        """
+        Compte les zones relues et les champs complétés dans les métriques
+        
+        Args:
+            zones (int): Zones relues
+            filled (int): Champs complétés
+        """
+        try:
+            metrics_manager.increment_counter('ocr_roi_zones', zones)
+            metrics_manager.increment_counter('ocr_roi_filled', filled)
+        except Exception as e:
+            logger.warning(f"Erreur lors de l'enregistrement des métriques OCR: {str(e)}")
+    
+    def _field_confidence(self, vehicle_info, sources, text_blocks):
+        """
+        Calcule la confiance de chaque champ extrait à partir des blocs de texte positionnés
+        
+        Un champ lu dans le texte vaut FIELD_SCORE_PARSED. S'y ajoutent:
+        - FIELD_SCORE_LOCATED si sa valeur correspond à une suite de blocs de texte
+        - FIELD_SCORE_ALIGNED si ces blocs sont sur une même ligne de l'image
+        - FIELD_SCORE_LABELED si le code de sa rubrique (ex: "E" pour le VIN) est
+          sur la même ligne, juste à gauche de la valeur
+        Sans blocs de texte (ex: résultat de Tesseract), seul le premier score s'applique.
+        
+        Args:
+            vehicle_info (dict): Champs extraits
+            sources (dict): Texte d'origine de chaque champ trouvé
+            text_blocks (list): Blocs de texte du résultat OCR (texte et bounding_poly)
+            
+        Returns:
+            dict: Confiance de chaque champ entre 0 et 1 (0 pour un champ non trouvé)
+        """
+        texts, starts, labels = self._index_text_blocks(text_blocks)
+        
+        confidence = {}
+        for field in vehicle_info:
+            source = sources.get(field)
+            if source is None:
+                confidence[field] = 0.0
+                continue
+            
+            score = FIELD_SCORE_PARSED
+            run = self._locate_text(source, texts, starts) if texts else None
+            if run is not None:
+                score += FIELD_SCORE_LOCATED
+                boxes = [self._block_bounds(text_blocks[index]) for index in run]
+                
+                # Hauteur de ligne: médiane des blocs de la valeur
+                heights = sorted(bottom - top for _, top, _, bottom in boxes)
+                height = max(heights[len(heights) // 2], 1)
+                centers = [(top + bottom) / 2 for _, top, _, bottom in boxes]
+                if max(centers) - min(centers) <= height / 2:
+                    score += FIELD_SCORE_ALIGNED
+                
+                value_left, value_center = boxes[0][0], centers[0]
+                for label in FIELD_LABELS.get(field, ()):
+                    for index in labels.get(label, ()):
+                        _, top, right, bottom = self._block_bounds(text_blocks[index])
+                        if abs((top + bottom) / 2 - value_center) <= height \
+                                and value_left - LABEL_MAX_GAP * height <= right <= value_left + height / 2:
+                            score += FIELD_SCORE_LABELED
+                            break
+                    else:
+                        continue
+                    break
+            
+            confidence[field] = round(score, 2)
+        return confidence
+    
+    @staticmethod
+    def _index_text_blocks(text_blocks):
+        """
+        Prépare les blocs de texte pour la recherche des valeurs et des codes de rubrique
+        
+        Args:
+            text_blocks (list): Blocs de texte du résultat OCR, dans l'ordre de lecture
+            
+        Returns:
+            tuple: (textes des blocs en majuscules, indices des blocs par premier
+                    caractère, indices des blocs de codes de rubrique par code)
+        """
+        texts, starts, labels = [], {}, {}
+        for index, block in enumerate(text_blocks):
+            text = (block.get("text") or '').upper()
+            texts.append(text)
+            if not text:
+                continue
+            starts.setdefault(text[0], []).append(index)
+            code = text.strip('().:')
+            if code in LABEL_CODES:
+                labels.setdefault(code, []).append(index)
+        return texts, starts, labels
+    
+    @staticmethod
+    def _locate_text(source, texts, starts):
+        """
+        Cherche la suite de blocs de texte consécutifs formant une valeur
+        
+        Args:
+            source (str): Texte de la valeur (les espaces sont ignorés)
+            texts (list): Textes des blocs en majuscules (voir _index_text_blocks)
+            starts (dict): Indices des blocs par premier caractère
+            
+        Returns:
+            range: Indices des blocs formant la valeur, ou None si elle n'est pas retrouvée
+        """
+        target = source.upper().replace(' ', '')
+        if not target:
+            return None
+        for first in starts.get(target[0], ()):
+            if not target.startswith(texts[first]):
+                continue
+            length = len(texts[first])
+            last = first
+            while length < len(target) and last + 1 < len(texts):
+                text = texts[last + 1]
+                if not text or not target.startswith(text, length):
+                    break
+                length += len(text)
+                last += 1
+            if length == len(target):
+                return range(first, last + 1)
+        return None
+    
+    @staticmethod
+    def _block_bounds(block):
+        """
+        Rectangle englobant d'un bloc de texte
+        
+        Args:
+            block (dict): Bloc de texte (bounding_poly: liste de sommets [x, y])
+            
+        Returns:
+            tuple: (gauche, haut, droite, bas)
+        """
+        vertices = block.get("bounding_poly") or [[0, 0]]
+        xs = [vertex[0] for vertex in vertices]
+        ys = [vertex[1] for vertex in vertices]
+        return min(xs), min(ys), max(xs), max(ys)
 
     def validate_registration(self, registration):
         """
@@ -307,45 +1196,29 @@ class OCRProcessor:
         pattern = r'^[A-Z]{2}-\d{3}-[A-Z]{2}$'
         return bool(re.match(pattern, registration))
 
-    def fallback_to_tesseract(self, image_path):
+    def fallback_to_tesseract(self, image_path=None, image_content=None):
         """
         Méthode de repli vers Tesseract OCR si Google Cloud Vision n'est pas configuré
         
+        L'image est reconnue par le pool de processus Tesseract (binarisée et
+        redressée), sans bloquer d'autre requête que celle-ci.
+        
         Args:
-            image_path (str): Chemin vers l'image
+            image_path (str, optional): Chemin vers l'image
+            image_content (bytes | memoryview, optional): Contenu de l'image en mémoire
             
         Returns:
             dict: Résultat de l'OCR avec le texte extrait
         """
-        try:
-            import pytesseract
-            from PIL import Image
-            
-            logger.info("Utilisation de Tesseract OCR comme fallback")
-            img = Image.open(image_path)
-            
-            # Prétraitement de l'image pour améliorer la reconnaissance
-            # Tesseract fonctionne mieux avec des images en noir et blanc à fort contraste
-            
-            # Extraire le texte avec Tesseract
-            extracted_text = pytesseract.image_to_string(img, lang='fra')
-            
-            if extracted_text:
-                return {
-                    "success": True,
-                    "full_text": extracted_text,
-                    "text_blocks": [],
-                    "note": "Texte extrait avec Tesseract OCR (solution de repli)"
-                }
-            else:
-                return {"error": "Aucun texte détecté avec Tesseract OCR"}
-                
-        except ImportError:
-            logger.error("Impossible de fallback vers Tesseract OCR: module pytesseract non installé")
-            return {"error": "Tesseract OCR non disponible"}
-        except Exception as e:
-            logger.error(f"Erreur lors de l'utilisation de Tesseract OCR: {str(e)}")
-            return {"error": f"Erreur avec Tesseract: {str(e)}"}
+        logger.info("Utilisation de Tesseract OCR comme fallback")
+        result = self.tesseract.recognize(content=image_content, image_path=image_path)
+        if "error" in result:
+            return result
+        if not result.get("full_text"):
+            return {"error": "Aucun texte détecté avec Tesseract OCR"}
+        
+        result["note"] = "Texte extrait avec Tesseract OCR (solution de repli)"
+        return result
 
 def extraire_infos_carte_grise(image_path):
     """
@@ -366,7 +1239,7 @@ def extraire_infos_carte_grise(image_path):
         result = ocr.fallback_to_tesseract(image_path)
     
     if "error" not in result:
-        return ocr.extract_vehicle_info(result)
+        return ocr.refine_vehicle_info(ocr.extract_vehicle_info(result), result, image_path=image_path)
     else:
         return result
 
@@ -4,14 +4,23 @@ Tests unitaires pour le module de reconnaissance d'image
 import unittest
 import sys
 import os
+import io
 import json
+import time
+import tempfile
 from unittest.mock import patch, MagicMock
 
 # Ajouter le répertoire parent au chemin d'importation
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Importer les modules à tester
-from image_recognition.image_recognition_main import ImageRecognitionEngine, detect_labels
+from image_recognition.image_recognition_main import ImageRecognitionEngine, detect_labels, scan_labels
+from utils.upload_buffer import UploadBuffer
+from utils.image_preprocessing import ImagePreprocessor
+from utils.micro_batcher import MicroBatcher
+from utils.perceptual_hash import BKTree, NearDuplicateIndex, dhash, dhash_content, hamming
+from utils.result_cache import ResultCache
+from utils.vision_client import VisionClientProvider, vision_client_provider
 
 
 class TestImageRecognitionModule(unittest.TestCase):
@@ -41,9 +50,15 @@ class TestImageRecognitionModule(unittest.TestCase):
                 with open(self.sample_image_path, 'wb') as f:
                     f.write(b'')
         
+        # Le client Vision partagé doit être recréé avec les mocks de chaque test
+        vision_client_provider.reset()
+        
         # Patcher les appels à Google Cloud Vision pour éviter les appels réels à l'API
         self.vision_client_patcher = patch('google.cloud.vision.ImageAnnotatorClient')
         self.mock_vision_client = self.vision_client_patcher.start()
+        # Pas de canal gRPC réel (ni de recherche d'identifiants) pour les clients simulés
+        self.transport_patcher = patch('utils.vision_client.ImageAnnotatorGrpcTransport')
+        self.transport_patcher.start()
         
         # Configurer le mock pour simuler une réponse
         mock_response = MagicMock()
@@ -58,10 +73,24 @@ class TestImageRecognitionModule(unittest.TestCase):
         self.engine = ImageRecognitionEngine()
         self.engine.vision_client = self.mock_vision_client.return_value
         self.engine.vision_api_available = True
+        
+        # Chaque test simule sa propre réponse de l'API: pas de cache partagé
+        self.engine.cache = ResultCache('labels', enabled=False)
+        self.label_cache_patcher = patch('image_recognition.image_recognition_main.label_cache',
+                                         ResultCache('labels', enabled=False))
+        self.label_cache_patcher.start()
+        self.engine.label_index = NearDuplicateIndex('labels', enabled=False)
+        self.label_index_patcher = patch('image_recognition.image_recognition_main.label_index',
+                                         NearDuplicateIndex('labels', enabled=False))
+        self.label_index_patcher.start()
 
     def tearDown(self):
         """Nettoyage après les tests"""
         self.vision_client_patcher.stop()
+        self.transport_patcher.stop()
+        self.label_cache_patcher.stop()
+        self.label_index_patcher.stop()
+        vision_client_provider.reset()
 
     def test_engine_initialization(self):
         """Test de l'initialisation du moteur de reconnaissance d'image"""
@@ -111,6 +140,16 @@ class TestImageRecognitionModule(unittest.TestCase):
             # Vérifier que l'API a été appelée
             mock_client.return_value.label_detection.assert_called_once()
 
+    def test_detect_labels_reuses_shared_client(self):
+        """La fonction autonome ne recrée pas de client Vision à chaque appel"""
+        with patch('image_recognition.image_recognition_main.vision.ImageAnnotatorClient') as mock_client:
+            mock_client.return_value.label_detection.return_value.label_annotations = []
+            detect_labels(self.sample_image_path)
+            detect_labels(self.sample_image_path)
+            
+            mock_client.assert_called_once()
+            self.assertEqual(mock_client.return_value.label_detection.call_count, 2)
+
     def test_detect_labels_returns_dict(self):
         """
         Test que la fonction detect_labels retourne un dictionnaire
@@ -231,6 +270,498 @@ class TestImageRecognitionModule(unittest.TestCase):
             self.assertIn("error", result)
             self.assertIn("API Error", result["error"])
 
+    def test_detect_labels_from_memory(self):
+        """Test de la détection de labels sur un contenu en mémoire (memoryview)"""
+        with open(self.sample_image_path, 'rb') as f:
+            content = memoryview(f.read())
+        
+        self.engine.preprocessor = ImagePreprocessor(enabled=False)
+        with patch('image_recognition.image_recognition_main.io.open') as mock_open:
+            result = self.engine.detect_labels(image_content=content)
+            mock_open.assert_not_called()
+        
+        self.assertTrue(result["success"])
+        image = self.engine.vision_client.label_detection.call_args.kwargs['image']
+        self.assertEqual(image.content, content.tobytes())
+
+    def test_analyze_image_from_memory(self):
+        """Test de l'analyse d'une image encodée en mémoire (cv2.imdecode)"""
+        import cv2
+        import numpy as np
+        
+        ok, encoded = cv2.imencode('.png', np.zeros((40, 60, 3), dtype=np.uint8))
+        self.assertTrue(ok)
+        
+        self.engine.net = None
+        result = self.engine.analyze_image(image_content=memoryview(encoded.tobytes()))
+        self.assertTrue(result["success"])
+        self.assertEqual(result["dimensions"], {"width": 60, "height": 40})
+        
+        result = self.engine.analyze_image(image_content=b"pas une image")
+        self.assertIn("error", result)
+
+
+    def _detection_net(self):
+        """Réseau de détection simulé: une détection sûre et une incertaine par image du lot"""
+        import numpy as np
+        net = MagicMock()
+        
+        def forward():
+            batch = net.setInput.call_args[0][0].shape[0]
+            rows = []
+            for index in range(batch):
+                rows.append([index, 1, 0.9, 0.1, 0.2, 0.5, 0.6])
+                rows.append([index, 2, 0.3, 0.0, 0.0, 1.0, 1.0])
+            return np.array(rows, dtype=np.float32).reshape(1, 1, -1, 7)
+        net.forward.side_effect = forward
+        return net
+    
+    def _encoded(self, width, height):
+        """Image PNG noire encodée"""
+        import cv2
+        import numpy as np
+        return cv2.imencode('.png', np.zeros((height, width, 3), dtype=np.uint8))[1].tobytes()
+    
+    def test_analyze_images_single_forward_pass(self):
+        """Un lot d'images est analysé en une passe du modèle, détections réparties par image"""
+        self.engine.net = self._detection_net()
+        self.engine.labels = {1: "pare-choc"}
+        
+        results = self.engine.analyze_images([self._encoded(100, 50), b"pas une image", self._encoded(200, 400)])
+        
+        self.engine.net.forward.assert_called_once()
+        self.assertEqual(self.engine.net.setInput.call_args[0][0].shape, (2, 3, 300, 300))
+        self.assertIn("error", results[1])
+        self.assertEqual(results[0]["detected_count"], 1)
+        self.assertEqual(results[0]["detections"][0]["class"], "pare-choc")
+        self.assertEqual(results[0]["detections"][0]["bounding_box"],
+                         {"x_min": 10, "y_min": 10, "x_max": 50, "y_max": 30})
+        self.assertEqual(results[2]["detections"][0]["bounding_box"],
+                         {"x_min": 20, "y_min": 80, "x_max": 100, "y_max": 240})
+        
+        # Au-delà de DNN_BATCH_SIZE images, une passe par groupe
+        self.engine.batch_size = 2
+        self.engine.net.forward.reset_mock()
+        self.engine.analyze_images([self._encoded(20, 20)] * 5)
+        self.assertEqual(self.engine.net.forward.call_count, 3)
+    
+    def test_concurrent_requests_share_forward_pass(self):
+        """Les analyses simultanées d'une image sont regroupées en un lot"""
+        import threading
+        self.engine.net = self._detection_net()
+        self.engine.batcher.max_delay = 0.2
+        
+        results = [None] * 4
+        def analyze(index):
+            results[index] = self.engine.analyze_image(image_content=self._encoded(40 * (index + 1), 40))
+        threads = [threading.Thread(target=analyze, args=(index,)) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.engine.net.forward.assert_called_once()
+        self.assertEqual([result["dimensions"]["width"] for result in results], [40, 80, 120, 160])
+        self.assertTrue(all(result["detected_count"] == 1 for result in results))
+        self.engine.batcher.shutdown()
+
+    
+    def test_model_loaded_on_first_use(self):
+        """Le modèle est chargé au premier usage, une seule fois, puis préchauffé"""
+        net = self._detection_net()
+        with patch('image_recognition.image_recognition_main.os.path.exists', return_value=True), \
+                patch('image_recognition.image_recognition_main.cv2.dnn.readNetFromTensorflow',
+                      return_value=net) as read_net, \
+                patch.object(ImageRecognitionEngine, '_load_labels'):
+            engine = ImageRecognitionEngine()
+            read_net.assert_not_called()
+            
+            engine.batch_size = 4
+            status = engine.warm_up()
+            self.assertTrue(status["model_loaded"])
+            self.assertEqual(status["batch_sizes"], [1, 4])
+            self.assertEqual([call[0][0].shape[0] for call in net.setInput.call_args_list], [1, 4])
+            
+            engine.analyze_images([self._encoded(20, 20)])
+            read_net.assert_called_once()
+        
+        # Fichiers absents: analyse de base, sans nouvelle tentative de chargement
+        with patch('image_recognition.image_recognition_main.os.path.exists', return_value=False):
+            engine = ImageRecognitionEngine()
+            self.assertFalse(engine.warm_up()["model_loaded"])
+            self.assertEqual(engine.analyze_images([self._encoded(20, 20)])[0]["type"], "basic_analysis")
+    
+    def test_basic_analysis_color_histogram(self):
+        """Les proportions de couleurs de l'histogramme unique sont celles des masques inRange"""
+        import cv2
+        import numpy as np
+        image = np.random.default_rng(7).integers(0, 256, (120, 160, 3), dtype=np.uint8)
+        
+        distribution = self.engine._basic_image_analysis(image)["colors"]["distribution"]
+        
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        for color, lower, upper in (("rouge", [0, 100, 100], [10, 255, 255]),
+                                    ("jaune", [20, 100, 100], [35, 255, 255]),
+                                    ("vert", [35, 50, 50], [85, 255, 255]),
+                                    ("bleu", [85, 50, 50], [130, 255, 255])):
+            mask = cv2.inRange(hsv, np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8))
+            self.assertAlmostEqual(distribution[color], cv2.countNonZero(mask) / image[..., 0].size * 100)
+        
+        # Grande image: analysée sur une copie réduite, dimensions d'origine rapportées
+        self.engine.basic_max_edge = 64
+        large = np.zeros((300, 401, 3), dtype=np.uint8)
+        large[:, :200] = (0, 0, 255)  # rouge (BGR)
+        result = self.engine._basic_image_analysis(large)
+        self.assertEqual(result["dimensions"], {"width": 401, "height": 300})
+        self.assertEqual(result["colors"]["dominant"], "rouge")
+        self.assertAlmostEqual(result["colors"]["distribution"]["rouge"], 50.0, delta=2.0)
+    
+    def test_scan_labels_single_pass(self):
+        """Un parcours unique donne les anomalies (mots-clés imbriqués compris) et le lien automobile"""
+        labels = {"Rust damaged bumper": 0.6, "sky": 0.95, "Broken headlight": 0.8}
+        
+        anomalies, car_related = scan_labels(labels)
+        
+        self.assertTrue(car_related)
+        self.assertEqual(
+            [(anomaly["type"], anomaly["label"]) for anomaly in anomalies],
+            [("broken", "Broken headlight"), ("damage", "Rust damaged bumper"),
+             ("damaged", "Rust damaged bumper"), ("rust", "Rust damaged bumper")]
+        )
+        self.assertEqual([anomaly["score"] for anomaly in anomalies], [0.8, 0.6, 0.6, 0.6])
+        self.assertEqual(self.engine._detect_anomalies(labels), anomalies)
+        self.assertTrue(self.engine._is_car_related(labels))
+        
+        # Aucun mot-clé à cheval sur deux labels
+        self.assertEqual(scan_labels({"ca": 0.5, "r": 0.5}), ([], False))
+        self.assertEqual(scan_labels({}), ([], False))
+    
+    def _photo(self, seed):
+        """Photo synthétique: aplats de couleurs et bruit de capteur"""
+        import cv2
+        import numpy as np
+        rng = np.random.default_rng(seed)
+        blocks = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+        image = cv2.resize(blocks, (640, 480), interpolation=cv2.INTER_LINEAR)
+        noise = rng.normal(0, 6, image.shape).astype(np.int16)
+        return np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    
+    def test_near_duplicate_labels_reuse_vision_call(self):
+        """Une photo recompressée et recadrée de la même pièce reprend les labels déjà obtenus"""
+        import cv2
+        photo = self._photo(1)
+        first = cv2.imencode('.jpg', photo, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+        retake = cv2.imencode('.jpg', photo[10:-10, 12:-12], [cv2.IMWRITE_JPEG_QUALITY, 60])[1].tobytes()
+        other = cv2.imencode('.jpg', self._photo(2))[1].tobytes()
+        self.engine.label_index = NearDuplicateIndex('labels', enabled=True, radius=6)
+        self.engine.vision_client.label_detection.return_value.error.message = ""
+        
+        result = self.engine.detect_labels(image_content=first)
+        self.assertNotIn("cached", result)
+        
+        similar = self.engine.detect_labels(image_content=retake)
+        self.assertTrue(similar["cached"])
+        self.assertLessEqual(similar["near_duplicate"]["distance"], 6)
+        self.assertEqual(similar["labels"], result["labels"])
+        self.assertEqual(self.engine.vision_client.label_detection.call_count, 1)
+        
+        # Autre pièce, ou image unie (hash non significatif): nouvel appel à l'API
+        self.engine.detect_labels(image_content=other)
+        self.engine.detect_labels(image_content=self._encoded(64, 64))
+        self.engine.detect_labels(image_content=self._encoded(64, 64))
+        self.assertEqual(self.engine.vision_client.label_detection.call_count, 4)
+    
+    def test_near_duplicate_analysis_skips_forward_pass(self):
+        """Une photo quasi identique n'entraîne pas de nouvelle passe du modèle"""
+        photo = self._photo(3)
+        self.engine.net = self._detection_net()
+        self.engine.batcher.max_delay = 0
+        
+        first = self.engine.analyze_image(image_array=photo)
+        similar = self.engine.analyze_image(image_array=photo[8:, 8:])
+        
+        self.engine.net.forward.assert_called_once()
+        self.assertTrue(similar["cached"])
+        self.assertEqual([(d["class"], d["confidence"]) for d in similar["detections"]],
+                         [(d["class"], d["confidence"]) for d in first["detections"]])
+        self.assertEqual(similar["possible_diagnoses"], first["possible_diagnoses"])
+        
+        # Autre seuil de confiance: résultats distincts
+        self.engine.confidence_threshold = 0.2
+        self.engine.analyze_image(image_array=photo)
+        self.assertEqual(self.engine.net.forward.call_count, 2)
+
+    def test_near_duplicate_analysis_rescaled(self):
+        """Une photo quasi identique d'une autre résolution reçoit ses propres dimensions et boîtes"""
+        import cv2
+        photo = self._photo(4)
+        self.engine.net = self._detection_net()
+        self.engine.batcher.max_delay = 0
+        
+        first = self.engine.analyze_image(image_array=photo)
+        smaller = self.engine.analyze_image(image_array=cv2.resize(photo, (320, 240), interpolation=cv2.INTER_AREA))
+        cropped = self.engine.analyze_image(image_array=photo[:, 10:-10])
+        
+        self.engine.net.forward.assert_called_once()
+        self.assertEqual(first["dimensions"], {"width": 640, "height": 480})
+        self.assertTrue(smaller["cached"])
+        self.assertEqual(smaller["dimensions"], {"width": 320, "height": 240})
+        self.assertEqual(smaller["detections"][0]["bounding_box"],
+                         {"x_min": 32, "y_min": 48, "x_max": 160, "y_max": 144})
+        self.assertTrue(cropped["cached"])
+        self.assertEqual(cropped["dimensions"], {"width": 620, "height": 480})
+        self.assertLessEqual(cropped["detections"][0]["bounding_box"]["x_max"], 620)
+        # Le résultat de la première photo reste en pixels de celle-ci
+        self.assertEqual(first["detections"][0]["bounding_box"]["x_max"], 320)
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    """Tests de l'index des images quasi identiques"""
+
+    def test_bk_tree_matches_linear_scan(self):
+        """Le BK-tree retrouve exactement les hash dans le rayon"""
+        import random
+        generator = random.Random(5)
+        values = [generator.getrandbits(64) for _ in range(300)]
+        # Variantes proches de quelques hash
+        values += [value ^ (1 << generator.randrange(64)) ^ (1 << generator.randrange(64)) for value in values[:40]]
+        tree = BKTree()
+        for index, value in enumerate(values):
+            tree.add(value, index)
+        
+        for query in values[:60:3] + [generator.getrandbits(64) for _ in range(10)]:
+            for radius in (0, 4, 12):
+                expected = sorted((hamming(query, value), index) for index, value in enumerate(values)
+                                  if hamming(query, value) <= radius)
+                self.assertEqual(sorted(tree.search(query, radius)), expected)
+    
+    def test_dhash_stable_and_uniform_skipped(self):
+        """Le hash d'une image encodée est celui de l'image décodée; une image unie n'a pas de hash"""
+        import cv2
+        import numpy as np
+        image = np.zeros((240, 320, 3), dtype=np.uint8)
+        cv2.rectangle(image, (40, 30), (200, 180), (255, 255, 255), -1)
+        
+        self.assertEqual(dhash(image), dhash_content(cv2.imencode('.png', image)[1].tobytes()))
+        self.assertIsNone(dhash(np.full((50, 50, 3), 128, dtype=np.uint8)))
+        self.assertIsNone(dhash_content(b"pas une image"))
+    
+    def test_namespaces_eviction_and_expiry(self):
+        """Les résultats sont séparés par espace de noms, bornés en nombre et en durée"""
+        index = NearDuplicateIndex('test', radius=2, max_entries=3, ttl=60, enabled=True, metrics=MagicMock())
+        index.set('a', 0b1111, {"value": 1})
+        
+        result, distance = index.get('a', 0b1110)
+        self.assertEqual((result, distance), ({"value": 1}, 1))
+        result["value"] = 2
+        self.assertEqual(index.get('a', 0b1111)[0], {"value": 1})
+        self.assertIsNone(index.get('b', 0b1111))
+        self.assertIsNone(index.get('a', 0b0000))
+        self.assertIsNone(index.get('a', None))
+        
+        # Au-delà de max_entries, les plus anciennes sont retirées (arbres reconstruits)
+        for value in range(4, 10):
+            index.set('a', value << 8, {"value": value})
+        self.assertIsNone(index.get('a', 0b1111))
+        self.assertEqual(index.get('a', 9 << 8)[0], {"value": 9})
+        self.assertEqual(index.status()["entries"], 3)
+        
+        with patch('utils.perceptual_hash.time.time', return_value=time.time() + 120):
+            self.assertIsNone(index.get('a', 9 << 8))
+
+class TestMicroBatcher(unittest.TestCase):
+    """Tests du regroupement des requêtes concurrentes"""
+
+    def test_batch_error_reaches_every_caller(self):
+        """Une erreur du traitement d'un lot est transmise à chaque appelant"""
+        def fail(items):
+            raise ValueError("modèle indisponible")
+        batcher = MicroBatcher(fail, max_batch_size=4, max_delay=0.05, metrics=MagicMock())
+        futures = [batcher.submit(index) for index in range(3)]
+        for future in futures:
+            with self.assertRaises(ValueError):
+                future.result(timeout=5)
+        batcher.shutdown()
+
+    def test_batch_size_bounded(self):
+        """Les lots ne dépassent pas max_batch_size; sans fenêtre, le traitement est direct"""
+        sizes = []
+        def double(items):
+            sizes.append(len(items))
+            return [item * 2 for item in items]
+        batcher = MicroBatcher(double, max_batch_size=2, max_delay=0.05, metrics=MagicMock())
+        futures = [batcher.submit(index) for index in range(5)]
+        self.assertEqual([future.result(timeout=5) for future in futures], [0, 2, 4, 6, 8])
+        self.assertTrue(all(size <= 2 for size in sizes))
+        batcher.shutdown()
+        
+        self.assertEqual(MicroBatcher(double, max_delay=0).process(21), 42)
+
+
+class TestVisionClientProvider(unittest.TestCase):
+    """Tests du client Google Cloud Vision partagé"""
+
+    def test_lazy_pool_and_keepalive(self):
+        """Clients créés au premier appel, en tourniquet, avec keepalive sur le canal"""
+        provider = VisionClientProvider(pool_size=2, keepalive_ms=20000)
+        with patch('utils.vision_client.vision.ImageAnnotatorClient',
+                   side_effect=lambda transport: MagicMock(transport=transport)) as mock_client, \
+                patch('utils.vision_client.ImageAnnotatorGrpcTransport') as mock_transport:
+            self.assertEqual(provider.status()["clients"], 0)
+            mock_client.assert_not_called()
+            
+            clients = [provider.get() for _ in range(4)]
+            self.assertEqual(mock_client.call_count, 2)
+            self.assertIsNot(clients[0], clients[1])
+            self.assertEqual(clients[2:], clients[:2])
+            
+            # Le client reçoit une instance de transport, sur un canal créé avec le keepalive
+            self.assertIs(clients[0].transport, mock_transport.return_value)
+            self.assertIs(mock_transport.call_args.kwargs['channel'], mock_transport.create_channel.return_value)
+            options = dict(mock_transport.create_channel.call_args.kwargs['options'])
+            self.assertEqual(options["grpc.keepalive_time_ms"], 20000)
+            self.assertEqual(options["grpc.max_send_message_length"], -1)
+            self.assertEqual(options["grpc.use_local_subchannel_pool"], 1)
+    
+    def test_real_client_created(self):
+        """Le client de la bibliothèque installée accepte le transport construit (sans réseau)"""
+        from google.auth.credentials import AnonymousCredentials
+        from google.cloud import vision
+        with patch('google.auth.default', return_value=(AnonymousCredentials(), None)):
+            client = VisionClientProvider(pool_size=1).get()
+        self.assertIsInstance(client, vision.ImageAnnotatorClient)
+        self.assertEqual(client.transport.kind, 'grpc')
+
+    def test_recreated_after_fork(self):
+        """Un processus enfant ne réutilise pas les canaux de son parent"""
+        provider = VisionClientProvider(pool_size=1)
+        with patch('utils.vision_client.vision.ImageAnnotatorClient',
+                   side_effect=lambda transport: MagicMock()) as mock_client, \
+                patch('utils.vision_client.ImageAnnotatorGrpcTransport'):
+            parent = provider.get()
+            self.assertIs(provider.get(), parent)
+            
+            with patch('utils.vision_client.os.getpid', return_value=os.getpid() + 1):
+                child = provider.get()
+            self.assertIsNot(child, parent)
+            self.assertEqual(mock_client.call_count, 2)
+
+
+class TestImagePreprocessor(unittest.TestCase):
+    """Tests de la préparation des images avant envoi à Google Cloud Vision"""
+
+    def setUp(self):
+        """Préparation avec un gestionnaire de métriques simulé"""
+        self.metrics = MagicMock()
+        self.preprocessor = ImagePreprocessor(enabled=True, ocr_max_edge=800, labels_max_edge=400,
+                                              quality=80, image_format='JPEG', ocr_grayscale=True,
+                                              metrics=self.metrics)
+
+    def _encode(self, size, image_format='PNG', orientation=None):
+        """Encode une image de test bruitée (difficile à compresser)"""
+        from PIL import Image
+        import numpy as np
+        
+        pixels = np.random.default_rng(0).integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+        image = Image.fromarray(pixels)
+        output = io.BytesIO()
+        if orientation is not None:
+            exif = Image.Exif()
+            exif[0x0112] = orientation
+            image.save(output, format='JPEG', exif=exif)
+        else:
+            image.save(output, format=image_format)
+        return output.getvalue()
+
+    def test_downscale_and_recompress(self):
+        """Une grande image est réduite, recompressée et les métriques enregistrées"""
+        from PIL import Image
+        
+        content = self._encode((1200, 900))
+        prepared, info = self.preprocessor.prepare(memoryview(content), 'labels')
+        
+        self.assertTrue(info["resized"])
+        self.assertEqual(info["original_size"], [1200, 900])
+        self.assertEqual(info["size"], [400, 300])
+        self.assertEqual(info["bytes"], len(prepared))
+        self.assertEqual(info["bytes_saved"], len(content) - len(prepared))
+        self.assertGreater(info["bytes_saved"], 0)
+        
+        with Image.open(io.BytesIO(prepared)) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (400, 300))
+        
+        recorded = {call.args[0]: call.args[1] for call in self.metrics.record_value.call_args_list}
+        self.assertEqual(recorded['vision_upload_bytes_saved'], info["bytes_saved"])
+        self.assertIn('vision_preprocess_ms', recorded)
+
+    def test_exif_orientation_and_grayscale(self):
+        """L'orientation EXIF est appliquée et l'image OCR passe en niveaux de gris"""
+        from PIL import Image
+        
+        content = self._encode((300, 200), orientation=6)
+        prepared, info = self.preprocessor.prepare(content, 'ocr')
+        
+        self.assertTrue(info["rotated"])
+        self.assertFalse(info["resized"])
+        with Image.open(io.BytesIO(prepared)) as image:
+            self.assertEqual(image.size, (200, 300))
+            self.assertEqual(image.mode, 'L')
+
+    def test_undecodable_or_disabled(self):
+        """Un contenu illisible ou une préparation désactivée laissent l'image intacte"""
+        prepared, info = self.preprocessor.prepare(b"pas une image", 'ocr')
+        self.assertEqual(prepared, b"pas une image")
+        self.assertEqual(info["bytes_saved"], 0)
+        
+        content = self._encode((1200, 900))
+        prepared, _ = ImagePreprocessor(enabled=False, metrics=self.metrics).prepare(content, 'labels')
+        self.assertEqual(prepared, content)
+        
+        with self.assertRaises(ValueError):
+            self.preprocessor.prepare(content, 'inconnu')
+
+
+class TestUploadBuffer(unittest.TestCase):
+    """Tests de la lecture en mémoire des fichiers reçus"""
+
+    def setUp(self):
+        """Dossier temporaire pour les fichiers déversés sur disque"""
+        self.spill_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Suppression du dossier temporaire"""
+        import shutil
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def test_small_upload_stays_in_memory(self):
+        """Un petit fichier est transmis en mémoire, sans fichier temporaire"""
+        with UploadBuffer(io.BytesIO(b"image"), filename="photo.jpg",
+                          spill_threshold=1024, spill_dir=self.spill_dir) as upload:
+            self.assertFalse(upload.spilled)
+            self.assertEqual(upload.size, 5)
+            self.assertEqual(bytes(upload.image_source()["image_content"]), b"image")
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+    def test_large_upload_spills_to_unique_file(self):
+        """Au-delà du seuil, chaque envoi a son propre fichier, supprimé à la fermeture"""
+        data = os.urandom(200 * 1024)
+        first = UploadBuffer(io.BytesIO(data), filename="photo.jpg",
+                             spill_threshold=100 * 1024, spill_dir=self.spill_dir)
+        second = UploadBuffer(io.BytesIO(data), filename="photo.jpg",
+                              spill_threshold=100 * 1024, spill_dir=self.spill_dir)
+        
+        self.assertTrue(first.spilled)
+        self.assertIsNone(first.content)
+        self.assertNotEqual(first.path, second.path)
+        self.assertTrue(first.path.endswith('.jpg'))
+        self.assertEqual(first.image_source(), {"image_path": first.path})
+        with open(first.path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        
+        first.close()
+        second.close()
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
 
 if __name__ == '__main__':
     unittest.main()
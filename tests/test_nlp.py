@@ -62,6 +62,22 @@ class TestNLPModule(unittest.TestCase):
         self.assertIsInstance(result["description"], str)
         self.assertTrue(len(result["description"]) > 0)
     
+    def test_error_code_prefix_fallback(self):
+        """Test du repli sur le préfixe pour un code absent de la base"""
+        result = self.nlp_assistant.interpret_command("Code P0399 au tableau de bord")
+        
+        self.assertEqual(result["entities"]["code"], "P0399")
+        self.assertEqual(result["description"], "Système d'allumage")
+    
+    def test_multiple_error_codes(self):
+        """Test d'une requête citant plusieurs codes (P, C et U)"""
+        result = self.nlp_assistant.interpret_command("J'ai les codes p0420, C0035 et U0100, et encore P0420")
+        
+        self.assertEqual(result["entities"]["code"], "P0420")
+        self.assertEqual(result["entities"]["codes"], ["P0420", "C0035", "U0100"])
+        self.assertEqual([item["match"] for item in result["details"]], ["code", "code", "code"])
+        self.assertEqual(result["details"][2]["severity"], "critical")
+    
     def test_maintenance_query_interpretation(self):
         """Test de l'interprétation d'une requête d'entretien"""
         result = self.nlp_assistant.interpret_command("Quand dois-je faire ma vidange?")
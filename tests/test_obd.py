@@ -4,13 +4,35 @@ Tests unitaires pour le module OBD-II
 import unittest
 import sys
 import os
+import time
+import heapq
+import shutil
+import tempfile
+import threading
 from unittest.mock import patch, MagicMock
 
+import numpy as np
+import obd
+from obd.protocols import ECU
+from obd.protocols.protocol import Frame, Message
+
 # Ajouter le répertoire parent au chemin d'importation
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Importer les modules à tester
 from obd2.obd_main import OBDManager
+from obd2.obd_session import OBDSession
+from obd2.obd_cache import OBDProfileCache
+from obd2.obd_telemetry import TelemetryStore, RingBuffer, SAMPLE_DTYPE
+from obd2.elm327_emulator import ELM327Emulator
+from obd2.obd_scheduler import PollingScheduler
+from obd2.obd_fleet import OBDFleet, parse_devices
+from obd2.obd_metrics import DerivedMetrics, compute_metrics
+from obd2.obd_anomaly import AnomalyDetector
+from obd2.obd_session import OBDSession
+from utils.dtc_index import DTCIndex
+from obd2.obd_stream import StreamerFull, TelemetryStreamer, TelemetrySubscription
+from obd2.obd_owner import OBDLinkOwner
 
 
 class TestOBDModule(unittest.TestCase):
@@ -19,6 +41,7 @@ class TestOBDModule(unittest.TestCase):
     def setUp(self):
         """Configuration des tests"""
         self.obd_manager = OBDManager()
+        self.obd_manager.profile_cache = None
 
     def test_obd_manager_init(self):
         """Test de l'initialisation de OBDManager"""
@@ -188,13 +211,17 @@ class TestOBDModule(unittest.TestCase):
         # Import de la fonction depuis app.py
         from app import get_vehicle_data
         
-        # Patch du OBDManager pour éviter la connexion réelle
-        with patch('app.obd_manager') as mock_obd_manager:
-            # Configurer les retours des méthodes
-            mock_obd_manager.connect.return_value = True
-            mock_obd_manager.get_rpm.return_value = {"success": True, "value": 1200}
-            mock_obd_manager.get_speed.return_value = {"success": True, "value": 45}
-            mock_obd_manager.get_dtc_codes.return_value = {"success": True, "codes": [], "count": 0}
+        # Patch de la session OBD pour éviter la connexion réelle
+        with patch('app.obd_session') as mock_obd_session:
+            # Configurer les retours des lectures
+            mock_obd_session.wait_until_connected.return_value = True
+            mock_obd_session.call.side_effect = lambda method, *args, **kwargs: {
+                'query_batch': {"success": True, "values": {
+                    "RPM": {"success": True, "value": 1200},
+                    "SPEED": {"success": True, "value": 45}
+                }},
+                'get_dtc_codes': {"success": True, "codes": [], "count": 0}
+            }[method]
             
             # Appeler la fonction
             result = get_vehicle_data()
@@ -204,10 +231,987 @@ class TestOBDModule(unittest.TestCase):
             self.assertIn("RPM", result)
             self.assertIn("Speed", result)
             self.assertIn("DTC", result)
+            self.assertEqual(result["RPM"], 1200)
             
-            # Vérifier que la fonction a bien appelé disconnect
-            mock_obd_manager.disconnect.assert_called_once()
+            # La liaison persistante ne doit pas être fermée après la requête
+            mock_obd_session.wait_until_connected.assert_called_once()
+            mock_obd_session.stop.assert_not_called()
+
+    def test_get_vehicle_data_dtc_details(self):
+        """Les codes défaut lus sont décrits par l'index des codes"""
+        from app import get_vehicle_data
+
+        with patch('app.obd_session') as mock_obd_session:
+            mock_obd_session.wait_until_connected.return_value = True
+            mock_obd_session.call.side_effect = lambda method, *args, **kwargs: {
+                'query_batch': {"success": True, "values": {}},
+                'get_dtc_codes': {"success": True, "count": 2, "codes": [
+                    {"code": "P0300", "description": "Random Misfire"},
+                    {"code": "P0399", "description": ""}
+                ]}
+            }[method]
+
+            result = get_vehicle_data()
+
+        details = {item["code"]: item for item in result["DTC_details"]}
+        self.assertEqual(details["P0300"]["match"], "code")
+        self.assertEqual(details["P0300"]["severity"], "high")
+        self.assertTrue(details["P0300"]["possible_causes"])
+        self.assertEqual(details["P0399"]["match"], "prefix_3")
+
+
+class TestOBDBatchQueries(unittest.TestCase):
+    """Tests pour les lectures groupées multi-PID"""
+
+    def setUp(self):
+        """Configuration d'un gestionnaire connecté à une connexion simulée"""
+        self.obd_manager = OBDManager()
+        self.connection = MagicMock()
+        self.connection.protocol_id.return_value = "6"  # ISO 15765-4 CAN
+        self.connection.supported_commands = {
+            obd.commands.RPM, obd.commands.SPEED, obd.commands.COOLANT_TEMP,
+            obd.commands.ENGINE_LOAD, obd.commands.INTAKE_TEMP, obd.commands.FUEL_LEVEL,
+            obd.commands.OIL_TEMP, obd.commands.BAROMETRIC_PRESSURE, obd.commands.FUEL_STATUS
+        }
+        self.obd_manager.connection = self.connection
+        self.obd_manager.connected = True
+
+        # Valeurs brutes renvoyées par l'ECU pour chaque PID
+        self.raw_values = {
+            0x0C: b'\x1a\xf8',  # 1726 tr/min
+            0x0D: b'\x32',      # 50 km/h
+            0x05: b'\x7b',      # 83 °C
+            0x04: b'\x80',
+            0x0F: b'\x46',
+            0x2F: b'\x80',
+            0x5C: b'\x82',
+            0x33: b'\x64',
+            0x03: b'\x02\x00'
+        }
+
+    def _message(self, data):
+        """Construit un message OBD décodé provenant de l'ECU moteur"""
+        message = Message([])
+        message.ecu = ECU.ENGINE
+        message.data = bytearray(data)
+        return message
+
+    def _ecu_query(self, cmd, force=False):
+        """Simule l'ECU: répond aux requêtes simples et multi-PID"""
+        pids = [int(cmd.command[i:i + 2], 16) for i in range(2, len(cmd.command), 2)]
+        data = b'\x41' + b''.join(bytes([pid]) + self.raw_values[pid] for pid in pids)
+        return cmd([self._message(data)])
+
+    def test_batch_packs_up_to_six_pids_per_request(self):
+        """Neuf PIDs Mode 01 sont lus en deux requêtes"""
+        self.connection.query.side_effect = self._ecu_query
+
+        result = self.obd_manager.get_dashboard_data()
+
+        self.assertTrue(result["success"])
+        self.assertEqual(self.connection.query.call_count, 2)
+        sent = [call.args[0].command for call in self.connection.query.call_args_list]
+        self.assertEqual(sent, [b'010C0D0304050F', b'012F5C33'])
+        self.assertEqual(result["values"]["RPM"]["value"], 1726)
+        self.assertEqual(result["values"]["SPEED"]["value"], 50)
+        self.assertEqual(result["values"]["COOLANT_TEMP"]["value"], 83)
+
+    def _refusal(self, cmd, text="NO DATA"):
+        """Réponse texte de l'ELM327 (message sans données, ECU inconnu)"""
+        return cmd([Message([Frame(text)])])
+
+    def test_batch_falls_back_when_multi_pid_refused(self):
+        """Les PIDs sont relus un par un si l'ECU refuse la requête groupée"""
+        def refuse_multi_pid(cmd, force=False):
+            if cmd.name == "MULTI_PID":
+                return self._refusal(cmd)
+            return self._ecu_query(cmd)
+
+        self.connection.query.side_effect = refuse_multi_pid
+
+        result = self.obd_manager.query_batch(["RPM", "SPEED"])
+
+        self.assertEqual(result["values"]["RPM"]["value"], 1726)
+        self.assertEqual(result["values"]["SPEED"]["value"], 50)
+        self.assertFalse(self.obd_manager.multi_pid_supported)
+
+        # Les lectures suivantes ne tentent plus la requête groupée
+        self.connection.query.reset_mock()
+        self.obd_manager.query_batch(["RPM", "SPEED"])
+        self.assertEqual(self.connection.query.call_count, 2)
+
+    def test_multi_pid_kept_after_transient_failure(self):
+        """Une réponse vide isolée ne désactive pas les requêtes groupées, un délai les réactive"""
+        failures = []
+
+        def flaky_multi_pid(cmd, force=False):
+            if cmd.name == "MULTI_PID" and failures:
+                failures.pop()
+                return obd.OBDResponse()
+            return self._ecu_query(cmd)
+
+        self.connection.query.side_effect = flaky_multi_pid
+        self.obd_manager.multi_pid_max_failures = 3
+
+        failures.extend([True, True])
+        for _ in range(2):
+            self.assertEqual(self.obd_manager.query_batch(["RPM", "SPEED"])["values"]["RPM"]["value"], 1726)
+        self.assertIsNone(self.obd_manager.multi_pid_supported)
+        self.obd_manager.query_batch(["RPM", "SPEED"])
+        self.assertTrue(self.obd_manager.multi_pid_supported)
+        self.assertEqual(self.obd_manager.multi_pid_failures, 0)
+
+        # Trois échecs consécutifs: lectures séquentielles jusqu'à la fin du délai
+        failures.extend([True] * 3)
+        for _ in range(3):
+            self.obd_manager.query_batch(["RPM", "SPEED"])
+        self.assertFalse(self.obd_manager.multi_pid_supported)
+        self.connection.query.reset_mock()
+        self.obd_manager.query_batch(["RPM", "SPEED"])
+        self.assertEqual(self.connection.query.call_count, 2)
+
+        self.obd_manager.multi_pid_disabled_at -= self.obd_manager.multi_pid_retry_delay
+        self.connection.query.reset_mock()
+        self.obd_manager.query_batch(["RPM", "SPEED"])
+        self.assertEqual(self.connection.query.call_count, 1)
+        self.assertTrue(self.obd_manager.multi_pid_supported)
+
+        # Refus explicite ("?"): désactivation immédiate
+        self.connection.query.side_effect = lambda cmd, force=False: \
+            self._refusal(cmd, "?") if cmd.name == "MULTI_PID" else self._ecu_query(cmd)
+        self.obd_manager.query_batch(["RPM", "SPEED"])
+        self.assertFalse(self.obd_manager.multi_pid_supported)
+
+    def test_batch_is_sequential_on_non_can_protocols(self):
+        """Les protocoles non CAN sont lus séquentiellement"""
+        self.connection.protocol_id.return_value = "3"  # ISO 9141-2
+        self.connection.query.side_effect = self._ecu_query
+
+        result = self.obd_manager.query_batch(["RPM", "SPEED", "COOLANT_TEMP"])
+
+        self.assertEqual(self.connection.query.call_count, 3)
+        self.assertEqual(result["values"]["COOLANT_TEMP"]["value"], 83)
+
+    def test_batch_values_are_recorded_in_telemetry(self):
+        """Les valeurs lues alimentent l'historique de télémétrie"""
+        self.connection.query.side_effect = self._ecu_query
+
+        self.obd_manager.query_batch(["RPM", "SPEED", "FUEL_STATUS"])
+
+        self.assertEqual(self.obd_manager.telemetry.pids(), ["RPM", "SPEED"])
+        self.assertEqual(self.obd_manager.telemetry.window("RPM", 60)["value"].tolist(), [1726])
+
+    def test_batch_reports_unsupported_commands(self):
+        """Une commande non supportée n'est pas envoyée au véhicule"""
+        self.connection.query.side_effect = self._ecu_query
+
+        result = self.obd_manager.query_batch(["RPM", "MAF"])
+
+        self.assertIn("error", result["values"]["MAF"])
+        self.assertEqual(self.connection.query.call_count, 1)
+
+
+class TestOBDSession(unittest.TestCase):
+    """Tests pour la session OBD-II persistante"""
+
+    def _make_manager(self, connect_results=None):
+        """Crée un OBDManager simulé dont la connexion reste active"""
+        manager = MagicMock()
+        manager.port = '/dev/ttyUSB0'
+        manager.connected = False
+        results = list(connect_results or [True])
+
+        def connect():
+            manager.connected = results.pop(0) if results else True
+            if manager.connected:
+                manager.connection.status.return_value = obd.OBDStatus.CAR_CONNECTED
+            return manager.connected
+
+        def disconnect():
+            manager.connected = False
+
+        manager.connect.side_effect = connect
+        manager.disconnect.side_effect = disconnect
+        return manager
+
+    def test_connection_is_reused_between_calls(self):
+        """La liaison n'est ouverte qu'une seule fois pour plusieurs lectures"""
+        manager = self._make_manager()
+        manager.get_rpm.return_value = {"success": True, "value": 900}
+        session = OBDSession(manager, reconnect_min_delay=0.01)
+        try:
+            self.assertTrue(session.wait_until_connected(timeout=2))
+            for _ in range(5):
+                self.assertEqual(session.call('get_rpm')["value"], 900)
+            manager.connect.assert_called_once()
+            manager.disconnect.assert_not_called()
+        finally:
+            session.stop()
+        manager.disconnect.assert_called()
+
+    def test_queries_run_in_owner_thread(self):
+        """Toutes les lectures sont exécutées par le thread propriétaire"""
+        manager = self._make_manager()
+        threads = set()
+        manager.get_speed.side_effect = lambda: threads.add(threading.current_thread().name) or {"value": 50}
+        session = OBDSession(manager, reconnect_min_delay=0.01)
+        try:
+            workers = [threading.Thread(target=session.call, args=('get_speed',)) for _ in range(8)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            self.assertEqual(threads, {'obd-session'})
+        finally:
+            session.stop()
+
+    def test_identical_pending_requests_are_shared(self):
+        """Les lectures identiques en attente partagent le même résultat"""
+        manager = self._make_manager()
+        release = threading.Event()
+        manager.get_rpm.side_effect = lambda: release.wait(2) and {"value": 1000}
+        session = OBDSession(manager, reconnect_min_delay=0.01)
+        try:
+            session.wait_until_connected(timeout=2)
+            first = session.submit('get_rpm')
+            second = session.submit('get_rpm')
+            self.assertIs(first, second)
+            release.set()
+            self.assertEqual(first.result(2), {"value": 1000})
+            self.assertEqual(manager.get_rpm.call_count, 1)
+            self.assertEqual(session.stats['shared_requests'], 1)
+        finally:
+            session.stop()
+
+    def test_reconnects_with_backoff(self):
+        """La session se reconnecte après des échecs successifs"""
+        manager = self._make_manager(connect_results=[False, False, True])
+        session = OBDSession(manager, reconnect_min_delay=0.01, reconnect_max_delay=0.05)
+        try:
+            # La première tentative échoue: échec immédiat, reconnexion en arrière-plan
+            self.assertFalse(session.wait_until_connected(timeout=2))
+            deadline = time.time() + 2
+            while not session.connected and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(session.connected)
+            self.assertEqual(manager.connect.call_count, 3)
+            self.assertEqual(session.stats['failed_attempts'], 2)
+        finally:
+            session.stop()
+
+    def test_link_loss_triggers_reconnection(self):
+        """Une perte de liaison détectée après une lecture provoque une reconnexion"""
+        manager = self._make_manager()
+        session = OBDSession(manager, reconnect_min_delay=0.01)
+        try:
+            session.wait_until_connected(timeout=2)
+
+            def lose_link():
+                manager.connection.status.return_value = obd.OBDStatus.NOT_CONNECTED
+                return {"error": "Impossible de lire le RPM"}
+
+            manager.get_rpm.side_effect = lose_link
+            session.call('get_rpm')
+            deadline = time.time() + 2
+            while manager.connect.call_count < 2 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(manager.connect.call_count, 2)
+            self.assertEqual(session.stats['link_losses'], 1)
+        finally:
+            session.stop()
+
+    def test_unknown_method_is_rejected(self):
+        """Seules les méthodes publiques de l'OBDManager sont acceptées"""
+        session = OBDSession(self._make_manager())
+        with self.assertRaises(ValueError):
+            session.submit('_private')
+
+class TestTelemetryStreamer(unittest.TestCase):
+    """Tests pour la diffusion en continu de la télémétrie"""
+
+    def setUp(self):
+        self.session = MagicMock()
+        self.session.call.return_value = {"success": True}
+        self.streamer = TelemetryStreamer(self.session)
+
+    def _response(self, name, magnitude):
+        """Crée une réponse python-OBD simulée"""
+        response = MagicMock()
+        response.is_null.return_value = False
+        response.command = obd.commands[name]
+        response.time = 123.0
+        response.value = obd.Unit.Quantity(magnitude, obd.Unit.rpm)
+        return response
+
+    def test_validate_pids(self):
+        """Les noms de commandes sont normalisés et filtrés"""
+        self.assertEqual(TelemetryStreamer.validate_pids([' rpm', 'SPEED', 'FOO', 'RPM', '']), ['RPM', 'SPEED'])
+
+    def test_watchers_follow_subscriptions(self):
+        """Seuls les PIDs nouveaux ou devenus inutiles modifient les watchers"""
+        first = self.streamer.subscribe(['RPM', 'SPEED'])
+        second = self.streamer.subscribe(['RPM', 'COOLANT_TEMP'])
+        self.assertEqual(self.session.call.call_args_list[0].args[:2], ('watch', ('RPM', 'SPEED')))
+        self.assertEqual(self.session.call.call_args_list[1].args[:2], ('watch', ('COOLANT_TEMP',)))
+
+        self.streamer.unsubscribe(first)
+        self.assertEqual(self.session.call.call_args.args[:2], ('unwatch', ('SPEED',)))
+        self.streamer.unsubscribe(second)
+        self.assertEqual(self.session.call.call_args.args[:2], ('unwatch', ('COOLANT_TEMP', 'RPM')))
+        self.assertEqual(self.streamer.status()['subscribers'], 0)
+
+    def test_dispatch_fans_out_to_interested_subscribers(self):
+        """Une réponse est redistribuée aux seuls abonnés concernés"""
+        rpm_sub = self.streamer.subscribe(['RPM'])
+        speed_sub = self.streamer.subscribe(['SPEED'])
+
+        self.streamer._dispatch(self._response('RPM', 850))
+
+        sample = rpm_sub.get(timeout=0.1)
+        self.assertEqual(sample['pid'], 'RPM')
+        self.assertEqual(sample['value'], 850)
+        self.assertEqual(sample['unit'], 'revolutions_per_minute')
+        self.assertIsNone(speed_sub.get(timeout=0.01))
+
+    def test_slow_subscriber_drops_oldest_samples(self):
+        """Un abonné lent perd ses échantillons les plus anciens"""
+        subscription = TelemetrySubscription(['RPM'], max_queue=2)
+        for i in range(4):
+            subscription.publish({'pid': 'RPM', 'value': i})
+        self.assertEqual(subscription.dropped, 2)
+        self.assertEqual(subscription.get(timeout=0.1)['value'], 2)
+        self.assertEqual(subscription.get(timeout=0.1)['value'], 3)
+
+    def test_watchers_restored_after_reconnection(self):
+        """Les watchers actifs sont réenregistrés après une reconnexion"""
+        self.streamer.subscribe(['SPEED', 'RPM'])
+        listener = self.session.add_connect_listener.call_args.args[0]
+        listener()
+        self.session.manager.watch.assert_called_once_with(('RPM', 'SPEED'), self.streamer._dispatch)
+
+    def test_subscribers_bounded(self):
+        """Au-delà du nombre maximal d'abonnés, les nouveaux sont refusés"""
+        streamer = TelemetryStreamer(self.session, max_subscribers=2)
+        first = streamer.subscribe(['RPM'])
+        streamer.subscribe(['SPEED'])
+        with self.assertRaises(StreamerFull):
+            streamer.subscribe(['RPM'])
+        streamer.unsubscribe(first)
+        streamer.subscribe(['RPM'])
+        self.assertEqual(streamer.status()['subscribers'], 2)
+
+    def test_stream_endpoint_rejects_unknown_pids(self):
+        """L'endpoint de diffusion refuse une liste sans PID valide"""
+        from app import app
+        client = app.test_client()
+        response = client.get('/obd2/stream?pids=FOO,BAR')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['status'], 'error')
+
+class FakeELM327:
+    """Adaptateur ELM327 simulé répondant aux commandes de listing des PIDs"""
+
+    # Bitmaps renvoyés par le véhicule (PIDS_A: charge, température, RPM, vitesse et PIDS_B)
+    bitmaps = {b'0100': b'\x18\x18\x00\x01', b'0120': b'\x00\x00\x00\x01', b'0140': b'\x40\x00\x00\x00'}
+    instances = []
+
+    def __init__(self, portname, baudrate, protocol, timeout, check_voltage=True, start_low_power=False):
+        self.protocol = protocol
+        self.sent = []
+        self._ELM327__port = MagicMock(baudrate=baudrate or 38400)
+        FakeELM327.instances.append(self)
+
+    def status(self):
+        return obd.OBDStatus.CAR_CONNECTED
+
+    def protocol_id(self):
+        return "6"
+
+    def send_and_parse(self, cmd):
+        self.sent.append(cmd)
+        message = Message([])
+        message.ecu = ECU.ENGINE
+        mode, pid = int(cmd[:2], 16), int(cmd[2:4], 16)
+        message.data = bytearray(bytes([mode + 0x40, pid]) + self.bitmaps.get(cmd[:4], bytes(4)))
+        return [message]
+
+    def close(self):
+        pass
+
+
+class TestOBDProfileCache(unittest.TestCase):
+    """Tests pour le cache des profils de connexion"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.tmp_dir, 'profiles.json')
+        FakeELM327.instances = []
+        self.bitmaps = dict(FakeELM327.bitmaps)
+        patcher = patch('obd.obd.ELM327', FakeELM327)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        FakeELM327.bitmaps = self.bitmaps
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _manager(self):
+        """Crée un gestionnaire utilisant un cache dans un dossier temporaire"""
+        manager = OBDManager()
+        manager.baudrate = None
+        manager.profile_cache = OBDProfileCache(self.cache_path)
+        return manager
+
+    def test_profile_is_saved_and_reused(self):
+        """La seconde connexion réutilise protocole, débit et PIDs sans découverte"""
+        cold = self._manager()
+        self.assertTrue(cold.connect())
+        self.assertIsNone(FakeELM327.instances[0].protocol)
+        self.assertEqual(FakeELM327.instances[0].sent, [b'0100', b'0120', b'0140', b'0600', b'0900'])
+
+        warm = self._manager()
+        self.assertTrue(warm.connect())
+        elm = FakeELM327.instances[1]
+        self.assertEqual(elm.protocol, "6")
+        self.assertEqual(elm._ELM327__port.baudrate, 38400)
+        self.assertEqual(elm.sent, [b'0100'])
+        self.assertTrue(warm.connection.used_cache)
+        self.assertEqual(warm.connection.supported_commands, cold.connection.supported_commands)
+        self.assertIn(obd.commands.RPM, warm.connection.supported_commands)
+        self.assertIn(obd.commands.CONTROL_MODULE_VOLTAGE, warm.connection.supported_commands)
+
+    def test_probe_mismatch_rediscovers_and_replaces_profile(self):
+        """Un véhicule différent relance la découverte et remplace le profil"""
+        self.assertTrue(self._manager().connect())
+
+        FakeELM327.bitmaps = {b'0100': b'\x00\x18\x00\x00'}
+        manager = self._manager()
+        self.assertTrue(manager.connect())
+
+        self.assertTrue(manager.connection.probe_mismatch)
+        self.assertNotIn(obd.commands.COOLANT_TEMP, manager.connection.supported_commands)
+        self.assertEqual(manager.profile_cache.stats['invalidations'], 1)
+        self.assertEqual(OBDProfileCache(self.cache_path).get(manager.port)['pid_bitmaps'],
+                         {'PIDS_A': '0' * 8 + '00011000' + '0' * 16, 'MIDS_A': '0' * 32, 'PIDS_9A': '0' * 32})
+
+    def test_different_vin_invalidates_profile(self):
+        """Un VIN différent de celui du profil invalide ce dernier"""
+        manager = self._manager()
+        manager.connect()
+        manager.vin = "VF1AAAAA111111111"
+        manager._check_profile_vin()
+        self.assertEqual(OBDProfileCache(self.cache_path).get(manager.port)['vin'], "VF1AAAAA111111111")
+
+        manager.vin = "WVWZZZ1JZXW000001"
+        manager._check_profile_vin()
+        self.assertIsNone(OBDProfileCache(self.cache_path).get(manager.port))
+
+    def test_workers_merge_profiles(self):
+        """Deux workers enregistrant chacun un port gardent les deux profils"""
+        first = OBDProfileCache(self.cache_path)
+        second = OBDProfileCache(self.cache_path)
+        first.save('/dev/ttyUSB0', {'protocol': "6"})
+        second.save('/dev/ttyUSB1', {'protocol': "3"})
+        first.save('/dev/ttyUSB0', {'vin': "VF1AAAAA111111111"})
+
+        profiles = OBDProfileCache(self.cache_path)
+        self.assertEqual(profiles.get('/dev/ttyUSB0')['vin'], "VF1AAAAA111111111")
+        self.assertEqual(profiles.get('/dev/ttyUSB1')['protocol'], "3")
+
+        # Profil enregistré par un autre worker: invalidé dans le fichier aussi
+        first.invalidate('/dev/ttyUSB1', "test")
+        self.assertEqual(first.stats['invalidations'], 1)
+        self.assertIsNone(OBDProfileCache(self.cache_path).get('/dev/ttyUSB1'))
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['profiles.json', 'profiles.json.lock'])
+
+class TestTelemetryStore(unittest.TestCase):
+    """Tests pour l'historique en mémoire de la télémétrie"""
+
+    def test_ring_buffer_keeps_latest_samples_contiguous(self):
+        """Le tampon écrase les plus anciens et retourne une vue sans copie"""
+        buffer = RingBuffer(4, SAMPLE_DTYPE)
+        for i in range(10):
+            buffer.append((i, i * 10))
+
+        view = buffer.view()
+        self.assertEqual(view['time'].tolist(), [6, 7, 8, 9])
+        self.assertEqual(view['value'].tolist(), [60, 70, 80, 90])
+        self.assertTrue(np.shares_memory(view, buffer._data))
+
+    def test_window_and_downsampling_tiers(self):
+        """Les niveaux 1 s/10 s/60 s agrègent min, max et moyenne"""
+        store = TelemetryStore(capacity=1000, tier_capacity=100)
+        for i in range(200):
+            store.record("RPM", 1000.0 + i * 0.5, 800 + i)  # 2 Hz pendant 100 s
+
+        raw = store.window("RPM", 10)
+        self.assertEqual(len(raw), 21)
+        self.assertEqual(raw['value'][-1], 999)
+
+        buckets = store.window("RPM", 30, resolution=10)
+        self.assertEqual(buckets['time'].tolist(), [1060, 1070, 1080, 1090])
+        first = buckets[0]
+        self.assertEqual((first['min'], first['max'], first['count']), (920, 939, 20))
+        self.assertAlmostEqual(float(first['mean']), 929.5)
+
+    def test_series_picks_finest_resolution_within_max_points(self):
+        """La résolution la plus fine respectant max_points est retenue"""
+        store = TelemetryStore(capacity=5000, tier_capacity=500)
+        for i in range(3600):
+            store.record("SPEED", i, 50)
+
+        series = store.series("SPEED", 1800, max_points=200)
+        self.assertEqual(series["resolution"], 10)
+        self.assertLessEqual(series["points"], 200)
+        self.assertEqual(series["mean"][0], 50)
+        self.assertEqual(store.series("SPEED", 60)["resolution"], 0)
+        self.assertIn("error", store.series("RPM", 60))
+
+    def test_duplicate_or_older_samples_are_ignored(self):
+        """Une même réponse relue n'est enregistrée qu'une fois"""
+        store = TelemetryStore(capacity=10)
+        self.assertTrue(store.record("RPM", 5.0, 900))
+        self.assertFalse(store.record("RPM", 5.0, 900))
+        self.assertFalse(store.record("RPM", 4.0, 850))
+        self.assertEqual(store.status()["pids"], {"RPM": 1})
+
+class TestELM327Emulator(unittest.TestCase):
+    """Tests pour l'émulateur ELM327"""
+
+    def test_multi_pid_and_iso_tp_frames(self):
+        """Une requête multi-PID longue est découpée en trames ISO-TP"""
+        emulator = ELM327Emulator()
+        emulator.respond("ATH1")
+        lines = emulator.respond("010C0D05040F2F").split("\r")
+        self.assertEqual(lines[0], "7E8 10 0E 41 0C 0D 48 0D 00")
+        self.assertEqual(lines[1][:6], "7E8 21")
+        self.assertEqual(len(lines), 3)
+
+        emulator.multi_pid = False
+        self.assertEqual(emulator.respond("010C0D"), "NO DATA")
+        self.assertEqual(emulator.respond("01A6"), "NO DATA")
+
+    def test_session_replay(self):
+        """Une session enregistrée est rejouée selon le temps écoulé"""
+        emulator = ELM327Emulator(session=[
+            {"pid": "RPM", "time": 100.0, "value": 800},
+            {"pid": "RPM", "time": 101.0, "value": 2400},
+            {"pid": "RPM", "time": 102.0, "value": 3000}
+        ])
+        emulator._session_start = time.time() - 0.5
+        self.assertEqual(emulator.current_value("RPM"), 800)
+        emulator._session_start = time.time() - 1.5
+        self.assertEqual(emulator.current_value("RPM"), 2400)
+        self.assertEqual(emulator.current_value("SPEED"), 0)
+
+    def test_obd_manager_reads_from_emulator(self):
+        """OBDManager se connecte à l'émulateur et lit valeurs, DTC et VIN"""
+        with ELM327Emulator(values={"RPM": 1726, "SPEED": 50, "COOLANT_TEMP": 83},
+                            dtcs=["P0133"]) as emulator:
+            manager = OBDManager()
+            manager.profile_cache = None
+            manager.protocol = "6"  # évite la détection automatique (plus lente)
+            manager.timeout = 5
+            try:
+                self.assertTrue(manager.connect(port=emulator.port))
+
+                values = manager.query_batch(["RPM", "SPEED", "COOLANT_TEMP"])["values"]
+                self.assertEqual(values["RPM"]["value"], 1726)
+                self.assertEqual(values["SPEED"]["value"], 50)
+                self.assertEqual(values["COOLANT_TEMP"]["value"], 83)
+                self.assertTrue(manager.multi_pid_supported)
+
+                self.assertEqual(manager.get_dtc_codes()["codes"][0]["code"], "P0133")
+                self.assertEqual(manager.get_basic_info()["info"]["VIN"]["value"], emulator.vin)
+            finally:
+                manager.disconnect()
+
+class TestPollingScheduler(unittest.TestCase):
+    """Tests pour la planification adaptative des lectures"""
+
+    def setUp(self):
+        self.session = MagicMock()
+        self.values = {"RPM": 800, "SPEED": 30, "COOLANT_TEMP": 90}
+
+        def call(method, names):
+            return {"success": True, "values": {name: {"value": self.values[name]} for name in names}}
+
+        self.session.call.side_effect = call
+
+    def test_rate_follows_variance(self):
+        """Un signal qui varie est lu plus souvent qu'un signal stable"""
+        scheduler = PollingScheduler(self.session, {"RPM": 10, "COOLANT_TEMP": 10})
+        rpm, coolant = scheduler._states["RPM"], scheduler._states["COOLANT_TEMP"]
+        for i in range(20):
+            scheduler._observe(rpm, 800 + (i % 2) * 400, i)
+            scheduler._observe(coolant, 90, i)
+        scheduler._rebalance()
+
+        rates = scheduler.rates()
+        self.assertEqual(rates["RPM"]["effective"], 20)
+        self.assertEqual(rates["COOLANT_TEMP"]["effective"], 2.5)
+
+    def test_rates_fit_link_capacity(self):
+        """La somme des fréquences est ramenée à la capacité de la liaison"""
+        scheduler = PollingScheduler(self.session, {"RPM": 20, "SPEED": 10, "COOLANT_TEMP": 2},
+                                     utilization=0.8)
+        scheduler.read_cost = 0.05  # 20 lectures de PID par seconde
+        scheduler._rebalance()
+
+        rates = scheduler.rates()
+        self.assertAlmostEqual(sum(r["effective"] for r in rates.values()), 16, places=2)
+        self.assertAlmostEqual(rates["RPM"]["effective"] / rates["SPEED"]["effective"], 2, places=2)
+        self.assertEqual(scheduler.status()["link_capacity"], 20)
+
+    def test_due_pids_are_read_in_one_batch(self):
+        """Les PIDs arrivés à échéance sont lus en une requête groupée puis replanifiés"""
+        scheduler = PollingScheduler(self.session, {"RPM": 10, "SPEED": 5, "COOLANT_TEMP": 0.5})
+        self.assertTrue(scheduler.run_once())
+
+        self.session.call.assert_called_once()
+        self.assertEqual(sorted(self.session.call.call_args.args[1]), ["COOLANT_TEMP", "RPM", "SPEED"])
+        self.assertEqual(scheduler.stats["pid_reads"], 3)
+        self.assertIsNotNone(scheduler.read_cost)
+
+        # RPM revient le premier, COOLANT_TEMP le dernier
+        order = [name for _, name in sorted(scheduler._heap)]
+        self.assertEqual(order, ["RPM", "SPEED", "COOLANT_TEMP"])
+
+    def test_failed_read_is_retried_later(self):
+        """Une lecture en échec est replanifiée sans modifier les fréquences"""
+        self.session.call.side_effect = None
+        self.session.call.return_value = {"error": "Non connecté au véhicule"}
+        scheduler = PollingScheduler(self.session, {"RPM": 10})
+        scheduler.run_once()
+
+        self.assertEqual(scheduler.stats["failed_requests"], 1)
+        self.assertIsNone(scheduler.read_cost)
+        self.assertGreater(scheduler._heap[0][0], time.monotonic() + 0.5)
+
+    def test_targets_changed_during_read(self):
+        """Des cibles modifiées pendant une lecture ne doublent pas la fréquence d'un PID"""
+        scheduler = PollingScheduler(self.session, {"RPM": 10, "SPEED": 5})
+        call = self.session.call.side_effect
+
+        def call_while_reconfigured(method, names):
+            # POST /obd2/monitor pendant la requête groupée
+            scheduler.set_targets({"RPM": 10, "SPEED": 5, "COOLANT_TEMP": 1})
+            return call(method, names)
+
+        self.session.call.side_effect = call_while_reconfigured
+        scheduler.run_once()
+        self.session.call.side_effect = call
+
+        self.assertEqual(sorted(name for _, name in scheduler._heap), ["COOLANT_TEMP", "RPM", "SPEED"])
+        # Une seule lecture par PID jusqu'à sa prochaine échéance, même avec des entrées périmées
+        heapq.heappush(scheduler._heap, (0.0, "RPM"))
+        scheduler.run_once()
+        self.assertEqual(sorted(self.session.call.call_args.args[1]), ["COOLANT_TEMP", "RPM", "SPEED"])
+        scheduler.run_once()
+        self.assertEqual(self.session.call.call_count, 2)
+        self.assertEqual(sorted(name for _, name in scheduler._heap), ["COOLANT_TEMP", "RPM", "SPEED"])
+
+class TestDerivedMetrics(unittest.TestCase):
+    """Tests pour les indicateurs dérivés de la télémétrie"""
+
+    def test_compute_metrics(self):
+        """Ralenti, plages de régime, distance et consommation sur une fenêtre synthétique"""
+        times = np.arange(0, 600, 1.0)
+        driving = times >= 200  # 200 s au ralenti puis 400 s à 90 km/h
+        signals = {
+            "RPM": (times, np.where(driving, 2500.0, 800.0)),
+            "SPEED": (times, np.where(driving, 90.0, 0.0)),
+            "ENGINE_LOAD": (times, np.where(driving, 45.0, 15.0)),
+            "FUEL_RATE": (times, np.where(driving, 6.0, 0.6))
+        }
+        metrics = compute_metrics(signals, 0.0, 600.0)
+
+        self.assertEqual(metrics["engine_on_s"], 600)
+        self.assertEqual(metrics["idle"]["seconds"], 200)
+        self.assertAlmostEqual(metrics["idle"]["ratio"], 1 / 3, places=3)
+        self.assertEqual([band["seconds"] for band in metrics["rpm_bands"]], [200, 0, 400, 0, 0, 0])
+        self.assertAlmostEqual(metrics["distance_km"], 10.0)
+        self.assertEqual(metrics["load_histogram"]["seconds"][1], 200)
+        self.assertEqual(metrics["load_histogram"]["seconds"][4], 400)
+        self.assertEqual(metrics["speed"]["mean_moving"], 90)
+
+        fuel = metrics["fuel"]
+        self.assertEqual(fuel["source"], "FUEL_RATE")
+        self.assertAlmostEqual(fuel["litres"], (200 * 0.6 + 400 * 6.0) / 3600, places=3)
+        self.assertAlmostEqual(fuel["instant_l_per_100km"]["p50"], 6.0 / 90 * 100, places=2)
+
+    def test_gaps_are_not_counted(self):
+        """Un trou dans l'historique n'est pas compté comme temps moteur"""
+        times = np.array([0.0, 1.0, 2.0, 100.0, 101.0])
+        metrics = compute_metrics({"RPM": (times, np.full(5, 900.0))}, 0.0, 102.0, max_gap=2.0)
+        self.assertEqual(metrics["engine_on_s"], 6)
+        self.assertEqual(metrics["fuel"], {"source": None})
+
+    def test_summary_uses_tiers_and_cache(self):
+        """Fenêtre plus longue que l'historique brut et cache par fenêtre"""
+        store = TelemetryStore(capacity=100, tier_capacity=1000)
+        for i in range(1000):
+            store.record("RPM", 1000.0 + i, 2500)
+            store.record("SPEED", 1000.0 + i, 72)
+        engine = DerivedMetrics(store)
+
+        metrics = engine.summary(900)
+        self.assertEqual(metrics["resolutions"], {"RPM": 1, "SPEED": 1})
+        self.assertAlmostEqual(metrics["distance_km"], 18.0, delta=0.1)
+        self.assertIs(engine.summary(900), metrics)
+        self.assertEqual(engine.stats, {"hits": 1, "misses": 1})
+
+        # Un nouvel échantillon définit une nouvelle fenêtre
+        store.record("RPM", 2000.0, 2500)
+        self.assertIsNot(engine.summary(900), metrics)
+        self.assertEqual(engine.stats["misses"], 2)
+
+        self.assertIn("error", DerivedMetrics(TelemetryStore()).summary(900))
+
+
+class TestAnomalyDetector(unittest.TestCase):
+    """Tests pour la détection d'anomalies sur la télémétrie"""
+
+    def setUp(self):
+        self.sink = MagicMock()
+        self.detector = AnomalyDetector(device="baie1", event_sink=self.sink, cooldown=60)
+
+    def test_ewma_band(self):
+        """Une valeur hors de la bande EWMA déclenche une seule alerte"""
+        for i in range(200):
+            self.detector.observe("RPM", i * 0.1, 800 + (i % 5) * 10)
+        alerts = self.detector.observe("RPM", 20.0, 2000)
+        self.assertEqual([a["type"] for a in alerts], ["ecart_statistique"])
+        self.assertEqual(alerts[0]["device"], "baie1")
+
+        # Condition toujours vraie: pas de nouvelle alerte
+        self.assertEqual(self.detector.observe("RPM", 20.1, 2600), [])
+        self.sink.assert_called_once()
+        self.assertEqual(self.sink.call_args.args[0], "obd_anomaly")
+        self.assertEqual(self.sink.call_args.kwargs["tags"], {"device": "baie1", "type": "ecart_statistique"})
+
+    def test_threshold_and_cooldown(self):
+        """Seuil absolu: émission au franchissement, puis délai de réémission"""
+        self.assertEqual(self.detector.observe("COOLANT_TEMP", 0.0, 90), [])
+        alerts = self.detector.observe("COOLANT_TEMP", 1.0, 112)
+        self.assertEqual(alerts[0]["type"], "seuil")
+        self.assertEqual(alerts[0]["severity"], "critical")
+
+        self.detector.observe("COOLANT_TEMP", 2.0, 95)
+        self.assertEqual(self.detector.observe("COOLANT_TEMP", 3.0, 113), [])
+        self.detector.observe("COOLANT_TEMP", 4.0, 95)
+        self.assertEqual(len(self.detector.observe("COOLANT_TEMP", 70.0, 113)), 1)
+        self.assertEqual(self.detector.status()["active"], ["seuil:COOLANT_TEMP"])
+
+    def test_cross_signal_rule(self):
+        """Règle croisée: moteur chaud sous forte charge, valeurs récentes uniquement"""
+        self.detector.observe("ENGINE_LOAD", 0.0, 85)
+        self.assertEqual(self.detector.observe("COOLANT_TEMP", 10.0, 107), [])  # charge trop ancienne
+
+        alerts = self.detector.observe("ENGINE_LOAD", 11.0, 85)
+        self.assertEqual(alerts[0]["rule"], "surchauffe_en_charge")
+        self.assertEqual(alerts[0]["values"], {"COOLANT_TEMP": 107, "ENGINE_LOAD": 85})
+        self.assertEqual(self.detector.alerts(since=10.5), alerts)
+
+    def test_fed_by_telemetry(self):
+        """Les valeurs enregistrées par le gestionnaire OBD alimentent le détecteur"""
+        manager = OBDManager()
+        manager.anomaly_detector.event_sink = self.sink
+        manager.telemetry.record("COOLANT_TEMP", 1.0, 90)
+        manager.telemetry.record("COOLANT_TEMP", 1.0, 120)  # doublon ignoré
+        manager.telemetry.record("COOLANT_TEMP", 2.0, 120)
+
+        self.assertEqual(manager.anomaly_detector.stats["samples"], 2)
+        self.assertEqual(len(manager.anomaly_detector.alerts()), 1)
+
+
+class TestOBDFleet(unittest.TestCase):
+    """Tests pour la flotte de dongles OBD-II"""
+
+    def make_session(self, port, delay=0.0):
+        """Session sur un gestionnaire simulé dont la lecture du régime dure delay secondes"""
+        manager = MagicMock()
+        manager.port = port
+        manager.connected = False
+
+        def connect():
+            manager.connected = True
+            return True
+
+        manager.connect.side_effect = connect
+        manager.connection.status.return_value = obd.OBDStatus.CAR_CONNECTED
+
+        def get_rpm():
+            time.sleep(delay)
+            return {"success": True, "value": 800}
+
+        manager.get_rpm.side_effect = get_rpm
+        return OBDSession(manager, name=f'obd-session-test-{port}')
+
+    def test_parse_devices(self):
+        """Analyse de la variable OBD_DEVICES"""
+        self.assertEqual(parse_devices("baie1=/dev/ttyUSB0, /dev/ttyUSB1,,baie3 = COM4"),
+                         {"baie1": "/dev/ttyUSB0", "ttyUSB1": "/dev/ttyUSB1", "baie3": "COM4"})
+
+    def test_add_device_validation(self):
+        """Identifiants réservés, doublons et ports partagés sont refusés"""
+        fleet = OBDFleet(devices={})
+        self.assertIn("error", fleet.add_device("stream", "/dev/ttyUSB0"))
+        self.assertIn("error", fleet.add_device("baie 1", "/dev/ttyUSB0"))
+        self.assertEqual(fleet.add_device("baie1", "/dev/ttyUSB0")["port"], "/dev/ttyUSB0")
+        self.assertIn("error", fleet.add_device("baie1", "/dev/ttyUSB1"))
+        self.assertIn("error", fleet.add_device("baie2", "/dev/ttyUSB0"))
+
+        # Les appareils partagent le même cache des profils
+        session = fleet.get("baie1")
+        self.assertEqual(session.name, "obd-session-baie1")
+        self.assertIs(session.manager.profile_cache, fleet.profile_cache)
+        self.assertTrue(fleet.remove_device("baie1"))
+        self.assertEqual(fleet.devices(), [])
+
+    def test_slow_device_does_not_block_others(self):
+        """Une lecture lente sur un poste ne retarde pas les autres postes"""
+        fleet = OBDFleet(devices={})
+        fleet.add_device("lent", session=self.make_session("/dev/ttyUSB0", delay=1.0))
+        fleet.add_device("rapide", session=self.make_session("/dev/ttyUSB1"))
+        self.addCleanup(fleet.stop)
+
+        slow = fleet.get("lent").submit('get_rpm')
+        time.sleep(0.1)
+        start = time.monotonic()
+        result = fleet.get("rapide").call('get_rpm', timeout=5)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(result["value"], 800)
+        self.assertLess(elapsed, 0.5)
+        self.assertFalse(slow.done())
+        self.assertEqual(slow.result(5)["value"], 800)
+
+        status = fleet.status()
+        self.assertEqual(status["count"], 2)
+        self.assertEqual(status["connected"], 2)
+        self.assertEqual(status["requests"], 2)
+
+    def test_device_endpoint(self):
+        """Routage des requêtes /obd2/<device_id>"""
+        import app as app_module
+
+        client = app_module.app.test_client()
+        response = client.get('/obd2/inconnu')
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('default', response.get_json()['devices'])
+
+        with patch('app.get_vehicle_data', return_value={"RPM": 900}) as mock_data:
+            response = client.get('/obd2/default')
+        self.assertEqual(response.get_json(), {"device_id": "default", "RPM": 900})
+        mock_data.assert_called_once_with(app_module.obd_session)
+
+        self.assertEqual(client.get('/obd2/fleet').get_json()["count"], 1)
+
+
+class TestDTCIndex(unittest.TestCase):
+    """Tests pour l'index des codes défaut"""
+
+    def test_lookup_levels(self):
+        """Recherche par code complet, préfixes puis famille"""
+        index = DTCIndex()
+        results = index.lookup_many(["P0420", "p0499", "P1234", " U0100 ", "X123", {"code": "P0420"}])
+
+        self.assertEqual([r["match"] for r in results],
+                         ["code", "prefix_3", "prefix_2", "code", None, "code"])
+        self.assertEqual(results[1]["code"], "P0499")
+        self.assertEqual(results[4]["description"], "")
+        self.assertEqual(results[0]["description"], results[5]["description"])
+
+    def test_context_codes_override_bundled_base(self):
+        """Les codes du module contextuel complètent la base, lus une fois par lot"""
+        context = {"P0420": {"description": "Catalyseur (constructeur)", "severity": "low"},
+                   "B1999": {"description": "Défaut spécifique"}}
+        source = MagicMock(return_value=context)
+        index = DTCIndex(context_source=source)
+
+        results = index.lookup_many(["P0420", "B1999", "P0300"] * 5)
+
+        source.assert_called_once()
+        self.assertEqual(results[0]["description"], "Catalyseur (constructeur)")
+        self.assertEqual(results[1]["match"], "code")
+        self.assertEqual(results[2]["severity"], "high")
+
+        # Une erreur du module contextuel n'empêche pas la recherche
+        source.side_effect = RuntimeError("serveur indisponible")
+        self.assertEqual(index.lookup("P0300")["match"], "code")
+
+    def test_missing_file(self):
+        """Un fichier de codes absent donne un index vide, sans exception"""
+        index = DTCIndex(path=os.path.join(tempfile.gettempdir(), "absent_dtc_codes.json"))
+        self.assertIsNone(index.lookup("P0300")["match"])
+
+class TestOBDLinkOwner(unittest.TestCase):
+    """Tests de l'attribution de la liaison OBD-II à un seul worker"""
+
+    def setUp(self):
+        from flask import Flask, Response, jsonify, request
+        self.directory = tempfile.mkdtemp()
+        self.lock_path = os.path.join(self.directory, 'obd_link.lock')
+
+        # Application du propriétaire: répond elle-même
+        self.owner_app = Flask('owner')
+
+        @self.owner_app.route('/obd2/echo', methods=['GET', 'POST'])
+        def echo():
+            return jsonify({'args': request.args.to_dict(), 'body': request.get_data(as_text=True),
+                            'forwarded': bool(request.headers.get('X-NovaEvo-OBD-Forwarded'))})
+
+        @self.owner_app.route('/obd2/stream')
+        def stream():
+            return Response((f"data: {i}\n\n" for i in range(3)), mimetype='text/event-stream')
+
+        self.owner = OBDLinkOwner(lock_path=self.lock_path, address='127.0.0.1:0', enabled=True)
+        self.owner.enable(self.owner_app)
+        self.other = OBDLinkOwner(lock_path=self.lock_path, enabled=True)
+        self.other_app = Flask('other')
+
+    def tearDown(self):
+        self.owner.release()
+        self.other.release()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_single_owner_and_forwarding(self):
+        """Un seul détenteur du verrou; les autres lui relaient les requêtes, flux compris"""
+        self.assertTrue(self.owner.is_owner())
+        self.assertFalse(self.other.is_owner())
+        self.assertTrue(self.owner.is_owner())
+
+        with self.other_app.test_request_context('/obd2/echo?pid=RPM', method='POST', data='{"a": 1}'):
+            from flask import request
+            response = self.other.forward(request)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json(), {'args': {'pid': 'RPM'}, 'body': '{"a": 1}', 'forwarded': True})
+
+        with self.other_app.test_request_context('/obd2/stream'):
+            from flask import request
+            response = self.other.forward(request)
+            self.assertEqual(response.mimetype, 'text/event-stream')
+            self.assertEqual(response.get_data(as_text=True), "data: 0\n\ndata: 1\n\ndata: 2\n\n")
+
+    def test_ownership_released_and_loops_refused(self):
+        """Une requête déjà relayée n'est pas relayée à nouveau; le verrou libéré est repris"""
+        self.assertTrue(self.owner.is_owner())
+        with self.other_app.test_request_context('/obd2', headers={'X-NovaEvo-OBD-Forwarded': '1'}):
+            from flask import request
+            self.assertEqual(self.other.forward(request).status_code, 503)
+
+        self.owner.release()
+        self.assertTrue(self.other.is_owner())
+        self.assertFalse(self.owner.is_owner())
+        # Propriétaire sans serveur local: pas d'adresse publiée, 503
+        with self.other_app.test_request_context('/obd2'):
+            from flask import request
+            self.assertEqual(self.owner.forward(request).status_code, 503)
 
+    def test_disabled_always_owner(self):
+        """Sans attribution (un seul processus), chaque processus traite ses requêtes"""
+        self.assertTrue(OBDLinkOwner(lock_path=self.lock_path, enabled=False).is_owner())
 
 if __name__ == '__main__':
     unittest.main()
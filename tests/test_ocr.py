@@ -1,15 +1,24 @@
 """
 Tests unitaires pour le module OCR
 """
+import io
 import os
 import sys
+import socket
+import time
 import unittest
+from concurrent.futures import Future
 from unittest.mock import patch, MagicMock
 
 # Ajouter le répertoire parent au chemin pour pouvoir importer les modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from ocr.ocr_main import OCRProcessor, extraire_infos_carte_grise
+from utils.multi_pattern import MultiPatternMatcher
+from utils.job_queue import JobQueue, JobQueueFull
+from utils.result_cache import ResultCache, content_key
+from utils.tesseract_engine import TesseractEngine, prepare_for_tesseract
+from google.cloud import vision
 
 class TestOCR(unittest.TestCase):
     """Tests pour le module OCR"""
@@ -23,6 +32,8 @@ class TestOCR(unittest.TestCase):
         # Initialiser le processeur OCR avec notre mock
         self.ocr = OCRProcessor()
         self.ocr.client = MagicMock()
+        # Chaque test simule sa propre réponse de l'API: pas de cache partagé
+        self.ocr.cache = ResultCache('ocr', enabled=False)
     
     def tearDown(self):
         """Nettoyage après chaque test"""
@@ -56,6 +67,325 @@ class TestOCR(unittest.TestCase):
         self.assertTrue(result["success"])
         self.assertEqual(result["full_text"], "CARTE GRISE\nRENAULT CLIO\nAA-123-BB")
     
+    def test_process_image_memoryview(self):
+        """Test du traitement d'une image reçue en mémoire (memoryview)"""
+        mock_response = MagicMock()
+        mock_response.text_annotations = []
+        self.ocr.client.text_detection.return_value = mock_response
+        
+        result = self.ocr.process_image(image_content=memoryview(b"fake_image_content"))
+        
+        self.assertTrue(result["success"])
+        image = self.ocr.client.text_detection.call_args.kwargs['image']
+        self.assertEqual(image.content, b"fake_image_content")
+    
+    def test_process_image_preprocessed_coordinates(self):
+        """Les coordonnées des blocs sont ramenées à la résolution d'origine"""
+        mock_text = MagicMock()
+        mock_text.description = "AA-123-BB"
+        mock_block = MagicMock()
+        mock_block.description = "AA-123-BB"
+        mock_block.bounding_poly.vertices = [MagicMock(x=100, y=50), MagicMock(x=200, y=50)]
+        self.ocr.client.text_detection.return_value.text_annotations = [mock_text, mock_block]
+        
+        self.ocr.preprocessor = MagicMock()
+        self.ocr.preprocessor.prepare.return_value = (b"reduite", {
+            "resized": True, "original_size": [4000, 3000], "size": [2000, 1500]
+        })
+        
+        result = self.ocr.process_image(image_content=b"originale")
+        
+        self.ocr.preprocessor.prepare.assert_called_once_with(b"originale", 'ocr')
+        image = self.ocr.client.text_detection.call_args.kwargs['image']
+        self.assertEqual(image.content, b"reduite")
+        self.assertEqual(result["text_blocks"][0]["bounding_poly"], [[200, 100], [400, 100]])
+    
+    def test_process_image_cached(self):
+        """Une image déjà analysée est resservie depuis le cache sans appel à l'API"""
+        mock_text = MagicMock()
+        mock_text.description = "AA-123-BB"
+        mock_response = MagicMock()
+        mock_response.text_annotations = [mock_text]
+        mock_response.error.message = ""
+        self.ocr.client.text_detection.return_value = mock_response
+        self.ocr.cache = ResultCache('ocr', directory='', enabled=True, metrics=MagicMock())
+        
+        first = self.ocr.process_image(image_content=b"image")
+        second = self.ocr.process_image(image_content=memoryview(b"image"))
+        
+        self.ocr.client.text_detection.assert_called_once()
+        self.assertNotIn("cached", first)
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["full_text"], "AA-123-BB")
+        self.assertEqual(self.ocr.cache.status()["hit_ratio"], 0.5)
+        
+        # Une réponse en erreur n'est pas mise en cache
+        mock_response.error.message = "quota"
+        self.ocr.process_image(image_content=b"autre image")
+        self.ocr.process_image(image_content=b"autre image")
+        self.assertEqual(self.ocr.client.text_detection.call_count, 3)
+    
+    def _batch_response(self, texts):
+        """Réponse simulée de batch_annotate_images (None = image en erreur)"""
+        responses = []
+        for text in texts:
+            response = MagicMock()
+            if text is None:
+                response.error.message = "Bad image data"
+            else:
+                annotation = MagicMock()
+                annotation.description = text
+                response.text_annotations = [annotation]
+                response.error.message = ""
+            responses.append(response)
+        return MagicMock(responses=responses)
+
+    def test_process_batch(self):
+        """Un groupe d'images part en une seule requête, les images en cache sont exclues"""
+        self.ocr.cache = ResultCache('ocr', directory='', enabled=True, metrics=MagicMock())
+        self.ocr.client.batch_annotate_images.return_value = self._batch_response(["AA-123-BB"])
+        self.ocr.process_batch([b"image a"])
+        
+        self.ocr.client.batch_annotate_images.return_value = self._batch_response(["BB-456-CC", None])
+        results = self.ocr.process_batch([b"image a", b"image b", b"image c", b""])
+        
+        self.assertTrue(results[0]["cached"])
+        self.assertEqual(results[1]["full_text"], "BB-456-CC")
+        self.assertIn("Bad image data", results[2]["error"])
+        self.assertEqual(results[3]["error"], "Aucune image fournie")
+        
+        requests = self.ocr.client.batch_annotate_images.call_args.kwargs['requests']
+        self.assertEqual(len(requests), 2)
+        self.assertEqual(requests[0].features[0].type_, vision.Feature.Type.TEXT_DETECTION)
+        
+        with self.assertRaises(ValueError):
+            self.ocr.process_batch([b"x"] * 17)
+
+    def test_iter_batch(self):
+        """Les groupes sont traités en parallèle et chaque image est produite une fois"""
+        self.ocr.batch_workers = 2
+        self.ocr.client.batch_annotate_images.side_effect = \
+            lambda requests: self._batch_response([r.image.content.decode() for r in requests])
+        self.ocr.preprocessor = MagicMock()
+        self.ocr.preprocessor.prepare.side_effect = lambda content, purpose: (bytes(content), {})
+        
+        images = [f"doc {i}".encode() for i in range(7)]
+        results = dict(self.ocr.iter_batch(images, batch_size=3))
+        
+        self.assertEqual(sorted(results), list(range(7)))
+        self.assertEqual(results[5]["full_text"], "doc 5")
+        self.assertEqual(self.ocr.client.batch_annotate_images.call_count, 3)
+
+    def test_batch_endpoint(self):
+        """L'endpoint diffuse une ligne NDJSON par document puis un résumé"""
+        import io
+        import json
+        import app as app_module
+        
+        def fake_iter_batch(images):
+            yield 1, {"error": "Bad image data"}
+            yield 0, {"success": True, "full_text": "RENAULT\nAA-123-BB"}
+        
+        client = app_module.app.test_client()
+        with patch.object(app_module.ocr_processor, 'iter_batch', side_effect=fake_iter_batch):
+            response = client.post('/ocr/batch', content_type='multipart/form-data', data={
+                'images': [(io.BytesIO(b"a"), 'a.jpg'), (io.BytesIO(b"b"), 'b.jpg')]
+            })
+        
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([line.get("index") for line in lines], [1, 0, None])
+        self.assertEqual(lines[0]["filename"], 'b.jpg')
+        self.assertEqual(lines[0]["status"], 'error')
+        self.assertEqual(lines[1]["vehicle_info"]["registration"], "AA-123-BB")
+        self.assertEqual(lines[2], {"done": True, "count": 2, "errors": 1})
+        
+        self.assertEqual(client.post('/ocr/batch').status_code, 400)
+    
+    def test_ocr_job_endpoint(self):
+        """En mode job, /ocr répond 202 et le résultat est lu sur /jobs/<id>"""
+        import io
+        import app as app_module
+        
+        queue = JobQueue(workers=1, store=ResultCache('jobs', directory='', enabled=True), metrics=MagicMock())
+        ocr_result = {"success": True, "full_text": "RENAULT CLIO\nAA-123-BB"}
+        client = app_module.app.test_client()
+        with patch.object(app_module, 'job_queue', queue), \
+                patch.object(app_module.ocr_processor, 'process_image', return_value=ocr_result) as process_image:
+            response = client.post('/ocr?async=1', content_type='multipart/form-data', data={
+                'image': (io.BytesIO(b"image"), 'carte.jpg')
+            })
+            self.assertEqual(response.status_code, 202)
+            status_url = response.get_json()["status_url"]
+            self.assertEqual(response.headers["Location"], status_url)
+            
+            for _ in range(100):
+                job = client.get(status_url).get_json()
+                if job["status"] in ("done", "error"):
+                    break
+                time.sleep(0.01)
+            
+            self.assertEqual(job["status"], "done")
+            self.assertEqual(job["result"]["vehicle_info"]["registration"], "AA-123-BB")
+            # Le job a reçu une copie de l'image, lue après la fin de la requête
+            process_image.assert_called_once_with(image_content=b"image")
+            
+            self.assertEqual(client.get('/jobs/' + '0' * 32).status_code, 404)
+            self.assertEqual(client.get('/jobs/..%2F..%2Fsecret').status_code, 404)
+            
+            response = client.post('/ocr', content_type='multipart/form-data', data={
+                'image': (io.BytesIO(b"image"), 'carte.jpg'), 'webhook': 'ftp://example.com/hook'
+            })
+            self.assertEqual(response.status_code, 400)
+        queue.shutdown()
+    
+    def _local_engine(self, confidence=90.0):
+        """Moteur Tesseract simulé, répondant immédiatement"""
+        result = {
+            "success": True,
+            "full_text": "RENAULT CLIO\nAA-123-BB\n",
+            "text_blocks": [],
+            "engine": "tesseract",
+            "tesseract": {"mean_confidence": confidence, "deskew_angle": 0.0, "duration_ms": 5.0}
+        }
+        engine = MagicMock(available=True, timeout=5)
+        engine.recognize.return_value = result
+        
+        def submit(content):
+            future = Future()
+            future.set_result(dict(result))
+            return future
+        engine.submit.side_effect = submit
+        return engine
+    
+    def _vision_response(self, delay=0.0):
+        """Réponse Vision simulée, après un délai"""
+        mock_text = MagicMock(description="RENAULT CLIO\nAA-123-BB")
+        mock_text.bounding_poly.vertices = [MagicMock(x=0, y=0), MagicMock(x=10, y=10)]
+        response = MagicMock(text_annotations=[mock_text])
+        response.error.message = ""
+        
+        def text_detection(image):
+            time.sleep(delay)
+            return response
+        return text_detection
+    
+    def test_process_image_hedged(self):
+        """Vision trop lent: le moteur local est lancé et l'emporte"""
+        self.ocr.backend = 'hedged'
+        self.ocr.hedge_delay = 0.05
+        self.ocr.tesseract = self._local_engine()
+        self.ocr.client.text_detection.side_effect = self._vision_response(delay=0.5)
+        
+        result = self.ocr.process_image(image_content=b"fake_image_content")
+        
+        self.assertEqual(result["engine"], "tesseract")
+        self.ocr.tesseract.submit.assert_called_once()
+        
+        # Vision répond dans le délai: pas de requête locale
+        self.ocr.tesseract = self._local_engine()
+        self.ocr.client.text_detection.side_effect = self._vision_response()
+        
+        result = self.ocr.process_image(image_content=b"other_image_content")
+        
+        self.assertNotIn("engine", result)
+        self.ocr.tesseract.submit.assert_not_called()
+    
+    def test_process_image_hedged_batch_pool_busy(self):
+        """Le délai de couverture mesure Vision, pas l'attente du pool des lots occupé"""
+        import threading
+        self.ocr.backend = 'hedged'
+        self.ocr.hedge_delay = 0.2
+        self.ocr.batch_workers = 1
+        self.ocr.tesseract = self._local_engine()
+        self.ocr.client.text_detection.side_effect = self._vision_response()
+        
+        release = threading.Event()
+        self.ocr._get_batch_executor().submit(release.wait, 5)
+        try:
+            result = self.ocr.process_image(image_content=b"fake_image_content")
+        finally:
+            release.set()
+        
+        self.assertNotIn("engine", result)
+        self.ocr.tesseract.submit.assert_not_called()
+    
+    def test_process_image_hedged_low_confidence(self):
+        """Un texte local peu sûr ne remplace pas la réponse de Vision"""
+        self.ocr.backend = 'hedged'
+        self.ocr.hedge_delay = 0.01
+        self.ocr.tesseract = self._local_engine(confidence=20.0)
+        self.ocr.client.text_detection.side_effect = self._vision_response(delay=0.2)
+        
+        result = self.ocr.process_image(image_content=b"fake_image_content")
+        
+        self.assertNotIn("engine", result)
+        self.ocr.tesseract.submit.assert_called_once()
+    
+    def test_process_image_offline(self):
+        """Sans Vision configuré, le moteur local est utilisé"""
+        self.ocr.client = None
+        self.ocr.vision_configured = False
+        self.ocr.tesseract = self._local_engine()
+        
+        result = self.ocr.process_image(image_content=b"fake_image_content")
+        
+        self.assertEqual(result["engine"], "tesseract")
+        self.assertEqual(self.ocr.extract_vehicle_info(result)["vehicle_info"]["registration"], "AA-123-BB")
+    
+    def test_process_batch_offline(self):
+        """Sans Vision configuré, ou avec OCR_BACKEND=tesseract, le lot est lu par le moteur local"""
+        self.ocr.client = None
+        self.ocr.vision_configured = False
+        self.ocr.tesseract = self._local_engine()
+        
+        results = self.ocr.process_batch([b"image a", b"", b"image b"])
+        
+        self.assertEqual([result.get("engine") for result in (results[0], results[2])], ["tesseract"] * 2)
+        self.assertEqual(results[1]["error"], "Aucune image fournie")
+        self.assertEqual(self.ocr.tesseract.submit.call_count, 2)
+        
+        images = [f"doc {i}".encode() for i in range(5)]
+        results = dict(self.ocr.iter_batch(images, batch_size=2))
+        self.assertEqual(sorted(results), list(range(5)))
+        self.assertTrue(all(result["engine"] == "tesseract" for result in results.values()))
+        
+        # Moteur local choisi: Vision n'est pas appelé même s'il est configuré
+        self.ocr.client = MagicMock()
+        self.ocr.backend = 'tesseract'
+        self.assertEqual(self.ocr.process_batch([b"image c"])[0]["engine"], "tesseract")
+        self.ocr.client.batch_annotate_images.assert_not_called()
+        
+        self.ocr.tesseract.available = False
+        self.assertEqual(self.ocr.process_batch([b"image d"])[0]["error"], "Tesseract OCR non disponible")
+    
+    def test_process_batch_hedged(self):
+        """Vision trop lent pour un lot: chaque image est lue par le moteur local"""
+        self.ocr.backend = 'hedged'
+        self.ocr.hedge_delay = 0.05
+        self.ocr.tesseract = self._local_engine()
+        
+        def slow_batch(requests):
+            time.sleep(0.5)
+            return self._batch_response(["AA-123-BB"] * len(requests))
+        self.ocr.client.batch_annotate_images.side_effect = slow_batch
+        
+        results = self.ocr.process_batch([b"image a", b"image b"])
+        
+        self.assertEqual([result["engine"] for result in results], ["tesseract"] * 2)
+        self.assertEqual(self.ocr.tesseract.submit.call_count, 2)
+        
+        # Vision répond dans le délai, une image en erreur: seule celle-ci est lue localement
+        self.ocr.tesseract = self._local_engine()
+        self.ocr.client.batch_annotate_images.side_effect = None
+        self.ocr.client.batch_annotate_images.return_value = self._batch_response(["BB-456-CC", None])
+        
+        results = self.ocr.process_batch([b"image c", b"image d"])
+        
+        self.assertEqual(results[0]["full_text"], "BB-456-CC")
+        self.assertEqual(results[1]["engine"], "tesseract")
+        self.ocr.tesseract.submit.assert_called_once_with(b"image d")
+    
     def test_extract_vehicle_info(self):
         """Test d'extraction des informations du véhicule"""
         # Données de test
@@ -114,6 +444,111 @@ class TestOCR(unittest.TestCase):
         self.assertEqual(result["vehicle_info"]["owner"], "MARTIN SOPHIE MARIE")
         self.assertEqual(result["vehicle_info"]["power"], "200 KW")
     
+    def test_extract_vehicle_info_field_confidence(self):
+        """La confiance par champ dépend de la position des blocs de texte"""
+        def block(text, left, top):
+            right, bottom = left + 20 * len(text), top + 24
+            return {"text": text, "bounding_poly": [[left, top], [right, top], [right, bottom], [left, bottom]]}
+        
+        ocr_result = {
+            "success": True,
+            "full_text": "A AA-123-BB\nE VF123456789012345\nRENAULT CLIO\n",
+            "text_blocks": [
+                block("A", 10, 10), block("AA-123-BB", 40, 10),
+                # VIN lu sans son code de rubrique, sur deux blocs décalés verticalement
+                block("VF12345678", 40, 50), block("9012345", 260, 90),
+                block("RENAULT", 10, 130), block("CLIO", 170, 130)
+            ]
+        }
+        
+        result = self.ocr.extract_vehicle_info(ocr_result)
+        confidence = result["field_confidence"]
+        
+        self.assertEqual(result["vehicle_info"]["make"], "Renault")
+        self.assertEqual(confidence["registration"], 1.0)  # localisée, alignée, après "A"
+        self.assertEqual(confidence["vin"], 0.7)  # localisé mais sur deux lignes, sans code
+        self.assertEqual(confidence["make"], 0.8)
+        self.assertEqual(confidence["first_registration_date"], 0.0)
+        
+        # Sans blocs de texte, seule la lecture dans le texte compte
+        del ocr_result["text_blocks"]
+        result = self.ocr.extract_vehicle_info(ocr_result)
+        self.assertEqual(result["field_confidence"]["registration"], 0.5)
+        self.assertEqual(result["confidence"], "basse")
+    
+    def _card_image(self):
+        """Photo de carte grise simulée (PNG blanc)"""
+        from PIL import Image
+        output = io.BytesIO()
+        Image.new('RGB', (800, 400), 'white').save(output, format='PNG')
+        return output.getvalue()
+    
+    def _low_confidence_result(self):
+        """Résultat OCR où seuls les codes de rubrique A, E et D.2 ont été lus"""
+        def block(text, left, top):
+            right, bottom = left + 20 * len(text), top + 24
+            return {"text": text, "bounding_poly": [[left, top], [right, top], [right, bottom], [left, bottom]]}
+        
+        return {
+            "success": True,
+            "full_text": "CERTIFICAT D'IMMATRICULATION\nA\nD.2\nE\nRENAULT\n",
+            "text_blocks": [block("A", 10, 10), block("D.2", 10, 50), block("E", 10, 90), block("RENAULT", 10, 130)]
+        }
+    
+    def test_refine_vehicle_info(self):
+        """Confiance basse: seules les zones des champs manquants sont relues, en une requête Vision"""
+        ocr_result = self._low_confidence_result()
+        extraction = self.ocr.extract_vehicle_info(ocr_result)
+        self.assertEqual(extraction["confidence"], "basse")
+        
+        zone_results = [
+            {"success": True, "full_text": "A AB-456-CD\n"},
+            {"error": "Erreur lors de l'analyse OCR: quota"},
+            {"success": True, "full_text": "D.2 BH0A12 D.3\n"}
+        ]
+        with patch.object(self.ocr, 'process_batch', return_value=zone_results) as process_batch:
+            result = self.ocr.refine_vehicle_info(extraction, ocr_result, image_content=self._card_image())
+        
+        crops = process_batch.call_args[0][0]
+        self.assertEqual(len(crops), 3)  # A, E et D.2: les autres codes n'ont pas été lus
+        from PIL import Image
+        with Image.open(io.BytesIO(crops[2])) as crop:
+            # Zone de la ligne "D.2" (24 px de haut, marges comprises) agrandie à des lignes de 64 px
+            self.assertEqual(crop.height, round(48 * 64 / 24))
+        
+        self.assertEqual(result["vehicle_info"]["registration"], "AB-456-CD")
+        self.assertEqual(result["vehicle_info"]["type_variant_version"], "BH0A12")
+        self.assertIsNone(result["vehicle_info"]["vin"])
+        self.assertEqual(result["refined_fields"], ["registration", "type_variant_version"])
+        self.assertEqual(result["field_confidence"]["registration"], 0.7)
+        self.assertEqual(result["extraction_quality"], "37.50%")
+        
+        # Confiance suffisante: pas de relecture
+        extraction = self.ocr.extract_vehicle_info({"success": True, "full_text": "RENAULT CLIO\nAA-123-BB\n"
+                                                    "VF123456789012345\n01/01/2020\nDUPONT JEAN\n5 CV\n"})
+        with patch.object(self.ocr, 'process_batch') as process_batch:
+            self.assertNotIn("refined_fields", self.ocr.refine_vehicle_info(extraction, ocr_result, image_content=b"x"))
+        process_batch.assert_not_called()
+    
+    def test_refine_vehicle_info_tesseract(self):
+        """Texte lu par Tesseract: les zones sont relues en parallèle sur le pool local"""
+        ocr_result = self._low_confidence_result()
+        ocr_result["engine"] = "tesseract"
+        engine = self._local_engine()
+        futures = []
+        for text in ("A\n", "E VF1 AB000 012345678\n", "D.2 BH0A12\n"):
+            futures.append(Future())
+            futures[-1].set_result({"success": True, "full_text": text})
+        engine.submit.side_effect = futures
+        self.ocr.tesseract = engine
+        
+        extraction = self.ocr.extract_vehicle_info(ocr_result)
+        result = self.ocr.refine_vehicle_info(extraction, ocr_result, image_content=self._card_image())
+        
+        self.assertEqual(engine.submit.call_count, 3)
+        self.assertEqual(result["vehicle_info"]["vin"], "VF1AB000012345678")
+        self.assertEqual(result["refined_fields"], ["vin", "type_variant_version"])
+    
     def test_validate_registration(self):
         """Test de validation du format de plaque d'immatriculation"""
         # Formats valides
@@ -175,5 +610,331 @@ class TestOCR(unittest.TestCase):
         self.assertEqual(result["vehicle_info"]["vin"], "VF123456789012345")
         self.assertIn("note", result)  # Le résultat devrait inclure la note du fallback
 
+class TestResultCache(unittest.TestCase):
+    """Tests du cache de résultats adressé par contenu"""
+
+    def setUp(self):
+        """Cache sur un dossier temporaire"""
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        self.metrics = MagicMock()
+
+    def tearDown(self):
+        """Suppression du dossier temporaire"""
+        import shutil
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _cache(self, **options):
+        """Cache de test (deux entrées en mémoire)"""
+        options.setdefault('max_entries', 2)
+        options.setdefault('directory', self.directory)
+        return ResultCache('test', enabled=True, metrics=self.metrics, **options)
+
+    def test_content_key(self):
+        """La clé dépend du contenu et de l'espace de noms, pas du type de tampon"""
+        self.assertEqual(content_key(b"abc", "ocr"), content_key(memoryview(b"abc"), "ocr"))
+        self.assertNotEqual(content_key(b"abc", "ocr"), content_key(b"abc", "labels"))
+        self.assertNotEqual(content_key(b"abc", "ocr"), content_key(b"abd", "ocr"))
+
+    def test_lru_and_copies(self):
+        """Le LRU est borné et chaque lecture retourne une copie"""
+        cache = self._cache(directory='')
+        cache.set("a", {"n": 1})
+        cache.set("b", {"n": 2})
+        cache.get("a")["n"] = 99
+        self.assertEqual(cache.get("a"), {"n": 1})
+        
+        cache.set("c", {"n": 3})  # "b" est le moins récemment utilisé
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.status()["entries"], 2)
+
+    def test_shared_on_disk(self):
+        """Un résultat écrit par un processus est lu par un autre"""
+        self._cache().set("cle", {"texte": "carte grise"})
+        
+        other = self._cache()
+        self.assertEqual(other.get("cle"), {"texte": "carte grise"})
+        self.assertEqual(other.stats["disk_hits"], 1)
+        self.assertEqual(other.get("cle"), {"texte": "carte grise"})
+        self.assertEqual(other.stats["memory_hits"], 1)
+        self.metrics.increment_counter.assert_any_call('result_cache_disk_hits', tags={'cache': 'test'})
+
+    def test_ttl_expiry(self):
+        """Les entrées expirées ne sont plus servies et sont purgées du disque"""
+        cache = self._cache(ttl=60)
+        cache.set("cle", {"n": 1})
+        
+        with patch('utils.result_cache.time.time', return_value=time.time() + 120):
+            self.assertIsNone(cache.get("cle"))
+            self.assertIsNone(self._cache(ttl=60).get("cle"))
+            self.assertEqual(cache.prune(), 1)
+        
+        self.assertIsNone(cache.get("cle"))
+
+
+class TestTesseractEngine(unittest.TestCase):
+    """Tests du moteur OCR local"""
+
+    def test_prepare_deskews_and_binarizes(self):
+        """L'image est binarisée, redressée, et les coordonnées ramenées à l'original"""
+        import cv2
+        import numpy as np
+        
+        image = np.full((600, 900), 255, dtype=np.uint8)
+        for i in range(8):
+            cv2.putText(image, f"AB-123-CD {i}", (40, 60 + i * 60), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 3)
+        skewed = cv2.warpAffine(image, cv2.getRotationMatrix2D((450, 300), 5, 1.0), (900, 600), borderValue=255)
+        
+        prepared, to_original, angle = prepare_for_tesseract(skewed, 450)
+        
+        self.assertAlmostEqual(angle, -5.0, delta=0.5)
+        self.assertEqual(prepared.shape, (300, 450))
+        self.assertEqual(set(np.unique(prepared)), {0, 255})
+        # Le centre de l'image préparée correspond au centre de l'original
+        np.testing.assert_allclose(to_original @ [225, 150, 1], [450, 300], atol=1)
+        
+        self.assertEqual(prepare_for_tesseract(image, 2000)[2], 0.0)
+
+    def test_unavailable(self):
+        """Sans exécutable tesseract, le moteur retourne une erreur explicite"""
+        engine = TesseractEngine(tesseract_cmd='/nonexistent/tesseract')
+        
+        self.assertFalse(engine.available)
+        self.assertEqual(engine.recognize(b"image"), {"error": "Tesseract OCR non disponible"})
+        with self.assertRaises(RuntimeError):
+            engine.submit(b"image")
+        
+        ocr = OCRProcessor()
+        ocr.tesseract = engine
+        self.assertIn("error", ocr.fallback_to_tesseract(image_content=b"image"))
+
+
+class TestJobQueue(unittest.TestCase):
+    """Tests de la file de jobs asynchrones"""
+
+    def setUp(self):
+        """File sur un stockage en mémoire"""
+        self.metrics = MagicMock()
+        self.queue = JobQueue(workers=1, max_pending=2, webhook_secret='secret', metrics=self.metrics,
+                              store=ResultCache('jobs', directory='', enabled=True))
+
+    def tearDown(self):
+        """Arrêt des threads"""
+        self.queue.shutdown()
+
+    def _wait(self, job_id):
+        """Attend la fin d'un job"""
+        for _ in range(200):
+            job = self.queue.get(job_id)
+            if job["status"] in ("done", "error"):
+                return job
+            time.sleep(0.01)
+        self.fail("Job non terminé")
+
+    def test_job_lifecycle(self):
+        """Un job passe de queued à done, un résultat en erreur termine le job en erreur"""
+        job = self.queue.submit('ocr', lambda value: {"value": value * 2}, 21)
+        self.assertEqual(job["status"], "queued")
+        self.assertEqual(self._wait(job["id"])["result"], {"value": 42})
+        
+        job = self.queue.submit('ocr', lambda: {"status": "error", "message": "Image illisible"})
+        self.assertEqual(self._wait(job["id"])["status"], "error")
+        
+        job = self.queue.submit('ocr', lambda: 1 / 0)
+        self.assertEqual(self._wait(job["id"])["result"]["status"], "error")
+        
+        self.assertIsNone(self.queue.get("../../etc/passwd"))
+        self.assertEqual(self.queue.status()["pending"], 0)
+
+    def test_bounded_queue(self):
+        """Au-delà de max_pending jobs en attente, les nouveaux sont refusés"""
+        import threading
+        release = threading.Event()
+        jobs = [self.queue.submit('ocr', lambda: release.wait(5) and {}) for _ in range(2)]
+        
+        with self.assertRaises(JobQueueFull):
+            self.queue.submit('ocr', dict)
+        
+        release.set()
+        for job in jobs:
+            self._wait(job["id"])
+        self.queue.submit('ocr', dict)
+
+    def test_webhook(self):
+        """Le job terminé est envoyé au webhook, signé avec la clé partagée"""
+        import hmac
+        import hashlib
+        with patch('utils.job_queue._PinnedAddressAdapter.send', autospec=True) as send, \
+                patch('utils.job_queue.socket.getaddrinfo', side_effect=self._resolve('93.184.216.34')):
+            send.return_value.status_code = 200
+            job = self.queue.submit('image_recognition', lambda: {"labels": []}, webhook='https://client.example/hook')
+            self._wait(job["id"])
+            for _ in range(200):
+                if send.called:
+                    break
+                time.sleep(0.01)
+        
+        adapter, request = send.call_args[0]
+        body, headers = request.body, request.headers
+        self.assertEqual(request.url, 'https://client.example/hook')
+        # Connexion à l'adresse vérifiée, certificat et SNI sur le nom d'origine
+        self.assertEqual((adapter.hostname, adapter.address, adapter.tls), ('client.example', '93.184.216.34', True))
+        self.assertEqual(adapter.poolmanager.connection_pool_kw["server_hostname"], 'client.example')
+        self.assertEqual(headers["X-NovaEvo-Job"], job["id"])
+        expected = hmac.new(b'secret', body, hashlib.sha256).hexdigest()
+        self.assertEqual(headers["X-NovaEvo-Signature"], f"sha256={expected}")
+        
+        with self.assertRaises(ValueError):
+            self.queue.submit('ocr', dict, webhook='file:///etc/passwd')
+    
+    def _resolve(self, *addresses):
+        """Résolution DNS simulée: chaque appel retourne l'adresse suivante (puis la dernière)"""
+        answers = list(addresses)
+        def getaddrinfo(host, port, **kwargs):
+            address = answers.pop(0) if len(answers) > 1 else answers[0]
+            family = socket.AF_INET6 if ':' in address else socket.AF_INET
+            return [(family, socket.SOCK_STREAM, 6, '', (address, port))]
+        return getaddrinfo
+    
+    def test_webhook_internal_addresses_rejected(self):
+        """Un webhook résolu en adresse interne est refusé à l'enregistrement"""
+        for url in ('http://127.0.0.1:8080/hook', 'http://169.254.169.254/latest/meta-data/',
+                    'http://10.0.0.5/hook', 'http://192.168.1.20/hook', 'http://[::1]/hook',
+                    'http://[::ffff:127.0.0.1]/hook', 'http://0.0.0.0/hook'):
+            with self.assertRaises(ValueError, msg=url):
+                self.queue.submit('ocr', dict, webhook=url)
+        
+        # Nom d'hôte public en apparence, résolu vers le réseau interne
+        with patch('utils.job_queue.socket.getaddrinfo', side_effect=self._resolve('172.16.0.3')):
+            self.assertIn("non autorisée", self.queue.webhook_error('https://hooks.client.example/x'))
+        with patch('utils.job_queue.socket.getaddrinfo', side_effect=socket.gaierror):
+            self.assertIn("introuvable", self.queue.webhook_error('https://absent.example/x'))
+        self.assertEqual(self.queue.status()["pending"], 0)
+    
+    def test_webhook_rebinding_checked_before_sending(self):
+        """Un hôte redirigé vers une adresse interne après l'enregistrement n'est pas appelé"""
+        with patch('utils.job_queue._PinnedAddressAdapter.send') as post, \
+                patch('utils.job_queue.socket.getaddrinfo', side_effect=self._resolve('93.184.216.34', '127.0.0.1')):
+            job = self.queue.submit('ocr', dict, webhook='https://rebind.example/hook')
+            self._wait(job["id"])
+            for _ in range(200):
+                if any(call.args[0] == 'job_webhook_failed' for call in self.metrics.increment_counter.call_args_list):
+                    break
+                time.sleep(0.01)
+        post.assert_not_called()
+        self.metrics.increment_counter.assert_any_call('job_webhook_failed', tags={'kind': 'ocr'})
+    
+    def test_webhook_sent_to_checked_address(self):
+        """L'envoi se connecte à l'adresse vérifiée, sans nouvelle résolution du nom"""
+        import threading
+        import urllib3
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        from utils.job_queue import _PinnedAddressAdapter
+        received = {}
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                received["host"] = self.headers["Host"]
+                received["body"] = self.rfile.read(int(self.headers["Content-Length"]))
+                self.send_response(204)
+                self.end_headers()
+            
+            def log_message(self, *args):
+                pass
+        
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        getaddrinfo = socket.getaddrinfo
+        looked_up = []
+        
+        def recording_getaddrinfo(host, *args, **kwargs):
+            looked_up.append(host)
+            return getaddrinfo(host, *args, **kwargs)
+        try:
+            with patch.object(urllib3.util.connection.socket, 'getaddrinfo', side_effect=recording_getaddrinfo):
+                response = self.queue._post_webhook(f'http://rebind.example:{server.server_port}/hook',
+                                                    '127.0.0.1', b'{}', {'Content-Type': 'application/json'})
+        finally:
+            server.shutdown()
+            server.server_close()
+        
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(received, {"host": f'rebind.example:{server.server_port}', "body": b'{}'})
+        self.assertNotIn('rebind.example', looked_up)
+    
+    def test_webhook_allowed_hosts(self):
+        """Avec une liste d'hôtes autorisés, seuls ces hôtes sont acceptés (sans résolution)"""
+        queue = JobQueue(workers=1, webhook_allowed_hosts='hooks.partner.example, crm.internal',
+                         store=ResultCache('jobs', directory='', enabled=True), metrics=MagicMock())
+        with patch('utils.job_queue.socket.getaddrinfo') as getaddrinfo:
+            self.assertTrue(queue.valid_webhook('https://HOOKS.partner.example/novaevo'))
+            self.assertTrue(queue.valid_webhook('http://crm.internal:8080/hook'))
+            self.assertIn("non autorisé", queue.webhook_error('https://client.example/hook'))
+            self.assertIn("non autorisé", queue.webhook_error('http://169.254.169.254/'))
+        getaddrinfo.assert_not_called()
+
+    def test_store_independent_of_result_cache_dir(self):
+        """Les jobs restent sur disque, visibles de tous les workers, même avec un cache de résultats en mémoire"""
+        import shutil
+        import tempfile
+        directory = tempfile.mkdtemp()
+        try:
+            with patch.dict(os.environ, {'RESULT_CACHE_DIR': '', 'JOB_STORE_DIR': directory}):
+                accepting = JobQueue(workers=1, metrics=MagicMock())
+                polled = JobQueue(workers=1, metrics=MagicMock())
+            self.assertEqual(accepting.store.directory, os.path.join(directory, 'jobs'))
+            
+            job = accepting.submit('ocr', dict)
+            for _ in range(200):
+                if (polled.get(job["id"]) or {}).get("status") == "done":
+                    break
+                time.sleep(0.01)
+            self.assertEqual(polled.get(job["id"])["status"], "done")
+            accepting.shutdown()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    
+    def test_store_revalidated_across_processes(self):
+        """Un job mis à jour par un autre worker n'est pas resservi périmé depuis la mémoire"""
+        import shutil
+        import tempfile
+        directory = tempfile.mkdtemp()
+        try:
+            writer = ResultCache('jobs', directory=directory, enabled=True, revalidate=True)
+            reader = ResultCache('jobs', directory=directory, enabled=True, revalidate=True)
+            
+            writer.set('job', {"status": "queued"})
+            self.assertEqual(reader.get('job'), {"status": "queued"})
+            time.sleep(0.01)
+            writer.set('job', {"status": "done"})
+            self.assertEqual(reader.get('job'), {"status": "done"})
+            self.assertEqual(writer.get('job'), {"status": "done"})
+            
+            writer.delete('job')
+            self.assertIsNone(reader.get('job'))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestMultiPatternMatcher(unittest.TestCase):
+    """Tests de l'automate de recherche de motifs"""
+
+    def test_finditer_overlapping(self):
+        """Toutes les occurrences sont trouvées, y compris imbriquées"""
+        matcher = MultiPatternMatcher(["MERCEDES", "MERCEDES BENZ", "DES", "BENZ"])
+        self.assertEqual(sorted(matcher.finditer("MERCEDES BENZ")),
+                         [(0, "MERCEDES"), (0, "MERCEDES BENZ"), (5, "DES"), (9, "BENZ")])
+        self.assertEqual(matcher.matches("UNE BENZ"), {"BENZ"})
+        self.assertFalse(matcher.contains("RENAULT"))
+
+    def test_first_follows_priority(self):
+        """first retourne le motif le plus prioritaire, comme une boucle sur les motifs"""
+        matcher = MultiPatternMatcher({"RENAULT": "Renault", "DS": "DS Automobiles"})
+        self.assertEqual(matcher.first("DS 3 RENAULT"), (5, "RENAULT"))
+        self.assertEqual(matcher.first("CITROEN DS 4"), (8, "DS"))
+        self.assertEqual(matcher.values["DS"], "DS Automobiles")
+        self.assertIsNone(matcher.first("PEUGEOT"))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,182 @@
+"""
+NovaEvo - Index des codes défaut OBD-II (DTC)
+
+Ce module charge une seule fois la base de codes défaut fournie avec
+l'application (utils/dtc_codes.json), complétée par le module contextuel
+'dtc_database', dans un index à plat: codes complets, préfixes à 3 et
+2 caractères et familles P/C/B/U partagent le même dictionnaire. La
+recherche d'un lot de codes se fait en une seule passe, au plus quatre
+accès au dictionnaire par code.
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.dtc_index')
+
+# Base de codes fournie avec l'application
+DEFAULT_DTC_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dtc_codes.json')
+
+# Format SAE J2012: famille, type (0-3), puis trois chiffres hexadécimaux
+DTC_PATTERN = re.compile(r'^[PCBU][0-3][0-9A-F]{3}$')
+
+# Niveaux de correspondance, du plus précis au plus générique
+MATCH_LEVELS = ('code', 'prefix_3', 'prefix_2', 'family')
+
+
+class DTCIndex:
+    """
+    Index des codes défaut OBD-II
+
+    Cette classe s'occupe de:
+    - Charger la base de codes fournie et la fusionner avec le module contextuel
+    - Indexer codes complets, préfixes et familles dans un seul dictionnaire
+    - Décrire un lot de codes en une seule passe (lookup_many)
+    """
+
+    def __init__(self, path: Optional[str] = None,
+                 context_source: Optional[Callable[[], Optional[Dict[str, Any]]]] = None):
+        """
+        Initialise l'index
+
+        Args:
+            path (str, optional): Chemin du fichier JSON de la base de codes
+            context_source (Callable, optional): Fonction retournant les codes du
+                module contextuel (dictionnaire code -> détails), ou None
+        """
+        self.path = path or os.getenv('DTC_CODES_FILE', DEFAULT_DTC_FILE)
+        self.context_source = context_source
+        self._lock = threading.Lock()
+
+        self._base = self._load()
+        self._entries = dict(self._base)
+        self._context_data = None
+
+    def lookup(self, code: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Décrit un code défaut
+
+        Args:
+            code (str | dict): Code (ex: "P0300") ou dictionnaire {"code": ...}
+
+        Returns:
+            Dict[str, Any]: Détails du code (voir lookup_many)
+        """
+        return self.lookup_many([code])[0]
+
+    def lookup_many(self, codes: Iterable[Union[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Décrit un lot de codes défaut en une seule passe
+
+        Le module contextuel n'est consulté qu'une fois par appel. Chaque code
+        est recherché tel quel, puis par préfixe à 3 et 2 caractères, puis par
+        famille.
+
+        Args:
+            codes (Iterable): Codes (ex: "P0300") ou dictionnaires {"code", "description"}
+                tels que retournés par OBDManager.get_dtc_codes()
+
+        Returns:
+            List[Dict[str, Any]]: Un résultat par code, dans l'ordre reçu, avec les clés
+            code, description, severity, possible_causes, recommended_actions et match
+            (niveau de correspondance, None si le code est inconnu)
+        """
+        entries = self._refresh()
+        results = []
+        resolved = {}
+
+        for item in codes:
+            fallback = ''
+            if isinstance(item, dict):
+                fallback = item.get('description') or ''
+                item = item.get('code', '')
+            code = str(item).strip().upper()
+
+            if code not in resolved:
+                resolved[code] = self._resolve(entries, code)
+            entry, match = resolved[code]
+
+            results.append({
+                'code': code,
+                'description': entry.get('description', '') if entry else fallback,
+                'severity': entry.get('severity', 'unknown') if entry else 'unknown',
+                'possible_causes': list(entry.get('causes', [])) if entry else [],
+                'recommended_actions': list(entry.get('actions', [])) if entry else [],
+                'match': match
+            })
+
+        return results
+
+    def _resolve(self, entries: Dict[str, Dict[str, Any]], code: str):
+        """
+        Recherche un code puis ses préfixes dans l'index
+
+        Args:
+            entries (Dict[str, Dict[str, Any]]): Index courant
+            code (str): Code normalisé
+
+        Returns:
+            tuple: (détails, niveau de correspondance), ou (None, None)
+        """
+        if not DTC_PATTERN.match(code):
+            return None, None
+
+        for key, match in zip((code, code[:3], code[:2], code[:1]), MATCH_LEVELS):
+            entry = entries.get(key)
+            if entry is not None:
+                return entry, match
+        return None, None
+
+    def _refresh(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Fusionne les codes du module contextuel s'ils ont changé
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Index à utiliser pour la passe de recherche
+        """
+        if self.context_source is None:
+            return self._entries
+
+        try:
+            context_data = self.context_source()
+        except Exception as e:
+            logger.warning(f"Codes défaut du module contextuel indisponibles: {str(e)}")
+            return self._entries
+
+        with self._lock:
+            # Le module contextuel remplace ses données à chaque synchronisation:
+            # l'identité de l'objet suffit à détecter un changement
+            if context_data is not self._context_data:
+                entries = dict(self._base)
+                if isinstance(context_data, dict):
+                    for code, details in context_data.items():
+                        if isinstance(details, dict):
+                            entries[str(code).upper()] = details
+                self._entries = entries
+                self._context_data = context_data
+            return self._entries
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Charge la base de codes fournie
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Index des codes complets, préfixes et familles
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement de la base de codes défaut: {str(e)}")
+            return {}
+
+        entries = {prefix: {'description': description}
+                   for prefix, description in data.get('prefixes', {}).items()}
+        entries.update(data.get('codes', {}))
+        logger.info(f"{len(entries)} entrées chargées dans l'index des codes défaut")
+        return entries
@@ -0,0 +1,284 @@
+"""
+NovaEvo - Préparation des images avant envoi à Google Cloud Vision
+
+Les photos prises au téléphone pèsent souvent 4 à 12 Mo alors que Vision n'a
+besoin que de 1 à 2 mégapixels pour lire une carte grise ou reconnaître une
+pièce. Ce module réduit l'image (plus grand côté borné), corrige son
+orientation EXIF, la passe en niveaux de gris pour l'OCR et la recompresse en
+JPEG ou WebP avant l'appel à l'API. Les octets économisés et la durée de la
+préparation sont enregistrés dans metrics_manager.
+"""
+
+import io
+import os
+import time
+import logging
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from PIL import Image, ImageOps, features
+
+from utils.metrics_manager import metrics_manager
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.image_preprocessing')
+
+# Usages des images envoyées à Vision
+PURPOSES = ('ocr', 'labels')
+
+# Formats de recompression pris en charge
+FORMATS = ('JPEG', 'WEBP')
+
+# Balise EXIF d'orientation, valeurs demandant une rotation ou un miroir,
+# et parmi elles celles qui échangent largeur et hauteur
+EXIF_ORIENTATION = 0x0112
+TRANSPOSED_ORIENTATIONS = (2, 3, 4, 5, 6, 7, 8)
+SWAPPED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def _env_flag(name: str, default: str) -> bool:
+    """
+    Lit un booléen dans les variables d'environnement
+
+    Args:
+        name (str): Nom de la variable
+        default (str): Valeur par défaut
+
+    Returns:
+        bool: Valeur de la variable
+    """
+    return os.getenv(name, default).lower() in ('true', '1', 't')
+
+
+class ImagePreprocessor:
+    """
+    Préparation des images avant un appel à Google Cloud Vision
+
+    Cette classe s'occupe de:
+    - Corriger l'orientation EXIF des photos
+    - Réduire l'image à un plus grand côté maximal (selon l'usage: OCR ou labels)
+    - Passer les images destinées à l'OCR en niveaux de gris
+    - Recompresser en JPEG ou WebP, en gardant l'original s'il est déjà plus léger
+    - Enregistrer les octets économisés et la durée de préparation
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, ocr_max_edge: Optional[int] = None,
+                 labels_max_edge: Optional[int] = None, quality: Optional[int] = None,
+                 image_format: Optional[str] = None, ocr_grayscale: Optional[bool] = None,
+                 metrics=None):
+        """
+        Initialise la préparation des images
+
+        Args:
+            enabled (bool, optional): Active la préparation (défaut: VISION_PREPROCESS)
+            ocr_max_edge (int, optional): Plus grand côté des images OCR (défaut: VISION_OCR_MAX_EDGE)
+            labels_max_edge (int, optional): Plus grand côté des images de labels
+                (défaut: VISION_LABELS_MAX_EDGE)
+            quality (int, optional): Qualité de recompression 1-95 (défaut: VISION_IMAGE_QUALITY)
+            image_format (str, optional): "JPEG" ou "WEBP" (défaut: VISION_IMAGE_FORMAT)
+            ocr_grayscale (bool, optional): Niveaux de gris pour l'OCR (défaut: VISION_OCR_GRAYSCALE)
+            metrics (MetricsManager, optional): Gestionnaire de métriques (défaut: metrics_manager)
+        """
+        self.enabled = enabled if enabled is not None else _env_flag('VISION_PREPROCESS', 'True')
+        self.max_edges = {
+            'ocr': ocr_max_edge or int(os.getenv('VISION_OCR_MAX_EDGE', '2048')),
+            'labels': labels_max_edge or int(os.getenv('VISION_LABELS_MAX_EDGE', '1024'))
+        }
+        self.quality = quality or int(os.getenv('VISION_IMAGE_QUALITY', '85'))
+        self.ocr_grayscale = ocr_grayscale if ocr_grayscale is not None else \
+            _env_flag('VISION_OCR_GRAYSCALE', 'True')
+        self.metrics = metrics or metrics_manager
+
+        self.image_format = (image_format or os.getenv('VISION_IMAGE_FORMAT', 'JPEG')).upper()
+        if self.image_format not in FORMATS:
+            logger.warning(f"Format d'image non pris en charge: {self.image_format}, JPEG utilisé")
+            self.image_format = 'JPEG'
+        elif self.image_format == 'WEBP' and not features.check('webp'):
+            logger.warning("Pillow compilé sans WebP, JPEG utilisé")
+            self.image_format = 'JPEG'
+
+    def signature(self, purpose: str) -> str:
+        """
+        Résume les paramètres appliqués à un usage (pour les clés de cache)
+
+        Args:
+            purpose (str): Usage de l'image ("ocr" ou "labels")
+
+        Returns:
+            str: Paramètres de préparation
+        """
+        if not self.enabled:
+            return 'brut'
+        grayscale = purpose == 'ocr' and self.ocr_grayscale
+        return f"{self.max_edges[purpose]}:{self.image_format}:{self.quality}:{'L' if grayscale else 'RGB'}"
+
+    def prepare(self, content: Union[bytes, memoryview],
+                purpose: str = 'labels') -> Tuple[bytes, Dict[str, Any]]:
+        """
+        Prépare une image pour Vision
+
+        Le contenu d'origine est retourné tel quel si la préparation est
+        désactivée, si l'image ne peut pas être décodée, ou si elle n'a besoin
+        ni d'être réduite ni d'être tournée et que la recompression ne l'allège pas.
+
+        Args:
+            content (bytes | memoryview): Image encodée (JPEG, PNG, ...)
+            purpose (str): Usage de l'image ("ocr" ou "labels")
+
+        Returns:
+            Tuple[bytes, Dict[str, Any]]: Image à envoyer et détails de la préparation
+            (original_bytes, bytes, bytes_saved, size, resized, rotated, format, duration_ms)
+        """
+        if purpose not in PURPOSES:
+            raise ValueError(f"Usage d'image inconnu: {purpose}")
+
+        original = content if isinstance(content, bytes) else bytes(content)
+        info = {
+            "original_bytes": len(original),
+            "bytes": len(original),
+            "bytes_saved": 0,
+            "resized": False,
+            "rotated": False,
+            "format": None,
+            "duration_ms": 0.0
+        }
+        if not self.enabled or not original:
+            return original, info
+
+        start = time.perf_counter()
+        try:
+            prepared, details = self._transform(original, purpose)
+        except Exception as e:
+            # Format inconnu de Pillow: Vision saura peut-être le lire
+            logger.debug(f"Image non préparée ({purpose}): {str(e)}")
+            return original, info
+        info.update(details)
+
+        if len(prepared) < len(original) or info["resized"] or info["rotated"]:
+            info["bytes"] = len(prepared)
+            info["bytes_saved"] = len(original) - len(prepared)
+        else:
+            prepared = original
+            info["format"] = None
+
+        info["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        self._record(purpose, info)
+        return prepared, info
+
+    def _transform(self, content: bytes, purpose: str) -> Tuple[bytes, Dict[str, Any]]:
+        """
+        Décode, oriente, réduit et recompresse une image
+
+        Args:
+            content (bytes): Image encodée
+            purpose (str): Usage de l'image
+
+        Returns:
+            Tuple[bytes, Dict[str, Any]]: Image recompressée et détails de la transformation
+        """
+        max_edge = self.max_edges[purpose]
+        grayscale = purpose == 'ocr' and self.ocr_grayscale
+
+        with Image.open(io.BytesIO(content)) as image:
+            orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+            rotated = orientation in TRANSPOSED_ORIENTATIONS
+            width, height = image.size
+            if orientation in SWAPPED_ORIENTATIONS:
+                width, height = height, width
+
+            # JPEG: décodage directement à une échelle réduite (1/2, 1/4, 1/8) quand c'est possible
+            image.draft('L' if grayscale else 'RGB', (max_edge, max_edge))
+            image = ImageOps.exif_transpose(image) if rotated else image
+
+            if grayscale:
+                image = image.convert('L')
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+
+            if max(image.size) > max_edge:
+                image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+            output = io.BytesIO()
+            image.save(output, format=self.image_format, quality=self.quality, optimize=True)
+
+        return output.getvalue(), {
+            "original_size": [width, height],
+            "size": list(image.size),
+            "resized": image.size != (width, height),
+            "rotated": rotated,
+            "format": self.image_format
+        }
+
+    def crop(self, content: Union[bytes, memoryview], boxes: List[Tuple[float, float, float, float]],
+             scales: List[float]) -> List[Optional[bytes]]:
+        """
+        Découpe des zones d'une image et les agrandit (relecture OCR d'une zone)
+
+        Les coordonnées sont celles de l'image d'origine après correction de
+        l'orientation EXIF, comme les blocs de texte des résultats OCR. L'image
+        n'est décodée qu'une fois pour toutes les zones.
+
+        Args:
+            content (bytes | memoryview): Image encodée
+            boxes (List[tuple]): Zones (gauche, haut, droite, bas), limitées à l'image
+            scales (List[float]): Facteur d'agrandissement de chaque zone
+
+        Returns:
+            List[Optional[bytes]]: Zones en PNG niveaux de gris (None pour une zone vide)
+        """
+        original = content if isinstance(content, bytes) else bytes(content)
+        crops = []
+        with Image.open(io.BytesIO(original)) as image:
+            image = ImageOps.exif_transpose(image).convert('L')
+            width, height = image.size
+            for (left, top, right, bottom), scale in zip(boxes, scales):
+                box = (max(0, int(left)), max(0, int(top)),
+                       min(width, int(right + 0.5)), min(height, int(bottom + 0.5)))
+                if box[2] <= box[0] or box[3] <= box[1]:
+                    crops.append(None)
+                    continue
+                zone = image.crop(box)
+                if scale > 1:
+                    zone = zone.resize((round(zone.width * scale), round(zone.height * scale)), Image.LANCZOS)
+                output = io.BytesIO()
+                zone.save(output, format='PNG')
+                crops.append(output.getvalue())
+        return crops
+
+    def _record(self, purpose: str, info: Dict[str, Any]) -> None:
+        """
+        Enregistre les métriques d'une préparation
+
+        Args:
+            purpose (str): Usage de l'image
+            info (Dict[str, Any]): Détails de la préparation
+        """
+        try:
+            tags = {'purpose': purpose}
+            self.metrics.record_value('vision_upload_bytes', info["bytes"], tags)
+            self.metrics.record_value('vision_upload_bytes_saved', info["bytes_saved"], tags)
+            self.metrics.record_value('vision_preprocess_ms', info["duration_ms"], tags)
+        except Exception as e:
+            logger.warning(f"Erreur lors de l'enregistrement des métriques d'image: {str(e)}")
+
+
+def record_vision_latency(feature: str, started: float) -> float:
+    """
+    Enregistre la durée d'un appel à Google Cloud Vision
+
+    Args:
+        feature (str): Fonctionnalité appelée (ex: "text_detection")
+        started (float): Valeur de time.perf_counter() avant l'appel
+
+    Returns:
+        float: Durée de l'appel en millisecondes
+    """
+    duration_ms = round((time.perf_counter() - started) * 1000, 2)
+    try:
+        metrics_manager.record_value('vision_request_ms', duration_ms, {'feature': feature})
+    except Exception as e:
+        logger.warning(f"Erreur lors de l'enregistrement de la latence Vision: {str(e)}")
+    return duration_ms
+
+
+# Instance partagée par les modules OCR et reconnaissance d'image
+image_preprocessor = ImagePreprocessor()
@@ -0,0 +1,452 @@
+"""
+NovaEvo - File de traitements asynchrones (OCR, reconnaissance d'image)
+
+Une analyse d'image peut occuper un worker gunicorn plusieurs secondes (image
+volumineuse, Vision lent). En mode job, l'endpoint enregistre le traitement,
+répond immédiatement avec un identifiant, et le traitement s'exécute sur un
+pool borné de threads. L'état et le résultat de chaque job sont conservés
+dans un ResultCache avec durée de vie (écrit sur disque sous JOB_STORE_DIR,
+donc lisible depuis n'importe quel worker gunicorn): le client interroge /jobs/<id> ou reçoit le
+résultat sur un webhook. Les webhooks ne peuvent viser que des adresses
+publiques (ou les hôtes d'une liste autorisée): un client ne doit pas
+pouvoir faire appeler par le serveur son réseau interne ou les métadonnées
+du cloud. L'envoi se connecte à l'adresse vérifiée, sans nouvelle
+résolution DNS.
+"""
+
+import os
+import re
+import hmac
+import json
+import time
+import uuid
+import socket
+import hashlib
+import logging
+import ipaddress
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse, urlunparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.metrics_manager import metrics_manager
+from utils.result_cache import ResultCache
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.job_queue')
+
+# Format des identifiants de job (uuid4 hexadécimal)
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Tentatives de livraison d'un webhook et délai avant chaque nouvelle tentative (s)
+WEBHOOK_ATTEMPTS = 3
+WEBHOOK_BACKOFF = 2.0
+
+
+class JobQueueFull(Exception):
+    """Trop de jobs en attente: le client doit réessayer plus tard"""
+
+
+class _PinnedAddressAdapter(HTTPAdapter):
+    """
+    Adaptateur requests qui se connecte à une adresse déjà vérifiée
+
+    Cette classe s'occupe de:
+    - Remplacer l'hôte de l'URL par l'adresse vérifiée: pas de seconde
+      résolution DNS, qui pourrait viser une adresse interne (DNS rebinding)
+    - Garder le nom d'origine pour l'en-tête Host, le SNI et la vérification
+      du certificat en https
+    """
+
+    def __init__(self, hostname: str, address: Optional[str] = None, tls: bool = False, **kwargs):
+        """
+        Initialise l'adaptateur
+
+        Args:
+            hostname (str): Nom d'hôte de l'URL
+            address (str, optional): Adresse IP à laquelle se connecter (None: résolution habituelle)
+            tls (bool): Adaptateur monté pour https
+            **kwargs: Arguments de HTTPAdapter
+        """
+        self.hostname = hostname
+        self.address = address
+        self.tls = tls
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        """
+        Crée le pool de connexions, avec le nom d'origine pour le SNI et le certificat
+        """
+        if self.address is not None and self.tls:
+            kwargs.update(server_hostname=self.hostname, assert_hostname=self.hostname)
+        super().init_poolmanager(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        """
+        Envoie la requête à l'adresse vérifiée, avec l'en-tête Host d'origine
+
+        Args:
+            request (PreparedRequest): Requête préparée par la session
+            **kwargs: Arguments de HTTPAdapter.send
+
+        Returns:
+            requests.Response: Réponse du serveur
+        """
+        if self.address is not None:
+            parsed = urlparse(request.url)
+            address = f"[{self.address}]" if ':' in self.address else self.address
+            request.headers['Host'] = parsed.netloc.rpartition('@')[2]
+            request.url = urlunparse(parsed._replace(netloc=f"{address}:{parsed.port}" if parsed.port else address))
+        return super().send(request, **kwargs)
+
+
+class JobQueue:
+    """
+    File de jobs exécutés en arrière-plan
+
+    Cette classe s'occupe de:
+    - Enregistrer un job et retourner son identifiant sans attendre son exécution
+    - Exécuter les jobs sur un pool borné de threads, en refusant les nouveaux
+      jobs au-delà d'un nombre maximal en attente
+    - Conserver l'état et le résultat des jobs avec une durée de vie
+    - Notifier un webhook à la fin d'un job (signature HMAC optionnelle), en
+      refusant les adresses internes à l'enregistrement et à chaque envoi
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 ttl: Optional[float] = None, store: Optional[ResultCache] = None,
+                 webhook_timeout: Optional[float] = None, webhook_secret: Optional[str] = None,
+                 webhook_allowed_hosts: Optional[str] = None, metrics=None):
+        """
+        Initialise la file (les threads sont créés au premier job)
+
+        Args:
+            workers (int, optional): Jobs exécutés simultanément (défaut: JOB_WORKERS)
+            max_pending (int, optional): Jobs en attente ou en cours au-delà desquels
+                les nouveaux sont refusés (défaut: JOB_MAX_PENDING)
+            ttl (float, optional): Durée de conservation des jobs en secondes (défaut: JOB_RESULT_TTL)
+            store (ResultCache, optional): Stockage des jobs (défaut: cache "jobs" sous
+                JOB_STORE_DIR, indépendant de RESULT_CACHE_DIR)
+            webhook_timeout (float, optional): Délai d'un appel de webhook (défaut: JOB_WEBHOOK_TIMEOUT)
+            webhook_secret (str, optional): Clé de signature des webhooks (défaut: JOB_WEBHOOK_SECRET)
+            webhook_allowed_hosts (str, optional): Seuls hôtes de webhook acceptés, séparés par
+                des virgules; vide = tout hôte résolu en adresses publiques
+                (défaut: JOB_WEBHOOK_ALLOWED_HOSTS)
+            metrics (MetricsManager, optional): Gestionnaire de métriques (défaut: metrics_manager)
+        """
+        self.workers = max(1, workers or int(os.getenv('JOB_WORKERS', '2')))
+        self.max_pending = max_pending or int(os.getenv('JOB_MAX_PENDING', '100'))
+        self.ttl = ttl or float(os.getenv('JOB_RESULT_TTL', '3600'))
+        self.webhook_timeout = webhook_timeout or float(os.getenv('JOB_WEBHOOK_TIMEOUT', '5'))
+        self.webhook_secret = webhook_secret if webhook_secret is not None else os.getenv('JOB_WEBHOOK_SECRET', '')
+        allowed_hosts = webhook_allowed_hosts if webhook_allowed_hosts is not None else \
+            os.getenv('JOB_WEBHOOK_ALLOWED_HOSTS', '')
+        self.webhook_allowed_hosts = {host.strip().lower() for host in allowed_hosts.split(',') if host.strip()}
+        self.metrics = metrics or metrics_manager
+        # Toujours actif, et relu sur disque: le job peut être mis à jour par un autre worker.
+        # Sur disque même si RESULT_CACHE_DIR est vide: /jobs/<id> peut arriver à n'importe quel worker
+        self.store = store or ResultCache('jobs', directory=os.getenv('JOB_STORE_DIR', 'data'), ttl=self.ttl,
+                                          enabled=True, revalidate=True)
+
+        self._pending = 0
+        self._executor = None
+        self._webhook_executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, func: Callable[..., Dict[str, Any]], *args,
+               webhook: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Enregistre un job et le place dans la file
+
+        Le résultat de func est conservé tel quel; un résultat contenant "error"
+        ou "status": "error" termine le job en erreur.
+
+        Args:
+            kind (str): Type de traitement (ex: "ocr")
+            func (Callable): Traitement à exécuter, retournant un dictionnaire
+            *args: Arguments du traitement
+            webhook (str, optional): URL http(s) appelée (POST JSON) à la fin du job
+            **kwargs: Arguments nommés du traitement
+
+        Returns:
+            Dict[str, Any]: Job enregistré (id, kind, status "queued", created_at)
+
+        Raises:
+            ValueError: Si l'URL du webhook n'est pas valide ou vise une adresse interne
+            JobQueueFull: Si trop de jobs sont déjà en attente
+        """
+        error = self.webhook_error(webhook) if webhook else None
+        if error:
+            raise ValueError(error)
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"{self._pending} jobs déjà en attente")
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+            executor = self._executor
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": "queued",
+            "created_at": time.time(),
+            "webhook": bool(webhook)
+        }
+        self.store.set(job["id"], job)
+        try:
+            executor.submit(self._run, dict(job), func, args, kwargs, webhook)
+        except Exception:
+            self._release()
+            raise
+        self._count('submitted', kind)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retourne l'état d'un job
+
+        Args:
+            job_id (str): Identifiant du job
+
+        Returns:
+            Optional[Dict[str, Any]]: Job (et son résultat une fois terminé), ou None
+            s'il est inconnu ou expiré
+        """
+        if not JOB_ID_PATTERN.match(job_id or ''):
+            return None
+        return self.store.get(job_id)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Retourne l'état de la file
+
+        Returns:
+            Dict[str, Any]: Jobs en attente ou en cours et paramètres
+        """
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "ttl": self.ttl
+            }
+
+    def shutdown(self) -> None:
+        """
+        Arrête les threads (les jobs pas encore démarrés sont abandonnés)
+        """
+        with self._lock:
+            executors = (self._executor, self._webhook_executor)
+            self._executor = self._webhook_executor = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def valid_webhook(self, url: str) -> bool:
+        """
+        Vérifie l'URL d'un webhook
+
+        Args:
+            url (str): URL fournie par le client
+
+        Returns:
+            bool: True si le webhook peut être appelé (voir webhook_error)
+        """
+        return self.webhook_error(url) is None
+
+    def webhook_error(self, url: str) -> Optional[str]:
+        """
+        Vérifie qu'un webhook peut être appelé
+
+        Avec JOB_WEBHOOK_ALLOWED_HOSTS, seuls les hôtes listés sont acceptés.
+        Sinon, l'hôte est résolu et chacune de ses adresses doit être publique:
+        boucle locale, réseaux privés, link-local (métadonnées du cloud),
+        adresses réservées et multicast sont refusés. La vérification est
+        refaite avant chaque envoi, et l'envoi se connecte à l'adresse vérifiée
+        (voir _check_webhook).
+
+        Args:
+            url (str): URL fournie par le client
+
+        Returns:
+            Optional[str]: Motif du refus, ou None si le webhook est accepté
+        """
+        return self._check_webhook(url)[0]
+
+    def _check_webhook(self, url: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Vérifie un webhook et retourne l'adresse à laquelle l'appeler
+
+        L'hôte ayant pu être redirigé vers une adresse interne depuis une
+        vérification précédente (DNS rebinding), la connexion doit se faire à
+        l'adresse retournée ici, sans nouvelle résolution.
+
+        Args:
+            url (str): URL fournie par le client
+
+        Returns:
+            Tuple[Optional[str], Optional[str]]: (motif du refus ou None, adresse IP
+            vérifiée, None pour un hôte de JOB_WEBHOOK_ALLOWED_HOSTS)
+        """
+        try:
+            parsed = urlparse(url)
+            port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        except ValueError:
+            parsed = port = None
+        if parsed is None or parsed.scheme not in ('http', 'https') or not parsed.hostname:
+            return "URL de webhook invalide (http ou https attendu)", None
+
+        host = parsed.hostname.lower()
+        if self.webhook_allowed_hosts:
+            if host in self.webhook_allowed_hosts:
+                return None, None
+            return f"Hôte de webhook non autorisé: {host}", None
+
+        try:
+            addresses = list(dict.fromkeys(
+                info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            ))
+        except (socket.gaierror, UnicodeError):
+            return f"Hôte de webhook introuvable: {host}", None
+        if not addresses:
+            return f"Hôte de webhook introuvable: {host}", None
+        for address in addresses:
+            # Zone d'une adresse IPv6 link-local (fe80::1%eth0)
+            ip = ipaddress.ip_address(address.split('%')[0])
+            if not ip.is_global or ip.is_multicast:
+                return f"Adresse de webhook non autorisée: {host}", None
+        return None, addresses[0]
+
+    def _run(self, job: Dict[str, Any], func: Callable[..., Dict[str, Any]],
+             args: tuple, kwargs: Dict[str, Any], webhook: Optional[str]) -> None:
+        """
+        Exécute un job et enregistre son résultat (thread du pool)
+
+        Args:
+            job (Dict[str, Any]): Job enregistré
+            func (Callable): Traitement
+            args (tuple): Arguments du traitement
+            kwargs (Dict[str, Any]): Arguments nommés du traitement
+            webhook (str, optional): URL à notifier
+        """
+        try:
+            job.update({"status": "running", "started_at": time.time()})
+            self.store.set(job["id"], job)
+
+            try:
+                result = func(*args, **kwargs)
+                failed = "error" in result or result.get("status") == "error"
+                job.update({"status": "error" if failed else "done", "result": result})
+            except Exception as e:
+                logger.error(f"Erreur lors du job {job['id']} ({job['kind']}): {str(e)}")
+                job.update({"status": "error", "result": {"status": "error", "message": str(e)}})
+
+            job["finished_at"] = time.time()
+            self.store.set(job["id"], job)
+            self._count(job["status"], job["kind"], job["finished_at"] - job["started_at"])
+        finally:
+            self._release()
+
+        if webhook:
+            self._get_webhook_executor().submit(self._notify, webhook, job)
+
+    def _notify(self, url: str, job: Dict[str, Any]) -> bool:
+        """
+        Envoie le job terminé au webhook du client, avec nouvelles tentatives
+
+        Args:
+            url (str): URL du webhook
+            job (Dict[str, Any]): Job terminé
+
+        Returns:
+            bool: True si le webhook a répondu par un code 2xx
+        """
+        body = json.dumps(job, ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'X-NovaEvo-Job': job["id"]}
+        if self.webhook_secret:
+            signature = hmac.new(self.webhook_secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+            headers['X-NovaEvo-Signature'] = f"sha256={signature}"
+
+        for attempt in range(1, WEBHOOK_ATTEMPTS + 1):
+            error, address = self._check_webhook(url)
+            if error:
+                logger.warning(f"Webhook du job {job['id']} refusé: {error}")
+                break
+            try:
+                response = self._post_webhook(url, address, body, headers)
+                if 200 <= response.status_code < 300:
+                    self._count('webhook_delivered', job["kind"])
+                    return True
+                logger.warning(f"Webhook du job {job['id']}: réponse {response.status_code}")
+            except requests.RequestException as e:
+                logger.warning(f"Webhook du job {job['id']} injoignable (tentative {attempt}): {str(e)}")
+            if attempt < WEBHOOK_ATTEMPTS:
+                time.sleep(WEBHOOK_BACKOFF * attempt)
+
+        self._count('webhook_failed', job["kind"])
+        return False
+
+    def _post_webhook(self, url: str, address: Optional[str], body: bytes,
+                      headers: Dict[str, str]) -> requests.Response:
+        """
+        Envoie un webhook en se connectant à l'adresse vérifiée
+
+        Args:
+            url (str): URL du webhook
+            address (str, optional): Adresse IP vérifiée (None: résolution habituelle)
+            body (bytes): Corps JSON
+            headers (Dict[str, str]): En-têtes de la requête
+
+        Returns:
+            requests.Response: Réponse du webhook
+        """
+        parsed = urlparse(url)
+        with requests.Session() as session:
+            # Connexion directe: un proxy de l'environnement résoudrait le nom lui-même
+            session.trust_env = False
+            session.mount(f"{parsed.scheme}://",
+                          _PinnedAddressAdapter(parsed.hostname, address, tls=parsed.scheme == 'https'))
+            return session.post(url, data=body, headers=headers,
+                                timeout=self.webhook_timeout, allow_redirects=False)
+
+    def _get_webhook_executor(self) -> ThreadPoolExecutor:
+        """
+        Retourne le thread d'envoi des webhooks (les attentes entre tentatives
+        n'occupent pas le pool des jobs)
+
+        Returns:
+            ThreadPoolExecutor: Pool d'un thread
+        """
+        with self._lock:
+            if self._webhook_executor is None:
+                self._webhook_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='job-webhook')
+            return self._webhook_executor
+
+    def _release(self) -> None:
+        """
+        Libère une place dans la file
+        """
+        with self._lock:
+            self._pending -= 1
+
+    def _count(self, outcome: str, kind: str, duration: Optional[float] = None) -> None:
+        """
+        Enregistre un événement de la file dans les métriques
+
+        Args:
+            outcome (str): Événement (submitted, done, error, webhook_delivered, webhook_failed)
+            kind (str): Type de traitement
+            duration (float, optional): Durée d'exécution du job (s)
+        """
+        try:
+            tags = {'kind': kind}
+            self.metrics.increment_counter(f'job_{outcome}', tags=tags)
+            if duration is not None:
+                self.metrics.record_value('job_duration_ms', round(duration * 1000, 2), tags)
+        except Exception as e:
+            logger.warning(f"Erreur lors de l'enregistrement des métriques de job: {str(e)}")
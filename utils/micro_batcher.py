@@ -0,0 +1,206 @@
+"""
+NovaEvo - Regroupement des requêtes concurrentes en lots (micro-batching)
+
+Une passe d'inférence sur un lot de N images coûte nettement moins que N
+passes d'une image (une seule préparation du réseau, calcul vectorisé sur le
+lot). Ce module regroupe les éléments soumis par plusieurs requêtes pendant
+une fenêtre de quelques millisecondes, les traite en un seul appel dans un
+thread dédié, puis rend à chaque requête le résultat de son élément.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+from utils.metrics_manager import metrics_manager
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.micro_batcher')
+
+# Marqueur d'arrêt du thread de regroupement
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Regroupement d'éléments soumis par des threads concurrents
+
+    Cette classe s'occupe de:
+    - Recevoir des éléments de plusieurs threads (une requête HTTP chacun)
+    - Les regrouper pendant au plus max_delay, jusqu'à max_batch_size éléments
+    - Traiter chaque lot en un seul appel, dans un thread dédié
+    - Rendre à chaque appelant le résultat de son élément (ou l'erreur du lot)
+    - Recréer son thread dans un processus issu d'un fork
+    """
+
+    def __init__(self, func: Callable[[List[Any]], List[Any]], max_batch_size: int = 8,
+                 max_delay: float = 0.005, name: str = 'batch', metrics=None):
+        """
+        Initialise le regroupement (le thread est créé au premier élément)
+
+        Args:
+            func (Callable): Traitement d'un lot, retournant un résultat par élément, dans l'ordre
+            max_batch_size (int): Nombre maximal d'éléments par lot
+            max_delay (float): Attente maximale d'autres éléments après le premier (s)
+            name (str): Nom du regroupement (thread et métriques)
+            metrics (MetricsManager, optional): Gestionnaire de métriques (défaut: metrics_manager)
+        """
+        self.func = func
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_delay = max(0.0, max_delay)
+        self.name = name
+        self.metrics = metrics or metrics_manager
+
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, item: Any) -> Future:
+        """
+        Place un élément dans le prochain lot
+
+        Args:
+            item (Any): Élément à traiter
+
+        Returns:
+            Future: Résultat de l'élément
+        """
+        future = Future()
+        self._get_queue().put((item, future))
+        return future
+
+    def process(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Traite un élément avec ceux soumis en même temps, et attend son résultat
+
+        Sans fenêtre de regroupement (max_delay nul, lots d'un élément), le
+        traitement a lieu directement dans le thread appelant.
+
+        Args:
+            item (Any): Élément à traiter
+            timeout (float, optional): Attente maximale du résultat (s)
+
+        Returns:
+            Any: Résultat de l'élément
+
+        Raises:
+            TimeoutError: Si le résultat n'est pas disponible à temps
+            Exception: Erreur levée par le traitement du lot
+        """
+        if self.max_batch_size == 1 or self.max_delay == 0:
+            return self.func([item])[0]
+        return self.submit(item).result(timeout=timeout)
+
+    def status(self) -> dict:
+        """
+        Retourne l'état du regroupement
+
+        Returns:
+            dict: Éléments en attente et paramètres
+        """
+        with self._lock:
+            running = self._queue is not None and self._pid == os.getpid()
+            return {
+                "pending": self._queue.qsize() if running else 0,
+                "max_batch_size": self.max_batch_size,
+                "max_delay_ms": round(self.max_delay * 1000, 2)
+            }
+
+    def shutdown(self) -> None:
+        """
+        Arrête le thread après le traitement des éléments déjà soumis
+        """
+        with self._lock:
+            pending, self._queue = self._queue, None
+            if pending is not None and self._pid == os.getpid():
+                pending.put(_STOP)
+
+    def _get_queue(self) -> queue.Queue:
+        """
+        Retourne la file du thread de regroupement, créé au premier usage
+
+        Le thread n'existe pas dans un processus issu d'un fork: il est alors recréé.
+
+        Returns:
+            queue.Queue: File des éléments à regrouper
+        """
+        with self._lock:
+            if self._queue is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._loop, args=(self._queue,), name=f'{self.name}-batcher', daemon=True
+                )
+                self._thread.start()
+            return self._queue
+
+    def _loop(self, pending: queue.Queue) -> None:
+        """
+        Boucle du thread: regroupe les éléments et traite chaque lot
+
+        Args:
+            pending (queue.Queue): File des éléments soumis
+        """
+        stopping = False
+        while not stopping:
+            first = pending.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    # Éléments déjà en attente: pris sans attendre, même après la fenêtre
+                    entry = pending.get(timeout=remaining) if remaining > 0 else pending.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            self._run(batch)
+
+    def _run(self, batch: List[tuple]) -> None:
+        """
+        Traite un lot et transmet les résultats aux appelants
+
+        Args:
+            batch (List[tuple]): (élément, Future) de chaque appelant
+        """
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            results = self.func([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{len(results)} résultats pour un lot de {len(batch)} éléments")
+        except Exception as e:
+            logger.error(f"Erreur lors du traitement d'un lot {self.name}: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+        self._record(len(batch), time.perf_counter() - start)
+
+    def _record(self, size: int, duration: float) -> None:
+        """
+        Enregistre la taille et la durée d'un lot dans les métriques
+
+        Args:
+            size (int): Éléments du lot
+            duration (float): Durée du traitement (s)
+        """
+        try:
+            self.metrics.record_value(f'{self.name}_batch_size', size)
+            self.metrics.record_value(f'{self.name}_batch_ms', round(duration * 1000, 2))
+        except Exception as e:
+            logger.warning(f"Erreur lors de l'enregistrement des métriques de lot: {str(e)}")
@@ -0,0 +1,162 @@
+"""
+NovaEvo - Recherche simultanée de plusieurs motifs dans un texte
+
+Ce module construit un automate d'Aho-Corasick à partir d'une liste de motifs
+littéraux (marques de véhicules, mots-clés...). Le texte est parcouru une seule
+fois, caractère par caractère, quel que soit le nombre de motifs: le coût ne
+dépend plus du produit lignes × motifs des boucles `motif in ligne`.
+"""
+
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+
+class MultiPatternMatcher:
+    """
+    Automate d'Aho-Corasick sur un ensemble de motifs littéraux
+
+    Cette classe s'occupe de:
+    - Construire l'automate (transitions complètes, sans retour arrière au parcours)
+    - Trouver toutes les occurrences des motifs, y compris celles qui se chevauchent
+    - Retourner le motif prioritaire présent dans un texte (ordre de la liste)
+    - Associer une valeur à chaque motif (ex: nom affiché d'une marque)
+
+    La comparaison est exacte: normaliser la casse du texte et des motifs avant l'appel.
+    """
+
+    def __init__(self, patterns: Union[Iterable[str], Dict[str, Any]]):
+        """
+        Construit l'automate
+
+        Args:
+            patterns (Iterable[str] | Dict[str, Any]): Motifs par ordre de priorité,
+                ou dictionnaire motif -> valeur (l'ordre des clés donne la priorité).
+                Les doublons et les motifs vides sont ignorés.
+        """
+        values = patterns if isinstance(patterns, dict) else {}
+        self.patterns = list(dict.fromkeys(p for p in patterns if p))
+        self.values = {pattern: values.get(pattern, pattern) for pattern in self.patterns}
+
+        self._transitions, self._outputs = self._build(self.patterns)
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, str]]:
+        """
+        Parcourt toutes les occurrences des motifs
+
+        Args:
+            text (str): Texte à analyser
+
+        Yields:
+            Tuple[int, str]: (position de début, motif), par position de fin croissante
+        """
+        transitions, outputs, patterns = self._transitions, self._outputs, self.patterns
+        state = 0
+        for position, char in enumerate(text):
+            state = transitions[state].get(char, 0)
+            for index in outputs[state]:
+                pattern = patterns[index]
+                yield position - len(pattern) + 1, pattern
+
+    def first(self, text: str) -> Optional[Tuple[int, str]]:
+        """
+        Retourne le motif prioritaire présent dans le texte
+
+        Le résultat est celui d'une boucle `for motif in motifs: if motif in texte`,
+        en un seul parcours du texte.
+
+        Args:
+            text (str): Texte à analyser
+
+        Returns:
+            Optional[Tuple[int, str]]: (position de sa première occurrence, motif), ou None
+        """
+        transitions, outputs = self._transitions, self._outputs
+        state = 0
+        best = None
+        best_end = 0
+        for position, char in enumerate(text):
+            state = transitions[state].get(char, 0)
+            for index in outputs[state]:
+                if best is None or index < best:
+                    best, best_end = index, position
+        if best is None:
+            return None
+        pattern = self.patterns[best]
+        return best_end - len(pattern) + 1, pattern
+
+    def contains(self, text: str) -> bool:
+        """
+        Indique si le texte contient au moins un motif (arrêt à la première occurrence)
+
+        Args:
+            text (str): Texte à analyser
+
+        Returns:
+            bool: True si un motif est présent
+        """
+        transitions, outputs = self._transitions, self._outputs
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            if outputs[state]:
+                return True
+        return False
+
+    def matches(self, text: str) -> Set[str]:
+        """
+        Retourne les motifs présents dans le texte
+
+        Args:
+            text (str): Texte à analyser
+
+        Returns:
+            Set[str]: Motifs trouvés au moins une fois
+        """
+        return {pattern for _, pattern in self.finditer(text)}
+
+    @staticmethod
+    def _build(patterns: List[str]) -> Tuple[List[Dict[str, int]], List[Tuple[int, ...]]]:
+        """
+        Construit les transitions et les sorties de l'automate
+
+        Les liens d'échec sont intégrés aux transitions (parcours en largeur): un
+        caractère absent des transitions d'un état ramène à l'état initial.
+
+        Args:
+            patterns (List[str]): Motifs distincts
+
+        Returns:
+            tuple: (transitions par état, indices des motifs reconnus par état)
+        """
+        transitions = [{}]
+        outputs = [[]]
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                following = transitions[state].get(char)
+                if following is None:
+                    following = len(transitions)
+                    transitions.append({})
+                    outputs.append([])
+                    transitions[state][char] = following
+                state = following
+            outputs[state].append(index)
+
+        # Arbre des préfixes, avant ajout des transitions issues des liens d'échec
+        children = [dict(state_transitions) for state_transitions in transitions]
+        failures = [0] * len(transitions)
+        queue = deque(children[0].values())
+        while queue:
+            state = queue.popleft()
+            failure = failures[state]
+            # Un état hérite des transitions et des sorties de son lien d'échec (déjà complet)
+            transitions[state] = {**transitions[failure], **children[state]}
+            outputs[state] = outputs[state] + outputs[failure]
+            for char, child in children[state].items():
+                failures[child] = transitions[failure].get(char, 0)
+                queue.append(child)
+
+        return transitions, [tuple(sorted(output)) for output in outputs]
@@ -0,0 +1,363 @@
+"""
+NovaEvo - Index des images quasi identiques (hash perceptuel)
+
+Les techniciens envoient souvent plusieurs photos presque identiques de la
+même pièce: elles ne diffèrent que par le bruit de compression JPEG, un
+léger recadrage ou un changement d'exposition. Le cache par contenu
+(utils/result_cache.py) ne les rapproche pas, puisque leurs octets
+diffèrent. Ce module calcule un dHash de 64 bits (sens du gradient de
+luminosité sur une vignette 9x8) et range les hash dans un BK-tree: les
+images à une distance de Hamming inférieure au rayon configuré retrouvent
+l'analyse déjà calculée, sans nouvel appel à Vision ni passe du modèle.
+L'index est gardé en mémoire pour la durée d'une session de travail
+(durée de vie bornée).
+"""
+
+import os
+import copy
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from utils.metrics_manager import metrics_manager
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.perceptual_hash')
+
+# Taille de la vignette du dHash: 9 colonnes donnent 8 comparaisons par ligne, soit 64 bits
+DHASH_SIZE = (9, 8)
+
+# Plus grand côté de l'image avant la réduction à la vignette (sous-échantillonnage sans calcul)
+DHASH_MAX_EDGE = 256
+
+# Écart-type minimal de la vignette: en dessous, l'image est presque uniforme
+# et son hash (quasi nul) la rapprocherait de toutes les autres images unies
+MIN_CONTRAST = 2.0
+
+# Poids des bits du hash
+_BIT_WEIGHTS = 1 << np.arange(64, dtype=np.uint64)
+
+
+def dhash(image: np.ndarray) -> Optional[int]:
+    """
+    Calcule le dHash d'une image décodée
+
+    Args:
+        image (numpy.ndarray): Image BGR ou niveaux de gris
+
+    Returns:
+        Optional[int]: Hash de 64 bits, ou None pour une image presque uniforme
+    """
+    height, width = image.shape[:2]
+    if not height or not width:
+        return None
+    # Sous-échantillonnage par pas entier: la vignette moyenne ensuite les pixels restants
+    step = max(1, max(height, width) // DHASH_MAX_EDGE)
+    reduced = image[::step, ::step]
+    if reduced.ndim == 3:
+        reduced = cv2.cvtColor(reduced, cv2.COLOR_BGR2GRAY)
+
+    thumbnail = cv2.resize(reduced, DHASH_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+    if thumbnail.std() < MIN_CONTRAST:
+        return None
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).ravel()
+    return int(_BIT_WEIGHTS[bits].sum())
+
+
+def dhash_content(content: Union[bytes, memoryview]) -> Optional[int]:
+    """
+    Calcule le dHash d'une image encodée
+
+    Les JPEG sont décodés directement au huitième de leur taille (en niveaux
+    de gris): quelques millisecondes pour une photo de 12 mégapixels.
+
+    Args:
+        content (bytes | memoryview): Image encodée (JPEG, PNG, ...)
+
+    Returns:
+        Optional[int]: Hash de 64 bits, ou None si l'image est illisible ou presque uniforme
+    """
+    buffer = np.frombuffer(content, dtype=np.uint8)
+    if not buffer.size:
+        return None
+    image = cv2.imdecode(buffer, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if image is None:
+        return None
+    return dhash(image)
+
+
+def hamming(first: int, second: int) -> int:
+    """
+    Distance de Hamming entre deux hash
+
+    Args:
+        first (int): Premier hash
+        second (int): Second hash
+
+    Returns:
+        int: Nombre de bits différents
+    """
+    return (first ^ second).bit_count()
+
+
+class BKTree:
+    """
+    Arbre de Burkhard-Keller pour la distance de Hamming
+
+    Cette classe s'occupe de:
+    - Ranger des hash avec la valeur associée (un nœud par hash distinct)
+    - Retrouver les hash à une distance inférieure à un rayon, en n'explorant
+      que les sous-arbres compatibles avec l'inégalité triangulaire
+    """
+
+    def __init__(self):
+        """Initialise un arbre vide"""
+        self.root = None
+        self.size = 0
+
+    def add(self, value: int, item: Any) -> Any:
+        """
+        Ajoute un hash à l'arbre
+
+        Args:
+            value (int): Hash
+            item (Any): Valeur associée (remplace celle d'un hash identique)
+
+        Returns:
+            Any: Valeur remplacée, ou None si le hash est nouveau
+        """
+        if self.root is None:
+            self.root = [value, item, {}]
+            self.size = 1
+            return None
+
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                replaced, node[1] = node[1], item
+                return replaced
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, item, {}]
+                self.size += 1
+                return None
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, Any]]:
+        """
+        Recherche les hash proches
+
+        Args:
+            value (int): Hash recherché
+            radius (int): Distance de Hamming maximale
+
+        Returns:
+            List[Tuple[int, Any]]: (distance, valeur) des hash à moins de radius bits
+        """
+        found = []
+        pending = [self.root] if self.root is not None else []
+        while pending:
+            node = pending.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.append((distance, node[1]))
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    pending.append(child)
+        return found
+
+
+class NearDuplicateIndex:
+    """
+    Résultats d'analyse retrouvés par proximité du hash perceptuel
+
+    Cette classe s'occupe de:
+    - Associer un résultat au hash d'une image, dans un espace de noms
+      (paramètres de l'analyse qui l'a produit)
+    - Retrouver le résultat de l'image la plus proche dans le rayon configuré
+    - Borner le nombre d'entrées (LRU) et leur durée de vie, en reconstruisant
+      les arbres quand trop d'entrées supprimées y restent
+    - Publier les succès et échecs de recherche dans les métriques
+    """
+
+    def __init__(self, name: str, radius: Optional[int] = None, max_entries: Optional[int] = None,
+                 ttl: Optional[float] = None, enabled: Optional[bool] = None, metrics=None):
+        """
+        Initialise l'index
+
+        Args:
+            name (str): Nom de l'index (tag des métriques)
+            radius (int, optional): Distance de Hamming maximale entre deux images
+                quasi identiques, sur 64 bits (défaut: NEAR_DUPLICATE_RADIUS)
+            max_entries (int, optional): Nombre de résultats gardés (défaut: NEAR_DUPLICATE_SIZE)
+            ttl (float, optional): Durée de vie d'un résultat en secondes, 0 = illimitée
+                (défaut: NEAR_DUPLICATE_TTL)
+            enabled (bool, optional): Active l'index (défaut: NEAR_DUPLICATE_ENABLED)
+            metrics (MetricsManager, optional): Gestionnaire de métriques (défaut: metrics_manager)
+        """
+        self.name = name
+        self.radius = radius if radius is not None else int(os.getenv('NEAR_DUPLICATE_RADIUS', '6'))
+        self.max_entries = max_entries or int(os.getenv('NEAR_DUPLICATE_SIZE', '512'))
+        self.ttl = ttl if ttl is not None else float(os.getenv('NEAR_DUPLICATE_TTL', '1800'))
+        self.enabled = enabled if enabled is not None else \
+            os.getenv('NEAR_DUPLICATE_ENABLED', 'True').lower() in ('true', '1', 't')
+        self.metrics = metrics or metrics_manager
+
+        # Entrées vivantes (identifiant -> espace de noms, hash, date, résultat), les plus anciennes en tête
+        self._entries = OrderedDict()
+        self._trees = {}
+        self._stale = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'writes': 0
+        }
+
+    def get(self, namespace: str, value: Optional[int]) -> Optional[Tuple[Any, int]]:
+        """
+        Retourne le résultat de l'image la plus proche
+
+        Args:
+            namespace (str): Espace de noms (paramètres de l'analyse)
+            value (int, optional): Hash de l'image (None: recherche ignorée)
+
+        Returns:
+            Optional[Tuple[Any, int]]: (copie du résultat, distance de Hamming), ou None
+        """
+        if not self.enabled or value is None:
+            return None
+
+        now = time.time()
+        best = None
+        with self._lock:
+            tree = self._trees.get(namespace)
+            for distance, entry_id in tree.search(value, self.radius) if tree else ():
+                entry = self._entries.get(entry_id)
+                if entry is None:
+                    continue
+                if self._expired(entry[2], now):
+                    self._discard(entry_id)
+                    continue
+                # À distance égale, l'image la plus récente
+                if best is None or (distance, -entry_id) < (best[0], -best[1]):
+                    best = (distance, entry_id)
+
+            if best is not None:
+                self._entries.move_to_end(best[1])
+                result = self._entries[best[1]][3]
+            self.stats['hits' if best is not None else 'misses'] += 1
+
+        self._publish('hits' if best is not None else 'misses')
+        if best is None:
+            return None
+        return copy.deepcopy(result), best[0]
+
+    def set(self, namespace: str, value: Optional[int], result: Any) -> None:
+        """
+        Associe un résultat au hash d'une image
+
+        Args:
+            namespace (str): Espace de noms (paramètres de l'analyse)
+            value (int, optional): Hash de l'image (None: rien n'est enregistré)
+            result (Any): Résultat de l'analyse (copié)
+        """
+        if not self.enabled or value is None:
+            return
+
+        result = copy.deepcopy(result)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (namespace, value, time.time(), result)
+            replaced = self._trees.setdefault(namespace, BKTree()).add(value, entry_id)
+            if replaced is not None:
+                self._entries.pop(replaced, None)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+            self.stats['writes'] += 1
+
+    def clear(self) -> None:
+        """
+        Vide l'index
+        """
+        with self._lock:
+            self._entries.clear()
+            self._trees.clear()
+            self._stale = 0
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Retourne l'état de l'index
+
+        Returns:
+            Dict[str, Any]: Entrées, paramètres et compteurs
+        """
+        with self._lock:
+            return {
+                "name": self.name,
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "radius": self.radius,
+                **self.stats
+            }
+
+    def _discard(self, entry_id: int) -> None:
+        """
+        Supprime une entrée (à appeler sous verrou)
+
+        Un BK-tree ne permet pas de retirer un nœud: l'entrée reste dans l'arbre
+        jusqu'à sa reconstruction, déclenchée quand les entrées supprimées sont
+        aussi nombreuses que la taille maximale de l'index.
+
+        Args:
+            entry_id (int): Identifiant de l'entrée
+        """
+        if self._entries.pop(entry_id, None) is None:
+            return
+        self._stale += 1
+        if self._stale >= self.max_entries:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        """
+        Reconstruit les arbres à partir des entrées vivantes (à appeler sous verrou)
+        """
+        self._trees = {}
+        for entry_id, (namespace, value, _, _) in self._entries.items():
+            self._trees.setdefault(namespace, BKTree()).add(value, entry_id)
+        self._stale = 0
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        """
+        Indique si une entrée a dépassé sa durée de vie
+
+        Args:
+            stored_at (float): Date d'enregistrement
+            now (float): Date courante
+
+        Returns:
+            bool: True si l'entrée est expirée
+        """
+        return bool(self.ttl) and now - stored_at > self.ttl
+
+    def _publish(self, outcome: str) -> None:
+        """
+        Publie une recherche dans les métriques (hors verrou)
+
+        Args:
+            outcome (str): "hits" ou "misses"
+        """
+        try:
+            self.metrics.increment_counter(f'near_duplicate_{outcome}', tags={'index': self.name})
+        except Exception as e:
+            logger.warning(f"Erreur lors de l'enregistrement des métriques de l'index: {str(e)}")
@@ -0,0 +1,386 @@
+"""
+NovaEvo - Cache de résultats adressé par contenu
+
+Ce module conserve les résultats d'analyses coûteuses (OCR et labels Google
+Cloud Vision) sous une clé dérivée du contenu analysé: la même image renvoyée
+par un utilisateur ou rejouée par le support retrouve son résultat sans
+nouvel appel à l'API. Les résultats sont gardés dans un LRU borné en mémoire
+et écrits sur disque (un fichier JSON par clé, écrit de manière atomique),
+ce qui les partage entre les workers gunicorn. Les taux de succès sont
+publiés dans metrics_manager.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Union
+
+from utils.metrics_manager import metrics_manager
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.result_cache')
+
+# Nombre d'écritures entre deux purges des entrées expirées sur disque
+PRUNE_INTERVAL = 200
+
+# Nombre de lectures entre deux publications du taux de succès (jauge écrite sur disque)
+RATIO_INTERVAL = 50
+
+
+def content_key(content: Union[bytes, memoryview], namespace: str = '') -> str:
+    """
+    Calcule la clé d'un contenu
+
+    SHA-256 est accéléré matériellement sur les processeurs récents (environ
+    1 ms par Mo): c'est le plus rapide des condensats de hashlib pour des
+    images de plusieurs mégaoctets.
+
+    Args:
+        content (bytes | memoryview): Contenu analysé (hashé sans copie)
+        namespace (str): Préfixe distinguant les usages et leurs paramètres
+
+    Returns:
+        str: Clé hexadécimale
+    """
+    digest = hashlib.sha256(namespace.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(content)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Cache de résultats JSON, en mémoire et sur disque
+
+    Cette classe s'occupe de:
+    - Conserver les résultats récents dans un LRU borné (sérialisés: chaque
+      lecture retourne une copie indépendante)
+    - Écrire chaque résultat sur disque pour les autres processus
+    - Expirer les entrées au-delà de leur durée de vie
+    - Publier les succès et échecs de lecture dans les métriques
+    """
+
+    def __init__(self, name: str, max_entries: Optional[int] = None,
+                 directory: Optional[str] = None, ttl: Optional[float] = None,
+                 enabled: Optional[bool] = None, revalidate: bool = False, metrics=None):
+        """
+        Initialise le cache
+
+        Args:
+            name (str): Nom du cache (sous-dossier et tag des métriques)
+            max_entries (int, optional): Nombre de résultats gardés en mémoire
+                (défaut: variable RESULT_CACHE_SIZE)
+            directory (str, optional): Dossier racine sur disque, None ou "" pour
+                un cache en mémoire seulement (défaut: variable RESULT_CACHE_DIR)
+            ttl (float, optional): Durée de vie d'une entrée en secondes, 0 = illimitée
+                (défaut: variable RESULT_CACHE_TTL)
+            enabled (bool, optional): Active le cache (défaut: variable RESULT_CACHE_ENABLED)
+            revalidate (bool): Vérifie sur disque qu'une entrée en mémoire n'a pas été
+                réécrite ou supprimée par un autre processus (valeurs modifiées après
+                leur première écriture, ex: état d'un job)
+            metrics (MetricsManager, optional): Gestionnaire de métriques (défaut: metrics_manager)
+        """
+        self.name = name
+        self.max_entries = max_entries or int(os.getenv('RESULT_CACHE_SIZE', '256'))
+        self.ttl = ttl if ttl is not None else float(os.getenv('RESULT_CACHE_TTL', str(7 * 24 * 3600)))
+        self.enabled = enabled if enabled is not None else \
+            os.getenv('RESULT_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+        self.revalidate = revalidate
+        self.metrics = metrics or metrics_manager
+
+        root = directory if directory is not None else os.getenv('RESULT_CACHE_DIR', 'data/result_cache')
+        self.directory = os.path.join(root, name) if root else None
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'writes': 0
+        }
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Retourne le résultat associé à une clé
+
+        Args:
+            key (str): Clé (voir content_key)
+
+        Returns:
+            Optional[Any]: Copie du résultat, ou None s'il est absent ou expiré
+        """
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        written_at = self._written_at(key) if self.revalidate else None
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, payload = entry
+                if written_at is not None and written_at != stored_at:
+                    # Réécrite (ou supprimée) par un autre processus: relire le disque
+                    del self._memory[key]
+                    entry = None
+                elif not self._expired(stored_at, now):
+                    self._memory.move_to_end(key)
+                    counted = self._count('memory_hits')
+                else:
+                    del self._memory[key]
+                    entry = None
+
+        if entry is None:
+            entry = self._read(key, now)
+            with self._lock:
+                if entry is None:
+                    counted = self._count('misses')
+                else:
+                    self._remember(key, *entry)
+                    counted = self._count('disk_hits')
+
+        self._publish(counted)
+        return json.loads(entry[1]) if entry is not None else None
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Enregistre un résultat en mémoire et sur disque
+
+        Args:
+            key (str): Clé (voir content_key)
+            value (Any): Résultat sérialisable en JSON
+        """
+        if not self.enabled:
+            return
+
+        try:
+            payload = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Résultat non sérialisable, non mis en cache ({self.name}): {str(e)}")
+            return
+
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, stored_at, payload)
+            self.stats['writes'] += 1
+            self._writes += 1
+            prune = self._writes % PRUNE_INTERVAL == 0
+
+        self._write(key, payload)
+        if self.revalidate:
+            # L'entrée en mémoire porte la date du fichier, comparée aux lectures suivantes
+            written_at = self._written_at(key)
+            with self._lock:
+                if written_at and self._memory.get(key, (None, None))[1] == payload:
+                    self._memory[key] = (written_at, payload)
+        if prune:
+            self.prune()
+
+    def delete(self, key: str) -> None:
+        """
+        Supprime une entrée
+
+        Args:
+            key (str): Clé de l'entrée
+        """
+        with self._lock:
+            self._memory.pop(key, None)
+        path = self._path(key)
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def prune(self) -> int:
+        """
+        Supprime les entrées expirées sur disque
+
+        Returns:
+            int: Nombre de fichiers supprimés
+        """
+        if self.directory is None or not self.ttl or not os.path.isdir(self.directory):
+            return 0
+
+        removed = 0
+        limit = time.time() - self.ttl
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                try:
+                    if os.path.getmtime(path) < limit:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    continue
+        if removed:
+            logger.info(f"{removed} entrées expirées supprimées du cache {self.name}")
+        return removed
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Retourne l'état du cache
+
+        Returns:
+            Dict[str, Any]: Entrées en mémoire, compteurs et taux de succès
+        """
+        with self._lock:
+            return {
+                "name": self.name,
+                "enabled": self.enabled,
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "directory": self.directory,
+                "hit_ratio": self._hit_ratio(),
+                **self.stats
+            }
+
+    def _remember(self, key: str, stored_at: float, payload: str) -> None:
+        """
+        Ajoute une entrée au LRU (à appeler sous verrou)
+
+        Args:
+            key (str): Clé de l'entrée
+            stored_at (float): Date d'écriture
+            payload (str): Résultat sérialisé
+        """
+        self._memory[key] = (stored_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        """
+        Indique si une entrée a dépassé sa durée de vie
+
+        Args:
+            stored_at (float): Date d'écriture
+            now (float): Date courante
+
+        Returns:
+            bool: True si l'entrée est expirée
+        """
+        return bool(self.ttl) and now - stored_at > self.ttl
+
+    def _path(self, key: str) -> Optional[str]:
+        """
+        Chemin du fichier d'une entrée (sous-dossiers par préfixe de clé)
+
+        Args:
+            key (str): Clé de l'entrée
+
+        Returns:
+            Optional[str]: Chemin, ou None sans stockage sur disque
+        """
+        if self.directory is None:
+            return None
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _written_at(self, key: str) -> Optional[float]:
+        """
+        Date d'écriture d'une entrée sur disque
+
+        Args:
+            key (str): Clé de l'entrée
+
+        Returns:
+            Optional[float]: Date du fichier, 0 s'il n'existe pas, None sans stockage sur disque
+        """
+        path = self._path(key)
+        if path is None:
+            return None
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0.0
+
+    def _read(self, key: str, now: float):
+        """
+        Lit une entrée sur disque
+
+        Args:
+            key (str): Clé de l'entrée
+            now (float): Date courante
+
+        Returns:
+            tuple: (date d'écriture, résultat sérialisé), ou None si absente ou expirée
+        """
+        path = self._path(key)
+        if path is None:
+            return None
+        try:
+            stored_at = os.path.getmtime(path)
+            if self._expired(stored_at, now):
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return stored_at, f.read()
+        except OSError:
+            return None
+
+    def _write(self, key: str, payload: str) -> None:
+        """
+        Écrit une entrée sur disque (fichier temporaire puis renommage atomique)
+
+        Args:
+            key (str): Clé de l'entrée
+            payload (str): Résultat sérialisé
+        """
+        path = self._path(key)
+        if path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Écriture impossible dans le cache {self.name}: {str(e)}")
+
+    def _hit_ratio(self) -> float:
+        """
+        Taux de succès depuis le démarrage (à appeler sous verrou)
+
+        Returns:
+            float: Part des lectures servies par le cache
+        """
+        hits = self.stats['memory_hits'] + self.stats['disk_hits']
+        total = hits + self.stats['misses']
+        return round(hits / total, 4) if total else 0.0
+
+    def _count(self, outcome: str) -> tuple:
+        """
+        Compte une lecture (à appeler sous verrou)
+
+        Args:
+            outcome (str): "memory_hits", "disk_hits" ou "misses"
+
+        Returns:
+            tuple: (résultat de la lecture, taux de succès à publier ou None)
+        """
+        self.stats[outcome] += 1
+        reads = self.stats['memory_hits'] + self.stats['disk_hits'] + self.stats['misses']
+        return outcome, self._hit_ratio() if reads % RATIO_INTERVAL == 1 else None
+
+    def _publish(self, counted: tuple) -> None:
+        """
+        Publie une lecture dans les métriques (hors verrou)
+
+        Args:
+            counted (tuple): Valeur retournée par _count
+        """
+        outcome, ratio = counted
+        try:
+            tags = {'cache': self.name}
+            self.metrics.increment_counter(f'result_cache_{outcome}', tags=tags)
+            if ratio is not None:
+                self.metrics.set_gauge('result_cache_hit_ratio', ratio, tags)
+        except Exception as e:
+            logger.warning(f"Erreur lors de l'enregistrement des métriques du cache: {str(e)}")
@@ -0,0 +1,382 @@
+"""
+NovaEvo - Moteur OCR local Tesseract sur un pool de processus
+
+Tesseract est lent (plusieurs centaines de millisecondes par page): la
+préparation de l'image et la reconnaissance tournent dans un pool de processus
+dédiés, hors des threads de requêtes, démarrés une fois puis réutilisés
+(imports et réglages faits à leur création). Chaque image est binarisée (seuil adaptatif) et redressée
+(angle estimé sur l'encre) avant la reconnaissance. Le résultat a la même
+forme que celui de Google Cloud Vision (full_text et text_blocks dans les
+coordonnées de l'image d'origine): le moteur sert de solution hors ligne et de
+requête de couverture quand Vision tarde à répondre.
+"""
+
+import os
+import time
+import shutil
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from utils.metrics_manager import metrics_manager
+
+try:
+    import pytesseract
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.tesseract_engine')
+
+# Angles d'inclinaison corrigés (degrés): en dessous, inutile; au-delà, estimation peu fiable
+MIN_DESKEW_ANGLE = 0.3
+MAX_DESKEW_ANGLE = 15.0
+
+# Taille du voisinage et décalage du seuil adaptatif (pixels, niveaux de gris)
+THRESHOLD_BLOCK_SIZE = 31
+THRESHOLD_OFFSET = 15
+
+
+def prepare_for_tesseract(image: np.ndarray, max_edge: int) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Réduit, binarise et redresse une image en niveaux de gris
+
+    Args:
+        image (np.ndarray): Image en niveaux de gris
+        max_edge (int): Plus grand côté de l'image transmise à Tesseract
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, float]: Image binaire (texte noir sur blanc),
+        transformation affine 2x3 ramenant ses coordonnées dans l'image d'origine,
+        angle de redressement appliqué (degrés)
+    """
+    scale = 1.0
+    height, width = image.shape[:2]
+    if max(height, width) > max_edge:
+        scale = max_edge / max(height, width)
+        image = cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+    # Seuil adaptatif: supporte l'éclairage inégal des photos prises au téléphone
+    binary = cv2.adaptiveThreshold(
+        cv2.GaussianBlur(image, (3, 3), 0), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY, THRESHOLD_BLOCK_SIZE, THRESHOLD_OFFSET
+    )
+
+    # Inclinaison: rectangle d'aire minimale englobant les pixels d'encre
+    angle = 0.0
+    ink = cv2.findNonZero(255 - binary)
+    if ink is not None and len(ink) > 50:
+        rect_angle = cv2.minAreaRect(ink)[-1]
+        angle = rect_angle - 90 if rect_angle > 45 else rect_angle
+        if not MIN_DESKEW_ANGLE <= abs(angle) <= MAX_DESKEW_ANGLE:
+            angle = 0.0
+
+    rotation = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+    if angle:
+        center = (binary.shape[1] / 2, binary.shape[0] / 2)
+        rotation = cv2.getRotationMatrix2D(center, angle, 1.0)
+        binary = cv2.warpAffine(binary, rotation, (binary.shape[1], binary.shape[0]),
+                                flags=cv2.INTER_NEAREST, borderValue=255)
+
+    # Image préparée -> image réduite (rotation inverse) -> image d'origine (échelle)
+    to_original = cv2.invertAffineTransform(rotation) / scale
+    return binary, to_original, round(float(angle), 2)
+
+
+def _init_worker(tesseract_cmd: Optional[str]) -> None:
+    """
+    Initialise un processus du pool (une seule fois par processus)
+
+    Args:
+        tesseract_cmd (str, optional): Chemin de l'exécutable tesseract
+    """
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    # OpenCV parallélise déjà entre processus: un thread par processus suffit
+    cv2.setNumThreads(1)
+
+
+def _ping(delay: float = 0.0) -> int:
+    """
+    Tâche vide utilisée pour démarrer les processus du pool
+
+    Args:
+        delay (float): Durée d'occupation du processus (s), pour que chaque tâche en démarre un
+
+    Returns:
+        int: Identifiant du processus
+    """
+    time.sleep(delay)
+    return os.getpid()
+
+
+def _recognize(content: bytes, lang: str, max_edge: int) -> Dict[str, Any]:
+    """
+    Reconnaît le texte d'une image (exécuté dans un processus du pool)
+
+    Args:
+        content (bytes): Image encodée (JPEG, PNG, ...)
+        lang (str): Langue(s) Tesseract (ex: "fra")
+        max_edge (int): Plus grand côté de l'image transmise à Tesseract
+
+    Returns:
+        Dict[str, Any]: Résultat au format de l'OCR Vision (full_text, text_blocks)
+    """
+    started = time.perf_counter()
+    image = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return {"error": "Image illisible pour Tesseract OCR"}
+
+    prepared, to_original, angle = prepare_for_tesseract(image, max_edge)
+    data = pytesseract.image_to_data(prepared, lang=lang, output_type=pytesseract.Output.DICT)
+
+    lines, text_blocks, confidences = {}, [], []
+    for i, word in enumerate(data["text"]):
+        word = word.strip()
+        confidence = float(data["conf"][i])
+        if not word or confidence < 0:
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+        confidences.append(confidence)
+
+        left, top = data["left"][i], data["top"][i]
+        right, bottom = left + data["width"][i], top + data["height"][i]
+        corners = np.array([[left, top, 1], [right, top, 1], [right, bottom, 1], [left, bottom, 1]], dtype=float)
+        text_blocks.append({
+            "text": word,
+            "bounding_poly": [[round(x), round(y)] for x, y in corners @ to_original.T]
+        })
+
+    details = {
+        "mean_confidence": round(sum(confidences) / len(confidences), 1) if confidences else 0.0,
+        "deskew_angle": angle,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+    if not text_blocks:
+        return {"success": True, "message": "Aucun texte détecté dans l'image", "engine": "tesseract",
+                "tesseract": details}
+
+    return {
+        "success": True,
+        "full_text": "\n".join(" ".join(words) for words in lines.values()) + "\n",
+        "text_blocks": text_blocks,
+        "engine": "tesseract",
+        "tesseract": details
+    }
+
+
+class TesseractEngine:
+    """
+    Moteur OCR Tesseract exécuté dans un pool de processus
+
+    Cette classe s'occupe de:
+    - Vérifier que pytesseract et l'exécutable tesseract sont installés
+    - Créer le pool au premier usage (ou via warm_up) et le garder entre les requêtes
+    - Soumettre les images sans bloquer l'appelant (Future) ou attendre le résultat
+    - Recréer le pool après la perte d'un processus ou dans un processus issu d'un fork
+    """
+
+    def __init__(self, workers: Optional[int] = None, lang: Optional[str] = None,
+                 tesseract_cmd: Optional[str] = None, max_edge: Optional[int] = None,
+                 timeout: Optional[float] = None, metrics=None):
+        """
+        Initialise le moteur (aucun processus n'est démarré ici)
+
+        Args:
+            workers (int, optional): Nombre de processus (défaut: TESSERACT_WORKERS)
+            lang (str, optional): Langue(s) Tesseract (défaut: TESSERACT_LANG)
+            tesseract_cmd (str, optional): Exécutable tesseract (défaut: TESSERACT_CMD)
+            max_edge (int, optional): Plus grand côté des images reconnues (défaut: TESSERACT_MAX_EDGE)
+            timeout (float, optional): Attente maximale d'un résultat en secondes (défaut: TESSERACT_TIMEOUT)
+            metrics (MetricsManager, optional): Gestionnaire de métriques (défaut: metrics_manager)
+        """
+        self.workers = max(1, workers or int(os.getenv('TESSERACT_WORKERS', '2')))
+        self.lang = lang or os.getenv('TESSERACT_LANG', 'fra')
+        self.tesseract_cmd = tesseract_cmd or os.getenv('TESSERACT_CMD') or None
+        self.max_edge = max_edge or int(os.getenv('TESSERACT_MAX_EDGE', '2500'))
+        self.timeout = timeout or float(os.getenv('TESSERACT_TIMEOUT', '30'))
+        self.metrics = metrics or metrics_manager
+
+        self._available = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """True si pytesseract et l'exécutable tesseract sont installés"""
+        if self._available is None:
+            self._available = PYTESSERACT_AVAILABLE and \
+                shutil.which(self.tesseract_cmd or 'tesseract') is not None
+            if not self._available:
+                logger.warning("Tesseract OCR non disponible (pytesseract ou exécutable tesseract absent)")
+        return self._available
+
+    def warm_up(self) -> int:
+        """
+        Démarre tous les processus du pool
+
+        Returns:
+            int: Nombre de processus démarrés (0 si Tesseract n'est pas disponible)
+        """
+        if not self.available:
+            return 0
+        executor = self._get_executor()
+        futures = [executor.submit(_ping, 0.2) for _ in range(self.workers)]
+        pids = {future.result(timeout=self.timeout) for future in futures}
+        logger.info(f"Pool Tesseract prêt: {len(pids)} processus")
+        return len(pids)
+
+    def submit(self, content: Union[bytes, memoryview]) -> Future:
+        """
+        Soumet une image au pool sans attendre le résultat
+
+        Args:
+            content (bytes | memoryview): Image encodée
+
+        Returns:
+            Future: Résultat de la reconnaissance (voir _recognize)
+
+        Raises:
+            RuntimeError: Si Tesseract n'est pas disponible
+        """
+        if not self.available:
+            raise RuntimeError("Tesseract OCR non disponible")
+        # Copie nécessaire: le contenu est transmis par pickle au processus du pool
+        content = content if isinstance(content, bytes) else bytes(content)
+        try:
+            return self._get_executor().submit(_recognize, content, self.lang, self.max_edge)
+        except BrokenProcessPool:
+            self._discard_executor()
+            return self._get_executor().submit(_recognize, content, self.lang, self.max_edge)
+
+    def recognize(self, content: Union[bytes, memoryview, None] = None,
+                  image_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Reconnaît le texte d'une image et attend le résultat
+
+        Args:
+            content (bytes | memoryview, optional): Image encodée
+            image_path (str, optional): Chemin de l'image (si content n'est pas fourni)
+
+        Returns:
+            Dict[str, Any]: Résultat au format de l'OCR Vision, ou {"error": ...}
+        """
+        if not self.available:
+            return {"error": "Tesseract OCR non disponible"}
+        try:
+            if content is None:
+                with open(image_path, 'rb') as image_file:
+                    content = image_file.read()
+            future = self.submit(content)
+            result = future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            logger.error(f"Tesseract OCR n'a pas répondu en {self.timeout} s")
+            return {"error": f"Tesseract OCR n'a pas répondu en {self.timeout} s"}
+        except BrokenProcessPool:
+            self._discard_executor()
+            logger.error("Un processus Tesseract s'est arrêté, pool recréé au prochain appel")
+            return {"error": "Erreur avec Tesseract: processus arrêté"}
+        except Exception as e:
+            logger.error(f"Erreur lors de l'utilisation de Tesseract OCR: {str(e)}")
+            return {"error": f"Erreur avec Tesseract: {str(e)}"}
+
+        self.record(result)
+        return result
+
+    def record(self, result: Dict[str, Any]) -> None:
+        """
+        Enregistre la durée et la confiance d'une reconnaissance
+
+        Args:
+            result (Dict[str, Any]): Résultat de _recognize
+        """
+        details = result.get("tesseract")
+        if not details:
+            return
+        try:
+            self.metrics.record_value('tesseract_ms', details["duration_ms"])
+            self.metrics.record_value('tesseract_confidence', details["mean_confidence"])
+        except Exception as e:
+            logger.warning(f"Erreur lors de l'enregistrement des métriques Tesseract: {str(e)}")
+
+    def shutdown(self) -> None:
+        """
+        Arrête les processus du pool
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Retourne l'état du moteur
+
+        Returns:
+            Dict[str, Any]: Disponibilité, pool démarré et paramètres
+        """
+        return {
+            "available": self.available,
+            "started": self._executor is not None,
+            "workers": self.workers,
+            "lang": self.lang
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """
+        Retourne le pool de processus (créé au premier usage)
+
+        Les processus sont créés par un serveur de fork (ou lancés à neuf) plutôt
+        que copiés depuis le processus Flask, dont les threads, verrous et canaux
+        gRPC ne doivent pas être dupliqués. Seul ce module y est préchargé; le
+        module principal est réimporté dans chaque processus (avec gunicorn,
+        c'est le lanceur: sans effet).
+
+        Returns:
+            ProcessPoolExecutor: Pool de TESSERACT_WORKERS processus
+        """
+        with self._lock:
+            if self._executor is None:
+                if 'forkserver' in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context('forkserver')
+                    context.set_forkserver_preload([__name__])
+                else:
+                    context = multiprocessing.get_context('spawn')
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=context,
+                    initializer=_init_worker, initargs=(self.tesseract_cmd,)
+                )
+                logger.info(f"Pool Tesseract créé ({self.workers} processus)")
+            return self._executor
+
+    def _discard_executor(self) -> None:
+        """
+        Abandonne un pool inutilisable (processus arrêté)
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _after_fork(self) -> None:
+        """
+        Réinitialise le moteur dans un processus enfant (le pool appartient au parent)
+        """
+        self._lock = threading.Lock()
+        self._executor = None
+
+
+# Moteur partagé par le module OCR
+tesseract_engine = TesseractEngine()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=tesseract_engine._after_fork)
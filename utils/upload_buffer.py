@@ -0,0 +1,167 @@
+"""
+NovaEvo - Lecture en mémoire des images envoyées aux endpoints
+
+Ce module lit un fichier reçu (werkzeug FileStorage ou tout flux binaire)
+directement en mémoire: le contenu est transmis tel quel aux modules OCR et
+reconnaissance d'image (bytes / memoryview), sans passer par le disque. Seuls
+les envois dépassant un seuil sont déversés dans un fichier temporaire au nom
+unique, supprimé à la fermeture: deux envois portant le même nom de fichier ne
+peuvent plus s'écraser.
+"""
+
+import io
+import os
+import logging
+import tempfile
+from typing import Any, BinaryIO, Dict, Optional
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.upload_buffer')
+
+# Taille des blocs lus dans le flux (octets)
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadBuffer:
+    """
+    Contenu d'un fichier envoyé, en mémoire ou déversé sur disque
+
+    Cette classe s'occupe de:
+    - Lire le flux reçu par blocs, en mémoire tant qu'il reste sous le seuil
+    - Déverser le contenu dans un fichier temporaire unique au-delà du seuil
+    - Exposer le contenu (memoryview) ou le chemin du fichier temporaire
+    - Supprimer le fichier temporaire à la fermeture
+    """
+
+    def __init__(self, stream: BinaryIO, filename: Optional[str] = None,
+                 spill_threshold: Optional[int] = None, spill_dir: Optional[str] = None):
+        """
+        Lit le flux reçu
+
+        Args:
+            stream (BinaryIO): Flux binaire (ex: request.files['image'].stream)
+            filename (str, optional): Nom du fichier côté client (seule l'extension est conservée)
+            spill_threshold (int, optional): Taille au-delà de laquelle le contenu est
+                écrit sur disque (défaut: variable UPLOAD_SPILL_THRESHOLD, 8 Mo)
+            spill_dir (str, optional): Dossier des fichiers temporaires
+                (défaut: variable UPLOAD_FOLDER)
+        """
+        self.filename = filename or ''
+        self.spill_threshold = spill_threshold if spill_threshold is not None else \
+            int(os.getenv('UPLOAD_SPILL_THRESHOLD', str(8 * 1024 * 1024)))
+        self.spill_dir = spill_dir or os.getenv('UPLOAD_FOLDER', 'uploads')
+        self.size = 0
+        self.path = None
+
+        self._memory = io.BytesIO()
+        self._read(stream)
+
+    @classmethod
+    def from_request_file(cls, file_storage, **options) -> 'UploadBuffer':
+        """
+        Lit un fichier reçu par Flask
+
+        Args:
+            file_storage (werkzeug.datastructures.FileStorage): Fichier de request.files
+            **options: Paramètres du constructeur (spill_threshold, spill_dir)
+
+        Returns:
+            UploadBuffer: Contenu du fichier
+        """
+        return cls(file_storage.stream, filename=file_storage.filename, **options)
+
+    @property
+    def spilled(self) -> bool:
+        """True si le contenu a été écrit dans un fichier temporaire"""
+        return self.path is not None
+
+    @property
+    def content(self) -> Optional[memoryview]:
+        """
+        Contenu en mémoire, sans copie
+
+        Returns:
+            Optional[memoryview]: Contenu, ou None si le fichier a été déversé sur disque
+        """
+        if self.spilled:
+            return None
+        return self._memory.getbuffer()
+
+    def read(self) -> bytes:
+        """
+        Retourne tout le contenu, relu sur disque s'il a été déversé
+
+        Returns:
+            bytes: Contenu du fichier
+        """
+        if self.spilled:
+            with open(self.path, 'rb') as f:
+                return f.read()
+        return self._memory.getvalue()
+
+    def image_source(self) -> Dict[str, Any]:
+        """
+        Arguments à transmettre aux modules d'analyse d'image
+
+        Returns:
+            Dict[str, Any]: {"image_path": ...} si déversé sur disque, sinon {"image_content": ...}
+        """
+        if self.spilled:
+            return {"image_path": self.path}
+        return {"image_content": self.content}
+
+    def close(self) -> None:
+        """
+        Libère la mémoire et supprime le fichier temporaire éventuel
+        """
+        self._memory = io.BytesIO()
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                logger.warning(f"Impossible de supprimer le fichier temporaire {self.path}: {str(e)}")
+            self.path = None
+
+    def __enter__(self) -> 'UploadBuffer':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _read(self, stream: BinaryIO) -> None:
+        """
+        Lit le flux par blocs, en basculant sur disque au-delà du seuil
+
+        Args:
+            stream (BinaryIO): Flux binaire
+        """
+        target = self._memory
+        try:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.size += len(chunk)
+                if target is self._memory and self.size > self.spill_threshold:
+                    target = self._spill()
+                target.write(chunk)
+        finally:
+            if target is not self._memory:
+                target.close()
+
+    def _spill(self) -> BinaryIO:
+        """
+        Crée le fichier temporaire et y recopie le contenu déjà lu
+
+        Returns:
+            BinaryIO: Fichier temporaire ouvert en écriture
+        """
+        os.makedirs(self.spill_dir, exist_ok=True)
+        suffix = os.path.splitext(os.path.basename(self.filename))[1][:16]
+        fd, self.path = tempfile.mkstemp(prefix='upload_', suffix=suffix, dir=self.spill_dir)
+        logger.info(f"Fichier reçu au-delà de {self.spill_threshold} octets, écrit dans {self.path}")
+
+        spill_file = os.fdopen(fd, 'wb')
+        spill_file.write(self._memory.getbuffer())
+        self._memory = io.BytesIO()
+        return spill_file
@@ -0,0 +1,170 @@
+"""
+NovaEvo - Client Google Cloud Vision partagé
+
+Chaque vision.ImageAnnotatorClient() charge les identifiants et ouvre un canal
+gRPC. Ce module fournit un client unique par processus, créé au premier usage,
+utilisé par le module OCR et par la reconnaissance d'image. Les canaux gardent
+leur connexion ouverte (keepalive) et peuvent être répartis sur un petit pool
+pour les traitements parallèles. Après un fork (workers gunicorn avec
+preload_app), le processus enfant recrée ses propres canaux: un canal gRPC ne
+doit pas être partagé entre processus.
+"""
+
+import os
+import logging
+import threading
+from typing import Any, Optional
+
+from google.cloud import vision
+from google.cloud.vision_v1.services.image_annotator.transports.grpc import ImageAnnotatorGrpcTransport
+
+# Configuration du logger
+logger = logging.getLogger('novaevo.vision_client')
+
+
+# Hôte de l'API (le transport ajoute aussi le port 443 quand il crée lui-même son canal)
+VISION_HOST = f"{ImageAnnotatorGrpcTransport.DEFAULT_HOST}:443"
+
+
+class VisionClientProvider:
+    """
+    Fournisseur du client Google Cloud Vision d'un processus
+
+    Cette classe s'occupe de:
+    - Créer les clients au premier usage seulement (pas de canal ouvert à l'import)
+    - Configurer le keepalive des canaux gRPC
+    - Répartir les appels sur un pool de canaux (tourniquet)
+    - Recréer les clients dans un processus issu d'un fork
+    """
+
+    def __init__(self, pool_size: Optional[int] = None, keepalive_ms: Optional[int] = None,
+                 keepalive_timeout_ms: Optional[int] = None):
+        """
+        Initialise le fournisseur (aucun client n'est créé ici)
+
+        Args:
+            pool_size (int, optional): Nombre de canaux gRPC (défaut: VISION_CHANNEL_POOL_SIZE)
+            keepalive_ms (int, optional): Intervalle des pings keepalive en ms
+                (défaut: VISION_KEEPALIVE_MS)
+            keepalive_timeout_ms (int, optional): Délai de réponse à un ping en ms
+                (défaut: VISION_KEEPALIVE_TIMEOUT_MS)
+        """
+        self.pool_size = max(1, pool_size or int(os.getenv('VISION_CHANNEL_POOL_SIZE', '1')))
+        self.keepalive_ms = keepalive_ms or int(os.getenv('VISION_KEEPALIVE_MS', '30000'))
+        self.keepalive_timeout_ms = keepalive_timeout_ms or int(os.getenv('VISION_KEEPALIVE_TIMEOUT_MS', '10000'))
+
+        self._clients = []
+        self._next = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """
+        Retourne un client Vision, créé au premier appel dans ce processus
+
+        Returns:
+            vision.ImageAnnotatorClient: Client partagé (tourniquet sur le pool)
+
+        Raises:
+            Exception: Si le client ne peut pas être créé (identifiants absents...)
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # Premier appel, ou processus enfant: les canaux du parent sont inutilisables
+                self._clients = []
+                self._next = 0
+                self._pid = os.getpid()
+
+            if len(self._clients) < self.pool_size:
+                self._clients.append(self._create(len(self._clients)))
+                return self._clients[-1]
+
+            client = self._clients[self._next]
+            self._next = (self._next + 1) % self.pool_size
+            return client
+
+    def reset(self) -> None:
+        """
+        Oublie les clients créés (ils seront recréés au prochain appel)
+        """
+        with self._lock:
+            self._clients = []
+            self._next = 0
+            self._pid = None
+
+    def _after_fork(self) -> None:
+        """
+        Réinitialise le fournisseur dans un processus enfant
+
+        Le verrou est recréé: il a pu être copié verrouillé par un autre thread du parent.
+        """
+        self._lock = threading.Lock()
+        self._clients = []
+        self._next = 0
+        self._pid = None
+
+    def status(self) -> dict:
+        """
+        Retourne l'état du fournisseur
+
+        Returns:
+            dict: Clients créés et paramètres des canaux
+        """
+        with self._lock:
+            return {
+                "clients": len(self._clients) if self._pid == os.getpid() else 0,
+                "pool_size": self.pool_size,
+                "keepalive_ms": self.keepalive_ms
+            }
+
+    def _create(self, index: int) -> Any:
+        """
+        Crée un client et son canal gRPC
+
+        Args:
+            index (int): Position du client dans le pool
+
+        Returns:
+            vision.ImageAnnotatorClient: Nouveau client
+        """
+        options = [
+            # Options par défaut du transport (messages sans limite de taille), perdues
+            # quand le canal lui est fourni
+            ("grpc.max_send_message_length", -1),
+            ("grpc.max_receive_message_length", -1),
+            ("grpc.keepalive_time_ms", self.keepalive_ms),
+            ("grpc.keepalive_timeout_ms", self.keepalive_timeout_ms),
+            ("grpc.keepalive_permit_without_calls", 1),
+            ("grpc.http2.max_pings_without_data", 0)
+        ]
+        if self.pool_size > 1:
+            # Sans pool de sous-canaux local, gRPC réutiliserait la même connexion TCP
+            options.append(("grpc.use_local_subchannel_pool", 1))
+
+        # Le client n'accepte qu'un nom ou une instance de transport (pas de fabrique
+        # avant google-cloud-vision 3.5): le canal est créé ici, avec les identifiants
+        # par défaut (GOOGLE_APPLICATION_CREDENTIALS)
+        channel = ImageAnnotatorGrpcTransport.create_channel(VISION_HOST, options=options)
+        client = vision.ImageAnnotatorClient(transport=ImageAnnotatorGrpcTransport(channel=channel))
+        logger.info(f"Client Google Cloud Vision créé ({index + 1}/{self.pool_size}, pid {os.getpid()})")
+        return client
+
+
+# Fournisseur partagé par les modules OCR et reconnaissance d'image
+vision_client_provider = VisionClientProvider()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=vision_client_provider._after_fork)
+
+
+def get_vision_client() -> Any:
+    """
+    Retourne le client Google Cloud Vision partagé du processus
+
+    Returns:
+        vision.ImageAnnotatorClient: Client partagé
+
+    Raises:
+        Exception: Si le client ne peut pas être créé
+    """
+    return vision_client_provider.get()